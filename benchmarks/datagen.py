@@ -0,0 +1,239 @@
+"""
+Synthetic MountainHub datasets for benchmarks.
+
+:func:`populate` fills the database of the current app context with users,
+trails, trip logs (a share of them with GPS tracks), guides with per-user
+progress, equipment and refuges. Sizes come from a named scale in
+:data:`SCALES` and the content is reproducible for a given seed, so
+benchmark runs against the same scale are comparable.
+
+Usage (writes to ``DATABASE_URL`` or the local development database)::
+
+    python -m benchmarks.datagen [--scale small|medium|large] [--seed 42]
+"""
+
+import argparse
+import datetime
+import random
+import uuid
+from dataclasses import dataclass
+from typing import Any, Dict, List
+
+from sqlalchemy import insert, select
+
+from benchmarks.track_storage import synthetic_points
+from src.models import Equipment, Guide, Refuge, Track, Trail, TripLog, User, UserGuideProgress, db
+from src.services.track_codec import TrackData
+
+
+@dataclass(frozen=True)
+class Scale:
+    users: int
+    trails: int
+    trip_logs: int
+    guides: int
+    equipment: int
+    refuges: int
+    # Share of trails and trip logs with a GPS track, and points per track
+    track_share: float = 0.3
+    track_points: int = 2_000
+
+
+SCALES: Dict[str, Scale] = {
+    'small': Scale(users=50, trails=200, trip_logs=500, guides=10, equipment=200, refuges=100),
+    'medium': Scale(users=500, trails=2_000, trip_logs=5_000, guides=30, equipment=1_000, refuges=500),
+    'large': Scale(users=5_000, trails=20_000, trip_logs=50_000, guides=100, equipment=5_000, refuges=2_000),
+}
+
+BATCH_SIZE = 1_000
+# Tracks go through the ORM (encoding and stats), so smaller batches
+TRACK_BATCH_SIZE = 100
+
+SEASONS = ['spring', 'summer', 'autumn', 'winter']
+REGIONS = ['Trentino', 'Alto Adige', "Valle d'Aosta", 'Lombardia', 'Piemonte', 'Veneto', 'Friuli']
+TRAIL_DIFFICULTIES = ['easy', 'moderate', 'hard', 'extreme']
+SKILL_LEVELS = ['beginner', 'intermediate', 'advanced', 'expert']
+EQUIPMENT_CATEGORIES = ['clothing', 'footwear', 'safety', 'navigation', 'camping']
+BRANDS = ['Salewa', 'La Sportiva', 'Scarpa', 'Ferrino', 'Camp', 'Grivel', 'Montura']
+WEATHER = ['sunny', 'cloudy', 'rain', 'snow', 'windy']
+
+_EPOCH = datetime.datetime(2024, 1, 1, 8, 0)
+
+
+def _insert(model: Any, rows: List[Dict[str, Any]]) -> None:
+    for start in range(0, len(rows), BATCH_SIZE):
+        db.session.execute(insert(model), rows[start:start + BATCH_SIZE])
+    db.session.commit()
+
+
+def _seasons(rng: random.Random) -> List[str]:
+    return sorted(rng.sample(SEASONS, rng.randint(1, 4)), key=SEASONS.index)
+
+
+def _track(rng: random.Random, points: int) -> Track:
+    return Track.from_track_data(TrackData.from_points(synthetic_points(points, seed=rng.randrange(1 << 30))))
+
+
+def populate(scale: Scale, seed: int = 42) -> Dict[str, List[Any]]:
+    """Insert a dataset of the given ``scale`` and return the generated ids.
+
+    The result maps ``users``, ``trails``, ``trails_with_track``,
+    ``trip_logs``, ``trip_logs_with_track``, ``guides`` and ``equipment``
+    to lists of primary keys, for building benchmark requests.
+    """
+    rng = random.Random(seed)
+    user_ids = [str(uuid.UUID(int=rng.getrandbits(128), version=4)) for _ in range(scale.users)]
+    _insert(User, [{
+        'id': user_id,
+        'username': f'escursionista{i}',
+        'email': f'escursionista{i}@example.com',
+        'password_hash': 'pbkdf2:sha256:benchmark',
+        'skill_level': rng.choice(SKILL_LEVELS),
+        'profile_data': {'home_region': rng.choice(REGIONS)},
+        'preferences': {'units': 'metric'},
+    } for i, user_id in enumerate(user_ids)])
+
+    trail_ids = [str(uuid.UUID(int=rng.getrandbits(128), version=4)) for _ in range(scale.trails)]
+    trail_rows = []
+    for i, trail_id in enumerate(trail_ids):
+        distance = round(rng.uniform(3, 30), 1)
+        gain = rng.randint(100, 2_000)
+        hours = round(distance / 4 + gain / 400, 1)
+        lat, lon = rng.uniform(45.8, 46.9), rng.uniform(6.8, 13.5)
+        trail_rows.append({
+            'id': trail_id,
+            'name': f'Sentiero {i}',
+            'description': 'Percorso tra boschi di larici, pascoli e creste panoramiche. ' * rng.randint(1, 4),
+            'difficulty': rng.choice(TRAIL_DIFFICULTIES),
+            'distance_km': distance,
+            'length_km': distance,
+            'elevation_gain_m': gain,
+            'elevation_gain': gain,
+            'estimated_duration_hours': hours,
+            'estimated_time_hours': hours,
+            'start_point': f'Rifugio {i}',
+            'end_point': f'Malga {i}',
+            'region': rng.choice(REGIONS),
+            'country': 'Italia',
+            'season_availability': _seasons(rng),
+            'coordinates': {'start': {'lat': lat, 'lon': lon}, 'end': {'lat': lat + 0.02, 'lon': lon + 0.03}},
+            'created_by': rng.choice(user_ids),
+        })
+    _insert(Trail, trail_rows)
+
+    log_rows = []
+    for log_id in range(1, scale.trip_logs + 1):
+        lat, lon = rng.uniform(45.8, 46.9), rng.uniform(6.8, 13.5)
+        log_rows.append({
+            'id': log_id,
+            'user_id': rng.choice(user_ids),
+            'title': f'Uscita {log_id}',
+            'description': 'Giornata limpida, neve residua sopra i 2500 m.',
+            'date': (_EPOCH + datetime.timedelta(days=rng.randrange(700))).date(),
+            'duration_hours': round(rng.uniform(2, 10), 1),
+            'distance_km': round(rng.uniform(4, 30), 1),
+            'elevation_gain': rng.randint(200, 2_000),
+            'difficulty': rng.choice(TRAIL_DIFFICULTIES),
+            'trail_id': rng.choice(trail_ids) if rng.random() < 0.7 else None,
+            'location_name': rng.choice(REGIONS),
+            'location_coords': {'lat': lat, 'lng': lon},
+            'weather_conditions': rng.choice(WEATHER),
+            'temperature': round(rng.uniform(-10, 28), 1),
+            'is_public': rng.random() < 0.8,
+            'photos': [f'https://example.com/photos/{log_id}-{n}.jpg' for n in range(rng.randint(0, 4))],
+            'waypoints': [],
+            'notes': ['Acqua alla fontana del rifugio'],
+            'equipment_used': rng.sample(EQUIPMENT_CATEGORIES, 2),
+            'companions': [{'user_id': c} for c in rng.sample(user_ids, min(len(user_ids), rng.randint(0, 2)))],
+        })
+    _insert(TripLog, log_rows)
+
+    trails_with_track = rng.sample(trail_ids, int(len(trail_ids) * scale.track_share))
+    logs_with_track = rng.sample(range(1, scale.trip_logs + 1), int(scale.trip_logs * scale.track_share))
+    owners = [('trail_id', t) for t in trails_with_track] + [('trip_log_id', i) for i in logs_with_track]
+    for n, (column, owner_id) in enumerate(owners, 1):
+        track = _track(rng, scale.track_points)
+        setattr(track, column, owner_id)
+        db.session.add(track)
+        if n % TRACK_BATCH_SIZE == 0:
+            db.session.commit()
+    db.session.commit()
+
+    _insert(Guide, [{
+        'title': f'Guida {i}',
+        'description': 'Dalla prima escursione alla prima ferrata, passo dopo passo.',
+        'difficulty': rng.choice(SKILL_LEVELS),
+        'duration_days': rng.randint(1, 7),
+        'elevation_gain': rng.randint(300, 3_000),
+        'steps': [{'title': f'Tappa {n}', 'content': 'Preparazione e sicurezza. ' * 5} for n in range(rng.randint(3, 10))],
+        'recommended_trails': rng.sample(trail_ids, min(len(trail_ids), 3)),
+    } for i in range(scale.guides)])
+    guide_ids = db.session.execute(select(Guide.id)).scalars().all()
+    _insert(UserGuideProgress, [{
+        'user_id': user_id,
+        'guide_id': guide_id,
+        'completed_steps': [0, 1],
+        'completed': False,
+    } for user_id in user_ids for guide_id in rng.sample(guide_ids, min(len(guide_ids), 3))])
+
+    equipment_ids = [str(uuid.UUID(int=rng.getrandbits(128), version=4)) for _ in range(scale.equipment)]
+    equipment_rows = []
+    for i, equipment_id in enumerate(equipment_ids):
+        price = rng.randint(20, 600)
+        equipment_rows.append({
+            'id': equipment_id,
+            'name': f'Articolo {i}',
+            'category': rng.choice(EQUIPMENT_CATEGORIES),
+            'brand': rng.choice(BRANDS),
+            'model': f'M{i}',
+            'description': 'Leggero e resistente.',
+            'weight': rng.randint(50, 3_000),
+            'specifications': {'waterproof': rng.random() < 0.5},
+            'price_range': {'min': price, 'max': price + rng.randint(0, 200), 'currency': 'EUR'},
+            'season_use': _seasons(rng),
+            'skill_level_required': rng.choice(SKILL_LEVELS),
+            'rating': round(rng.uniform(2.5, 5), 2),
+        })
+    _insert(Equipment, equipment_rows)
+
+    _insert(Refuge, [{
+        'name': f'Rifugio {i}',
+        'latitude': round(rng.uniform(45.8, 46.9), 6),
+        'longitude': round(rng.uniform(6.8, 13.5), 6),
+        'altitude_m': rng.randint(1_200, 3_500),
+        'capacity': rng.randint(10, 120),
+        'contact_info': {'phone': '+39 0462 000000'},
+        'amenities': rng.sample(['restaurant', 'shower', 'wifi', 'heating'], 2),
+        'opening_periods': [{'start': '2024-06-15', 'end': '2024-09-20'}],
+        'booking_required': rng.random() < 0.5,
+        'rating': round(rng.uniform(3, 5), 2),
+    } for i in range(scale.refuges)])
+
+    return {
+        'users': user_ids,
+        'trails': trail_ids,
+        'trails_with_track': trails_with_track,
+        'trip_logs': list(range(1, scale.trip_logs + 1)),
+        'trip_logs_with_track': logs_with_track,
+        'guides': guide_ids,
+        'equipment': equipment_ids,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--scale', choices=sorted(SCALES), default='small')
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    from src.main import create_app
+
+    app = create_app()
+    with app.app_context():
+        db.create_all()
+        ids = populate(SCALES[args.scale], seed=args.seed)
+    print(', '.join(f'{name}: {len(values)}' for name, values in ids.items()))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,318 @@
+"""
+Endpoint benchmark suite.
+
+Builds the full application on a fresh SQLite database filled by
+:mod:`benchmarks.datagen`, then measures every database-backed endpoint in
+two phases:
+
+* **sequential** -- each scenario is requested repeatedly through the Flask
+  test client, giving per-endpoint p50/p95/p99 latency, single-thread
+  throughput and the peak Python allocation of one request (``tracemalloc``,
+  measured in a separate pass so it does not slow the timed one);
+* **load** -- the app is served by a threaded local HTTP server and several
+  client threads issue a random mix of the read scenarios for a fixed time,
+  giving aggregate throughput and latency under contention.
+
+Responses are the warm path: caches fill during warm-up and no conditional
+headers are sent, so every request produces a full body. The ``/external``
+routes are left out because they call third-party APIs.
+
+Results can be saved as a baseline and compared with later runs; with
+``--fail-on-regression`` the exit status is 1 when a latency percentile or
+throughput figure is worse than the baseline by more than ``--tolerance``.
+
+Usage::
+
+    python -m benchmarks.endpoints [--scale small] [--requests 200]
+        [--threads 8] [--duration 10] [--save-baseline bench.json]
+        [--baseline bench.json] [--tolerance 0.15] [--fail-on-regression]
+"""
+
+import argparse
+import http.client
+import json
+import os
+import platform
+import random
+import resource
+import shutil
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional
+
+from flask import Flask
+
+from benchmarks.datagen import SCALES, populate
+
+Ids = Dict[str, List[Any]]
+
+
+@dataclass(frozen=True)
+class Scenario:
+    name: str
+    method: str
+    # Builds a request path from the generated ids
+    path: Callable[[random.Random, Ids], str]
+    body: Optional[Callable[[random.Random, Ids], Dict[str, Any]]] = None
+
+    @property
+    def read_only(self) -> bool:
+        return self.method == 'GET'
+
+
+def _get(name: str, path: Callable[[random.Random, Ids], str]) -> Scenario:
+    return Scenario(name, 'GET', path)
+
+
+SCENARIOS: List[Scenario] = [
+    _get('users.list', lambda r, ids: '/api/users'),
+    _get('users.detail', lambda r, ids: f"/api/users/{r.choice(ids['users'])}"),
+    _get('trails.list', lambda r, ids: '/api/trails'),
+    _get('trails.list_season', lambda r, ids: '/api/trails?season=winter'),
+    _get('trails.detail', lambda r, ids: f"/api/trails/{r.choice(ids['trails'])}"),
+    _get('trails.profile', lambda r, ids: f"/api/trails/{r.choice(ids['trails_with_track'])}/profile"),
+    _get('trip_logs.list', lambda r, ids: '/api/trip-logs'),
+    _get('trip_logs.list_user', lambda r, ids: f"/api/trip-logs?user_id={r.choice(ids['users'])}"),
+    _get('trip_logs.detail', lambda r, ids: f"/api/trip-logs/{r.choice(ids['trip_logs'])}"),
+    _get('trip_logs.detail_track',
+         lambda r, ids: f"/api/trip-logs/{r.choice(ids['trip_logs_with_track'])}?include=track"),
+    _get('trip_logs.track', lambda r, ids: f"/api/trip-logs/{r.choice(ids['trip_logs_with_track'])}/track"),
+    _get('trip_logs.profile', lambda r, ids: f"/api/trip-logs/{r.choice(ids['trip_logs_with_track'])}/profile"),
+    _get('guides.list', lambda r, ids: '/api/guides'),
+    _get('guides.detail', lambda r, ids: f"/api/guides/{r.choice(ids['guides'])}"),
+    _get('guides.progress', lambda r, ids: f"/api/guides/progress?user_id={r.choice(ids['users'])}"),
+    _get('equipment.categories', lambda r, ids: '/api/equipment/categories'),
+    _get('equipment.list', lambda r, ids: '/api/equipment'),
+    _get('equipment.list_price', lambda r, ids: '/api/equipment?category=footwear&max_price=200'),
+    Scenario('equipment.configure', 'POST', lambda r, ids: '/api/equipment/configure',
+             lambda r, ids: {'activity_type': 'hiking', 'season': r.choice(['summer', 'winter']),
+                             'duration_days': r.randint(1, 5), 'skill_level': 'intermediate'}),
+    Scenario('trip_logs.create', 'POST', lambda r, ids: '/api/trip-logs',
+             lambda r, ids: {'user_id': r.choice(ids['users']), 'title': 'Benchmark',
+                             'date': '2024-07-14', 'distance_km': 12.5, 'elevation_gain': 900}),
+]
+
+
+def _percentile(sorted_values: List[float], fraction: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, round(fraction * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+def summarise(latencies: List[float], elapsed: float, errors: int = 0) -> Dict[str, float]:
+    """Latency percentiles (ms) and throughput for one series of requests."""
+    values = sorted(latencies)
+    return {
+        'requests': len(values),
+        'errors': errors,
+        'p50_ms': round(_percentile(values, 0.50) * 1000, 3),
+        'p95_ms': round(_percentile(values, 0.95) * 1000, 3),
+        'p99_ms': round(_percentile(values, 0.99) * 1000, 3),
+        'mean_ms': round(sum(values) / len(values) * 1000, 3) if values else 0.0,
+        'rps': round(len(values) / elapsed, 1) if elapsed else 0.0,
+    }
+
+
+def build_app(database_path: str, scale: str, seed: int) -> tuple:
+    """Create the app on a new SQLite file and fill it with synthetic data."""
+    os.environ['DATABASE_URL'] = f'sqlite:///{database_path}'
+    # Keep the timing log off stdout/stderr; headers are still computed
+    os.environ.setdefault('REQUEST_TIMING_LOG', '0')
+    # All load comes from one client address
+    os.environ.setdefault('RATE_LIMIT_ENABLED', '0')
+    from src.main import create_app
+    from src.models import db
+
+    app = create_app()
+    with app.app_context():
+        db.create_all()
+        ids = populate(SCALES[scale], seed=seed)
+    return app, ids
+
+
+def _call(client: Any, scenario: Scenario, rng: random.Random, ids: Ids) -> int:
+    path = scenario.path(rng, ids)
+    if scenario.body is None:
+        return client.open(path, method=scenario.method).status_code
+    return client.open(path, method=scenario.method, json=scenario.body(rng, ids)).status_code
+
+
+def run_sequential(app: Flask, ids: Ids, requests: int, seed: int) -> Dict[str, Dict[str, float]]:
+    client = app.test_client()
+    results = {}
+    for scenario in SCENARIOS:
+        rng = random.Random(seed)
+        for _ in range(max(10, requests // 10)):
+            _call(client, scenario, rng, ids)
+        latencies, errors = [], 0
+        start = time.perf_counter()
+        for _ in range(requests):
+            t0 = time.perf_counter()
+            status = _call(client, scenario, rng, ids)
+            latencies.append(time.perf_counter() - t0)
+            errors += status >= 400
+        stats = summarise(latencies, time.perf_counter() - start, errors)
+
+        tracemalloc.start()
+        peak = 0
+        for _ in range(min(requests, 20)):
+            tracemalloc.reset_peak()
+            before = tracemalloc.get_traced_memory()[0]
+            _call(client, scenario, rng, ids)
+            peak = max(peak, tracemalloc.get_traced_memory()[1] - before)
+        tracemalloc.stop()
+        stats['peak_kib'] = round(peak / 1024, 1)
+        results[scenario.name] = stats
+    return results
+
+
+def run_load(app: Flask, ids: Ids, threads: int, duration: float, seed: int) -> Dict[str, float]:
+    from werkzeug.serving import WSGIRequestHandler, make_server
+
+    class QuietHandler(WSGIRequestHandler):
+        def log_request(self, *args: Any) -> None:
+            pass
+
+    server = make_server('127.0.0.1', 0, app, threaded=True, request_handler=QuietHandler)
+    server_thread = threading.Thread(target=server.serve_forever, daemon=True)
+    server_thread.start()
+    port = server.server_port
+    readers = [s for s in SCENARIOS if s.read_only]
+    latencies: List[List[float]] = [[] for _ in range(threads)]
+    errors = [0] * threads
+    deadline = time.perf_counter() + duration
+
+    def worker(index: int) -> None:
+        rng = random.Random(seed + index)
+        while time.perf_counter() < deadline:
+            scenario = rng.choice(readers)
+            t0 = time.perf_counter()
+            connection = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+            try:
+                connection.request('GET', scenario.path(rng, ids), headers={'Accept-Encoding': 'gzip'})
+                response = connection.getresponse()
+                response.read()
+                ok = response.status < 400
+            except OSError:
+                ok = False
+            finally:
+                connection.close()
+            latencies[index].append(time.perf_counter() - t0)
+            errors[index] += not ok
+
+    start = time.perf_counter()
+    workers = [threading.Thread(target=worker, args=(i,)) for i in range(threads)]
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    server.shutdown()
+    stats = summarise([v for series in latencies for v in series], elapsed, sum(errors))
+    stats['threads'] = threads
+    return stats
+
+
+def _peak_rss_mib() -> float:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in KiB on Linux and bytes on macOS
+    return round(peak / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+
+
+def compare(current: Dict[str, Any], baseline: Dict[str, Any], tolerance: float) -> List[str]:
+    """Print a comparison with ``baseline`` and return the regressions found."""
+    regressions = []
+
+    def check(label: str, now: Dict[str, float], then: Dict[str, float]) -> None:
+        cells = []
+        for key in ('p50_ms', 'p95_ms', 'p99_ms', 'rps'):
+            if not then.get(key):
+                continue
+            change = (now[key] - then[key]) / then[key]
+            worse = change < -tolerance if key == 'rps' else change > tolerance
+            cells.append(f'{key} {change:+7.1%}{" !" if worse else "  "}')
+            if worse:
+                regressions.append(f'{label} {key}: {then[key]} -> {now[key]}')
+        print(f'  {label:<26} ' + '  '.join(cells))
+
+    print(f"\nAgainst baseline ({baseline['meta']['created']}, tolerance {tolerance:.0%}):")
+    for name, stats in current['sequential'].items():
+        if name in baseline['sequential']:
+            check(name, stats, baseline['sequential'][name])
+    if current.get('load') and baseline.get('load'):
+        check('load', current['load'], baseline['load'])
+    return regressions
+
+
+def print_report(results: Dict[str, Any]) -> None:
+    header = f"{'scenario':<26} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'req/s':>8} {'peak KiB':>9} {'err':>4}"
+    print(header)
+    print('-' * len(header))
+    for name, s in results['sequential'].items():
+        print(f"{name:<26} {s['p50_ms']:>8.2f} {s['p95_ms']:>8.2f} {s['p99_ms']:>8.2f} "
+              f"{s['rps']:>8.0f} {s['peak_kib']:>9.1f} {s['errors']:>4}")
+    load = results.get('load')
+    if load:
+        print(f"\nload ({load['threads']} threads): {load['rps']:.0f} req/s, p50 {load['p50_ms']:.2f} ms, "
+              f"p95 {load['p95_ms']:.2f} ms, p99 {load['p99_ms']:.2f} ms, {load['errors']} errors")
+    print(f"peak RSS: {results['meta']['peak_rss_mib']} MiB")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--scale', choices=sorted(SCALES), default='small')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--requests', type=int, default=200, help='timed requests per scenario')
+    parser.add_argument('--threads', type=int, default=8, help='load phase client threads (0 to skip)')
+    parser.add_argument('--duration', type=float, default=10.0, help='load phase length in seconds')
+    parser.add_argument('--save-baseline', metavar='PATH')
+    parser.add_argument('--baseline', metavar='PATH')
+    parser.add_argument('--tolerance', type=float, default=0.15)
+    parser.add_argument('--fail-on-regression', action='store_true')
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='mountainhub-bench-')
+    try:
+        started = time.perf_counter()
+        app, ids = build_app(os.path.join(workdir, 'bench.db'), args.scale, args.seed)
+        print(f'{args.scale} dataset generated in {time.perf_counter() - started:.1f} s\n')
+        results: Dict[str, Any] = {'sequential': run_sequential(app, ids, args.requests, args.seed)}
+        if args.threads > 0:
+            results['load'] = run_load(app, ids, args.threads, args.duration, args.seed)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+    results['meta'] = {
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'scale': args.scale,
+        'seed': args.seed,
+        'requests': args.requests,
+        'python': platform.python_version(),
+        'sqlite': sqlite3.sqlite_version,
+        'peak_rss_mib': _peak_rss_mib(),
+    }
+    print_report(results)
+
+    regressions: List[str] = []
+    if args.baseline:
+        with open(args.baseline) as fh:
+            baseline = json.load(fh)
+        if baseline['meta']['scale'] != args.scale:
+            print(f"\nwarning: baseline was recorded at scale {baseline['meta']['scale']!r}")
+        regressions = compare(results, baseline, args.tolerance)
+        print(f'\n{len(regressions)} regression(s)')
+    if args.save_baseline:
+        with open(args.save_baseline, 'w') as fh:
+            json.dump(results, fh, indent=2)
+        print(f'baseline written to {args.save_baseline}')
+    if regressions and args.fail_on_regression:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,277 @@
+"""
+Benchmark the external API converters on recorded upstream responses.
+
+Overpass responses for large areas run to tens of megabytes, and
+``TrailService._convert_to_geojson`` / ``RefugeService._convert_to_geojson``
+process them inside the request. This harness replays responses from disk
+through :class:`benchmarks.stub_server.StubServer`, with the services
+pointed at the stub via ``base_url``, and reports for each response:
+
+* ``fetch``   -- HTTP transfer from the stub (``requests``, body only);
+* ``parse``   -- ``json.loads`` of the body, as ``response.json()`` does;
+* ``convert`` -- the service's GeoJSON conversion;
+* ``serialize`` -- encoding the result with the app's JSON provider;
+* ``end-to-end`` -- the public service method against the stub.
+
+Each stage is timed (best of ``--repeat``) and then run once more under
+``tracemalloc`` for its peak traced memory and the number of memory blocks
+it leaves allocated (the objects it built).
+
+Fixtures are read from ``benchmarks/fixtures`` (not committed; files are
+named ``trails-<label>.json``, ``refuges-<label>.json`` and
+``weather-<label>.json``, optionally gzipped). Record them once with
+network access, e.g.::
+
+    python -m benchmarks.external_converters --record alps-20km --bbox 46.3,11.6,46.5,11.9
+
+Without recordings, synthetic Overpass and Open-Meteo responses are
+generated for squares of ``--sides`` kilometres.
+
+Usage::
+
+    python -m benchmarks.external_converters [--sides 2 10 25] [--repeat 3]
+"""
+
+import argparse
+import gzip
+import json
+import math
+import os
+import random
+import time
+import tracemalloc
+from typing import Any, Callable, Dict, List, Tuple
+
+import requests
+
+from benchmarks.stub_server import StubServer
+from src.external_apis import RefugeService, TrailService, WeatherService
+from src.json_provider import dumps_bytes
+
+FIXTURE_DIR = os.path.join(os.path.dirname(__file__), 'fixtures')
+OVERPASS_PATH = '/api/interpreter'
+OPEN_METEO_PATH = '/v1/forecast'
+
+# Rough densities of OSM hiking data in the Alps
+TRAIL_WAYS_PER_KM2 = 6
+REFUGES_PER_KM2 = 0.4
+
+# A bounding box passed to the services; the stub ignores it
+_BBOX = (46.3, 11.6, 46.5, 11.9)
+
+
+def _bbox_km(side_km: float, lat: float = 46.4, lon: float = 11.7) -> Tuple[float, float, float, float]:
+    dlat = side_km / 111.0
+    dlon = side_km / (111.0 * math.cos(math.radians(lat)))
+    return lat, lon, lat + dlat, lon + dlon
+
+
+def synthetic_trails(side_km: float, seed: int = 42) -> Dict[str, Any]:
+    """An Overpass ``out body; >; out skel qt;`` response for hiking ways."""
+    rng = random.Random(seed)
+    south, west, north, east = _bbox_km(side_km)
+    ways, nodes = [], []
+    next_node = 1
+    for way_id in range(1, int(side_km * side_km * TRAIL_WAYS_PER_KM2) + 1):
+        lat, lon = rng.uniform(south, north), rng.uniform(west, east)
+        refs = []
+        for _ in range(rng.randint(10, 120)):
+            lat += rng.gauss(0, 1e-4)
+            lon += rng.gauss(0, 1.4e-4)
+            nodes.append({'type': 'node', 'id': next_node, 'lat': round(lat, 7), 'lon': round(lon, 7)})
+            refs.append(next_node)
+            next_node += 1
+        ways.append({
+            'type': 'way',
+            'id': way_id,
+            'nodes': refs,
+            'tags': {
+                'highway': rng.choice(['path', 'footway', 'track']),
+                'sac_scale': rng.choice(['hiking', 'mountain_hiking', 'demanding_mountain_hiking']),
+                'trail_visibility': rng.choice(['excellent', 'good', 'intermediate']),
+                'name': f'Sentiero {way_id}',
+                'ref': str(rng.randint(1, 999)),
+                'surface': rng.choice(['ground', 'gravel', 'rock']),
+            },
+        })
+    relations = [{
+        'type': 'relation',
+        'id': rel_id,
+        'members': [{'type': 'way', 'ref': w['id'], 'role': ''} for w in rng.sample(ways, min(len(ways), 10))],
+        'tags': {'route': 'hiking', 'name': f'Alta Via {rel_id}', 'network': 'lwn'},
+    } for rel_id in range(1, len(ways) // 50 + 2)]
+    return {
+        'version': 0.6,
+        'generator': 'Overpass API (synthetic)',
+        'osm3s': {'timestamp_osm_base': '2024-06-01T00:00:00Z'},
+        'elements': ways + relations + nodes,
+    }
+
+
+def synthetic_refuges(side_km: float, seed: int = 42) -> Dict[str, Any]:
+    """An Overpass ``out body;`` response for alpine huts and shelters."""
+    rng = random.Random(seed)
+    south, west, north, east = _bbox_km(side_km)
+    count = max(1, int(side_km * side_km * REFUGES_PER_KM2))
+    return {
+        'version': 0.6,
+        'generator': 'Overpass API (synthetic)',
+        'elements': [{
+            'type': 'node',
+            'id': node_id,
+            'lat': round(rng.uniform(south, north), 7),
+            'lon': round(rng.uniform(west, east), 7),
+            'tags': {
+                'tourism': rng.choice(['alpine_hut', 'wilderness_hut']),
+                'name': f'Rifugio {node_id}',
+                'ele': str(rng.randint(1_200, 3_400)),
+                'capacity': str(rng.randint(8, 120)),
+                'operator': 'CAI',
+                'website': f'https://example.com/rifugio/{node_id}',
+                'opening_hours': 'Jun 20-Sep 20',
+            },
+        } for node_id in range(1, count + 1)],
+    }
+
+
+def synthetic_weather(days: int = 7) -> Dict[str, Any]:
+    """An Open-Meteo forecast with the variables ``WeatherService`` requests."""
+    hours = days * 24
+    hourly_vars = [
+        'temperature_2m', 'relative_humidity_2m', 'dew_point_2m', 'apparent_temperature',
+        'precipitation_probability', 'precipitation', 'rain', 'showers', 'snowfall', 'snow_depth',
+        'weather_code', 'pressure_msl', 'surface_pressure', 'cloud_cover', 'cloud_cover_low',
+        'cloud_cover_mid', 'cloud_cover_high', 'visibility', 'wind_speed_10m', 'wind_direction_10m',
+        'wind_gusts_10m',
+    ]
+    rng = random.Random(7)
+    hourly: Dict[str, List[Any]] = {
+        'time': [f'2024-06-{1 + h // 24:02d}T{h % 24:02d}:00' for h in range(hours)],
+    }
+    for name in hourly_vars:
+        hourly[name] = [round(rng.uniform(0, 100), 1) for _ in range(hours)]
+    return {
+        'latitude': 46.4, 'longitude': 11.7, 'elevation': 2100.0, 'timezone': 'Europe/Rome',
+        'current': {name: round(rng.uniform(0, 30), 1) for name in hourly_vars[:14]},
+        'hourly': hourly,
+        'daily': {'time': [f'2024-06-{d + 1:02d}' for d in range(days)],
+                  'temperature_2m_max': [round(rng.uniform(10, 25), 1) for _ in range(days)]},
+    }
+
+
+def _read_fixture(path: str) -> bytes:
+    opener = gzip.open if path.endswith('.gz') else open
+    with opener(path, 'rb') as fh:
+        return fh.read()
+
+
+def load_fixtures(sides: List[float]) -> List[Tuple[str, str, bytes]]:
+    """``(kind, label, body)`` for recorded fixtures, or synthetic ones if none exist."""
+    fixtures = []
+    if os.path.isdir(FIXTURE_DIR):
+        for name in sorted(os.listdir(FIXTURE_DIR)):
+            stem = name[:-3] if name.endswith('.gz') else name
+            kind, _, label = stem[:-len('.json')].partition('-')
+            if stem.endswith('.json') and kind in ('trails', 'refuges', 'weather'):
+                fixtures.append((kind, label, _read_fixture(os.path.join(FIXTURE_DIR, name))))
+    if fixtures:
+        return fixtures
+    for side in sides:
+        fixtures.append(('trails', f'{side:g}km', json.dumps(synthetic_trails(side)).encode()))
+        fixtures.append(('refuges', f'{side:g}km', json.dumps(synthetic_refuges(side)).encode()))
+    fixtures.append(('weather', '7d', json.dumps(synthetic_weather()).encode()))
+    return fixtures
+
+
+def _measure(func: Callable[[], Any], repeat: int) -> Tuple[Any, float, float, int]:
+    """Best wall time (ms), then peak traced MiB and live blocks left by one call."""
+    best = float('inf')
+    result = None
+    for _ in range(repeat):
+        result = None
+        start = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - start)
+    result = None
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    result = func()
+    peak = tracemalloc.get_traced_memory()[1]
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    blocks = sum(stat.count_diff for stat in after.compare_to(before, 'filename'))
+    return result, best * 1000, peak / (1024 * 1024), blocks
+
+
+def run(sides: List[float], repeat: int) -> None:
+    # Measure the converters on every call, not the disk cache
+    os.environ['UPSTREAM_CACHE_ENABLED'] = '0'
+    fixtures = load_fixtures(sides)
+    header = f"{'fixture':<18} {'MB':>6} {'stage':<11} {'ms':>9} {'peak MiB':>9} {'blocks':>10}"
+    print(header)
+    print('-' * len(header))
+    with StubServer() as stub:
+        weather = WeatherService(base_url=stub.url + OPEN_METEO_PATH)
+        trails = TrailService(base_url=stub.url + OVERPASS_PATH)
+        refuges = RefugeService(base_url=stub.url + OVERPASS_PATH)
+        for kind, label, body in fixtures:
+            if kind == 'weather':
+                path, url = OPEN_METEO_PATH, weather.base_url
+                convert: Callable[[Any], Any] = lambda data: data
+                end_to_end = lambda: dumps_bytes(weather.get_weather(*_BBOX[:2]))
+            else:
+                service = trails if kind == 'trails' else refuges
+                path, url = OVERPASS_PATH, service.base_url
+                convert = service._convert_to_geojson
+                fetch_area = service.get_trails_in_area if kind == 'trails' else service.get_refuges_in_area
+                end_to_end = lambda: dumps_bytes(fetch_area(*_BBOX))
+            stub.serve(path, body)
+
+            raw, *fetch = _measure(lambda: requests.post(url, data={'data': ''}).content, repeat)
+            parsed, *parse = _measure(lambda: json.loads(raw), repeat)
+            converted, *conv = _measure(lambda: convert(parsed), repeat)
+            _, *ser = _measure(lambda: dumps_bytes(converted), repeat)
+            _, *e2e = _measure(end_to_end, repeat)
+            name, size = f'{kind}-{label}', f'{len(body) / 1e6:.1f}'
+            for stage, (ms, peak, blocks) in (('fetch', fetch), ('parse', parse), ('convert', conv),
+                                               ('serialize', ser), ('end-to-end', e2e)):
+                print(f'{name:<18} {size:>6} {stage:<11} {ms:>9.1f} {peak:>9.1f} {blocks:>10}')
+                name = size = ''
+            if isinstance(converted, dict) and 'features' in converted:
+                print(f"{'':<18} {'':>6} {len(converted['features'])} features")
+
+
+def record(label: str, bbox: Tuple[float, float, float, float]) -> None:
+    """Capture real Overpass and Open-Meteo responses for ``bbox`` as fixtures."""
+    os.environ['UPSTREAM_CACHE_ENABLED'] = '0'
+    south, west, north, east = bbox
+    targets = [
+        ('trails', 'https://overpass-api.de', OVERPASS_PATH, lambda url: TrailService(url).get_trails_in_area(*bbox)),
+        ('refuges', 'https://overpass-api.de', OVERPASS_PATH,
+         lambda url: RefugeService(url).get_refuges_in_area(*bbox)),
+        ('weather', 'https://api.open-meteo.com', OPEN_METEO_PATH,
+         lambda url: WeatherService(url).get_weather((south + north) / 2, (west + east) / 2)),
+    ]
+    for kind, upstream, path, call in targets:
+        with StubServer(upstream=upstream, record_dir=FIXTURE_DIR) as stub:
+            stub.record_name = f'{kind}-{label}.json'
+            call(stub.url + path)
+        print(f'recorded {os.path.join(FIXTURE_DIR, stub.record_name)}')
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--sides', type=float, nargs='+', default=[2, 10, 25],
+                        help='synthetic area sizes (square side in km)')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--record', metavar='LABEL', help='record fixtures from the live APIs')
+    parser.add_argument('--bbox', default='46.3,11.6,46.5,11.9', help='south,west,north,east for --record')
+    args = parser.parse_args()
+    if args.record:
+        record(args.record, tuple(float(v) for v in args.bbox.split(',')))
+    else:
+        run(args.sides, args.repeat)
+
+
+if __name__ == '__main__':
+    main()
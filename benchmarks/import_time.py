@@ -0,0 +1,67 @@
+"""
+Measure how long importing the application takes.
+
+Each run starts a fresh interpreter with ``-X importtime`` and imports a
+module (``src.main`` by default, which also builds the app), so the figures
+match what a gunicorn worker or CLI invocation pays at boot. Reports the
+median wall time over the runs and the slowest modules by cumulative import
+time from the last run.
+
+Usage::
+
+    python -m benchmarks.import_time [--module src.main] [--runs 5] [--top 15]
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from typing import List, Tuple
+
+
+def _import_once(module: str, env: dict) -> Tuple[float, List[Tuple[int, str]]]:
+    start = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+        capture_output=True, text=True, env=env, check=True,
+    )
+    elapsed = time.perf_counter() - start
+    modules = []
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative_us, name = (part.strip() for part in line.split(':', 1)[1].split('|'))
+        modules.append((int(cumulative_us), name))
+    return elapsed, modules
+
+
+def run(module: str, runs: int, top: int) -> None:
+    env = dict(os.environ)
+    # Keep the benchmark from touching the development database
+    env.setdefault('DATABASE_URL', 'sqlite:///' + os.path.join(tempfile.gettempdir(), 'mh_import_bench.db'))
+    times = []
+    modules: List[Tuple[int, str]] = []
+    for _ in range(runs):
+        elapsed, modules = _import_once(module, env)
+        times.append(elapsed * 1000)
+    print(f'import {module}: median {statistics.median(times):.0f} ms over {runs} runs '
+          f'(min {min(times):.0f} ms, interpreter start included)')
+    print(f"\n{'cumulative':>12}  module")
+    for cumulative_us, name in sorted(modules, reverse=True)[:top]:
+        print(f'{cumulative_us / 1000:>10.1f}ms  {name}')
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--module', default='src.main')
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--top', type=int, default=15)
+    args = parser.parse_args()
+    run(args.module, args.runs, args.top)
+
+
+if __name__ == '__main__':
+    main()
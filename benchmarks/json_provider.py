@@ -0,0 +1,109 @@
+"""
+Compare Flask's default JSON provider with ``FastJSONProvider``.
+
+Encodes representative payloads -- a trail list as returned by
+``/api/trails`` and a GeoJSON track as returned by
+``/api/trip-logs/<id>/track`` -- with Flask's stock provider (on dicts whose
+dates were already converted with ``isoformat()``, as ``to_dict`` used to
+do), the compact stdlib fallback and, when installed, ``orjson``.
+
+Usage::
+
+    python -m benchmarks.json_provider [--trails 2000] [--points 20000]
+"""
+
+import argparse
+import datetime
+import decimal
+import time
+from typing import Any, Callable, Dict, List
+
+from flask import Flask
+from flask.json.provider import DefaultJSONProvider
+
+from benchmarks.track_storage import synthetic_points
+from src.json_provider import FastJSONProvider, orjson, stdlib_dumps_bytes
+from src.services.track_codec import TrackData
+
+
+def trail_rows(count: int) -> List[Dict[str, Any]]:
+    """Trail dictionaries with raw ``datetime``/``Decimal`` values."""
+    now = datetime.datetime(2024, 6, 1, 8, 30)
+    return [{
+        'id': f'00000000-0000-4000-8000-{i:012d}',
+        'name': f'Sentiero {i}',
+        'description': 'Percorso panoramico tra boschi e pascoli alpini. ' * 4,
+        'difficulty': ('easy', 'moderate', 'hard')[i % 3],
+        'distance_km': 5.0 + i % 20,
+        'elevation_gain_m': 300 + i % 1200,
+        'rating': decimal.Decimal('4.25'),
+        'season_availability': ['summer', 'autumn'],
+        'coordinates': {'lat': 46.5 + i * 1e-4, 'lon': 11.8},
+        'created_at': now,
+        'updated_at': now,
+    } for i in range(count)]
+
+
+def _legacy(rows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """What ``to_dict`` produced before: dates and decimals converted by hand."""
+    out = []
+    for row in rows:
+        row = dict(row)
+        row['rating'] = float(row['rating'])
+        row['created_at'] = row['created_at'].isoformat()
+        row['updated_at'] = row['updated_at'].isoformat()
+        out.append(row)
+    return out
+
+
+def _timed(func: Callable[[], Any], repeat: int = 5) -> tuple:
+    best = float('inf')
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - start)
+    return result, best * 1000
+
+
+def run(trails: int, points: int) -> None:
+    app = Flask(__name__)
+    default = DefaultJSONProvider(app)
+    default.compact = True
+    fast = FastJSONProvider(app)
+    rows = trail_rows(trails)
+    payloads = {
+        f'{trails} trails': (lambda: _legacy(rows), rows),
+        f'track {points} pts': (
+            lambda: TrackData.from_points(synthetic_points(points)).to_geojson(),
+            TrackData.from_points(synthetic_points(points)).to_geojson(),
+        ),
+    }
+    encoders = {
+        'flask default': lambda legacy, raw: default.dumps(legacy).encode('utf-8'),
+        'stdlib compact': lambda legacy, raw: stdlib_dumps_bytes(raw),
+    }
+    if orjson is not None:
+        encoders['orjson'] = lambda legacy, raw: fast.dumps_bytes(raw)
+    header = f"{'payload':<18} {'encoder':<15} {'bytes':>10} {'time':>9}"
+    print(header)
+    print('-' * len(header))
+    for name, (make_legacy, raw) in payloads.items():
+        legacy = make_legacy()
+        for label, encode in encoders.items():
+            # The legacy path pays for the to_dict conversions too
+            convert = make_legacy if label == 'flask default' else (lambda: legacy)
+            body, elapsed = _timed(lambda: encode(convert(), raw))
+            print(f'{name:<18} {label:<15} {len(body):>10} {elapsed:>7.1f}ms')
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--trails', type=int, default=2000)
+    parser.add_argument('--points', type=int, default=20000)
+    args = parser.parse_args()
+    run(args.trails, args.points)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,72 @@
+"""
+Measure the per-request overhead of the timing middleware.
+
+Two otherwise identical apps serve a trivial JSON endpoint that runs one
+SQLite query; one has ``init_request_timing`` installed. The difference in
+mean latency over many test-client requests is the middleware's cost,
+including the Server-Timing header and the cursor event hooks (log output is
+disabled so the figure excludes the logging handler's I/O).
+
+Usage::
+
+    python -m benchmarks.request_timing [--requests 20000]
+"""
+
+import argparse
+import time
+
+from flask import Flask, jsonify
+from sqlalchemy import text
+
+from src.db_config import init_database
+from src.models import db
+from src.request_timing import init_request_timing
+
+
+def make_app(timed: bool) -> Flask:
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+    app.config['REQUEST_TIMING_LOG'] = False
+    init_database(app)
+    if timed:
+        init_request_timing(app)
+
+    @app.route('/ping')
+    def ping():
+        return jsonify({'value': db.session.execute(text('select 1')).scalar()})
+
+    return app
+
+
+def _mean_us(app: Flask, count: int) -> float:
+    client = app.test_client()
+    for _ in range(200):  # warm up
+        client.get('/ping')
+    start = time.perf_counter()
+    for _ in range(count):
+        client.get('/ping')
+    return (time.perf_counter() - start) / count * 1e6
+
+
+def run(count: int) -> None:
+    plain, timed = make_app(False), make_app(True)
+    # Interleave rounds to spread out machine noise
+    plain_us, timed_us = [], []
+    for _ in range(5):
+        plain_us.append(_mean_us(plain, count // 5))
+        timed_us.append(_mean_us(timed, count // 5))
+    base, with_timing = min(plain_us), min(timed_us)
+    print(f'without timing: {base:8.1f} us/request')
+    print(f'with timing:    {with_timing:8.1f} us/request')
+    print(f'overhead:       {with_timing - base:8.1f} us/request')
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--requests', type=int, default=20000)
+    args = parser.parse_args()
+    run(args.requests)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,105 @@
+"""
+Local HTTP stub for the third-party APIs.
+
+:class:`StubServer` serves canned response bodies on ``127.0.0.1`` from a
+background thread, so ``WeatherService``/``TrailService``/``RefugeService``
+can be pointed at it through their ``base_url`` and exercised end to end
+without network access. Bodies are registered per path and can be swapped
+between requests. ``delay`` makes every answer wait that many seconds, to
+simulate a slow upstream.
+
+With ``upstream`` set the stub instead forwards each request to the real
+API and records the response body in ``record_dir``, which is how fixture
+files for the benchmarks are captured.
+"""
+
+import os
+import threading
+import time
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Optional
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+    # The default backlog of 5 drops connections when many clients start at once
+    request_queue_size = 128
+
+
+class StubServer:
+    """Serve registered bodies; use as a context manager to start and stop it."""
+
+    def __init__(self, upstream: Optional[str] = None, record_dir: Optional[str] = None,
+                 delay: float = 0.0) -> None:
+        self.responses: Dict[str, bytes] = {}
+        self.requests = 0
+        self.delay = delay
+        self.upstream = upstream
+        self.record_dir = record_dir
+        self.record_name: Optional[str] = None
+        self._server = _Server(('127.0.0.1', 0), self._handler())
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    @property
+    def url(self) -> str:
+        return f'http://127.0.0.1:{self._server.server_port}'
+
+    def serve(self, path: str, body: bytes) -> None:
+        """Answer requests for ``path`` (any method, any query) with ``body``."""
+        self.responses[path] = body
+
+    def __enter__(self) -> 'StubServer':
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc: object) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def _forward(self, handler: BaseHTTPRequestHandler, payload: Optional[bytes]) -> bytes:
+        request = urllib.request.Request(self.upstream + handler.path, data=payload, method=handler.command)
+        if payload is not None:
+            request.add_header('Content-Type', handler.headers.get('Content-Type', 'application/octet-stream'))
+        with urllib.request.urlopen(request, timeout=180) as response:
+            body = response.read()
+        if self.record_dir and self.record_name:
+            os.makedirs(self.record_dir, exist_ok=True)
+            with open(os.path.join(self.record_dir, self.record_name), 'wb') as fh:
+                fh.write(body)
+        return body
+
+    def _handler(self) -> type:
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+            # Headers and body go out in separate writes; without TCP_NODELAY the
+            # body waits for the client's delayed ACK (~40 ms) on kept-alive connections
+            disable_nagle_algorithm = True
+
+            def _respond(self) -> None:
+                length = int(self.headers.get('Content-Length') or 0)
+                payload = self.rfile.read(length) if length else None
+                stub.requests += 1
+                if stub.delay:
+                    time.sleep(stub.delay)
+                if stub.upstream:
+                    body = stub._forward(self, payload)
+                else:
+                    body = stub.responses.get(self.path.split('?', 1)[0])
+                if body is None:
+                    self.send_error(404)
+                    return
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            do_GET = do_POST = _respond
+
+            def log_message(self, format: str, *args: object) -> None:
+                pass
+
+        return Handler
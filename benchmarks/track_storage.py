@@ -0,0 +1,81 @@
+"""
+Compare JSON and binary storage of GPS tracks.
+
+Generates synthetic tracks of increasing length and reports the stored size
+and encode/decode latency of the legacy JSON ``gpx_data`` representation
+against the ``mht1`` binary encoding used by the ``tracks`` table.
+
+Usage::
+
+    python -m benchmarks.track_storage [--points 1000 10000 100000]
+"""
+
+import argparse
+import json
+import math
+import random
+import time
+from typing import Any, Callable, Dict, List
+
+from src.services.track_codec import TrackData, decode_track, encode_track
+
+
+def synthetic_points(count: int, seed: int = 42) -> List[Dict[str, Any]]:
+    """Generate a plausible mountain track: a random walk sampled every 5 s."""
+    rng = random.Random(seed)
+    lat, lon, ele, ts = 46.5, 11.8, 1500.0, 1_700_000_000
+    heading = rng.uniform(0, 2 * math.pi)
+    points = []
+    for _ in range(count):
+        heading += rng.gauss(0, 0.2)
+        lat += math.cos(heading) * 4e-5
+        lon += math.sin(heading) * 5.5e-5
+        ele += rng.gauss(0.3, 1.5)
+        ts += 5
+        points.append({
+            'lat': round(lat, 7),
+            'lon': round(lon, 7),
+            'ele': round(ele, 1),
+            'time': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime(ts)),
+        })
+    return points
+
+
+def _timed(func: Callable[[], Any], repeat: int = 3) -> tuple:
+    best = float('inf')
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - start)
+    return result, best * 1000
+
+
+def run(sizes: List[int]) -> None:
+    header = f"{'points':>8} {'json B':>11} {'bin B':>10} {'ratio':>6} " \
+             f"{'json enc':>9} {'json dec':>9} {'bin enc':>9} {'bin dec':>9}"
+    print(header)
+    print('-' * len(header))
+    for size in sizes:
+        points = synthetic_points(size)
+        payload = {'points': points}
+        json_blob, json_enc = _timed(lambda: json.dumps(payload).encode())
+        _, json_dec = _timed(lambda: json.loads(json_blob))
+        track = TrackData.from_points(points)
+        bin_blob, bin_enc = _timed(lambda: encode_track(track))
+        _, bin_dec = _timed(lambda: decode_track(bin_blob))
+        print(
+            f'{size:>8} {len(json_blob):>11} {len(bin_blob):>10} {len(json_blob) / len(bin_blob):>5.1f}x '
+            f'{json_enc:>7.1f}ms {json_dec:>7.1f}ms {bin_enc:>7.1f}ms {bin_dec:>7.1f}ms'
+        )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--points', type=int, nargs='+', default=[1_000, 10_000, 100_000])
+    args = parser.parse_args()
+    run(args.points)
+
+
+if __name__ == '__main__':
+    main()
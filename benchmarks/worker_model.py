@@ -0,0 +1,197 @@
+"""
+Compare gunicorn worker classes with a slow upstream.
+
+Starts the real server (``gunicorn.conf.py``) once per worker class against
+a synthetic database from :mod:`benchmarks.datagen`, with Overpass replaced
+by :class:`benchmarks.stub_server.StubServer` answering after ``--delay``
+seconds and the upstream cache disabled, so every ``/api/external/refuges``
+request waits on the stub. For a fixed time ``--slow-clients`` threads
+request refuges while ``--fast-clients`` threads request the
+database-backed read endpoints, and the report gives throughput and latency
+for both groups. Rate limits and the admission cap (``src/admission.py``)
+are switched off, so only the worker class differs:
+
+* ``sync`` workers serve one request per process, so once every worker is
+  waiting on Overpass the fast endpoints queue behind it too;
+* ``gthread`` workers serve ``--threads`` requests per process, so slow
+  requests overlap and the fast endpoints keep answering.
+
+Results on a single-core container (2 workers, 8 threads, 2 s upstream
+delay, 8 slow and 4 fast clients, 20 s)::
+
+    worker    slow req/s  slow p50 ms   fast req/s  fast p50 ms  fast p95 ms
+    sync             1.0         8187          0.5         8190         8206
+    gthread          3.9         2019        314.9         8.88        34.22
+
+With sync workers refuge throughput is capped at ``workers / delay`` and
+every request, fast or slow, queues for a worker that is waiting on
+Overpass. With gthread workers the cap is ``workers * threads / delay``
+(here the 8 clients are the limit) and the database endpoints keep
+answering in milliseconds.
+
+Usage::
+
+    python -m benchmarks.worker_model [--workers 2] [--threads 8] [--delay 2]
+        [--slow-clients 8] [--fast-clients 4] [--duration 20] [--classes sync gthread]
+"""
+
+import argparse
+import http.client
+import json
+import os
+import random
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from typing import Any, Dict, List
+
+from benchmarks.endpoints import SCENARIOS, Ids, build_app, summarise
+from benchmarks.external_converters import OVERPASS_PATH, synthetic_refuges
+from benchmarks.stub_server import StubServer
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+REFUGES_PATH = '/api/external/refuges?south={:.4f}&west={:.4f}&north={:.4f}&east={:.4f}'
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def _get(port: int, path: str, timeout: float = 60) -> int:
+    connection = http.client.HTTPConnection('127.0.0.1', port, timeout=timeout)
+    try:
+        connection.request('GET', path)
+        response = connection.getresponse()
+        response.read()
+        return response.status
+    finally:
+        connection.close()
+
+
+def start_server(worker_class: str, port: int, env: Dict[str, str], workers: int, threads: int) -> subprocess.Popen:
+    """Start gunicorn with the project's config and wait until it answers."""
+    env = dict(env, GUNICORN_WORKER_CLASS=worker_class, GUNICORN_THREADS=str(threads))
+    process = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', '--bind', f'127.0.0.1:{port}',
+         '--workers', str(workers), '--access-logfile', '/dev/null', '--log-level', 'warning', 'src.main:app'],
+        cwd=ROOT, env=env,
+    )
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        try:
+            if _get(port, '/api/trails', timeout=5) == 200:
+                return process
+        except OSError:
+            time.sleep(0.2)
+    process.terminate()
+    raise RuntimeError(f'gunicorn ({worker_class}) did not start')
+
+
+def run_load(port: int, ids: Ids, slow_clients: int, fast_clients: int, duration: float,
+             seed: int) -> Dict[str, Dict[str, float]]:
+    """Run slow (upstream-bound) and fast (database) clients side by side."""
+    readers = [s for s in SCENARIOS if s.read_only]
+    latencies: Dict[str, List[float]] = {'slow': [], 'fast': []}
+    errors = {'slow': 0, 'fast': 0}
+    lock = threading.Lock()
+    deadline = time.perf_counter() + duration
+
+    def client(group: str, index: int) -> None:
+        rng = random.Random(seed + index)
+        while time.perf_counter() < deadline:
+            if group == 'slow':
+                south, west = rng.uniform(45.8, 46.8), rng.uniform(10.5, 12.5)
+                path = REFUGES_PATH.format(south, west, south + 0.1, west + 0.1)
+            else:
+                path = rng.choice(readers).path(rng, ids)
+            t0 = time.perf_counter()
+            try:
+                ok = _get(port, path) < 400
+            except OSError:
+                ok = False
+            elapsed = time.perf_counter() - t0
+            with lock:
+                latencies[group].append(elapsed)
+                errors[group] += not ok
+
+    start = time.perf_counter()
+    clients = [threading.Thread(target=client, args=('slow', i)) for i in range(slow_clients)]
+    clients += [threading.Thread(target=client, args=('fast', 1000 + i)) for i in range(fast_clients)]
+    for thread in clients:
+        thread.start()
+    for thread in clients:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    return {group: summarise(latencies[group], elapsed, errors[group]) for group in latencies}
+
+
+def print_report(results: Dict[str, Dict[str, Dict[str, float]]]) -> None:
+    header = f"{'worker':<9} {'slow req/s':>10} {'slow p50 ms':>12} {'fast req/s':>12} {'fast p50 ms':>12} " \
+             f"{'fast p95 ms':>12} {'err':>4}"
+    print(header)
+    print('-' * len(header))
+    for worker_class, r in results.items():
+        slow, fast = r['slow'], r['fast']
+        print(f"{worker_class:<9} {slow['rps']:>10.1f} {slow['p50_ms']:>12.0f} {fast['rps']:>12.1f} "
+              f"{fast['p50_ms']:>12.2f} {fast['p95_ms']:>12.2f} {slow['errors'] + fast['errors']:>4}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--classes', nargs='+', default=['sync', 'gthread'])
+    parser.add_argument('--workers', type=int, default=2)
+    parser.add_argument('--threads', type=int, default=8, help='threads per gthread worker')
+    parser.add_argument('--delay', type=float, default=2.0, help='simulated upstream latency in seconds')
+    parser.add_argument('--slow-clients', type=int, default=8)
+    parser.add_argument('--fast-clients', type=int, default=4)
+    parser.add_argument('--duration', type=float, default=20.0)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--json', metavar='PATH', help='also write the results to PATH')
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='mountainhub-bench-')
+    results: Dict[str, Any] = {}
+    try:
+        database = os.path.join(workdir, 'bench.db')
+        _, ids = build_app(database, 'small', args.seed)
+        with StubServer(delay=args.delay) as stub:
+            stub.serve(OVERPASS_PATH, json.dumps(synthetic_refuges(10, args.seed)).encode())
+            env = dict(
+                os.environ,
+                DATABASE_URL=f'sqlite:///{database}',
+                OVERPASS_URL=stub.url + OVERPASS_PATH,
+                UPSTREAM_CACHE_ENABLED='0',
+                PREFETCH_ENABLED='0',
+                REQUEST_TIMING_LOG='0',
+                RATE_LIMIT_ENABLED='0',
+                ADMISSION_MAX_CONCURRENT='0',
+                METRICS_DIR=os.path.join(workdir, 'metrics'),
+            )
+            for worker_class in args.classes:
+                port = _free_port()
+                process = start_server(worker_class, port, env, args.workers, args.threads)
+                try:
+                    results[worker_class] = run_load(
+                        port, ids, args.slow_clients, args.fast_clients, args.duration, args.seed
+                    )
+                finally:
+                    process.terminate()
+                    process.wait(30)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+    print(f'{args.workers} workers, {args.threads} threads, {args.delay:g} s upstream delay, '
+          f'{args.slow_clients} slow + {args.fast_clients} fast clients, {args.duration:g} s\n')
+    print_report(results)
+    if args.json:
+        with open(args.json, 'w') as fh:
+            json.dump(results, fh, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,79 @@
+"""
+Gunicorn settings for MountainHub (read automatically from the working directory).
+
+The application is imported once in the master (``preload_app``) and its
+lazily built services are constructed there too, so forked workers share
+that memory copy-on-write and boot without importing anything. Connection
+pools must not be shared across processes: each worker drops the engines
+it inherited and opens its own connections on first use.
+
+Workers are ``gthread`` workers: each serves ``GUNICORN_THREADS``
+requests at once, so a request waiting up to 25 s on Overpass ties up one
+thread instead of a whole process. ``GUNICORN_WORKER_CLASS=sync`` restores
+one request per process. Keep ``DB_POOL_SIZE + DB_MAX_OVERFLOW`` at least
+``GUNICORN_THREADS`` so threads do not queue for database connections.
+``python -m benchmarks.worker_model`` compares the two worker classes
+against a slow simulated upstream.
+
+Run ``flask --app src.main init-db`` before starting the server; workers do
+not create the schema.
+
+Workers write metrics into per-process files in ``METRICS_DIR``, which
+``/metrics`` aggregates; the directory is emptied when the server starts and
+a worker's gauges are dropped when it exits. Rate limit buckets and
+concurrency slots (``src/admission.py``) are shared the same way: reset at
+startup, with an exited worker's slots freed.
+
+With ``PREFETCH_ENABLED=1`` every worker starts a prefetch thread after it
+boots (not in the master, whose threads would not survive the fork); only
+one of them refreshes upstream data on each tick.
+"""
+
+import multiprocessing
+import os
+import tempfile
+
+bind = f"0.0.0.0:{os.getenv('PORT', '5000')}"
+workers = int(os.getenv('WEB_CONCURRENCY', multiprocessing.cpu_count() * 2 + 1))
+worker_class = os.getenv('GUNICORN_WORKER_CLASS', 'gthread')
+# gunicorn turns sync workers into gthread ones when threads > 1
+threads = int(os.getenv('GUNICORN_THREADS', '8')) if worker_class == 'gthread' else 1
+preload_app = True
+timeout = int(os.getenv('GUNICORN_TIMEOUT', '30'))
+accesslog = '-'
+
+# Set before the app is loaded so the master and every worker share it
+os.environ.setdefault('METRICS_DIR', os.path.join(tempfile.gettempdir(), 'mountainhub-metrics'))
+
+
+def on_starting(server):
+    from src.admission import reset_admission_state
+    from src.metrics import clear_metrics_dir
+    clear_metrics_dir()
+    reset_admission_state()
+
+
+def when_ready(server):
+    from src.lazy_services import preload_services
+    preload_services()
+
+
+def post_fork(server, worker):
+    from src.main import app
+    from src.models import db
+    with app.app_context():
+        for engine in db.engines.values():
+            # close=False: leave the parent's connections to the parent
+            engine.dispose(close=False)
+
+
+def post_worker_init(worker):
+    from src.prefetch import start_prefetch_thread
+    start_prefetch_thread()
+
+
+def child_exit(server, worker):
+    from src.admission import release_process
+    from src.metrics import mark_process_dead
+    mark_process_dead(worker.pid)
+    release_process(worker.pid)
@@ -0,0 +1,317 @@
+"""
+Admission control: per-client rate limits and a concurrency cap.
+
+Every request is charged to a token bucket keyed by client address and
+endpoint class. Views marked with :func:`rate_limit_class` (the
+``/external`` routes and ``/equipment/configure``) are ``expensive`` and
+get a much smaller allowance than the ``default`` class. A client that runs
+out of tokens gets 429 with ``Retry-After`` set to the time until its next
+token.
+
+Expensive requests also need one of ``ADMISSION_MAX_CONCURRENT`` running
+slots. When all slots are taken, up to ``ADMISSION_QUEUE_SIZE`` requests
+wait for a slot for at most ``ADMISSION_QUEUE_TIMEOUT`` seconds. Requests
+that find the queue full, or that time out in it, get 503. This way a burst
+of Overpass queries cannot occupy every worker thread.
+
+The buckets and slots live in a memory-mapped file in ``RATE_LIMIT_DIR``
+that all gunicorn workers share. Updates take an ``flock`` on the file, so
+the limits hold for the whole server rather than per worker. Slots held by
+a worker that died are reclaimed. gunicorn empties the file when it starts
+(see ``gunicorn.conf.py``).
+"""
+
+import contextlib
+import fcntl
+import hashlib
+import math
+import mmap
+import os
+import struct
+import tempfile
+import threading
+import time
+from typing import Callable, Iterator, Optional, Tuple
+
+from flask import Flask, Response, current_app, g, jsonify, request
+
+from .metrics import admission_rejections
+
+DEFAULT_CLASS = 'default'
+EXPENSIVE_CLASS = 'expensive'
+
+_MAGIC = b'MHA1'
+_HEADER = struct.Struct('<4sIII')  # magic, buckets, running slots, queue slots
+_HEADER_SIZE = 64
+_BUCKET = struct.Struct('<Qdd')  # key hash, tokens, last refill
+_SLOT = struct.Struct('<qd')  # pid, claimed at
+# Buckets probed for a key before the least recently used one is reused
+_PROBE = 8
+_QUEUE_POLL_SECONDS = 0.02
+
+RUNNING, QUEUED = 0, 1
+
+
+def rate_limit_class(name: str) -> Callable:
+    """Put a view in rate limit class ``name`` (``'expensive'`` or ``'default'``)."""
+    def decorator(view: Callable) -> Callable:
+        view.rate_limit_class = name
+        return view
+    return decorator
+
+
+def _key_hash(key: str) -> int:
+    # 0 marks an empty bucket
+    return int.from_bytes(hashlib.blake2b(key.encode('utf-8'), digest_size=8).digest(), 'little') or 1
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+class AdmissionState:
+    """Token buckets and concurrency slots in a file shared by all workers."""
+
+    def __init__(self, path: str, buckets: int = 4096, running: int = 16, queued: int = 32) -> None:
+        self.path = path
+        self.sizes = (buckets, running, queued)
+        self._bucket_offset = _HEADER_SIZE
+        self._slot_offsets = (
+            self._bucket_offset + buckets * _BUCKET.size,
+            self._bucket_offset + buckets * _BUCKET.size + running * _SLOT.size,
+        )
+        size = self._slot_offsets[1] + queued * _SLOT.size
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self._file = open(os.open(path, os.O_RDWR | os.O_CREAT, 0o644), 'r+b')
+        self._lock = threading.Lock()
+        with self._locked():
+            header = _HEADER.pack(_MAGIC, *self.sizes)
+            if os.fstat(self._file.fileno()).st_size != size or self._read_header() != header:
+                # New file, or one laid out for other settings: start empty
+                self._file.truncate(0)
+                self._file.truncate(size)
+                os.pwrite(self._file.fileno(), header, 0)
+        self._mm = mmap.mmap(self._file.fileno(), size)
+
+    def _read_header(self) -> bytes:
+        self._file.seek(0)
+        return self._file.read(_HEADER.size)
+
+    @classmethod
+    def open_existing(cls, path: str) -> Optional['AdmissionState']:
+        """Open ``path`` with the sizes it was created with, if it exists."""
+        try:
+            with open(path, 'rb') as fh:
+                magic, *sizes = _HEADER.unpack(fh.read(_HEADER.size))
+        except (FileNotFoundError, struct.error):
+            return None
+        return cls(path, *sizes) if magic == _MAGIC else None
+
+    @contextlib.contextmanager
+    def _locked(self) -> Iterator[None]:
+        # flock excludes other processes; threads share the descriptor, hence the lock
+        with self._lock:
+            fcntl.flock(self._file.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(self._file.fileno(), fcntl.LOCK_UN)
+
+    def take(self, key: str, rate: float, burst: float, now: Optional[float] = None) -> Tuple[bool, float]:
+        """Take a token from ``key``'s bucket (``rate`` tokens/s, at most ``burst``).
+
+        Returns ``(allowed, retry_after)``; ``retry_after`` is the wait in
+        seconds until a token is available when the request is refused.
+        """
+        now = time.time() if now is None else now
+        wanted = _key_hash(key)
+        buckets = self.sizes[0]
+        with self._locked():
+            position, empty, oldest = None, None, None
+            for probe in range(_PROBE):
+                offset = self._bucket_offset + (wanted + probe) % buckets * _BUCKET.size
+                stored, tokens, updated = _BUCKET.unpack_from(self._mm, offset)
+                if stored == wanted:
+                    position = offset
+                    break
+                if stored == 0:
+                    empty = offset if empty is None else empty
+                elif oldest is None or updated < oldest[1]:
+                    oldest = (offset, updated)
+            if position is None:
+                # A new client; with every probed bucket taken, reuse the one idle longest
+                position = empty if empty is not None else oldest[0]
+                tokens = burst
+            else:
+                tokens = min(burst, tokens + max(0.0, now - updated) * rate)
+            allowed = tokens >= 1
+            if allowed:
+                tokens -= 1
+            _BUCKET.pack_into(self._mm, position, wanted, tokens, now)
+        return allowed, 0.0 if allowed else (1 - tokens) / rate
+
+    def claim(self, table: int, pid: Optional[int] = None) -> Optional[int]:
+        """Claim a free slot in ``table`` (``RUNNING`` or ``QUEUED``) for ``pid``."""
+        pid = os.getpid() if pid is None else pid
+        start, count = self._slot_offsets[table], self.sizes[1 + table]
+        with self._locked():
+            holders = [_SLOT.unpack_from(self._mm, start + i * _SLOT.size)[0] for i in range(count)]
+            free = next((i for i, holder in enumerate(holders) if holder == 0), None)
+            if free is None:
+                # Reclaim slots left behind by a worker that was killed
+                free = next((i for i, holder in enumerate(holders) if not _pid_alive(holder)), None)
+            if free is not None:
+                _SLOT.pack_into(self._mm, start + free * _SLOT.size, pid, time.time())
+        return free
+
+    def release(self, table: int, index: int) -> None:
+        with self._locked():
+            _SLOT.pack_into(self._mm, self._slot_offsets[table] + index * _SLOT.size, 0, 0.0)
+
+    def release_process(self, pid: int) -> None:
+        """Free every slot held by ``pid`` (called when gunicorn reaps a worker)."""
+        with self._locked():
+            for table in (RUNNING, QUEUED):
+                start = self._slot_offsets[table]
+                for i in range(self.sizes[1 + table]):
+                    if _SLOT.unpack_from(self._mm, start + i * _SLOT.size)[0] == pid:
+                        _SLOT.pack_into(self._mm, start + i * _SLOT.size, 0, 0.0)
+
+    def in_use(self, table: int) -> int:
+        start = self._slot_offsets[table]
+        return sum(
+            _SLOT.unpack_from(self._mm, start + i * _SLOT.size)[0] != 0 for i in range(self.sizes[1 + table])
+        )
+
+    def admit(self, timeout: float) -> Tuple[Optional[int], str]:
+        """Claim a running slot, waiting in the queue for up to ``timeout`` seconds.
+
+        Returns ``(slot, '')`` or ``(None, reason)`` with reason
+        ``'queue_full'`` or ``'queue_timeout'``.
+        """
+        slot = self.claim(RUNNING)
+        if slot is not None:
+            return slot, ''
+        queued = self.claim(QUEUED)
+        if queued is None:
+            return None, 'queue_full'
+        try:
+            deadline = time.monotonic() + timeout
+            while time.monotonic() < deadline:
+                time.sleep(_QUEUE_POLL_SECONDS)
+                slot = self.claim(RUNNING)
+                if slot is not None:
+                    return slot, ''
+            return None, 'queue_timeout'
+        finally:
+            self.release(QUEUED, queued)
+
+
+def state_path() -> str:
+    directory = os.getenv('RATE_LIMIT_DIR', os.path.join(tempfile.gettempdir(), 'mountainhub-ratelimit'))
+    return os.path.join(directory, 'admission.bin')
+
+
+def reset_admission_state() -> None:
+    """Forget buckets and slots from a previous server run (called when gunicorn starts)."""
+    try:
+        os.remove(state_path())
+    except FileNotFoundError:
+        pass
+
+
+def release_process(pid: int) -> None:
+    """Free the slots of an exited worker (called from gunicorn's ``child_exit``)."""
+    state = AdmissionState.open_existing(state_path())
+    if state is not None:
+        state.release_process(pid)
+
+
+class _ProcessState:
+    """The app's shared state as opened by the current process, reopened after a fork."""
+
+    def __init__(self, config: dict) -> None:
+        self.config = config
+        self._pid: Optional[int] = None
+        self._state: Optional[AdmissionState] = None
+        self._lock = threading.Lock()
+
+    def get(self) -> AdmissionState:
+        if self._pid != os.getpid():
+            with self._lock:
+                if self._pid != os.getpid():
+                    self._state = AdmissionState(
+                        self.config['RATE_LIMIT_PATH'], self.config['RATE_LIMIT_BUCKETS'],
+                        max(1, self.config['ADMISSION_MAX_CONCURRENT']), max(1, self.config['ADMISSION_QUEUE_SIZE']),
+                    )
+                    self._pid = os.getpid()
+        return self._state
+
+
+def client_key() -> str:
+    """The client address, taken from ``X-Forwarded-For`` behind trusted proxies."""
+    proxies = current_app.config['RATE_LIMIT_TRUSTED_PROXIES']
+    forwarded = [part.strip() for part in request.headers.get('X-Forwarded-For', '').split(',') if part.strip()]
+    if proxies and len(forwarded) >= proxies:
+        # Each trusted proxy appends the address it received the request from
+        return forwarded[-proxies]
+    return request.remote_addr or 'unknown'
+
+
+def _reject(status: int, reason: str, endpoint_class: str, retry_after: float) -> Tuple[Response, int]:
+    admission_rejections.inc(endpoint_class=endpoint_class, reason=reason)
+    message = 'Too many requests' if status == 429 else 'Server busy, try again shortly'
+    response = jsonify({'error': message})
+    response.headers['Retry-After'] = str(max(1, math.ceil(retry_after)))
+    return response, status
+
+
+def init_admission(app: Flask) -> None:
+    """Rate limit and cap concurrency of ``app``'s requests (``RATE_LIMIT_*``, ``ADMISSION_*``)."""
+    app.config.setdefault('RATE_LIMIT_ENABLED', os.getenv('RATE_LIMIT_ENABLED', '1') == '1')
+    app.config.setdefault('RATE_LIMIT_PATH', state_path())
+    app.config.setdefault('RATE_LIMIT_BUCKETS', int(os.getenv('RATE_LIMIT_BUCKETS', '4096')))
+    app.config.setdefault('RATE_LIMIT_TRUSTED_PROXIES', int(os.getenv('RATE_LIMIT_TRUSTED_PROXIES', '0')))
+    # Class -> (requests per minute, burst)
+    app.config.setdefault('RATE_LIMITS', {
+        DEFAULT_CLASS: (float(os.getenv('RATE_LIMIT_DEFAULT_PER_MINUTE', '600')),
+                        float(os.getenv('RATE_LIMIT_DEFAULT_BURST', '120'))),
+        EXPENSIVE_CLASS: (float(os.getenv('RATE_LIMIT_EXPENSIVE_PER_MINUTE', '30')),
+                          float(os.getenv('RATE_LIMIT_EXPENSIVE_BURST', '10'))),
+    })
+    # 0 disables the cap
+    app.config.setdefault('ADMISSION_MAX_CONCURRENT', int(os.getenv('ADMISSION_MAX_CONCURRENT', '16')))
+    app.config.setdefault('ADMISSION_QUEUE_SIZE', int(os.getenv('ADMISSION_QUEUE_SIZE', '32')))
+    app.config.setdefault('ADMISSION_QUEUE_TIMEOUT', float(os.getenv('ADMISSION_QUEUE_TIMEOUT', '2')))
+    shared = app.extensions['admission'] = _ProcessState(app.config)
+
+    @app.before_request
+    def admit_request() -> Optional[Tuple[Response, int]]:
+        config = current_app.config
+        if request.method == 'OPTIONS':
+            return None
+        view = current_app.view_functions.get(request.endpoint)
+        endpoint_class = getattr(view, 'rate_limit_class', DEFAULT_CLASS)
+        if config['RATE_LIMIT_ENABLED']:
+            per_minute, burst = config['RATE_LIMITS'][endpoint_class]
+            allowed, retry_after = shared.get().take(f'{endpoint_class}:{client_key()}', per_minute / 60, burst)
+            if not allowed:
+                return _reject(429, 'rate_limited', endpoint_class, retry_after)
+        if endpoint_class == EXPENSIVE_CLASS and config['ADMISSION_MAX_CONCURRENT'] > 0:
+            slot, reason = shared.get().admit(config['ADMISSION_QUEUE_TIMEOUT'])
+            if slot is None:
+                return _reject(503, reason, endpoint_class, 1)
+            g.admission_slot = slot
+        return None
+
+    @app.teardown_request
+    def release_slot(exc: Optional[BaseException]) -> None:
+        slot = g.pop('admission_slot', None)
+        if slot is not None:
+            shared.get().release(RUNNING, slot)
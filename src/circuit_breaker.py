@@ -0,0 +1,134 @@
+"""
+Circuit breakers for calls to third-party APIs.
+
+A :class:`CircuitBreaker` counts consecutive failures of one upstream.
+After ``failure_threshold`` of them it *opens*: calls fail immediately with
+:class:`CircuitOpenError` instead of tying up a worker until a timeout.
+Once ``reset_timeout`` seconds have passed it goes *half-open* and lets a
+single trial call through; success closes the breaker, failure opens it
+again for another ``reset_timeout``.
+
+State is per process. Every transition is counted in
+``circuit_breaker_transitions_total`` and the current state is exposed in
+the ``circuit_breaker_state`` gauge (summed over workers, so
+``state="open"`` is the number of workers with the breaker open).
+"""
+
+import contextlib
+import logging
+import os
+import threading
+import time
+from typing import Callable, Dict, Iterator, Optional
+
+from .metrics import circuit_breaker_state, circuit_breaker_transitions
+
+logger = logging.getLogger('mountainhub.upstream')
+
+CLOSED, OPEN, HALF_OPEN = 'closed', 'open', 'half_open'
+
+
+class UpstreamUnavailable(Exception):
+    """An external API could not be reached or answered with an error."""
+
+    def __init__(self, upstream: str, message: str, retry_after: Optional[float] = None) -> None:
+        super().__init__(f'{upstream}: {message}')
+        self.upstream = upstream
+        self.retry_after = retry_after
+
+
+class CircuitOpenError(UpstreamUnavailable):
+    """Raised without calling the upstream while its breaker is open."""
+
+
+class CircuitBreaker:
+    """Fail fast after repeated upstream failures, probing again later."""
+
+    def __init__(self, name: str, failure_threshold: int = 5, reset_timeout: float = 30.0,
+                 is_failure: Callable[[BaseException], bool] = lambda exc: True) -> None:
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.is_failure = is_failure
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self._trial_running = False
+        self._lock = threading.Lock()
+        circuit_breaker_state.set(1, upstream=name, state=CLOSED)
+
+    def _transition(self, state: str) -> None:
+        if state == self.state:
+            return
+        logger.warning('Circuit breaker for %s: %s -> %s', self.name, self.state, state)
+        circuit_breaker_state.set(0, upstream=self.name, state=self.state)
+        circuit_breaker_state.set(1, upstream=self.name, state=state)
+        circuit_breaker_transitions.inc(upstream=self.name, state=state)
+        self.state = state
+
+    def retry_after(self) -> float:
+        """Seconds until the breaker will let a trial call through."""
+        return max(0.0, self.opened_at + self.reset_timeout - time.monotonic())
+
+    def _before_call(self) -> None:
+        with self._lock:
+            if self.state == OPEN:
+                if self.retry_after() > 0:
+                    raise CircuitOpenError(self.name, 'circuit open', self.retry_after())
+                self._transition(HALF_OPEN)
+            if self.state == HALF_OPEN:
+                if self._trial_running:
+                    raise CircuitOpenError(self.name, 'circuit half-open, trial in progress', self.reset_timeout)
+                self._trial_running = True
+
+    def record_success(self) -> None:
+        with self._lock:
+            self.failures = 0
+            self._trial_running = False
+            self._transition(CLOSED)
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._trial_running = False
+            self.failures += 1
+            if self.state == HALF_OPEN or self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+                self._transition(OPEN)
+
+    @contextlib.contextmanager
+    def guard(self) -> Iterator[None]:
+        """Run the block as one call through the breaker."""
+        self._before_call()
+        try:
+            yield
+        except BaseException as exc:
+            if self.is_failure(exc):
+                self.record_failure()
+            else:
+                self.record_success()
+            raise
+        self.record_success()
+
+
+_breakers: Dict[str, CircuitBreaker] = {}
+_breakers_lock = threading.Lock()
+
+
+def circuit_breaker(name: str, is_failure: Callable[[BaseException], bool] = lambda exc: True) -> CircuitBreaker:
+    """The process-wide breaker for upstream ``name``.
+
+    Thresholds come from ``CIRCUIT_FAILURE_THRESHOLD`` and
+    ``CIRCUIT_RESET_SECONDS``.
+    """
+    breaker = _breakers.get(name)
+    if breaker is None:
+        with _breakers_lock:
+            breaker = _breakers.get(name)
+            if breaker is None:
+                breaker = _breakers[name] = CircuitBreaker(
+                    name,
+                    failure_threshold=int(os.getenv('CIRCUIT_FAILURE_THRESHOLD', '5')),
+                    reset_timeout=float(os.getenv('CIRCUIT_RESET_SECONDS', '30')),
+                    is_failure=is_failure,
+                )
+    return breaker
@@ -0,0 +1,177 @@
+"""
+HTTP response compression.
+
+``init_compression`` registers an ``after_request`` hook that compresses
+JSON, GeoJSON, GPX and text responses with the best encoding the client
+accepts: zstd or brotli when the optional ``zstandard``/``brotli`` packages
+are installed, gzip otherwise. Small bodies (below ``COMPRESS_MIN_SIZE``)
+are left alone because compression would not pay for itself, and streamed
+responses are compressed chunk by chunk so they keep streaming.
+"""
+
+import zlib
+from typing import Any, Iterable, Iterator, Optional
+
+from flask import Flask, Response, request
+
+try:  # pragma: no cover - optional dependency
+    import zstandard
+except ImportError:  # pragma: no cover
+    zstandard = None
+
+try:  # pragma: no cover - optional dependency
+    import brotli
+except ImportError:  # pragma: no cover
+    brotli = None
+
+DEFAULT_MIMETYPES = (
+    'application/json',
+    'application/geo+json',
+    'application/gpx+xml',
+    'application/xml',
+    'application/javascript',
+    'application/x-ndjson',
+    'application/vnd.mountainhub.forecast',
+    'image/svg+xml',
+    'text/html',
+    'text/css',
+    'text/plain',
+    'text/csv',
+    'text/javascript',
+    'text/xml',
+)
+
+# Input bytes after which a streamed response is sync-flushed to the client
+STREAM_FLUSH_BYTES = 16 * 1024
+
+
+def available_encodings() -> list:
+    """Content codings supported in this process, most preferred first."""
+    encodings = []
+    if zstandard is not None:
+        encodings.append('zstd')
+    if brotli is not None:
+        encodings.append('br')
+    encodings.append('gzip')
+    return encodings
+
+
+def negotiate_encoding(accept: Any, supported: Iterable[str]) -> Optional[str]:
+    """Pick the first ``supported`` coding the client accepts with ``q > 0``."""
+    for encoding in supported:
+        if accept.quality(encoding) > 0:
+            return encoding
+    return None
+
+
+def _compressor(encoding: str, level: Optional[int]) -> Any:
+    """Return an object exposing ``compress(chunk)`` and ``flush()``."""
+    if encoding == 'zstd':
+        return _ZstdStream(level or 3)
+    if encoding == 'br':
+        return _BrotliStream(level or 5)
+    return zlib.compressobj(level or 6, zlib.DEFLATED, 31)  # wbits=31: gzip container
+
+
+class _ZstdStream:
+    def __init__(self, level: int) -> None:
+        self._obj = zstandard.ZstdCompressor(level=level).compressobj()
+
+    def compress(self, data: bytes) -> bytes:
+        return self._obj.compress(data)
+
+    def flush(self, mode: Optional[int] = None) -> bytes:
+        if mode == zlib.Z_SYNC_FLUSH:
+            return self._obj.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK)
+        return self._obj.flush()
+
+
+class _BrotliStream:
+    def __init__(self, level: int) -> None:
+        self._obj = brotli.Compressor(quality=level)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._obj.process(data)
+
+    def flush(self, mode: Optional[int] = None) -> bytes:
+        if mode == zlib.Z_SYNC_FLUSH:
+            return self._obj.flush()
+        return self._obj.finish()
+
+
+def compress_bytes(data: bytes, encoding: str, level: Optional[int] = None) -> bytes:
+    """Compress a whole body with ``encoding``."""
+    compressor = _compressor(encoding, level)
+    return compressor.compress(data) + compressor.flush()
+
+
+def _compress_stream(chunks: Iterable[bytes], encoding: str, level: Optional[int]) -> Iterator[bytes]:
+    compressor = _compressor(encoding, level)
+    unflushed = 0
+    for chunk in chunks:
+        if isinstance(chunk, str):
+            chunk = chunk.encode('utf-8')
+        data = compressor.compress(chunk)
+        unflushed += len(chunk)
+        # Sync-flush periodically so output keeps flowing without hurting the ratio
+        if unflushed >= STREAM_FLUSH_BYTES:
+            data += compressor.flush(zlib.Z_SYNC_FLUSH)
+            unflushed = 0
+        if data:
+            yield data
+    tail = compressor.flush()
+    if tail:
+        yield tail
+
+
+def init_compression(app: Flask) -> None:
+    """Register response compression on ``app`` using its ``COMPRESS_*`` settings."""
+    app.config.setdefault('COMPRESS_ENABLED', True)
+    app.config.setdefault('COMPRESS_MIN_SIZE', 1024)
+    app.config.setdefault('COMPRESS_MIMETYPES', DEFAULT_MIMETYPES)
+    app.config.setdefault('COMPRESS_LEVEL', None)  # per-encoding default
+    supported = available_encodings()
+
+    @app.after_request
+    def compress_response(response: Response) -> Response:
+        return _maybe_compress(app, response, supported)
+
+
+def _maybe_compress(app: Flask, response: Response, supported: list) -> Response:
+    config = app.config
+    # HEAD goes through the same negotiation as GET so both send the same headers
+    if not config['COMPRESS_ENABLED']:
+        return response
+    if (
+        response.status_code < 200
+        or response.status_code in (204, 304)
+        or response.direct_passthrough
+        or 'Content-Encoding' in response.headers
+        or response.mimetype not in config['COMPRESS_MIMETYPES']
+        or response.cache_control.no_transform
+    ):
+        return response
+    response.vary.add('Accept-Encoding')
+    encoding = negotiate_encoding(request.accept_encodings, supported)
+    if encoding is None:
+        return response
+    level = config['COMPRESS_LEVEL']
+    if response.is_streamed:
+        response.response = _compress_stream(response.response, encoding, level)
+        response.headers.pop('Content-Length', None)
+    else:
+        data = response.get_data()
+        if len(data) < config['COMPRESS_MIN_SIZE']:
+            return response
+        response.set_data(compress_bytes(data, encoding, level))
+    response.headers['Content-Encoding'] = encoding
+    _weaken_etag(response)
+    return response
+
+
+def _weaken_etag(response: Response) -> None:
+    """Compressed bytes differ from the identity body, so a strong tag must become weak."""
+    etag, weak = response.get_etag()
+    if etag and not weak:
+        response.set_etag(etag, weak=True)
+
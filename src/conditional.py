@@ -0,0 +1,115 @@
+"""
+Conditional GET support (ETag / Last-Modified).
+
+Resource endpoints are wrapped with :func:`conditional`, which asks a cheap
+*version* function for the resource's validators before the view runs. The
+version function only selects ``updated_at`` columns (or ``count`` and
+``max(updated_at)`` for collections), so when the client's ``If-None-Match``
+or ``If-Modified-Since`` still matches, a ``304 Not Modified`` is returned
+without loading or serialising any rows.
+
+The ETags are weak: they identify a version of the resource, not its exact
+bytes, so the same tag is valid for the identity and compressed bodies and
+a ``304`` carries the tag the client saw on its ``200``.
+"""
+
+import datetime
+import functools
+import hashlib
+from typing import Any, Callable, Optional, Sequence
+
+from flask import current_app, g, make_response, request
+from sqlalchemy import func
+
+from .models import db
+
+Version = Optional[Sequence[Any]]
+
+
+def row_version(statement: Any) -> Version:
+    """Execute a ``select`` of version columns and return the first row, if any."""
+    row = db.session.execute(statement).first()
+    return tuple(row) if row is not None else None
+
+
+def collection_version(query: Any, *updated_columns: Any) -> Version:
+    """Return ``(count, max(col), ...)`` for a Flask-SQLAlchemy query.
+
+    Any insert, update or delete of a matching row changes either the count
+    or the newest ``updated_at``, which is all a collection ETag needs.
+    """
+    aggregates = [func.max(column) for column in updated_columns]
+    return tuple(query.order_by(None).with_entities(func.count(), *aggregates).one())
+
+
+def current_version(version: Callable[..., Version], **kwargs: Any) -> Version:
+    """Return the version computed by :func:`conditional` for this request.
+
+    Views use this to key caches without repeating the version query; when
+    called outside a conditional view the version is computed directly.
+    """
+    if 'resource_version' in g:
+        return g.resource_version
+    return version(**kwargs)
+
+
+def make_etag(parts: Sequence[Any]) -> str:
+    """Derive an opaque ETag from the version parts, endpoint and query string."""
+    digest = hashlib.blake2b(digest_size=12)
+    digest.update(request.endpoint.encode() if request.endpoint else b'')
+    digest.update(request.query_string)
+    digest.update(repr(tuple(parts)).encode())
+    return digest.hexdigest()
+
+
+def _last_modified(parts: Sequence[Any]) -> Optional[datetime.datetime]:
+    stamps = [p for p in parts if isinstance(p, datetime.datetime)]
+    if not stamps:
+        return None
+    # Timestamps are stored as naive UTC; HTTP dates have second precision
+    return max(stamps).replace(microsecond=0, tzinfo=datetime.timezone.utc)
+
+
+def _is_not_modified(etag: str, modified: Optional[datetime.datetime]) -> bool:
+    if request.if_none_match:
+        # If-None-Match takes precedence over If-Modified-Since (RFC 9110 13.2.2)
+        return request.if_none_match.contains_weak(etag)
+    since = request.if_modified_since
+    return bool(since and modified and modified <= since)
+
+
+def conditional(version: Callable[..., Version], last_modified: bool = True) -> Callable:
+    """Decorate a GET view with ETag/Last-Modified validation.
+
+    ``version`` receives the view's URL arguments and returns a sequence of
+    values that changes whenever the response would, or ``None`` when the
+    resource does not exist (the view then runs and produces its 404).
+
+    Collections should pass ``last_modified=False``: deleting a row does not
+    move ``max(updated_at)``, so only the ETag (which includes the count) can
+    validate them safely.
+    """
+    def decorator(view: Callable) -> Callable:
+        @functools.wraps(view)
+        def wrapper(*args: Any, **kwargs: Any) -> Any:
+            if request.method not in ('GET', 'HEAD'):
+                return view(*args, **kwargs)
+            parts = g.resource_version = version(**kwargs)
+            if parts is None:
+                return view(*args, **kwargs)
+            etag = make_etag(parts)
+            modified = _last_modified(parts) if last_modified else None
+            if _is_not_modified(etag, modified):
+                response = current_app.response_class(status=304)
+            else:
+                response = make_response(view(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+            response.set_etag(etag, weak=True)
+            if modified is not None:
+                response.last_modified = modified
+            # Clients may cache but must revalidate, which is now cheap
+            response.cache_control.no_cache = True
+            return response
+        return wrapper
+    return decorator
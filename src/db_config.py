@@ -0,0 +1,139 @@
+"""
+Database engine configuration.
+
+The connection URL comes from ``DATABASE_URL`` (falling back to the SQLite
+file in ``src/database/app.db`` for local development). Server databases get
+a sized connection pool with pre-ping and recycling so connections dropped
+by the server or a proxy are replaced transparently. SQLite connections are
+switched to WAL mode with ``synchronous=NORMAL``, a busy timeout and memory
+mapped I/O, so several gunicorn workers can read while one writes instead of
+serialising on the database lock.
+
+With ``DATABASE_REPLICA_URL`` set, a ``replica`` bind is added and GET/HEAD
+requests read from it (see ``src/models/routing.py``). After a client
+writes, a short-lived cookie pins its reads to the primary for
+``REPLICA_STICKY_SECONDS`` so it sees its own changes despite replication
+lag.
+"""
+
+import os
+import time
+from typing import Any, Dict, Optional
+
+from flask import Flask, Response, g, request
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+
+from .models import db
+from .models.routing import REPLICA_BIND_KEY
+
+DEFAULT_SQLITE_DIR = os.path.join(os.path.dirname(__file__), 'database')
+
+# SQLite pragmas applied to every new connection
+SQLITE_BUSY_TIMEOUT_MS = 5000
+SQLITE_MMAP_SIZE = 256 * 1024 * 1024
+
+READ_METHODS = frozenset(('GET', 'HEAD', 'OPTIONS'))
+# Cookie pinning a client's reads to the primary after it writes
+STICKY_COOKIE = 'mh_db_primary'
+
+
+def _env_bool(name: str, default: bool) -> bool:
+    value = os.getenv(name)
+    if value is None:
+        return default
+    return value.strip().lower() in ('1', 'true', 'yes', 'on')
+
+
+def database_url() -> str:
+    """Return the configured SQLAlchemy URL."""
+    url = os.getenv('DATABASE_URL')
+    if not url:
+        os.makedirs(DEFAULT_SQLITE_DIR, exist_ok=True)
+        return f"sqlite:///{os.path.join(DEFAULT_SQLITE_DIR, 'app.db')}"
+    return _normalise_url(url)
+
+
+def replica_url() -> Optional[str]:
+    """Return the read replica URL from ``DATABASE_REPLICA_URL``, if set."""
+    url = os.getenv('DATABASE_REPLICA_URL')
+    return _normalise_url(url) if url else None
+
+
+def _normalise_url(url: str) -> str:
+    # Hosting platforms still hand out the pre-1.4 ``postgres://`` scheme
+    if url.startswith('postgres://'):
+        return 'postgresql://' + url[len('postgres://'):]
+    return url
+
+
+def engine_options(url: str) -> Dict[str, Any]:
+    """Pool settings for ``url``, overridable through ``DB_*`` variables."""
+    if make_url(url).get_backend_name() == 'sqlite':
+        # SQLAlchemy picks a suitable pool per SQLite database kind
+        return {}
+    return {
+        'pool_size': int(os.getenv('DB_POOL_SIZE', '5')),
+        'max_overflow': int(os.getenv('DB_MAX_OVERFLOW', '10')),
+        'pool_timeout': int(os.getenv('DB_POOL_TIMEOUT', '30')),
+        'pool_recycle': int(os.getenv('DB_POOL_RECYCLE', '1800')),
+        'pool_pre_ping': _env_bool('DB_POOL_PRE_PING', True),
+    }
+
+
+def _sqlite_pragmas(dbapi_connection: Any, connection_record: Any) -> None:
+    cursor = dbapi_connection.cursor()
+    try:
+        cursor.execute('PRAGMA journal_mode=WAL')  # a no-op for in-memory databases
+        cursor.execute('PRAGMA synchronous=NORMAL')
+        cursor.execute(f'PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}')
+        cursor.execute(f'PRAGMA mmap_size={SQLITE_MMAP_SIZE}')
+    finally:
+        cursor.close()
+
+
+def init_database(app: Flask) -> None:
+    """Configure ``SQLALCHEMY_*`` settings from the environment and bind ``db``."""
+    if 'SQLALCHEMY_DATABASE_URI' not in app.config:
+        app.config['SQLALCHEMY_DATABASE_URI'] = database_url()
+    url = app.config['SQLALCHEMY_DATABASE_URI']
+    app.config.setdefault('SQLALCHEMY_ENGINE_OPTIONS', engine_options(url))
+    app.config.setdefault('SQLALCHEMY_TRACK_MODIFICATIONS', False)
+    app.config.setdefault('REPLICA_STICKY_SECONDS', int(os.getenv('REPLICA_STICKY_SECONDS', '5')))
+    replica = app.config.setdefault('DATABASE_REPLICA_URL', replica_url())
+    if replica:
+        binds = app.config.setdefault('SQLALCHEMY_BINDS', {})
+        binds.setdefault(REPLICA_BIND_KEY, {'url': replica, **engine_options(replica)})
+    db.init_app(app)
+    with app.app_context():
+        for engine in db.engines.values():
+            if engine.dialect.name == 'sqlite':
+                event.listen(engine, 'connect', _sqlite_pragmas)
+    if replica:
+        _install_replica_routing(app)
+
+
+def _install_replica_routing(app: Flask) -> None:
+    """Send reads to the replica unless the client wrote very recently."""
+    window = app.config['REPLICA_STICKY_SECONDS']
+
+    @app.before_request
+    def route_reads() -> None:
+        if request.method in READ_METHODS and not _pinned_to_primary():
+            g.db_read_replica = True
+
+    @app.after_request
+    def pin_after_write(response: Response) -> Response:
+        if request.method not in READ_METHODS and response.status_code < 400 and window > 0:
+            response.set_cookie(
+                STICKY_COOKIE, str(int(time.time()) + window), max_age=window, httponly=True, samesite='Lax'
+            )
+        return response
+
+
+def _pinned_to_primary() -> bool:
+    try:
+        return int(request.cookies.get(STICKY_COOKIE, '0')) > time.time()
+    except ValueError:
+        return False
+
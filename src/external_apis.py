@@ -5,10 +5,322 @@ This module defines service classes that encapsulate calls to third‑party
 APIs such as Open‑Meteo, Overpass (OpenStreetMap) and others. Each service
 provides a clean method for retrieving or transforming data in a format
 convenient for the application.
+
+Upstream URLs default to the public endpoints and can be overridden with
+``OPEN_METEO_URL`` and ``OVERPASS_URL`` (or the ``base_url`` argument), for
+example to point the services at a mirror or at the stub server used by
+``benchmarks/external_converters.py``.
+
+Calls go through a per-upstream circuit breaker (``src/circuit_breaker.py``)
+and failures raise ``UpstreamUnavailable``. Results are kept in the shared
+disk cache (``src/upstream_cache.py``), which serves stale data while the
+upstream is failing.
+The services are shared by all threads of a worker (gunicorn runs
+``gthread`` workers, see ``gunicorn.conf.py``). Each thread sends its
+requests through its own ``requests.Session``, so connections to an
+upstream are kept alive between calls without sharing a session across
+threads.
+Forecasts are requested for coordinates snapped to a 0.01° grid (about
+1 km), so nearby requests share cache entries. Overpass areas are cached,
+counted for prefetching and refreshed as fixed 0.05° tiles: a bounding box
+is answered from the tiles it overlaps (at most ``MAX_AREA_TILES``), and
+the uncached ones are loaded with one Overpass request per rectangle of
+contiguous tiles. ``WeatherService.get_weather_batch`` fetches
+the uncached cells of many points in one Open-Meteo request.
+A :class:`WeatherQuery` narrows a forecast to some variables, resolutions
+and days, which shrinks both the upstream request and the response.
 """
 
+import hashlib
+import json
+import math
+import os
+import threading
+
 import requests
-from typing import Any, Dict, Optional
+from typing import Any, Callable, Dict, Iterable, List, NamedTuple, Optional, Sequence, Tuple
+
+from .circuit_breaker import UpstreamUnavailable, circuit_breaker
+from .prefetch import register_prefetch
+from .request_timing import track_upstream
+from .upstream_cache import cached_upstream, cached_upstream_many
+
+
+OPEN_METEO_URL = "https://api.open-meteo.com/v1/forecast"
+OVERPASS_URL = "https://overpass-api.de/api/interpreter"
+
+# Freshness and additional stale-while-revalidate windows, in seconds
+WEATHER_TTL, WEATHER_STALE_TTL = 15 * 60, 60 * 60
+OSM_TTL, OSM_STALE_TTL = 24 * 60 * 60, 7 * 24 * 60 * 60
+
+WEATHER_GRID = 0.01
+OSM_TILE = 0.05
+# Largest Overpass area served, in tiles (e.g. 0.5° x 0.5°)
+MAX_AREA_TILES = 100
+# Locations per Open-Meteo request, keeping the query string a reasonable length
+WEATHER_BATCH_SIZE = 50
+
+CURRENT_VARIABLES = (
+    "temperature_2m", "relative_humidity_2m", "apparent_temperature", "precipitation", "rain",
+    "showers", "snowfall", "weather_code", "cloud_cover", "pressure_msl", "surface_pressure",
+    "wind_speed_10m", "wind_direction_10m", "wind_gusts_10m",
+)
+HOURLY_VARIABLES = (
+    "temperature_2m", "relative_humidity_2m", "dew_point_2m", "apparent_temperature",
+    "precipitation_probability", "precipitation", "rain", "showers", "snowfall", "snow_depth",
+    "weather_code", "pressure_msl", "surface_pressure", "cloud_cover", "cloud_cover_low",
+    "cloud_cover_mid", "cloud_cover_high", "visibility", "wind_speed_10m", "wind_direction_10m",
+    "wind_gusts_10m",
+)
+DAILY_VARIABLES = (
+    "weather_code", "temperature_2m_max", "temperature_2m_min", "apparent_temperature_max",
+    "apparent_temperature_min", "sunrise", "sunset", "precipitation_sum", "rain_sum", "showers_sum",
+    "snowfall_sum", "precipitation_hours", "precipitation_probability_max", "wind_speed_10m_max",
+    "wind_gusts_10m_max", "wind_direction_10m_dominant",
+)
+RESOLUTIONS = ("current", "hourly", "daily")
+DEFAULT_FORECAST_DAYS = 7
+# Open-Meteo's forecast horizon
+MAX_FORECAST_DAYS = 16
+
+
+class WeatherQuery(NamedTuple):
+    """The variables and horizon requested from Open-Meteo.
+
+    The default asks for every variable the app knows about, for
+    ``DEFAULT_FORECAST_DAYS`` days; :meth:`select` narrows it down.
+    """
+    current: Tuple[str, ...] = CURRENT_VARIABLES
+    hourly: Tuple[str, ...] = HOURLY_VARIABLES
+    daily: Tuple[str, ...] = DAILY_VARIABLES
+    days: int = DEFAULT_FORECAST_DAYS
+
+    @classmethod
+    def select(cls, variables: Optional[Iterable[str]] = None, resolutions: Optional[Iterable[str]] = None,
+               days: Optional[int] = None) -> "WeatherQuery":
+        """Only ``variables`` (all by default) at ``resolutions`` (all by default) for ``days`` days.
+
+        A variable is requested at every selected resolution that offers it.
+        Raises ``ValueError`` for unknown names, an out-of-range ``days`` or
+        a selection that leaves nothing to request.
+        """
+        resolutions = RESOLUTIONS if resolutions is None else tuple(dict.fromkeys(resolutions))
+        unknown = [name for name in resolutions if name not in RESOLUTIONS]
+        if unknown:
+            raise ValueError(f"Unknown resolution: {', '.join(unknown)} (expected {', '.join(RESOLUTIONS)})")
+        default = cls()
+        sections = {name: getattr(default, name) if name in resolutions else () for name in RESOLUTIONS}
+        if variables is not None:
+            wanted = set(variables)
+            unknown = sorted(wanted.difference(CURRENT_VARIABLES, HOURLY_VARIABLES, DAILY_VARIABLES))
+            if unknown:
+                raise ValueError(f"Unknown weather variable: {', '.join(unknown)}")
+            sections = {name: tuple(v for v in offered if v in wanted) for name, offered in sections.items()}
+        if not any(sections.values()):
+            raise ValueError("The selection leaves no weather variables to request")
+        if days is None:
+            days = DEFAULT_FORECAST_DAYS
+        if not 1 <= days <= MAX_FORECAST_DAYS:
+            raise ValueError(f"days must be between 1 and {MAX_FORECAST_DAYS}")
+        if not sections["hourly"] and not sections["daily"]:
+            days = DEFAULT_FORECAST_DAYS  # irrelevant for current conditions; keeps cache keys shared
+        return cls(days=days, **sections)
+
+    @classmethod
+    def from_args(cls, args: Optional[Sequence[Any]] = None) -> "WeatherQuery":
+        """The query recorded with prefetch demand by :meth:`as_args` (the default for ``None``)."""
+        if args is None:
+            return cls()
+        current, hourly, daily, days = args
+        return cls(tuple(current), tuple(hourly), tuple(daily), int(days))
+
+    def as_args(self) -> List[Any]:
+        return [list(self.current), list(self.hourly), list(self.daily), self.days]
+
+    def params(self) -> Dict[str, Any]:
+        """Open-Meteo query parameters, leaving out the unselected resolutions."""
+        params: Dict[str, Any] = {
+            name: ",".join(getattr(self, name)) for name in RESOLUTIONS if getattr(self, name)
+        }
+        params["forecast_days"] = self.days
+        return params
+
+    def cache_suffix(self) -> str:
+        """Distinguishes the cache key of a narrowed query; empty for the default one."""
+        if self == DEFAULT_WEATHER_QUERY:
+            return ""
+        canonical = json.dumps(self.as_args(), separators=(",", ":"))
+        return ":" + hashlib.sha1(canonical.encode()).hexdigest()[:12]
+
+
+DEFAULT_WEATHER_QUERY = WeatherQuery()
+
+
+# Connect and read timeouts; Overpass queries ask the server for at most 25 s
+UPSTREAM_TIMEOUT = (3.05, float(os.getenv("UPSTREAM_TIMEOUT_SECONDS", "30")))
+
+
+_local = threading.local()
+
+
+def _session() -> requests.Session:
+    """The calling thread's HTTP session (sessions are not thread-safe)."""
+    session = getattr(_local, "session", None)
+    if session is None:
+        session = _local.session = requests.Session()
+    return session
+
+
+def _is_upstream_failure(exc: BaseException) -> bool:
+    """Errors that count against a breaker: network errors, timeouts, 5xx, 429 and bad bodies."""
+    if isinstance(exc, requests.exceptions.HTTPError) and exc.response is not None:
+        return exc.response.status_code >= 500 or exc.response.status_code == 429
+    return isinstance(exc, (requests.exceptions.RequestException, UpstreamUnavailable))
+
+
+def _request(upstream: str, send: Callable[[], requests.Response]) -> Any:
+    """Send a request through ``upstream``'s circuit breaker and decode the JSON body.
+
+    Raises :class:`UpstreamUnavailable` (or ``CircuitOpenError`` without
+    calling the upstream while its breaker is open). A body that is not
+    valid JSON is decoded inside the breaker and counts as a failure.
+    """
+    try:
+        with circuit_breaker(upstream, _is_upstream_failure).guard(), track_upstream(upstream):
+            response = send()
+            response.raise_for_status()
+            try:
+                return response.json()
+            except ValueError as exc:
+                raise UpstreamUnavailable(upstream, f'invalid JSON response: {exc}') from exc
+    except requests.exceptions.RequestException as exc:
+        raise UpstreamUnavailable(upstream, str(exc)) from exc
+
+
+def _weather_key(latitude: float, longitude: float, timezone: str,
+                 query: WeatherQuery = DEFAULT_WEATHER_QUERY) -> str:
+    return f"open-meteo:forecast:{latitude},{longitude}:{timezone}{query.cache_suffix()}"
+
+
+def _weather_demand(latitude: float, longitude: float, timezone: str, query: WeatherQuery) -> tuple:
+    args: List[Any] = [latitude, longitude, timezone]
+    if query != DEFAULT_WEATHER_QUERY:
+        args.append(query.as_args())
+    return ("weather", args)
+
+
+def _snap(value: float, grid: float) -> float:
+    return round(round(value / grid) * grid, 6)
+
+
+def _tile_span(low: float, high: float) -> range:
+    """Indices of the ``OSM_TILE`` rows (or columns) overlapping ``[low, high]``."""
+    first = math.floor(round(low / OSM_TILE, 9))
+    return range(first, max(first + 1, math.ceil(round(high / OSM_TILE, 9))))
+
+
+def _tile_box(rows: range, columns: range) -> Tuple[float, float, float, float]:
+    """``(south, west, north, east)`` of a block of tiles."""
+    return (
+        round(rows.start * OSM_TILE, 6), round(columns.start * OSM_TILE, 6),
+        round(rows.stop * OSM_TILE, 6), round(columns.stop * OSM_TILE, 6),
+    )
+
+
+def osm_area_tiles(south: float, west: float, north: float, east: float) -> int:
+    """How many ``OSM_TILE`` tiles a bounding box overlaps."""
+    return len(_tile_span(south, north)) * len(_tile_span(west, east))
+
+
+def _osm_tiles(south: float, west: float, north: float, east: float) -> Dict[Tuple[int, int], Tuple[float, ...]]:
+    """The tiles, as ``(south, west, north, east)`` by ``(row, column)``, overlapping a bounding box."""
+    return {
+        (i, j): _tile_box(range(i, i + 1), range(j, j + 1))
+        for i in _tile_span(south, north) for j in _tile_span(west, east)
+    }
+
+
+def _tile_blocks(indexes: Iterable[Tuple[int, int]]) -> List[Tuple[range, range]]:
+    """Cover the tiles at ``indexes`` with ``(rows, columns)`` rectangles holding no other tile.
+
+    Runs of adjacent tiles in a row are merged with the identical runs of
+    the rows below, so a contiguous area is one rectangle.
+    """
+    runs: List[Tuple[int, int, int]] = []  # (row, first column, last column + 1)
+    for i, j in sorted(indexes):
+        if runs and runs[-1][0] == i and runs[-1][2] == j:
+            runs[-1] = (i, runs[-1][1], j + 1)
+        else:
+            runs.append((i, j, j + 1))
+    blocks: Dict[Tuple[int, int], Tuple[int, int]] = {}  # columns -> (first row, last row + 1) of the open block
+    closed: List[Tuple[range, range]] = []
+    for i, first, stop in runs:
+        rows = blocks.get((first, stop))
+        if rows is not None and rows[1] == i:
+            blocks[(first, stop)] = (rows[0], i + 1)
+            continue
+        if rows is not None:
+            closed.append((range(*rows), range(first, stop)))
+        blocks[(first, stop)] = (i, i + 1)
+    closed.extend((range(*rows), range(*columns)) for columns, rows in blocks.items())
+    return closed
+
+
+def _feature_bbox(feature: Dict[str, Any]) -> Tuple[float, float, float, float]:
+    """``(south, west, north, east)`` of a GeoJSON ``Point`` or ``LineString`` feature."""
+    geometry = feature["geometry"]
+    coordinates = geometry["coordinates"]
+    if geometry["type"] == "Point":
+        coordinates = [coordinates]
+    lons = [c[0] for c in coordinates]
+    lats = [c[1] for c in coordinates]
+    return min(lats), min(lons), max(lats), max(lons)
+
+
+def _overlaps(bbox: Sequence[float], area: Sequence[float]) -> bool:
+    return bbox[0] <= area[2] and bbox[2] >= area[0] and bbox[1] <= area[3] and bbox[3] >= area[1]
+
+
+def _cached_osm_area(kind: str, bbox: Tuple[float, float, float, float],
+                     fetch: Callable[..., Dict[str, Any]]) -> Dict[str, Any]:
+    """The features of ``bbox`` for Overpass ``kind``, cached per ``OSM_TILE`` tile.
+
+    ``fetch(south, west, north, east)`` returns a GeoJSON feature collection;
+    the uncached tiles are fetched a rectangle of contiguous tiles at a time
+    and each result is split between its tiles. Raises ``ValueError`` for an
+    area of more than ``MAX_AREA_TILES`` tiles.
+    """
+    if osm_area_tiles(*bbox) > MAX_AREA_TILES:
+        raise ValueError(f"The area is too large: at most {MAX_AREA_TILES} tiles of {OSM_TILE}° per request")
+    indexes: Dict[Tuple[int, int], str] = {}
+    tiles: Dict[str, Tuple[float, ...]] = {}
+    for index, tile in _osm_tiles(*bbox).items():
+        key = f"overpass:{kind}:" + ",".join(map(str, tile))
+        indexes[index], tiles[key] = key, tile
+
+    def load_many(keys: List[str]) -> Dict[str, Any]:
+        wanted = set(keys)
+        loaded: Dict[str, Any] = {}
+        for rows, columns in _tile_blocks(index for index, key in indexes.items() if key in wanted):
+            collection = fetch(*_tile_box(rows, columns))
+            boxes = [(feature, _feature_bbox(feature)) for feature in collection["features"]]
+            for key in (indexes[(i, j)] for i in rows for j in columns):
+                loaded[key] = {"type": "FeatureCollection",
+                               "features": [feature for feature, box in boxes if _overlaps(box, tiles[key])]}
+        return loaded
+
+    by_tile = cached_upstream_many(
+        list(tiles), load_many, OSM_TTL, OSM_STALE_TTL,
+        demand={key: (kind, list(tile)) for key, tile in tiles.items()},
+    )
+    # Ways cross tiles: keep each feature once, and only those touching ``bbox``
+    features: Dict[Tuple[Any, Any], Dict[str, Any]] = {}
+    for collection in by_tile.values():
+        for feature in (collection or {}).get("features", ()):
+            properties = feature["properties"]
+            if _overlaps(_feature_bbox(feature), bbox):
+                features.setdefault((properties.get("type"), properties.get("id")), feature)
+    return {"type": "FeatureCollection", "features": list(features.values())}
 
 
 class WeatherService:
@@ -16,42 +328,67 @@ class WeatherService:
     Service for interacting with the Open‑Meteo Weather API.
     """
 
-    def __init__(self) -> None:
-        self.base_url = "https://api.open-meteo.com/v1/forecast"
-
-    def get_weather(self, latitude: float, longitude: float, timezone: str = "auto") -> Optional[Dict[str, Any]]:
-        """Get current weather and forecast for a specific location."""
-        params = {
-            "latitude": latitude,
-            "longitude": longitude,
-            "timezone": timezone,
-            "current": (
-                "temperature_2m,relative_humidity_2m,apparent_temperature,precipitation,rain,"
-                "showers,snowfall,weather_code,cloud_cover,pressure_msl,surface_pressure,"
-                "wind_speed_10m,wind_direction_10m,wind_gusts_10m"
-            ),
-            "hourly": (
-                "temperature_2m,relative_humidity_2m,dew_point_2m,apparent_temperature,"
-                "precipitation_probability,precipitation,rain,showers,snowfall,snow_depth,"
-                "weather_code,pressure_msl,surface_pressure,cloud_cover,cloud_cover_low,"
-                "cloud_cover_mid,cloud_cover_high,visibility,wind_speed_10m,wind_direction_10m,"
-                "wind_gusts_10m"
-            ),
-            "daily": (
-                "weather_code,temperature_2m_max,temperature_2m_min,apparent_temperature_max,"
-                "apparent_temperature_min,sunrise,sunset,precipitation_sum,rain_sum,showers_sum,"
-                "snowfall_sum,precipitation_hours,precipitation_probability_max,wind_speed_10m_max,"
-                "wind_gusts_10m_max,wind_direction_10m_dominant"
-            ),
-            "forecast_days": 7,
-        }
-        try:
-            response = requests.get(self.base_url, params=params)
-            response.raise_for_status()
-            return response.json()
-        except requests.exceptions.RequestException as exc:  # pragma: no cover
-            print(f"Error fetching weather data: {exc}")
-            return None
+    def __init__(self, base_url: Optional[str] = None) -> None:
+        self.base_url = base_url or os.getenv("OPEN_METEO_URL", OPEN_METEO_URL)
+
+    def get_weather(self, latitude: float, longitude: float, timezone: str = "auto",
+                    query: WeatherQuery = DEFAULT_WEATHER_QUERY) -> Dict[str, Any]:
+        """Get current weather and forecast for a specific location.
+
+        ``query`` narrows the variables and days requested (and returned);
+        each distinct query is cached separately.
+        """
+        latitude, longitude = _snap(latitude, WEATHER_GRID), _snap(longitude, WEATHER_GRID)
+        return cached_upstream(
+            _weather_key(latitude, longitude, timezone, query),
+            lambda: self._fetch_weather(latitude, longitude, timezone, query),
+            WEATHER_TTL, WEATHER_STALE_TTL,
+            demand=_weather_demand(latitude, longitude, timezone, query),
+        )
+
+    def get_weather_batch(self, points: Sequence[Tuple[float, float]], timezone: str = "auto",
+                          query: WeatherQuery = DEFAULT_WEATHER_QUERY) -> List[Dict[str, Any]]:
+        """Forecasts for several ``(latitude, longitude)`` points, in the same order.
+
+        Points are snapped to the forecast grid and deduplicated; grid cells
+        without a fresh cached forecast are requested together (Open-Meteo
+        takes lists of coordinates), ``WEATHER_BATCH_SIZE`` per request.
+        """
+        cells = [(_snap(lat, WEATHER_GRID), _snap(lon, WEATHER_GRID)) for lat, lon in points]
+        cell_keys = {cell: _weather_key(*cell, timezone, query) for cell in cells}
+        key_cells = {key: cell for cell, key in cell_keys.items()}
+
+        def load_many(keys: List[str]) -> Dict[str, Any]:
+            forecasts = self._fetch_weather_batch([key_cells[key] for key in keys], timezone, query)
+            return dict(zip(keys, forecasts))
+
+        forecasts = cached_upstream_many(
+            list(key_cells), load_many, WEATHER_TTL, WEATHER_STALE_TTL,
+            demand={key: _weather_demand(*cell, timezone, query) for key, cell in key_cells.items()},
+        )
+        return [forecasts[cell_keys[cell]] for cell in cells]
+
+    def _fetch_weather(self, latitude: float, longitude: float, timezone: str,
+                       query: WeatherQuery = DEFAULT_WEATHER_QUERY) -> Dict[str, Any]:
+        return self._fetch_weather_batch([(latitude, longitude)], timezone, query)[0]
+
+    def _fetch_weather_batch(self, cells: List[Tuple[float, float]], timezone: str,
+                             query: WeatherQuery = DEFAULT_WEATHER_QUERY) -> List[Dict[str, Any]]:
+        forecasts: List[Dict[str, Any]] = []
+        for start in range(0, len(cells), WEATHER_BATCH_SIZE):
+            chunk = cells[start:start + WEATHER_BATCH_SIZE]
+            params = dict(
+                query.params(),
+                latitude=",".join(str(lat) for lat, _ in chunk),
+                longitude=",".join(str(lon) for _, lon in chunk),
+                timezone=timezone,
+            )
+            data = _request('open-meteo', lambda: _session().get(
+                self.base_url, params=params, timeout=UPSTREAM_TIMEOUT
+            ))
+            # A single location comes back as an object, several as a list in request order
+            forecasts.extend(data if isinstance(data, list) else [data])
+        return forecasts
 
 
 class TrailService:
@@ -59,11 +396,14 @@ class TrailService:
     Service for interacting with the OpenStreetMap/Overpass API to get trail data.
     """
 
-    def __init__(self) -> None:
-        self.base_url = "https://overpass-api.de/api/interpreter"
+    def __init__(self, base_url: Optional[str] = None) -> None:
+        self.base_url = base_url or os.getenv("OVERPASS_URL", OVERPASS_URL)
 
-    def get_trails_in_area(self, south: float, west: float, north: float, east: float) -> Optional[Dict[str, Any]]:
+    def get_trails_in_area(self, south: float, west: float, north: float, east: float) -> Dict[str, Any]:
         """Get hiking trails in a bounding box area."""
+        return _cached_osm_area("trails", (south, west, north, east), self._fetch_trails_in_area)
+
+    def _fetch_trails_in_area(self, south: float, west: float, north: float, east: float) -> Dict[str, Any]:
         overpass_query = f"""
         [out:json][timeout:25];
         (
@@ -77,16 +417,20 @@ class TrailService:
         >;
         out skel qt;
         """
-        try:
-            response = requests.post(self.base_url, data={"data": overpass_query})
-            response.raise_for_status()
-            return self._convert_to_geojson(response.json())
-        except requests.exceptions.RequestException as exc:  # pragma: no cover
-            print(f"Error fetching trail data: {exc}")
-            return None
+        return self._convert_to_geojson(_request('overpass', lambda: _session().post(
+            self.base_url, data={"data": overpass_query}, timeout=UPSTREAM_TIMEOUT
+        )))
 
-    def get_trail_by_id(self, osm_id: int, osm_type: str = "way") -> Optional[Dict[str, Any]]:
+    def get_trail_by_id(self, osm_id: int, osm_type: str = "way") -> Dict[str, Any]:
         """Get a specific trail by its OSM ID."""
+        return cached_upstream(
+            f"overpass:{osm_type}:{osm_id}",
+            lambda: self._fetch_trail_by_id(osm_id, osm_type),
+            OSM_TTL, OSM_STALE_TTL,
+            demand=("trail", [osm_id, osm_type]),
+        )
+
+    def _fetch_trail_by_id(self, osm_id: int, osm_type: str) -> Dict[str, Any]:
         overpass_query = f"""
         [out:json][timeout:25];
         {osm_type}(id:{osm_id});
@@ -94,13 +438,9 @@ class TrailService:
         >;
         out skel qt;
         """
-        try:
-            response = requests.post(self.base_url, data={"data": overpass_query})
-            response.raise_for_status()
-            return self._convert_to_geojson(response.json())
-        except requests.exceptions.RequestException as exc:  # pragma: no cover
-            print(f"Error fetching trail data: {exc}")
-            return None
+        return self._convert_to_geojson(_request('overpass', lambda: _session().post(
+            self.base_url, data={"data": overpass_query}, timeout=UPSTREAM_TIMEOUT
+        )))
 
     def _convert_to_geojson(self, osm_data: Dict[str, Any]) -> Dict[str, Any]:
         """Convert OSM data to GeoJSON format (simplified)."""
@@ -130,11 +470,14 @@ class RefugeService:
     Service for interacting with the Overpass API to get mountain refuge data.
     """
 
-    def __init__(self) -> None:
-        self.base_url = "https://overpass-api.de/api/interpreter"
+    def __init__(self, base_url: Optional[str] = None) -> None:
+        self.base_url = base_url or os.getenv("OVERPASS_URL", OVERPASS_URL)
 
-    def get_refuges_in_area(self, south: float, west: float, north: float, east: float) -> Optional[Dict[str, Any]]:
+    def get_refuges_in_area(self, south: float, west: float, north: float, east: float) -> Dict[str, Any]:
         """Get mountain refuges and huts in a bounding box area."""
+        return _cached_osm_area("refuges", (south, west, north, east), self._fetch_refuges_in_area)
+
+    def _fetch_refuges_in_area(self, south: float, west: float, north: float, east: float) -> Dict[str, Any]:
         overpass_query = f"""
         [out:json][timeout:25];
         (
@@ -145,13 +488,9 @@ class RefugeService:
         );
         out body;
         """
-        try:
-            response = requests.post(self.base_url, data={"data": overpass_query})
-            response.raise_for_status()
-            return self._convert_to_geojson(response.json())
-        except requests.exceptions.RequestException as exc:  # pragma: no cover
-            print(f"Error fetching refuge data: {exc}")
-            return None
+        return self._convert_to_geojson(_request('overpass', lambda: _session().post(
+            self.base_url, data={"data": overpass_query}, timeout=UPSTREAM_TIMEOUT
+        )))
 
     def _convert_to_geojson(self, osm_data: Dict[str, Any]) -> Dict[str, Any]:
         """Convert OSM data to GeoJSON format for refuge nodes."""
@@ -167,4 +506,17 @@ class RefugeService:
                     "properties": properties,
                 }
                 features.append(feature)
-        return {"type": "FeatureCollection", "features": features}
\ No newline at end of file
+        return {"type": "FeatureCollection", "features": features}
+
+
+# How the prefetch scheduler refetches the keys recorded above (Overpass areas are single tiles)
+register_prefetch(
+    "weather",
+    lambda args: lambda: WeatherService()._fetch_weather(*args[:3], WeatherQuery.from_args(*args[3:])),
+    WEATHER_TTL, WEATHER_STALE_TTL,
+)
+register_prefetch("trails", lambda args: lambda: TrailService()._fetch_trails_in_area(*args), OSM_TTL, OSM_STALE_TTL)
+register_prefetch("trail", lambda args: lambda: TrailService()._fetch_trail_by_id(*args), OSM_TTL, OSM_STALE_TTL)
+register_prefetch(
+    "refuges", lambda args: lambda: RefugeService()._fetch_refuges_in_area(*args), OSM_TTL, OSM_STALE_TTL
+)
@@ -0,0 +1,96 @@
+"""
+JSON provider used for all API responses.
+
+Flask's default provider runs every payload through ``json.dumps`` with
+``sort_keys`` and a Python-level ``default`` hook, which dominates CPU time
+for large ``to_dict`` lists and GeoJSON tracks. :class:`FastJSONProvider`
+encodes with ``orjson`` when it is installed and falls back to a compact
+stdlib encoder otherwise. Both encode ``datetime``/``date`` as ISO 8601 and
+``Decimal`` as a number, so models can return column values as they are.
+"""
+
+import dataclasses
+import datetime
+import decimal
+import json
+import uuid
+from typing import Any
+
+from flask.json.provider import JSONProvider
+
+try:  # pragma: no cover - optional dependency
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None
+
+
+def _default(value: Any) -> Any:
+    """Fallback for types neither encoder handles natively."""
+    if isinstance(value, (datetime.datetime, datetime.date, datetime.time)):
+        return value.isoformat()
+    if isinstance(value, decimal.Decimal):
+        return float(value)
+    if isinstance(value, uuid.UUID):
+        return str(value)
+    if dataclasses.is_dataclass(value) and not isinstance(value, type):
+        return dataclasses.asdict(value)
+    if hasattr(value, 'tolist'):  # numpy arrays and scalars
+        return value.tolist()
+    if hasattr(value, '__html__'):
+        return str(value.__html__())
+    raise TypeError(f'Object of type {type(value).__name__} is not JSON serializable')
+
+
+_stdlib_encoder = json.JSONEncoder(ensure_ascii=False, separators=(',', ':'), default=_default)
+
+
+def stdlib_dumps_bytes(obj: Any) -> bytes:
+    """Compact stdlib encoding, used when ``orjson`` is not installed."""
+    return _stdlib_encoder.encode(obj).encode('utf-8')
+
+
+if orjson is not None:
+    _ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+
+    def dumps_bytes(obj: Any) -> bytes:
+        return orjson.dumps(obj, default=_default, option=_ORJSON_OPTIONS)
+
+    _loads = orjson.loads
+else:  # pragma: no cover - exercised when orjson is absent
+    dumps_bytes = stdlib_dumps_bytes
+    _loads = json.loads
+
+
+def loads_bytes(data: bytes) -> Any:
+    """Decode UTF-8 JSON produced by :func:`dumps_bytes`."""
+    return _loads(data)
+
+
+class FastJSONProvider(JSONProvider):
+    """Compact JSON provider backed by ``orjson`` when available.
+
+    Output is never pretty-printed and keys keep their insertion order,
+    which ``to_dict`` already makes deterministic.
+    """
+
+    mimetype = 'application/json'
+
+    def dumps(self, obj: Any, **kwargs: Any) -> str:
+        if kwargs:
+            # Callers asking for specific json.dumps options get the stdlib encoder
+            kwargs.setdefault('default', _default)
+            return json.dumps(obj, **kwargs)
+        return dumps_bytes(obj).decode('utf-8')
+
+    def dumps_bytes(self, obj: Any) -> bytes:
+        """Encode ``obj`` straight to UTF-8 bytes, skipping the ``str`` round trip."""
+        return dumps_bytes(obj)
+
+    def loads(self, s: Any, **kwargs: Any) -> Any:
+        if kwargs:
+            return json.loads(s, **kwargs)
+        return _loads(s)
+
+    def response(self, *args: Any, **kwargs: Any) -> Any:
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(dumps_bytes(obj) + b'\n', mimetype=self.mimetype)
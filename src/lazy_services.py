@@ -0,0 +1,42 @@
+"""
+Lazily constructed service singletons.
+
+Blueprints used to build their service objects at import time, so every
+gunicorn worker paid for them (and for importing ``requests`` and friends)
+while booting. Factories decorated with :func:`lazy_service` run on first
+use instead; :func:`preload_services` builds them all up front, which the
+gunicorn master does with ``preload_app`` so workers share the objects
+copy-on-write. A lock makes sure concurrent first calls from several
+threads of a worker still build a service only once.
+"""
+
+import functools
+import threading
+from typing import Any, Callable, List, TypeVar
+
+T = TypeVar('T')
+
+_getters: List[Callable[[], Any]] = []
+
+
+def lazy_service(factory: Callable[[], T]) -> Callable[[], T]:
+    """Decorate a zero-argument factory so its result is built once and reused."""
+    lock = threading.Lock()
+    instance: List[T] = []
+
+    @functools.wraps(factory)
+    def getter() -> T:
+        if not instance:
+            with lock:
+                if not instance:
+                    instance.append(factory())
+        return instance[0]
+
+    _getters.append(getter)
+    return getter
+
+
+def preload_services() -> None:
+    """Build every registered service now (e.g. in the pre-fork master)."""
+    for getter in _getters:
+        getter()
@@ -4,41 +4,69 @@ Entry point for the MountainHub backend.
 This module configures the Flask application, initialises the SQLAlchemy
 database and registers all API blueprints. Running this script will
 bootstrap the app for local development. In production environments the
-``Procfile`` refers to ``src.main:app`` for Gunicorn.
+``Procfile`` refers to ``src.main:app`` for Gunicorn (settings in
+``gunicorn.conf.py``).
+
+Building the app does no database work: the schema is created by the
+``init-db`` command (``flask --app src.main init-db``), run once per deploy
+rather than in every worker.
 """
 
 import os
 import sys
 
-from flask import Flask, send_from_directory
+import click
+from flask import Flask
 from flask_cors import CORS
 
 # Ensure the package root is on the path for relative imports
 sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
 
+from .admission import init_admission  # noqa: E402
+from .compression import init_compression  # noqa: E402
+from .db_config import init_database  # noqa: E402
+from .json_provider import FastJSONProvider  # noqa: E402
+from .metrics import init_metrics  # noqa: E402
 from .models import db  # noqa: E402
+from .models.track import migrate_legacy_gpx_data  # noqa: E402
+from .models.types import upgrade_json_columns  # noqa: E402
+from .prefetch import prefetch_command  # noqa: E402
+from .query_inspector import init_query_inspector  # noqa: E402
+from .request_timing import init_request_timing  # noqa: E402
+from .route_planner import route_graph_command  # noqa: E402
 from .routes.user import user_bp  # noqa: E402
 from .routes.trail import trail_bp  # noqa: E402
 from .routes.equipment import equipment_bp  # noqa: E402
 from .routes.external import external_bp  # noqa: E402
 from .routes.trip_log import trip_log_bp  # noqa: E402
 from .routes.guide import guide_bp  # noqa: E402
+from .routes.planner import planner_bp  # noqa: E402
+from .static_assets import register_static_routes  # noqa: E402
 
 
 def create_app() -> Flask:
     """Application factory to create and configure the Flask app."""
     app = Flask(__name__, static_folder=os.path.join(os.path.dirname(__file__), 'static'))
     app.config['SECRET_KEY'] = os.getenv('SECRET_KEY', 'change-me')
-    # SQLite database file stored in ``src/database/app.db``
-    db_path = os.path.join(os.path.dirname(__file__), 'database')
-    os.makedirs(db_path, exist_ok=True)
-    app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{os.path.join(db_path, 'app.db')}"
-    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
-
-    # Initialise and create tables
-    db.init_app(app)
-    with app.app_context():
-        db.create_all()
+    # Compact JSON via orjson when installed; handles datetime/Decimal natively
+    app.json = FastJSONProvider(app)
+    # Bulk import: rows per executemany batch and rows per committed transaction
+    app.config['BULK_IMPORT_BATCH_SIZE'] = int(os.getenv('BULK_IMPORT_BATCH_SIZE', '1000'))
+    app.config['BULK_IMPORT_TRANSACTION_SIZE'] = int(os.getenv('BULK_IMPORT_TRANSACTION_SIZE', '10000'))
+
+    # Database from ``DATABASE_URL`` (SQLite file in ``src/database`` by default)
+    init_database(app)
+    app.cli.add_command(init_db_command)
+    app.cli.add_command(prefetch_command)
+    app.cli.add_command(route_graph_command)
+    # Server-Timing header and per-request log line (wall, DB and upstream time)
+    init_request_timing(app)
+    # Opt-in (QUERY_INSPECTOR_ENABLED): N+1 warnings, query budgets, slow-query EXPLAIN
+    init_query_inspector(app)
+    # Prometheus ``/metrics``: route latency, upstream calls, caches, DB pool
+    init_metrics(app)
+    # Per-client token buckets and a cap on concurrent expensive requests, shared by all workers
+    init_admission(app)
 
     # Register CORS and blueprints
     CORS(app)
@@ -48,26 +76,46 @@ def create_app() -> Flask:
     app.register_blueprint(external_bp, url_prefix='/api/external')
     app.register_blueprint(trip_log_bp, url_prefix='/api')
     app.register_blueprint(guide_bp, url_prefix='/api')
+    app.register_blueprint(planner_bp, url_prefix='/api')
+
+    # Compress JSON/GeoJSON responses for clients that accept it
+    init_compression(app)
 
-    # Serve static files (e.g., frontend build) if present
-    @app.route('/', defaults={'path': ''})
-    @app.route('/<path:path>')
-    def serve(path: str):
-        static_folder_path = app.static_folder
-        if static_folder_path and path and os.path.exists(os.path.join(static_folder_path, path)):
-            return send_from_directory(static_folder_path, path)
-        index_path = os.path.join(static_folder_path, 'index.html') if static_folder_path else None
-        if index_path and os.path.exists(index_path):
-            return send_from_directory(static_folder_path, 'index.html')
-        return "Static content not found", 404
+    # Serve static files (e.g., frontend build) if present, from a startup manifest
+    register_static_routes(app)
 
     return app
 
 
+@click.command('init-db')
+@click.option('--drop', is_flag=True, help='Drop all tables before creating them.')
+def init_db_command(drop: bool) -> None:
+    """Bring the database schema up to date and migrate legacy data.
+
+    Creates missing tables (with their indexes), converts PostgreSQL JSON
+    columns to JSONB and adds any missing GIN indexes on existing tables,
+    then moves old ``gpx_data`` tracks into the tracks table. Columns that
+    were added to a model after its table was created are not added here.
+    """
+    if drop:
+        db.drop_all()
+    db.create_all()
+    with db.engine.begin() as connection:
+        converted = upgrade_json_columns(connection, db.metadata)
+    if converted:
+        click.echo(f'Converted {converted} JSON columns to JSONB.')
+    migrated = migrate_legacy_gpx_data()
+    if migrated:
+        click.echo(f'Moved {migrated} trip log tracks from gpx_data into the tracks table.')
+    click.echo('Database schema is up to date.')
+
+
 # Create the app instance used by Gunicorn
 app = create_app()
 
 
 if __name__ == '__main__':
-    # Run in development mode
+    # Run in development mode, creating the schema on the local database
+    with app.app_context():
+        db.create_all()
     app.run(host='0.0.0.0', port=5000, debug=True)
@@ -0,0 +1,408 @@
+"""
+Prometheus-style metrics shared across gunicorn workers.
+
+Each process writes its samples into its own memory-mapped file under
+``METRICS_DIR``; an update is an in-place write of an 8-byte double, so
+recording costs about a microsecond and needs no locking between processes.
+``GET /metrics`` reads every process's file and sums the samples, so the
+scrape reflects all workers whichever one answers it.
+
+Counters and histograms live in ``values_<pid>.db`` files that are kept
+after a worker exits (totals must never go backwards). Gauges such as DB
+pool usage live in ``live_<pid>.db`` files that ``mark_process_dead``
+removes when gunicorn reaps the worker (see ``gunicorn.conf.py``).
+"""
+
+import glob
+import json
+import mmap
+import os
+import struct
+import tempfile
+import threading
+import time
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from flask import Flask, Response, g, request
+from sqlalchemy import event
+
+from .models import db
+
+# Latency buckets (seconds) for requests and upstream calls
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+_INITIAL_FILE_SIZE = 64 * 1024
+_HEADER = 8  # bytes used (int32) + padding
+
+
+def metrics_dir() -> str:
+    """Return the shared metrics directory, creating a temporary one if unset.
+
+    The path is stored in the environment so processes forked later (and
+    re-imports in the same process) agree on it.
+    """
+    path = os.environ.get('METRICS_DIR')
+    if not path:
+        path = os.environ['METRICS_DIR'] = tempfile.mkdtemp(prefix='mountainhub-metrics-')
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+class _MmapValues:
+    """Append-only ``key -> double`` store in a memory-mapped file.
+
+    Entries are ``int32 key length | key (padded to 8 bytes) | float64``,
+    preceded by a header holding the number of bytes in use.
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self._file = open(path, 'a+b')
+        if os.fstat(self._file.fileno()).st_size == 0:
+            self._file.truncate(_INITIAL_FILE_SIZE)
+        self._capacity = os.fstat(self._file.fileno()).st_size
+        self._mm = mmap.mmap(self._file.fileno(), self._capacity)
+        self._positions: Dict[str, int] = {}
+        self._used = struct.unpack_from('i', self._mm, 0)[0] or _HEADER
+        for key, _, position in _read_entries(self._mm, self._used):
+            self._positions[key] = position
+
+    def _position(self, key: str) -> int:
+        position = self._positions.get(key)
+        if position is None:
+            encoded = key.encode('utf-8')
+            padding = b' ' * (7 - (len(encoded) + 3) % 8)
+            entry = struct.pack('i', len(encoded)) + encoded + padding + struct.pack('d', 0.0)
+            while self._used + len(entry) > self._capacity:
+                self._grow()
+            self._mm[self._used:self._used + len(entry)] = entry
+            self._used += len(entry)
+            struct.pack_into('i', self._mm, 0, self._used)
+            position = self._positions[key] = self._used - 8
+        return position
+
+    def _grow(self) -> None:
+        self._capacity *= 2
+        self._mm.close()
+        self._file.truncate(self._capacity)
+        self._mm = mmap.mmap(self._file.fileno(), self._capacity)
+
+    def inc(self, key: str, amount: float) -> None:
+        position = self._position(key)
+        value = struct.unpack_from('d', self._mm, position)[0]
+        struct.pack_into('d', self._mm, position, value + amount)
+
+    def set(self, key: str, value: float) -> None:
+        struct.pack_into('d', self._mm, self._position(key), value)
+
+
+def _read_entries(buffer: Any, used: int) -> Iterator[Tuple[str, float, int]]:
+    position = _HEADER
+    while position < used:
+        length = struct.unpack_from('i', buffer, position)[0]
+        key_start = position + 4
+        key = bytes(buffer[key_start:key_start + length]).decode('utf-8')
+        position = key_start + length + (7 - (length + 3) % 8)
+        yield key, struct.unpack_from('d', buffer, position)[0], position
+        position += 8
+
+
+def _read_file(path: str) -> Iterator[Tuple[str, float]]:
+    with open(path, 'rb') as handle:
+        data = handle.read()
+    if len(data) < _HEADER:
+        return
+    used = struct.unpack_from('i', data, 0)[0]
+    for key, value, _ in _read_entries(data, used):
+        yield key, value
+
+
+class _ProcessFiles:
+    """The current process's value files, reopened after a fork."""
+
+    def __init__(self) -> None:
+        self._pid: Optional[int] = None
+        self._files: Dict[str, _MmapValues] = {}
+        self.lock = threading.Lock()
+
+    def get(self, kind: str) -> _MmapValues:
+        pid = os.getpid()
+        if pid != self._pid:
+            # Forked: never write into the parent's files
+            self._pid = pid
+            self._files = {}
+        values = self._files.get(kind)
+        if values is None:
+            values = self._files[kind] = _MmapValues(os.path.join(metrics_dir(), f'{kind}_{pid}.db'))
+        return values
+
+
+_process_files = _ProcessFiles()
+
+
+class _Metric:
+    kind = ''
+    file_kind = 'values'
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._keys: Dict[Tuple[str, Tuple[str, ...]], str] = {}
+
+    def _key(self, sample: str, labels: Dict[str, Any], extra: Tuple[Tuple[str, str], ...] = ()) -> str:
+        values = tuple(str(labels[name]) for name in self.labelnames)
+        cache_key = (sample, values + tuple(v for _, v in extra))
+        key = self._keys.get(cache_key)
+        if key is None:
+            pairs = list(zip(self.labelnames, values)) + list(extra)
+            key = self._keys[cache_key] = json.dumps([self.name, sample, pairs])
+        return key
+
+    def _update(self, key: str, amount: float, replace: bool = False) -> None:
+        with _process_files.lock:
+            values = _process_files.get(self.file_kind)
+            if replace:
+                values.set(key, amount)
+            else:
+                values.inc(key, amount)
+
+
+class Counter(_Metric):
+    kind = 'counter'
+
+    def inc(self, amount: float = 1.0, **labels: Any) -> None:
+        self._update(self._key(self.name + '_total', labels), amount)
+
+
+class Gauge(_Metric):
+    """Gauge summed over live processes (e.g. connections checked out)."""
+
+    kind = 'gauge'
+    file_kind = 'live'
+
+    def inc(self, amount: float = 1.0, **labels: Any) -> None:
+        self._update(self._key(self.name, labels), amount)
+
+    def dec(self, amount: float = 1.0, **labels: Any) -> None:
+        self._update(self._key(self.name, labels), -amount)
+
+    def set(self, value: float, **labels: Any) -> None:
+        self._update(self._key(self.name, labels), value, replace=True)
+
+
+class Histogram(_Metric):
+    kind = 'histogram'
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS) -> None:
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (float('inf'),)
+        self._bucket_labels = [(('le', _format_bound(b)),) for b in self.buckets]
+
+    def observe(self, value: float, **labels: Any) -> None:
+        index = next(i for i, bound in enumerate(self.buckets) if value <= bound)
+        # Buckets are stored non-cumulatively and summed up at exposition
+        bucket = self._key(self.name + '_bucket', labels, self._bucket_labels[index])
+        total = self._key(self.name + '_sum', labels)
+        count = self._key(self.name + '_count', labels)
+        with _process_files.lock:
+            values = _process_files.get(self.file_kind)
+            values.inc(bucket, 1.0)
+            values.inc(total, value)
+            values.inc(count, 1.0)
+
+
+def _format_bound(bound: float) -> str:
+    return '+Inf' if bound == float('inf') else repr(float(bound))
+
+
+class MetricsRegistry:
+    """Metric definitions plus exposition of the values from all processes."""
+
+    def __init__(self) -> None:
+        self._metrics: Dict[str, _Metric] = {}
+
+    def _register(self, metric: _Metric) -> Any:
+        return self._metrics.setdefault(metric.name, metric)
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self._register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def collect(self) -> Dict[Tuple[str, str, Tuple[Tuple[str, str], ...]], float]:
+        """Sum the samples of every process's files."""
+        totals: Dict[Tuple[str, str, Tuple[Tuple[str, str], ...]], float] = {}
+        for path in glob.glob(os.path.join(metrics_dir(), '*.db')):
+            try:
+                entries = list(_read_file(path))
+            except (OSError, struct.error, UnicodeDecodeError):
+                continue  # a file being created or removed
+            for key, value in entries:
+                name, sample, pairs = json.loads(key)
+                ident = (name, sample, tuple(tuple(p) for p in pairs))
+                totals[ident] = totals.get(ident, 0.0) + value
+        return totals
+
+    def exposition(self) -> str:
+        """Render all metrics in the Prometheus text format."""
+        samples: Dict[str, List[Tuple[str, Tuple[Tuple[str, str], ...], float]]] = {}
+        for (name, sample, pairs), value in self.collect().items():
+            samples.setdefault(name, []).append((sample, pairs, value))
+        lines = []
+        for name, metric in sorted(self._metrics.items()):
+            lines.append(f'# HELP {name} {metric.documentation}')
+            lines.append(f'# TYPE {name} {metric.kind}')
+            rows = samples.get(name, [])
+            if isinstance(metric, Histogram):
+                rows = _cumulative_buckets(metric, rows)
+            for sample, pairs, value in sorted(rows, key=_sample_order):
+                lines.append(f'{sample}{_format_labels(pairs)} {_format_value(value)}')
+        return '\n'.join(lines) + '\n'
+
+
+def _cumulative_buckets(metric: Histogram, rows: Iterable[Tuple[str, Any, float]]) -> List[Tuple[str, Any, float]]:
+    bounds = {_format_bound(b): i for i, b in enumerate(metric.buckets)}
+    series: Dict[Tuple[Tuple[str, str], ...], List[float]] = {}
+    out = []
+    for sample, pairs, value in rows:
+        if sample.endswith('_bucket'):
+            base = tuple(p for p in pairs if p[0] != 'le')
+            le = dict(pairs)['le']
+            series.setdefault(base, [0.0] * len(metric.buckets))[bounds[le]] += value
+        else:
+            out.append((sample, pairs, value))
+    for base, counts in series.items():
+        running = 0.0
+        for bound, count in zip(metric.buckets, counts):
+            running += count
+            out.append((metric.name + '_bucket', base + (('le', _format_bound(bound)),), running))
+    return out
+
+
+def _sample_order(row: Tuple[str, Any, float]) -> Tuple[Any, ...]:
+    sample, pairs, _ = row
+    labels = [p for p in pairs if p[0] != 'le']
+    le = dict(pairs).get('le')
+    bound = float('inf') if le == '+Inf' else float(le) if le else 0.0
+    return (labels, sample, bound)
+
+
+def _format_labels(pairs: Sequence[Sequence[str]]) -> str:
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{k}="{_escape(v)}"' for k, v in pairs) + '}'
+
+
+def _escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_value(value: float) -> str:
+    return str(int(value)) if value.is_integer() else repr(value)
+
+
+def mark_process_dead(pid: int) -> None:
+    """Drop the gauge file of an exited worker (called from gunicorn's ``child_exit``)."""
+    try:
+        os.remove(os.path.join(metrics_dir(), f'live_{pid}.db'))
+    except FileNotFoundError:
+        pass
+
+
+def clear_metrics_dir() -> None:
+    """Remove values left by a previous server run (called when gunicorn starts)."""
+    for path in glob.glob(os.path.join(metrics_dir(), '*.db')):
+        os.remove(path)
+
+
+REGISTRY = MetricsRegistry()
+
+http_request_duration = REGISTRY.histogram(
+    'http_request_duration_seconds', 'Request latency by endpoint.', ('endpoint', 'method', 'status')
+)
+upstream_request_duration = REGISTRY.histogram(
+    'upstream_request_duration_seconds', 'Latency of calls to external APIs.', ('upstream', 'outcome')
+)
+cache_requests = REGISTRY.counter(
+    'cache_requests', 'Cache lookups by cache and result (hit/miss/stale/fallback).', ('cache', 'result')
+)
+prefetch_requests = REGISTRY.counter(
+    'prefetch_requests', 'Upstream refreshes made by the prefetch scheduler.', ('kind', 'outcome')
+)
+circuit_breaker_state = REGISTRY.gauge(
+    'circuit_breaker_state', 'Processes whose breaker for an upstream is in each state.', ('upstream', 'state')
+)
+circuit_breaker_transitions = REGISTRY.counter(
+    'circuit_breaker_transitions', 'Circuit breaker state changes by upstream and new state.', ('upstream', 'state')
+)
+admission_rejections = REGISTRY.counter(
+    'admission_rejections', 'Requests refused by rate limits or the concurrency cap.', ('endpoint_class', 'reason')
+)
+db_pool_checked_out = REGISTRY.gauge(
+    'db_pool_checked_out', 'Database connections currently checked out of the pool.', ('bind',)
+)
+db_pool_connects = REGISTRY.counter(
+    'db_pool_connects', 'New database connections opened by the pool.', ('bind',)
+)
+
+
+def record_cache(cache: str, hits: int, misses: int) -> None:
+    """Count cache lookups; callers batch them to keep list endpoints cheap."""
+    if hits:
+        cache_requests.inc(hits, cache=cache, result='hit')
+    if misses:
+        cache_requests.inc(misses, cache=cache, result='miss')
+
+
+def _instrument_pool(engine: Any, bind: str) -> None:
+    @event.listens_for(engine, 'connect')
+    def on_connect(dbapi_connection: Any, connection_record: Any) -> None:
+        db_pool_connects.inc(bind=bind)
+
+    @event.listens_for(engine, 'checkout')
+    def on_checkout(dbapi_connection: Any, connection_record: Any, connection_proxy: Any) -> None:
+        db_pool_checked_out.inc(bind=bind)
+
+    @event.listens_for(engine, 'checkin')
+    def on_checkin(dbapi_connection: Any, connection_record: Any) -> None:
+        db_pool_checked_out.dec(bind=bind)
+
+
+def init_metrics(app: Flask) -> None:
+    """Record request latency and DB pool usage for ``app`` and serve ``/metrics``."""
+    app.config.setdefault('METRICS_ENABLED', os.getenv('METRICS_ENABLED', '1') == '1')
+    if not app.config['METRICS_ENABLED']:
+        return
+    metrics_dir()
+
+    with app.app_context():
+        for bind, engine in db.engines.items():
+            _instrument_pool(engine, bind or 'default')
+
+    @app.before_request
+    def start_request_clock() -> None:
+        g.metrics_start = time.perf_counter()
+
+    @app.after_request
+    def observe_request(response: Response) -> Response:
+        start = g.get('metrics_start')
+        if start is not None:
+            http_request_duration.observe(
+                time.perf_counter() - start,
+                endpoint=request.endpoint or 'unmatched',
+                method=request.method,
+                status=response.status_code,
+            )
+        return response
+
+    @app.route('/metrics')
+    def metrics() -> Response:
+        return Response(REGISTRY.exposition(), content_type=CONTENT_TYPE)
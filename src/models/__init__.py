@@ -13,6 +13,7 @@ from .trail import Trail  # noqa: F401
 from .equipment import Equipment  # noqa: F401
 from .refuge import Refuge  # noqa: F401
 from .trip_log import TripLog  # noqa: F401
+from .track import Track  # noqa: F401
 from .guide import Guide, UserGuideProgress  # noqa: F401
 
 __all__ = [
@@ -22,6 +23,7 @@ __all__ = [
     "Equipment",
     "Refuge",
     "TripLog",
+    "Track",
     "Guide",
     "UserGuideProgress",
 ]
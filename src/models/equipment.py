@@ -9,6 +9,7 @@ clothing or navigation and can be filtered by the API.
 from datetime import datetime
 import uuid
 
+from .types import gin_index, json_document
 from .user import db
 
 
@@ -30,7 +31,7 @@ class Equipment(db.Model):
     weight = db.Column(db.Integer)
     specifications = db.Column(db.JSON)
     price_range = db.Column(db.JSON)  # {"min": 100, "max": 200, "currency": "EUR"}
-    season_use = db.Column(db.JSON)  # ["spring", "summer", "autumn", "winter"]
+    season_use = db.Column(json_document())  # ["spring", "summer", "autumn", "winter"]
     skill_level_required = db.Column(
         db.Enum('beginner', 'intermediate', 'advanced', 'expert', name='skill_levels')
     )
@@ -39,6 +40,9 @@ class Equipment(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
+    # Serves ``?season=`` containment filters on PostgreSQL
+    __table_args__ = (gin_index('ix_equipment_season_use', 'season_use'),)
+
     def __repr__(self) -> str:  # pragma: no cover
         return f'<Equipment {self.name}>'
 
@@ -58,7 +62,7 @@ class Equipment(db.Model):
             'season_use': self.season_use,
             'skill_level_required': self.skill_level_required,
             'image_url': self.image_url,
-            'rating': float(self.rating) if self.rating else None,
-            'created_at': self.created_at.isoformat() if self.created_at else None,
-            'updated_at': self.updated_at.isoformat() if self.updated_at else None,
+            'rating': self.rating,
+            'created_at': self.created_at,
+            'updated_at': self.updated_at,
         }
@@ -12,9 +12,9 @@ This module defines two models:
 
 import datetime
 
-from sqlalchemy.dialects.postgresql import JSONB
-from sqlalchemy.ext.mutable import MutableDict
+from sqlalchemy.ext.mutable import MutableList
 
+from .types import json_document
 from .user import db
 
 
@@ -34,10 +34,10 @@ class Guide(db.Model):
     updated_at = db.Column(db.DateTime, default=datetime.datetime.utcnow, onupdate=datetime.datetime.utcnow)
 
     # Store steps as JSON
-    steps = db.Column(MutableDict.as_mutable(JSONB), default=list)
+    steps = db.Column(MutableList.as_mutable(json_document()), default=list)
 
     # Store recommended trails as JSON array of trail IDs
-    recommended_trails = db.Column(MutableDict.as_mutable(JSONB), default=list)
+    recommended_trails = db.Column(MutableList.as_mutable(json_document()), default=list)
 
     def to_dict(self) -> dict:
         """Convert guide to dictionary."""
@@ -51,8 +51,8 @@ class Guide(db.Model):
             'image_url': self.image_url,
             'steps': self.steps,
             'recommended_trails': self.recommended_trails,
-            'created_at': self.created_at.isoformat() if self.created_at else None,
-            'updated_at': self.updated_at.isoformat() if self.updated_at else None,
+            'created_at': self.created_at,
+            'updated_at': self.updated_at,
         }
 
 
@@ -64,7 +64,7 @@ class UserGuideProgress(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.String(36), db.ForeignKey('user.id'), nullable=False)
     guide_id = db.Column(db.Integer, db.ForeignKey('guides.id'), nullable=False)
-    completed_steps = db.Column(MutableDict.as_mutable(JSONB), default=list)
+    completed_steps = db.Column(MutableList.as_mutable(json_document()), default=list)
     completed = db.Column(db.Boolean, default=False)
     started_at = db.Column(db.DateTime, default=datetime.datetime.utcnow)
     completed_at = db.Column(db.DateTime)
@@ -82,6 +82,6 @@ class UserGuideProgress(db.Model):
             'completed_steps': self.completed_steps,
             'total_steps': len(self.guide.steps) if self.guide else 0,
             'completed': self.completed,
-            'started_at': self.started_at.isoformat() if self.started_at else None,
-            'completed_at': self.completed_at.isoformat() if self.completed_at else None,
+            'started_at': self.started_at,
+            'completed_at': self.completed_at,
         }
\ No newline at end of file
@@ -37,8 +37,8 @@ class Refuge(db.Model):
         return {
             'id': self.id,
             'name': self.name,
-            'latitude': float(self.latitude) if self.latitude else None,
-            'longitude': float(self.longitude) if self.longitude else None,
+            'latitude': self.latitude,
+            'longitude': self.longitude,
             'altitude_m': self.altitude_m,
             'capacity': self.capacity,
             'contact_info': self.contact_info,
@@ -48,7 +48,7 @@ class Refuge(db.Model):
             'cai_code': self.cai_code,
             'description': self.description,
             'image_url': self.image_url,
-            'rating': float(self.rating) if self.rating else None,
-            'created_at': self.created_at.isoformat() if self.created_at else None,
-            'updated_at': self.updated_at.isoformat() if self.updated_at else None,
+            'rating': self.rating,
+            'created_at': self.created_at,
+            'updated_at': self.updated_at,
         }
@@ -0,0 +1,32 @@
+"""
+Session that routes reads to a read replica.
+
+When a ``replica`` bind is configured (see ``src/db_config.py``), requests
+marked read-only run their queries against the replica engine, while
+flushes and every other request use the primary. Requests are marked in
+``flask.g`` by the hooks installed in ``init_database``; outside a request
+(CLI commands, scripts) everything goes to the primary.
+"""
+
+from typing import Any
+
+from flask import g, has_app_context
+from flask_sqlalchemy.session import Session
+
+REPLICA_BIND_KEY = 'replica'
+
+
+def reads_from_replica() -> bool:
+    """Whether the current request was marked to read from the replica."""
+    return has_app_context() and g.get('db_read_replica', False)
+
+
+class RoutingSession(Session):
+    """Flask-SQLAlchemy session choosing the replica engine for read-only requests."""
+
+    def get_bind(self, mapper: Any = None, clause: Any = None, bind: Any = None, **kwargs: Any) -> Any:
+        if bind is None and not self._flushing and reads_from_replica():
+            replica = self._db.engines.get(REPLICA_BIND_KEY)
+            if replica is not None:
+                return replica
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
@@ -0,0 +1,170 @@
+"""
+Track model definition.
+
+A ``Track`` stores the GPS points of a trip log or a trail in the compact binary
+format implemented by ``src.services.track_codec``. Keeping tracks in their
+own table means trip log listings never touch the point data, and the binary
+column is deferred so even loading a ``Track`` row only reads its summary
+columns until the points are actually needed.
+"""
+
+import json
+import logging
+from datetime import datetime
+from typing import Any, Mapping, Optional
+
+from sqlalchemy import exists, inspect, text
+from sqlalchemy.orm import column_property, deferred
+
+from ..services.track_codec import ENCODING, TrackData, decode_track, encode_track
+from ..services.track_metrics import compute_track_metrics
+from .trip_log import TripLog
+from .user import db
+
+logger = logging.getLogger('mountainhub.tracks')
+
+
+class Track(db.Model):
+    """Binary encoded GPS track attached to a trip log or a trail."""
+
+    __tablename__ = 'tracks'
+
+    id = db.Column(db.Integer, primary_key=True)
+    trip_log_id = db.Column(
+        db.Integer, db.ForeignKey('trip_logs.id', ondelete='CASCADE'), unique=True, index=True
+    )
+    trail_id = db.Column(
+        db.String(36), db.ForeignKey('trail.id', ondelete='CASCADE'), unique=True, index=True
+    )
+    encoding = db.Column(db.String(20), nullable=False, default=ENCODING)
+    point_count = db.Column(db.Integer, nullable=False, default=0)
+    has_elevation = db.Column(db.Boolean, default=False)
+    has_time = db.Column(db.Boolean, default=False)
+    # Bounding box, kept as plain columns so it can be queried without decoding
+    min_lat = db.Column(db.Float)
+    min_lon = db.Column(db.Float)
+    max_lat = db.Column(db.Float)
+    max_lon = db.Column(db.Float)
+    # Derived figures (distance, climb, moving time...) computed on write
+    stats = db.Column(db.JSON)
+    data = deferred(db.Column(db.LargeBinary, nullable=False))
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    trip_log = db.relationship(
+        'TripLog', backref=db.backref('track', uselist=False, cascade='all, delete-orphan')
+    )
+    trail = db.relationship(
+        'Trail', backref=db.backref('track', uselist=False, cascade='all, delete-orphan')
+    )
+
+    def __repr__(self) -> str:  # pragma: no cover
+        return f'<Track {self.id} ({self.point_count} points)>'
+
+    @classmethod
+    def from_track_data(cls, track: TrackData) -> 'Track':
+        """Create a new track row from decoded points."""
+        instance = cls()
+        instance.set_points(track)
+        return instance
+
+    def set_points(self, track: TrackData) -> None:
+        """Replace the stored points and refresh the summary columns and stats."""
+        self.data = encode_track(track)
+        self.encoding = ENCODING
+        self.point_count = len(track)
+        self.has_elevation = track.ele is not None
+        self.has_time = track.time is not None
+        bbox = track.bbox()
+        self.min_lon, self.min_lat, self.max_lon, self.max_lat = bbox or (None, None, None, None)
+        self.stats = compute_track_metrics(track)
+        self._decoded = track
+
+    @property
+    def points(self) -> TrackData:
+        """Decoded points, decoded once per instance on first access."""
+        decoded: Optional[TrackData] = getattr(self, '_decoded', None)
+        if decoded is None:
+            decoded = decode_track(self.data)
+            self._decoded = decoded
+        return decoded
+
+    def to_dict(self) -> dict:
+        """Serialize the track summary (without points) to a dictionary."""
+        bbox = None
+        if self.min_lat is not None:
+            bbox = [self.min_lon, self.min_lat, self.max_lon, self.max_lat]
+        return {
+            'id': self.id,
+            'encoding': self.encoding,
+            'point_count': self.point_count,
+            'has_elevation': self.has_elevation,
+            'has_time': self.has_time,
+            'bbox': bbox,
+            'stats': self.stats,
+            'updated_at': self.updated_at,
+        }
+
+
+def attach_track(owner: Any, track_data: TrackData, metrics: Mapping[str, str],
+                 overwrite_metrics: bool) -> Track:
+    """Store ``track_data`` as the track of ``owner`` (a trip log or a trail).
+
+    ``metrics`` maps track stats to the owner's columns, e.g.
+    ``{'elevation_gain': 'elevation_gain_m'}``; values already set on the
+    owner are kept unless ``overwrite_metrics`` is set. The owner's
+    ``updated_at`` is bumped, since its version must change with its track.
+    """
+    if owner.track is None:
+        owner.track = Track.from_track_data(track_data)
+    else:
+        owner.track.set_points(track_data)
+    for stat, column in metrics.items():
+        value = owner.track.stats.get(stat)
+        if value is not None and (overwrite_metrics or getattr(owner, column) is None):
+            setattr(owner, column, value)
+    owner.updated_at = datetime.utcnow()
+    return owner.track
+
+
+# Cheap existence flag used by trip log summaries, avoiding a per-row track load
+TripLog.has_gpx = column_property(
+    exists().where(Track.trip_log_id == TripLog.id).correlate_except(Track)
+)
+
+
+def migrate_legacy_gpx_data() -> int:
+    """Move tracks from the old ``trip_logs.gpx_data`` JSON column into ``tracks``.
+
+    Databases created before tracks had their own table still hold the
+    points in ``gpx_data``. Every log with such a payload and no track yet
+    gets one, and metrics the log lacks are filled from it; payloads that
+    cannot be read are logged and skipped. The column itself is left in
+    place. Returns the number of tracks created; safe to run repeatedly.
+    """
+    columns = {column['name'] for column in inspect(db.engine).get_columns(TripLog.__tablename__)}
+    if 'gpx_data' not in columns:
+        return 0
+    rows = db.session.execute(text(
+        'SELECT id, gpx_data FROM trip_logs WHERE gpx_data IS NOT NULL '
+        'AND NOT EXISTS (SELECT 1 FROM tracks WHERE tracks.trip_log_id = trip_logs.id)'
+    )).all()
+    migrated = 0
+    for log_id, payload in rows:
+        try:
+            if isinstance(payload, (str, bytes)):
+                payload = json.loads(payload)
+            if payload is None:
+                continue
+            track = Track.from_track_data(TrackData.from_gpx_data(payload))
+        except (ValueError, KeyError, TypeError) as exc:
+            logger.warning('Skipping unreadable gpx_data of trip log %s: %s', log_id, exc)
+            continue
+        log = db.session.get(TripLog, log_id)
+        log.track = track
+        for field in ('distance_km', 'elevation_gain', 'duration_hours'):
+            if getattr(log, field) is None and track.stats.get(field) is not None:
+                setattr(log, field, track.stats[field])
+        migrated += 1
+    db.session.commit()
+    return migrated
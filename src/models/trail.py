@@ -9,6 +9,7 @@ README for details on the API endpoints available for this model.
 from datetime import datetime
 import uuid
 
+from .types import gin_index, json_document
 from .user import db  # Import the shared db instance from the user model
 
 
@@ -39,7 +40,7 @@ class Trail(db.Model):
     region = db.Column(db.String(100))
     country = db.Column(db.String(100))
     # JSON fields
-    season_availability = db.Column(db.JSON)  # e.g., ["spring", "summer"]
+    season_availability = db.Column(json_document())  # e.g., ["spring", "summer"]
     coordinates = db.Column(db.JSON)  # start/end coordinates as dict
     # Foreign keys / relationships
     created_by = db.Column(db.String(36), db.ForeignKey('user.id'), nullable=True)
@@ -47,7 +48,10 @@ class Trail(db.Model):
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
     # Relationships
-    trip_logs = db.relationship('TripLog', backref='trail', lazy=True)
+    trip_logs = db.relationship('TripLog', back_populates='trail', lazy=True)
+
+    # Serves ``?season=`` containment filters on PostgreSQL
+    __table_args__ = (gin_index('ix_trail_season_availability', 'season_availability'),)
 
     def __repr__(self) -> str:  # pragma: no cover
         return f'<Trail {self.name}>'
@@ -73,6 +77,6 @@ class Trail(db.Model):
             'season_availability': self.season_availability,
             'coordinates': self.coordinates,
             'created_by': self.created_by,
-            'created_at': self.created_at.isoformat() if self.created_at else None,
-            'updated_at': self.updated_at.isoformat() if self.updated_at else None,
+            'created_at': self.created_at,
+            'updated_at': self.updated_at,
         }
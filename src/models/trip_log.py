@@ -3,15 +3,16 @@ Trip log model definition.
 
 Trip logs (diari di viaggio) record user outings including various details
 such as date, distance, elevation gain and optionally associated trail and
-equipment. They can contain photos, GPX data and notes. This model also
-provides a summary dictionary for lightweight listings.
+equipment. They can contain photos, notes and a GPS track, which is stored
+separately in the ``tracks`` table (see ``src/models/track.py``). This model
+also provides a summary dictionary for lightweight listings.
 """
 
 import datetime
 
-from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.ext.mutable import MutableDict, MutableList
 
+from .types import gin_index, json_document
 from .user import db
 
 
@@ -31,7 +32,7 @@ class TripLog(db.Model):
     difficulty = db.Column(db.String(20))  # easy, moderate, hard, extreme
     trail_id = db.Column(db.String(36), db.ForeignKey('trail.id'))
     location_name = db.Column(db.String(100))
-    location_coords = db.Column(MutableDict.as_mutable(JSONB))  # {lat: float, lng: float}
+    location_coords = db.Column(MutableDict.as_mutable(json_document()))  # {lat: float, lng: float}
     weather_conditions = db.Column(db.String(50))
     temperature = db.Column(db.Float)
     is_public = db.Column(db.Boolean, default=True)
@@ -39,35 +40,43 @@ class TripLog(db.Model):
     updated_at = db.Column(db.DateTime, default=datetime.datetime.utcnow, onupdate=datetime.datetime.utcnow)
 
     # Store photos as JSON array of URLs
-    photos = db.Column(MutableList.as_mutable(JSONB), default=list)
-
-    # Store GPX track data as JSON
-    gpx_data = db.Column(MutableDict.as_mutable(JSONB))
+    photos = db.Column(MutableList.as_mutable(json_document()), default=list)
 
     # Store waypoints as JSON array
-    waypoints = db.Column(MutableList.as_mutable(JSONB), default=list)
+    waypoints = db.Column(MutableList.as_mutable(json_document()), default=list)
 
     # Store notes as JSON array of {timestamp, text, location?}
-    notes = db.Column(MutableList.as_mutable(JSONB), default=list)
+    notes = db.Column(MutableList.as_mutable(json_document()), default=list)
 
     # Store equipment used as JSON array of equipment IDs
-    equipment_used = db.Column(MutableList.as_mutable(JSONB), default=list)
+    equipment_used = db.Column(MutableList.as_mutable(json_document()), default=list)
 
     # Store companions as JSON array of {name, user_id?}
-    companions = db.Column(MutableList.as_mutable(JSONB), default=list)
+    companions = db.Column(MutableList.as_mutable(json_document()), default=list)
 
     # Relationships
-    user = db.relationship('User', backref=db.backref('trip_logs', lazy=True))
-    trail = db.relationship('Trail', backref=db.backref('trip_logs', lazy=True))
-
-    def to_dict(self) -> dict:
-        """Serialize trip log to a detailed dictionary."""
-        return {
+    user = db.relationship('User', back_populates='trip_logs')
+    trail = db.relationship('Trail', back_populates='trip_logs')
+
+    # Serve the ``?equipment=`` and ``?companion=`` containment filters on PostgreSQL
+    __table_args__ = (
+        gin_index('ix_trip_logs_equipment_used', 'equipment_used'),
+        gin_index('ix_trip_logs_companions', 'companions'),
+    )
+
+    def to_dict(self, include_track: bool = False) -> dict:
+        """Serialize trip log to a detailed dictionary.
+
+        The GPS track is summarised by default; pass ``include_track`` to
+        embed the full track as a GeoJSON feature under ``gpx_data``.
+        """
+        track = self.track
+        data = {
             'id': self.id,
             'user_id': self.user_id,
             'title': self.title,
             'description': self.description,
-            'date': self.date.isoformat() if self.date else None,
+            'date': self.date,
             'duration_hours': self.duration_hours,
             'distance_km': self.distance_km,
             'elevation_gain': self.elevation_gain,
@@ -79,16 +88,19 @@ class TripLog(db.Model):
             'temperature': self.temperature,
             'is_public': self.is_public,
             'photos': self.photos,
-            'gpx_data': self.gpx_data,
+            'track': track.to_dict() if track else None,
             'waypoints': self.waypoints,
             'notes': self.notes,
             'equipment_used': self.equipment_used,
             'companions': self.companions,
-            'created_at': self.created_at.isoformat() if self.created_at else None,
-            'updated_at': self.updated_at.isoformat() if self.updated_at else None,
+            'created_at': self.created_at,
+            'updated_at': self.updated_at,
             'user': self.user.to_dict() if self.user else None,
             'trail': self.trail.to_dict() if self.trail else None,
         }
+        if include_track:
+            data['gpx_data'] = track.points.to_geojson() if track else None
+        return data
 
     def to_summary_dict(self) -> dict:
         """Serialize trip log to a summary dictionary (without heavy fields)."""
@@ -96,7 +108,7 @@ class TripLog(db.Model):
             'id': self.id,
             'user_id': self.user_id,
             'title': self.title,
-            'date': self.date.isoformat() if self.date else None,
+            'date': self.date,
             'duration_hours': self.duration_hours,
             'distance_km': self.distance_km,
             'elevation_gain': self.elevation_gain,
@@ -104,7 +116,7 @@ class TripLog(db.Model):
             'location_name': self.location_name,
             'weather_conditions': self.weather_conditions,
             'photo_count': len(self.photos) if self.photos else 0,
-            'has_gpx': self.gpx_data is not None,
-            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'has_gpx': bool(self.has_gpx),
+            'created_at': self.created_at,
             'user_name': self.user.username if self.user else None,
         }
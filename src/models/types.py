@@ -0,0 +1,111 @@
+"""
+Column types and SQL helpers shared by the models.
+
+JSON documents are stored as ``JSONB`` on PostgreSQL and as the generic
+``JSON`` type elsewhere (a ``TEXT`` column on SQLite), so the same models
+run against the production database and the SQLite files used in
+development and tests. :func:`json_array_contains` filters such columns
+in SQL on both backends, and :func:`gin_index` declares the PostgreSQL
+index that makes those filters index lookups.
+:func:`upgrade_json_columns` brings PostgreSQL databases created before
+either existed up to date, which ``create_all`` does not do for tables
+that are already there.
+"""
+
+from typing import Any
+
+from sqlalchemy import JSON, Boolean, Index, MetaData, and_, exists, func, inspect, text, type_coerce
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.engine import Connection
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.schema import CreateIndex
+from sqlalchemy.sql.expression import ColumnElement
+from sqlalchemy.types import TypeEngine
+
+
+def json_document() -> TypeEngine:
+    """Return a new portable JSON column type.
+
+    A fresh instance is needed per column: ``Mutable.as_mutable`` binds its
+    change tracking to the type *instance*, so sharing one between
+    ``MutableDict`` and ``MutableList`` columns would mix them up.
+    """
+    return JSON().with_variant(JSONB(), 'postgresql')
+
+
+def gin_index(name: str, column: str) -> Index:
+    """GIN index supporting ``@>`` on a JSONB column, created on PostgreSQL only."""
+    return Index(
+        name, column, postgresql_using='gin', postgresql_ops={column: 'jsonb_path_ops'}
+    ).ddl_if(dialect='postgresql')
+
+
+def upgrade_json_columns(connection: Connection, metadata: MetaData) -> int:
+    """Convert existing JSON columns to ``JSONB`` and add missing GIN indexes.
+
+    Only PostgreSQL is touched. Columns declared with :func:`json_document`
+    that an older schema created as ``json`` are altered in place, then
+    every :func:`gin_index` is created with ``IF NOT EXISTS``; run it after
+    ``create_all``. Returns the number of columns converted; safe to run
+    repeatedly.
+    """
+    dialect = connection.dialect
+    if dialect.name != 'postgresql':
+        return 0
+    inspector = inspect(connection)
+    existing = set(inspector.get_table_names())
+    converted = 0
+    for table in metadata.sorted_tables:
+        if table.name not in existing:
+            continue
+        current = {column['name']: column['type'] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name not in current or isinstance(current[column.name], JSONB):
+                continue
+            if isinstance(column.type.dialect_impl(dialect), JSONB):
+                name = dialect.identifier_preparer.quote(column.name)
+                connection.execute(text(
+                    f'ALTER TABLE {dialect.identifier_preparer.format_table(table)} '
+                    f'ALTER COLUMN {name} TYPE jsonb USING {name}::jsonb'
+                ))
+                converted += 1
+        for index in table.indexes:
+            if index.dialect_options['postgresql']['using'] == 'gin':
+                connection.execute(CreateIndex(index, if_not_exists=True))
+    return converted
+
+
+class json_array_contains(ColumnElement):
+    """``column`` is a JSON array with an element matching ``value``.
+
+    ``value`` is a scalar compared for equality, or a dict whose items must
+    all be present in an object element (e.g. ``{'user_id': ...}``).
+    Compiles to JSONB containment (``column @> '[value]'``) on PostgreSQL,
+    which a :func:`gin_index` serves, and to an ``EXISTS`` over
+    ``json_each`` on SQLite.
+    """
+
+    type = Boolean()
+    inherit_cache = False
+
+    def __init__(self, column: Any, value: Any) -> None:
+        self.column = column
+        self.value = value
+
+
+@compiles(json_array_contains, 'postgresql')
+def _contains_postgresql(element: json_array_contains, compiler: Any, **kw: Any) -> str:
+    return compiler.process(type_coerce(element.column, JSONB).contains([element.value]), **kw)
+
+
+@compiles(json_array_contains)
+def _contains_json_each(element: json_array_contains, compiler: Any, **kw: Any) -> str:
+    each = func.json_each(element.column).table_valued('value', 'type')
+    if isinstance(element.value, dict):
+        condition = and_(
+            each.c.type == 'object',
+            *[func.json_extract(each.c.value, f'$.{key}') == v for key, v in element.value.items()],
+        )
+    else:
+        condition = each.c.value == element.value
+    return compiler.process(exists().where(condition), **kw)
@@ -12,9 +12,12 @@ from flask_sqlalchemy import SQLAlchemy
 from datetime import datetime
 import uuid
 
+from .routing import RoutingSession
+
 # Instantiate the SQLAlchemy object. This should be initialised with
-# ``app.config`` in ``src/main.py`` via ``db.init_app(app)``.
-db = SQLAlchemy()
+# ``app.config`` in ``src/main.py`` via ``db.init_app(app)``. The routing
+# session sends read-only requests to the ``replica`` bind when configured.
+db = SQLAlchemy(session_options={'class_': RoutingSession})
 
 
 class User(db.Model):
@@ -34,7 +37,7 @@ class User(db.Model):
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
     # Relationships
-    trip_logs = db.relationship('TripLog', backref='user', lazy=True)
+    trip_logs = db.relationship('TripLog', back_populates='user', lazy=True)
 
     def __repr__(self) -> str:  # pragma: no cover - simple repr
         return f'<User {self.username}>'
@@ -48,6 +51,6 @@ class User(db.Model):
             'skill_level': self.skill_level,
             'profile_data': self.profile_data,
             'preferences': self.preferences,
-            'created_at': self.created_at.isoformat() if self.created_at else None,
-            'updated_at': self.updated_at.isoformat() if self.updated_at else None,
+            'created_at': self.created_at,
+            'updated_at': self.updated_at,
         }
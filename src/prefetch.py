@@ -0,0 +1,157 @@
+"""
+Background refresh of popular upstream data.
+
+Every ``/api/external`` request counts a hit for its cache keys (a 0.01°
+weather tile, or the 0.05° Overpass tiles an area overlaps) in the shared
+upstream cache, with counts halving every few hours.
+:class:`PrefetchScheduler` periodically takes the most requested keys and
+refetches those that are missing, stale or about to expire, so peak-hour
+traffic for popular areas is served from a warm cache. Upstream calls are limited to
+``PREFETCH_BUDGET_PER_MINUTE``.
+
+Each gunicorn worker runs a scheduler thread (started in
+``gunicorn.conf.py`` when ``PREFETCH_ENABLED=1``); a lease in the cache
+database makes sure only one of them runs each tick. Outside gunicorn,
+``flask --app src.main prefetch`` runs the same loop (``--once`` for a
+single pass, e.g. from cron).
+"""
+
+import logging
+import os
+import random
+import threading
+import time
+from typing import Any, Callable, Dict, List, NamedTuple, Optional
+
+import click
+
+from .circuit_breaker import CircuitOpenError
+from .metrics import prefetch_requests
+from .upstream_cache import UpstreamCache, upstream_cache
+
+logger = logging.getLogger('mountainhub.prefetch')
+
+SCHEDULER_LEASE = 'prefetch:scheduler'
+# Demand below this score is forgotten
+PRUNE_SCORE = 0.05
+
+
+class PrefetchKind(NamedTuple):
+    # Builds the loader for a key from the arguments recorded with its demand
+    make_loader: Callable[[List[Any]], Callable[[], Any]]
+    ttl: float
+    stale_ttl: float
+
+
+_KINDS: Dict[str, PrefetchKind] = {}
+
+
+def register_prefetch(kind: str, make_loader: Callable[[List[Any]], Callable[[], Any]],
+                      ttl: float, stale_ttl: float) -> None:
+    """Declare how keys recorded with demand ``kind`` are refetched and cached."""
+    _KINDS[kind] = PrefetchKind(make_loader, ttl, stale_ttl)
+
+
+class PrefetchScheduler:
+    """Refresh the most requested upstream keys before they expire."""
+
+    def __init__(self, cache: UpstreamCache, interval: float = 60, budget_per_minute: int = 30,
+                 min_score: float = 1.5, top: int = 200, lookahead: Optional[float] = None) -> None:
+        self.cache = cache
+        self.interval = interval
+        self.budget_per_minute = budget_per_minute
+        self.min_score = min_score
+        self.top = top
+        # Refresh entries that stop being fresh before the tick after next
+        self.lookahead = 2 * interval if lookahead is None else lookahead
+        self._stop = threading.Event()
+
+    def run_once(self) -> int:
+        """Run one pass and return the number of upstream requests made."""
+        from . import external_apis  # noqa: F401 - registers the prefetch kinds
+
+        budget = max(1, int(self.budget_per_minute * self.interval / 60))
+        made = 0
+        now = time.time()
+        for key, kind, args, score in self.cache.popular(self.top, self.min_score):
+            if made >= budget:
+                break
+            spec = _KINDS.get(kind)
+            fresh_until = self.cache.fresh_until(key)
+            if spec is None or (fresh_until is not None and fresh_until - now > self.lookahead):
+                continue
+            if not self.cache.acquire_lease(key):
+                continue  # a request is fetching it right now
+            outcome = 'ok'
+            try:
+                made += 1
+                value = spec.make_loader(args)()
+                if value is not None:
+                    self.cache.set(key, value, spec.ttl, spec.stale_ttl)
+            except CircuitOpenError:
+                made -= 1  # failed fast without calling the upstream
+                outcome = 'circuit_open'
+            except Exception as exc:
+                outcome = 'error'
+                logger.warning('Prefetch of %s failed: %s', key, exc)
+            finally:
+                self.cache.release_lease(key)
+            prefetch_requests.inc(kind=kind, outcome=outcome)
+        self.cache.prune_demand(PRUNE_SCORE)
+        return made
+
+    def tick(self) -> None:
+        """Run a pass unless another process already ran one this interval."""
+        # The lease is left to expire so the other workers skip this interval
+        if self.cache.acquire_lease(SCHEDULER_LEASE, self.interval * 0.9):
+            try:
+                made = self.run_once()
+                if made:
+                    logger.info('Prefetched %d upstream responses', made)
+            except Exception:
+                logger.exception('Prefetch pass failed')
+
+    def run_forever(self) -> None:
+        # Jitter so the workers' threads do not all wake at the same moment
+        while not self._stop.wait(self.interval * random.uniform(0.9, 1.1)):
+            self.tick()
+
+    def stop(self) -> None:
+        self._stop.set()
+
+
+def scheduler_from_env() -> Optional[PrefetchScheduler]:
+    """A scheduler configured from ``PREFETCH_*`` variables, or ``None`` without a cache."""
+    cache = upstream_cache()
+    if cache is None:
+        return None
+    return PrefetchScheduler(
+        cache,
+        interval=float(os.getenv('PREFETCH_INTERVAL_SECONDS', '60')),
+        budget_per_minute=int(os.getenv('PREFETCH_BUDGET_PER_MINUTE', '30')),
+        min_score=float(os.getenv('PREFETCH_MIN_SCORE', '1.5')),
+        top=int(os.getenv('PREFETCH_TOP', '200')),
+    )
+
+
+def start_prefetch_thread() -> Optional[PrefetchScheduler]:
+    """Start the scheduler in a daemon thread when ``PREFETCH_ENABLED=1``."""
+    if os.getenv('PREFETCH_ENABLED', '0') != '1':
+        return None
+    scheduler = scheduler_from_env()
+    if scheduler is not None:
+        threading.Thread(target=scheduler.run_forever, name='prefetch', daemon=True).start()
+    return scheduler
+
+
+@click.command('prefetch')
+@click.option('--once', is_flag=True, help='Run a single pass and exit.')
+def prefetch_command(once: bool) -> None:
+    """Refresh cached upstream data for the most requested areas."""
+    scheduler = scheduler_from_env()
+    if scheduler is None:
+        raise click.ClickException('The upstream cache is disabled (UPSTREAM_CACHE_ENABLED=0).')
+    if once:
+        click.echo(f'{scheduler.run_once()} upstream requests made.')
+        return
+    scheduler.run_forever()
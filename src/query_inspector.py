@@ -0,0 +1,184 @@
+"""
+Opt-in SQL inspection for development and tests.
+
+With ``QUERY_INSPECTOR_ENABLED`` every statement a request executes is
+recorded, and at the end of the request:
+
+* statements executed ``QUERY_N_PLUS_ONE_THRESHOLD`` or more times with only
+  their parameters changing are reported as a likely N+1 pattern (usually a
+  lazy relationship touched inside a loop);
+* the number of queries is checked against the route's budget, set with the
+  :func:`query_budget` decorator or globally with ``QUERY_BUDGET``.
+
+Statements slower than ``SLOW_QUERY_MS`` are logged as they finish, together
+with the database's ``EXPLAIN`` output. Findings go to the
+``mountainhub.queries`` logger; with ``QUERY_INSPECTOR_RAISE`` (meant for
+tests) N+1 patterns and exceeded budgets raise :class:`QueryProblem`
+instead, failing the request (with ``TESTING`` set the exception reaches the
+test client).
+"""
+
+import contextlib
+import logging
+import os
+from collections import Counter
+from contextvars import ContextVar
+from time import perf_counter
+from typing import Any, Callable, Iterator, List, Optional
+
+from flask import Flask, Response, current_app, g, has_app_context, request
+from sqlalchemy import event
+
+from .models import db
+
+logger = logging.getLogger('mountainhub.queries')
+
+
+class QueryProblem(AssertionError):
+    """Raised in strict mode for an N+1 pattern or an exceeded query budget."""
+
+
+class QueryLog:
+    """Statements executed in one request (or one :func:`capture_queries` block)."""
+
+    __slots__ = ('statements', '_start')
+
+    def __init__(self) -> None:
+        self.statements: List[str] = []
+        self._start = 0.0
+
+    def __len__(self) -> int:
+        return len(self.statements)
+
+    def repeated(self, threshold: int) -> List[tuple]:
+        """``(statement, count)`` pairs executed at least ``threshold`` times."""
+        counts = Counter(self.statements)
+        return [(sql, n) for sql, n in counts.most_common() if n >= threshold]
+
+
+_current: ContextVar[Optional[QueryLog]] = ContextVar('query_log', default=None)
+
+
+def query_budget(max_queries: int) -> Callable:
+    """Declare the maximum number of queries a view may run."""
+    def decorator(view: Callable) -> Callable:
+        view.query_budget = max_queries
+        return view
+    return decorator
+
+
+@contextlib.contextmanager
+def capture_queries() -> Iterator[QueryLog]:
+    """Record the statements executed inside the block (e.g. in a test)."""
+    log = QueryLog()
+    token = _current.set(log)
+    try:
+        yield log
+    finally:
+        _current.reset(token)
+
+
+def _before_cursor_execute(conn: Any, cursor: Any, statement: str, *args: Any) -> None:
+    log = _current.get()
+    if log is not None:
+        log._start = perf_counter()
+
+
+def _after_cursor_execute(conn: Any, cursor: Any, statement: str, parameters: Any,
+                          context: Any, executemany: bool) -> None:
+    log = _current.get()
+    if log is None:
+        return
+    log.statements.append(statement)
+    elapsed = perf_counter() - log._start
+    threshold = _slow_query_seconds()
+    if threshold is not None and elapsed >= threshold:
+        plan = None if executemany else _explain(conn, statement, parameters)
+        logger.warning(
+            'Slow query (%.1f ms) in %s:\n%s\nparameters: %r\nplan:\n%s',
+            elapsed * 1000, _where(), statement, parameters, plan or '(not available)',
+        )
+
+
+def _slow_query_seconds() -> Optional[float]:
+    """The current app's ``SLOW_QUERY_MS`` in seconds, ``None`` where inspection is off."""
+    if not has_app_context() or not current_app.config.get('QUERY_INSPECTOR_ENABLED'):
+        return None
+    return current_app.config['SLOW_QUERY_MS'] / 1000
+
+
+def _explain(conn: Any, statement: str, parameters: Any) -> Optional[str]:
+    """Return the query plan, using a raw cursor so no events fire again."""
+    if not statement.lstrip().upper().startswith(('SELECT', 'WITH')):
+        return None
+    prefix = 'EXPLAIN QUERY PLAN ' if conn.dialect.name == 'sqlite' else 'EXPLAIN '
+    cursor = conn.connection.dbapi_connection.cursor()
+    try:
+        cursor.execute(prefix + statement, parameters)
+        return '\n'.join(' | '.join(str(col) for col in row) for row in cursor.fetchall())
+    except Exception as exc:  # pragma: no cover - depends on the statement and driver
+        return f'EXPLAIN failed: {exc}'
+    finally:
+        cursor.close()
+
+
+def _where() -> str:
+    try:
+        return f'{request.method} {request.path} ({request.endpoint})'
+    except RuntimeError:
+        return 'no request'
+
+
+def _report(log: QueryLog) -> None:
+    config = current_app.config
+    problems = []
+    for statement, count in log.repeated(config['QUERY_N_PLUS_ONE_THRESHOLD']):
+        problems.append(f'Possible N+1: statement executed {count} times in {_where()}:\n{statement}')
+    view = current_app.view_functions.get(request.endpoint)
+    budget = getattr(view, 'query_budget', None)
+    if budget is None:
+        budget = config['QUERY_BUDGET']
+    if budget is not None and len(log) > budget:
+        problems.append(f'Query budget exceeded in {_where()}: {len(log)} queries (budget {budget})')
+    for problem in problems:
+        logger.warning(problem)
+    if problems and config['QUERY_INSPECTOR_RAISE']:
+        raise QueryProblem('\n\n'.join(problems))
+
+
+def init_query_inspector(app: Flask) -> None:
+    """Install query inspection on ``app`` when ``QUERY_INSPECTOR_ENABLED`` is set."""
+    app.config.setdefault('QUERY_INSPECTOR_ENABLED', os.getenv('QUERY_INSPECTOR_ENABLED', '0') == '1')
+    app.config.setdefault('QUERY_INSPECTOR_RAISE', os.getenv('QUERY_INSPECTOR_RAISE', '0') == '1')
+    app.config.setdefault('QUERY_N_PLUS_ONE_THRESHOLD', int(os.getenv('QUERY_N_PLUS_ONE_THRESHOLD', '3')))
+    app.config.setdefault('QUERY_BUDGET', int(os.getenv('QUERY_BUDGET', '0')) or None)
+    app.config.setdefault('SLOW_QUERY_MS', float(os.getenv('SLOW_QUERY_MS', '100')))
+    if not app.config['QUERY_INSPECTOR_ENABLED']:
+        return
+
+    with app.app_context():
+        for engine in db.engines.values():
+            if not event.contains(engine, 'before_cursor_execute', _before_cursor_execute):
+                event.listen(engine, 'before_cursor_execute', _before_cursor_execute)
+                event.listen(engine, 'after_cursor_execute', _after_cursor_execute)
+
+    # A request inside a ``capture_queries`` block also adds its statements to the block's log
+    @app.before_request
+    def start_query_log() -> None:
+        g.outer_query_log = _current.get()
+        _current.set(QueryLog())
+
+    @app.after_request
+    def check_query_log(response: Response) -> Response:
+        log = _current.get()
+        if log is not None:
+            outer = g.get('outer_query_log')
+            _current.set(outer)
+            if outer is not None:
+                outer.statements.extend(log.statements)
+            _report(log)
+        return response
+
+    @app.teardown_request
+    def drop_query_log(exc: Optional[BaseException]) -> None:
+        _current.set(g.get('outer_query_log'))
@@ -0,0 +1,148 @@
+"""
+Per-request timing: wall time, database time and upstream API time.
+
+``init_request_timing`` starts a :class:`RequestTimings` for every request
+and attaches SQLAlchemy cursor events to the app's engines, so each query's
+duration and count is added to the current request. Calls to third-party
+APIs are wrapped in :func:`track_upstream`. When the response is ready the
+figures are sent back in a ``Server-Timing`` header (visible in browser dev
+tools) and written as one JSON log line on the ``mountainhub.timing``
+logger.
+
+The current request's timings live in a ``ContextVar`` rather than
+``flask.g`` so the per-query hooks stay a few hundred nanoseconds.
+"""
+
+import contextlib
+import json
+import logging
+import os
+import sys
+from contextvars import ContextVar
+from time import perf_counter
+from typing import Any, Dict, Iterator, Optional
+
+from flask import Flask, Response, request
+from sqlalchemy import event
+
+from .metrics import upstream_request_duration
+from .models import db
+
+logger = logging.getLogger('mountainhub.timing')
+
+
+class RequestTimings:
+    """Accumulated timings of the request being handled."""
+
+    __slots__ = ('start', 'db_time', 'db_queries', 'upstream', '_query_start')
+
+    def __init__(self) -> None:
+        self.start = perf_counter()
+        self.db_time = 0.0
+        self.db_queries = 0
+        self.upstream: Dict[str, float] = {}
+        self._query_start = 0.0
+
+    def elapsed(self) -> float:
+        return perf_counter() - self.start
+
+
+_current: ContextVar[Optional[RequestTimings]] = ContextVar('request_timings', default=None)
+
+
+def current_timings() -> Optional[RequestTimings]:
+    """Return the timings of the request being handled, if any."""
+    return _current.get()
+
+
+@contextlib.contextmanager
+def track_upstream(name: str) -> Iterator[None]:
+    """Add the time spent in the block to the request's ``name`` upstream.
+
+    The call is also recorded in the ``upstream_request_duration_seconds``
+    metric, with ``outcome="error"`` when the block raises.
+    """
+    timings = _current.get()
+    start = perf_counter()
+    outcome = 'error'
+    try:
+        yield
+        outcome = 'ok'
+    finally:
+        elapsed = perf_counter() - start
+        if timings is not None:
+            timings.upstream[name] = timings.upstream.get(name, 0.0) + elapsed
+        upstream_request_duration.observe(elapsed, upstream=name, outcome=outcome)
+
+
+def _before_cursor_execute(conn: Any, cursor: Any, statement: str, *args: Any) -> None:
+    timings = _current.get()
+    if timings is not None:
+        timings._query_start = perf_counter()
+
+
+def _after_cursor_execute(conn: Any, cursor: Any, statement: str, *args: Any) -> None:
+    timings = _current.get()
+    if timings is not None:
+        timings.db_time += perf_counter() - timings._query_start
+        timings.db_queries += 1
+
+
+def server_timing_header(timings: RequestTimings, total: float) -> str:
+    """Format ``timings`` as a ``Server-Timing`` header value (durations in ms)."""
+    parts = [f'total;dur={total * 1000:.2f}']
+    if timings.db_queries:
+        noun = 'query' if timings.db_queries == 1 else 'queries'
+        parts.append(f'db;dur={timings.db_time * 1000:.2f};desc="{timings.db_queries} {noun}"')
+    for name, seconds in timings.upstream.items():
+        parts.append(f'ext-{name};dur={seconds * 1000:.2f}')
+    return ', '.join(parts)
+
+
+def init_request_timing(app: Flask) -> None:
+    """Register timing hooks on ``app`` and on its database engines."""
+    app.config.setdefault('REQUEST_TIMING_ENABLED', os.getenv('REQUEST_TIMING_ENABLED', '1') == '1')
+    app.config.setdefault('REQUEST_TIMING_LOG', os.getenv('REQUEST_TIMING_LOG', '1') == '1')
+    if not app.config['REQUEST_TIMING_ENABLED']:
+        return
+    if app.config['REQUEST_TIMING_LOG'] and not logger.handlers:
+        handler = logging.StreamHandler(sys.stderr)
+        handler.setFormatter(logging.Formatter('%(message)s'))
+        logger.addHandler(handler)
+        logger.setLevel(logging.INFO)
+        logger.propagate = False
+    log_requests = app.config['REQUEST_TIMING_LOG']
+
+    with app.app_context():
+        for engine in db.engines.values():
+            if not event.contains(engine, 'before_cursor_execute', _before_cursor_execute):
+                event.listen(engine, 'before_cursor_execute', _before_cursor_execute)
+                event.listen(engine, 'after_cursor_execute', _after_cursor_execute)
+
+    @app.before_request
+    def start_timing() -> None:
+        _current.set(RequestTimings())
+
+    @app.after_request
+    def report_timing(response: Response) -> Response:
+        timings = _current.get()
+        if timings is None:
+            return response
+        total = timings.elapsed()
+        response.headers['Server-Timing'] = server_timing_header(timings, total)
+        if log_requests and logger.isEnabledFor(logging.INFO):
+            logger.info(json.dumps({
+                'method': request.method,
+                'path': request.path,
+                'endpoint': request.endpoint,
+                'status': response.status_code,
+                'total_ms': round(total * 1000, 2),
+                'db_ms': round(timings.db_time * 1000, 2),
+                'db_queries': timings.db_queries,
+                'upstream_ms': {k: round(v * 1000, 2) for k, v in timings.upstream.items()},
+            }))
+        return response
+
+    @app.teardown_request
+    def stop_timing(exc: Optional[BaseException]) -> None:
+        _current.set(None)
@@ -0,0 +1,190 @@
+"""
+Route planning over the local trails and the cached Overpass ways.
+
+The graph (``src/services/route_graph.py``) is built from two sources:
+
+* the tracks of local ``Trail`` rows, with ``difficulty`` mapped to an SAC
+  grade and elevations from the track;
+* the OSM ways in the shared upstream cache (``src/upstream_cache.py``),
+  i.e. every trail area and way the app has fetched from Overpass, with
+  their ``sac_scale`` tag. Overpass gives no elevations, so climbs only
+  count where a way meets a local track.
+
+Building takes seconds for a large region, so the graph is saved to
+``ROUTE_GRAPH_PATH`` and reloaded from there. The file records a
+fingerprint of its sources (trail count and newest ``updated_at``, and a
+hash of the cached Overpass entries' contents, so a cache refresh that
+brings back the same ways keeps the graph). A worker checks it against
+the sources at most every ``ROUTE_GRAPH_CHECK_SECONDS`` and rebuilds when
+they changed; an ``flock`` makes one worker build while the others wait
+and then load its file. ``flask --app src.main route-graph`` builds the
+graph ahead of the first request, e.g. after deploying.
+"""
+
+import contextlib
+import fcntl
+import hashlib
+import itertools
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from typing import Iterator, List, Optional, Tuple
+
+import click
+
+from .models import Track, Trail, db
+from .services.route_graph import (
+    FORMAT_VERSION, Coordinate, GraphBuilder, RouteGraph, sac_grade,
+)
+from .services.track_codec import decode_track
+from .upstream_cache import upstream_cache
+
+logger = logging.getLogger('mountainhub.routing')
+
+# Cache key prefixes of Overpass results holding trail ways (see ``TrailService``)
+OVERPASS_WAY_PREFIXES = ('overpass:trails:', 'overpass:way:', 'overpass:relation:')
+# SAC grade assumed for local trails, by ``Trail.difficulty``
+DIFFICULTY_GRADES = {'easy': 1, 'moderate': 2, 'hard': 3, 'extreme': 5}
+
+
+def graph_path() -> str:
+    return os.getenv(
+        'ROUTE_GRAPH_PATH', os.path.join(tempfile.gettempdir(), 'mountainhub-route-graph', 'graph.bin')
+    )
+
+
+def source_fingerprint() -> str:
+    """Changes whenever a trail track or a cached Overpass way is added, changed or removed."""
+    trails = db.session.query(
+        db.func.count(Track.id), db.func.max(Track.updated_at), db.func.max(Trail.updated_at)
+    ).join(Trail, Track.trail_id == Trail.id).one()
+    cache = upstream_cache()
+    ways = [cache.prefix_digest(prefix) for prefix in OVERPASS_WAY_PREFIXES] if cache is not None else []
+    parts = [FORMAT_VERSION, list(trails), ways]
+    return hashlib.sha1(json.dumps(parts, default=str).encode()).hexdigest()
+
+
+def local_ways() -> Iterator[Tuple[List[Coordinate], int, dict]]:
+    """``(coordinates, grade, info)`` for every trail with a track."""
+    rows = db.session.query(Trail.id, Trail.name, Trail.difficulty, Track.data).join(
+        Track, Track.trail_id == Trail.id
+    )
+    for trail_id, name, difficulty, data in rows.yield_per(100):
+        track = decode_track(data)
+        elevations = track.ele if track.ele is not None else [None] * len(track)
+        yield (
+            list(zip(track.lat, track.lon, elevations)),
+            DIFFICULTY_GRADES.get(difficulty, 0),
+            {'source': 'trail', 'id': trail_id, 'name': name},
+        )
+
+
+def cached_osm_ways() -> Iterator[Tuple[List[Coordinate], int, dict]]:
+    """``(coordinates, grade, info)`` for every OSM way in the upstream cache, once each."""
+    cache = upstream_cache()
+    if cache is None:
+        return
+    seen = set()
+    for prefix in OVERPASS_WAY_PREFIXES:
+        for _, collection in cache.scan(prefix):
+            for feature in (collection or {}).get('features', ()):
+                properties = feature.get('properties') or {}
+                geometry = feature.get('geometry') or {}
+                if geometry.get('type') != 'LineString' or properties.get('id') in seen:
+                    continue
+                seen.add(properties.get('id'))
+                yield (
+                    [(lat, lon, None) for lon, lat, *_ in geometry.get('coordinates', ())],
+                    sac_grade(properties.get('sac_scale')),
+                    {'source': 'osm', 'id': properties.get('id'), 'name': properties.get('name')},
+                )
+
+
+def build_graph(fingerprint: str = '') -> RouteGraph:
+    """Build the graph from the local trails and the cached OSM ways."""
+    started = time.perf_counter()
+    builder = GraphBuilder()
+    for coordinates, grade, info in itertools.chain(local_ways(), cached_osm_ways()):
+        builder.add_way(coordinates, grade, **info)
+    graph = builder.build(fingerprint)
+    logger.info('Built route graph: %d nodes, %d edges from %d ways in %.1f s',
+                graph.node_count, graph.edge_count, len(graph.way_info), time.perf_counter() - started)
+    return graph
+
+
+@contextlib.contextmanager
+def _build_lock(path: str) -> Iterator[None]:
+    with open(path + '.lock', 'a') as fh:
+        fcntl.flock(fh.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(fh.fileno(), fcntl.LOCK_UN)
+
+
+def _load(path: str) -> Optional[RouteGraph]:
+    try:
+        return RouteGraph.load(path)
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError, KeyError) as exc:
+        logger.warning('Ignoring unreadable route graph %s: %s', path, exc)
+        return None
+
+
+def load_or_build(fingerprint: str, path: Optional[str] = None) -> RouteGraph:
+    """The saved graph if it matches ``fingerprint``, otherwise a new one (then saved)."""
+    path = path or graph_path()
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    graph = _load(path)
+    if graph is not None and graph.fingerprint == fingerprint:
+        return graph
+    with _build_lock(path):
+        graph = _load(path)  # another worker may have built it while we waited
+        if graph is not None and graph.fingerprint == fingerprint:
+            return graph
+        graph = build_graph(fingerprint)
+        partial = f'{path}.{os.getpid()}.tmp'
+        graph.save(partial)
+        os.replace(partial, path)
+        return graph
+
+
+_graph: Optional[RouteGraph] = None
+_checked_at = 0.0
+_graph_lock = threading.Lock()
+
+
+def route_graph(check_seconds: Optional[float] = None) -> RouteGraph:
+    """The current graph, checked against its sources at most every ``check_seconds``."""
+    global _graph, _checked_at
+    if check_seconds is None:
+        check_seconds = float(os.getenv('ROUTE_GRAPH_CHECK_SECONDS', '300'))
+    if _graph is not None and time.monotonic() - _checked_at < check_seconds:
+        return _graph
+    with _graph_lock:
+        if _graph is None or time.monotonic() - _checked_at >= check_seconds:
+            fingerprint = source_fingerprint()
+            if _graph is None or _graph.fingerprint != fingerprint:
+                _graph = load_or_build(fingerprint)
+            _checked_at = time.monotonic()
+        return _graph
+
+
+def reset_route_graph() -> None:
+    """Forget the in-process graph (the saved file is kept)."""
+    global _graph, _checked_at
+    with _graph_lock:
+        _graph, _checked_at = None, 0.0
+
+
+@click.command('route-graph')
+def route_graph_command() -> None:
+    """Build the route planner's trail graph unless it is up to date."""
+    graph = load_or_build(source_fingerprint())
+    click.echo(f'Route graph: {graph.node_count} nodes, {graph.edge_count} edges, '
+               f'{len(graph.way_info)} ways ({graph_path()}).')
+
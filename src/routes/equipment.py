@@ -9,37 +9,61 @@ additional recommendation logic lives in ``src.services.equipment_configurator``
 
 from flask import Blueprint, request, jsonify
 
+from ..admission import EXPENSIVE_CLASS, rate_limit_class
+from ..conditional import collection_version, conditional
 from ..models import db, Equipment
-from ..equipment_configurator import EquipmentConfiguratorService
+from ..models.types import json_array_contains
+from ..serialization_cache import cached_list, json_list_response
+from ..lazy_services import lazy_service
 
 
 equipment_bp = Blueprint('equipment', __name__)
 
-_configurator = EquipmentConfiguratorService()
+
+@lazy_service
+def _configurator():
+    from ..equipment_configurator import EquipmentConfiguratorService
+    return EquipmentConfiguratorService()
 
 
 @equipment_bp.route('/equipment/categories', methods=['GET'])
+@conditional(lambda: ('categories-v1',))
 def list_equipment_categories() -> tuple:
     """Return a list of available equipment categories."""
     categories = ['clothing', 'footwear', 'safety', 'navigation', 'camping']
     return jsonify(categories), 200
 
 
-@equipment_bp.route('/equipment', methods=['GET'])
-def list_equipment() -> tuple:
-    """Return equipment items with optional filters."""
+def _equipment_query():
+    """Equipment query with the SQL-side filters given in the query string."""
     query = Equipment.query
     category = request.args.get('category')
     brand = request.args.get('brand')
     min_rating = request.args.get('min_rating', type=float)
-    max_price = request.args.get('max_price', type=float)
+    season = request.args.get('season')
     if category:
         query = query.filter_by(category=category)
     if brand:
         query = query.filter_by(brand=brand)
     if min_rating is not None:
         query = query.filter(Equipment.rating >= min_rating)
-    results = query.all()
+    if season:
+        query = query.filter(json_array_contains(Equipment.season_use, season))
+    return query
+
+
+@equipment_bp.route('/equipment', methods=['GET'])
+@conditional(lambda: collection_version(_equipment_query(), Equipment.updated_at), last_modified=False)
+def list_equipment() -> tuple:
+    """Return equipment items with optional filters."""
+    max_price = request.args.get('max_price', type=float)
+    if max_price is None:
+        versions = _equipment_query().with_entities(Equipment.id, Equipment.updated_at).all()
+        fragments = cached_list(
+            'equipment', versions, lambda ids: Equipment.query.filter(Equipment.id.in_(ids)), Equipment.to_dict
+        )
+        return json_list_response(fragments), 200
+    results = _equipment_query().all()
     # Filter by max_price by inspecting price_range JSON field
     items = []
     for item in results:
@@ -52,11 +76,12 @@ def list_equipment() -> tuple:
 
 
 @equipment_bp.route('/equipment/configure', methods=['POST'])
+@rate_limit_class(EXPENSIVE_CLASS)
 def configure_equipment() -> tuple:
     """Generate a personalised equipment configuration based on user parameters."""
     params = request.get_json() or {}
     try:
-        config = _configurator.generate_configuration(params)
+        config = _configurator().generate_configuration(params)
     except ValueError as exc:
         return jsonify({'error': str(exc)}), 400
     return jsonify(config), 200
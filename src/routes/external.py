@@ -5,21 +5,112 @@ This module exposes endpoints under the ``/api/external`` prefix for
 retrieving weather, trail and refuge data from third‑party services. It
 delegates the heavy lifting to the service classes defined in
 ``src.services.external_apis``.
+
+When an upstream is failing, responses may be built from stale cached data
+(flagged with ``Warning``/``Age`` headers); with nothing cached the
+endpoints answer 503 with ``Retry-After``. All endpoints here are in the
+``expensive`` rate limit class (see ``src/admission.py``).
+
+The weather endpoints take ``variables``, ``resolution`` (``current``,
+``hourly``, ``daily``) and ``days`` to request only part of a forecast, and
+``format=columnar`` (or ``format=binary`` for a single location) for the
+compact encodings in ``src/services/forecast_format.py``.
 """
 
-from flask import Blueprint, request, jsonify
+import logging
+import math
+from typing import Any, Dict, List, Mapping, Optional
 
-from ..external_apis import WeatherService, TrailService, RefugeService
+from flask import Blueprint, Response, request, jsonify
+
+from ..admission import EXPENSIVE_CLASS, rate_limit_class
+from ..circuit_breaker import UpstreamUnavailable
+from ..lazy_services import lazy_service
+from ..models import Trail, TripLog
+from ..services.forecast_format import MIMETYPE as BINARY_FORECAST_MIMETYPE, to_binary, to_columnar
+from ..services.track_sampling import RoutePoint, sample_along, waypoint_points
+from ..upstream_cache import add_staleness_headers
 
 
 external_bp = Blueprint('external', __name__)
+logger = logging.getLogger('mountainhub.upstream')
+
+# Retry-After for upstream errors while the circuit breaker is still closed
+DEFAULT_RETRY_AFTER = 30
+# Forecast points per route request and default spacing along a track
+MAX_ROUTE_POINTS = 50
+DEFAULT_ROUTE_SPACING_KM = 2.0
+FORECAST_FORMATS = ('json', 'columnar', 'binary')
+
+
+@external_bp.errorhandler(UpstreamUnavailable)
+def upstream_unavailable(exc: UpstreamUnavailable) -> tuple:
+    logger.warning('Upstream unavailable: %s', exc)
+    response = jsonify({'error': f'{exc.upstream} is currently unavailable', 'upstream': exc.upstream})
+    retry_after = exc.retry_after if exc.retry_after is not None else DEFAULT_RETRY_AFTER
+    response.headers['Retry-After'] = str(max(1, round(retry_after)))
+    return response, 503
+
+
+@external_bp.after_request
+def flag_stale_data(response: Response) -> Response:
+    return add_staleness_headers(response)
+
+
+# Built on first use: importing ``external_apis`` pulls in ``requests``
+@lazy_service
+def weather_service():
+    from ..external_apis import WeatherService
+    return WeatherService()
+
+
+@lazy_service
+def trail_service():
+    from ..external_apis import TrailService
+    return TrailService()
+
 
-weather_service = WeatherService()
-trail_service = TrailService()
-refuge_service = RefugeService()
+@lazy_service
+def refuge_service():
+    from ..external_apis import RefugeService
+    return RefugeService()
+
+
+def _option_list(value: Any) -> Optional[List[str]]:
+    """A comma-separated string or a list of names, ``None`` when absent."""
+    if value is None:
+        return None
+    if isinstance(value, str):
+        value = value.split(',')
+    if not isinstance(value, list):
+        raise ValueError('variables and resolution must be comma-separated names')
+    return [name for name in (str(item).strip() for item in value) if name]
+
+
+def _weather_options(options: Mapping[str, Any], formats: tuple = FORECAST_FORMATS) -> tuple:
+    """The forecast query and output format requested, or an error response."""
+    from ..external_apis import WeatherQuery
+
+    fmt = options.get('format', 'json')
+    if fmt not in formats:
+        return None, None, (jsonify({'error': f"format must be one of {', '.join(formats)}"}), 400)
+    try:
+        days = options.get('days')
+        if days is not None:
+            try:
+                days = int(days)
+            except (TypeError, ValueError):
+                raise ValueError('days must be an integer') from None
+        query = WeatherQuery.select(
+            _option_list(options.get('variables')), _option_list(options.get('resolution')), days
+        )
+    except ValueError as exc:
+        return None, None, (jsonify({'error': str(exc)}), 400)
+    return query, fmt, None
 
 
 @external_bp.route('/weather', methods=['GET'])
+@rate_limit_class(EXPENSIVE_CLASS)
 def get_weather() -> tuple:
     """Get weather data for a specific location."""
     latitude = request.args.get('latitude', type=float)
@@ -27,48 +118,146 @@ def get_weather() -> tuple:
     timezone = request.args.get('timezone', 'auto')
     if latitude is None or longitude is None:
         return jsonify({'error': 'Latitude and longitude are required parameters'}), 400
-    weather_data = weather_service.get_weather(latitude, longitude, timezone)
-    if weather_data:
-        return jsonify(weather_data), 200
-    return jsonify({'error': 'Failed to fetch weather data'}), 500
+    if not (-90 <= latitude <= 90 and -180 <= longitude <= 180):
+        return jsonify({'error': 'Latitude must be within -90..90 and longitude within -180..180'}), 400
+    query, fmt, error = _weather_options(request.args)
+    if error:
+        return error
+    weather_data = weather_service().get_weather(latitude, longitude, timezone, query)
+    if not weather_data:
+        return jsonify({'error': 'Failed to fetch weather data'}), 500
+    if fmt == 'binary':
+        return Response(to_binary(weather_data), mimetype=BINARY_FORECAST_MIMETYPE), 200
+    return jsonify(to_columnar(weather_data) if fmt == 'columnar' else weather_data), 200
+
+
+def _route_points() -> tuple:
+    """Points to forecast for the route request, or an error response."""
+    if request.method == 'POST':
+        data = request.get_json(silent=True) or {}
+        raw = data.get('points')
+        if not isinstance(raw, list) or not raw:
+            return None, (jsonify({'error': 'points must be a non-empty list of {lat, lon}'}), 400)
+        if len(raw) > MAX_ROUTE_POINTS:
+            return None, (jsonify({'error': f'At most {MAX_ROUTE_POINTS} points per request'}), 400)
+        points = waypoint_points(raw, MAX_ROUTE_POINTS)
+        if len(points) != len(raw):
+            return None, (jsonify({'error': 'Every point needs lat within -90..90 and lon within -180..180'}), 400)
+        return points, None
+
+    spacing_km = request.args.get('spacing_km', DEFAULT_ROUTE_SPACING_KM, type=float)
+    if spacing_km is None or not math.isfinite(spacing_km) or spacing_km <= 0:
+        return None, (jsonify({'error': 'spacing_km must be a positive number'}), 400)
+    trail_id = request.args.get('trail_id')
+    trip_log_id = request.args.get('trip_log_id', type=int)
+    if trail_id:
+        trail = Trail.query.get(trail_id)
+        if not trail:
+            return None, (jsonify({'error': 'Trail not found'}), 404)
+        track = trail.track
+        waypoints: list = []
+    elif trip_log_id is not None:
+        log = TripLog.query.get(trip_log_id)
+        if not log:
+            return None, (jsonify({'error': 'Trip log not found'}), 404)
+        track = log.track
+        waypoints = log.waypoints
+    else:
+        return None, (jsonify({'error': 'trail_id or trip_log_id is required'}), 400)
+    # Prefer the recorded track; fall back to the trip's waypoints
+    points: List[RoutePoint] = []
+    if track is not None:
+        points = sample_along(track.points, spacing_km, MAX_ROUTE_POINTS)
+    if not points:
+        points = waypoint_points(waypoints, MAX_ROUTE_POINTS)
+    if not points:
+        return None, (jsonify({'error': 'The route has no track or waypoints'}), 404)
+    return points, None
+
+
+@external_bp.route('/weather/route', methods=['GET', 'POST'])
+@rate_limit_class(EXPENSIVE_CLASS)
+def get_route_weather() -> tuple:
+    """Forecasts along a trail or trip log (GET) or for a list of points (POST).
+
+    Points in the same forecast grid cell share one forecast, listed once in
+    ``forecasts`` and referenced by index from ``points``.
+    """
+    points, error = _route_points()
+    if error:
+        return error
+    options = (request.get_json(silent=True) or {}) if request.method == 'POST' else request.args
+    query, fmt, error = _weather_options(options, formats=('json', 'columnar'))
+    if error:
+        return error
+    forecasts = weather_service().get_weather_batch(
+        [(lat, lon) for lat, lon, _ in points], options.get('timezone', 'auto'), query
+    )
+    if fmt == 'columnar':
+        columnar = {id(f): to_columnar(f) for f in {id(f): f for f in forecasts}.values()}
+        forecasts = [columnar[id(f)] for f in forecasts]
+    # Points in the same grid cell are given the same forecast object
+    indexes: Dict[int, int] = {}
+    body: Dict[str, list] = {'points': [], 'forecasts': []}
+    for (lat, lon, distance_km), forecast in zip(points, forecasts):
+        index = indexes.setdefault(id(forecast), len(indexes))
+        if index == len(body['forecasts']):
+            body['forecasts'].append(forecast)
+        body['points'].append({'lat': lat, 'lon': lon, 'distance_km': distance_km, 'forecast': index})
+    return jsonify(body), 200
+
+
+def _bbox_args() -> tuple:
+    """The ``south, west, north, east`` query arguments, or an error response."""
+    bbox = [request.args.get(name, type=float) for name in ('south', 'west', 'north', 'east')]
+    if None in bbox:
+        return None, (jsonify({'error': 'All bounding box parameters (south, west, north, east) are required'}), 400)
+    south, west, north, east = bbox
+    if not (-90 <= south <= north <= 90 and -180 <= west <= east <= 180):
+        return None, (jsonify({'error': 'The bounding box must have south <= north and west <= east '
+                                        'within -90..90 and -180..180'}), 400)
+    return bbox, None
 
 
 @external_bp.route('/trails', methods=['GET'])
+@rate_limit_class(EXPENSIVE_CLASS)
 def get_trails() -> tuple:
     """Get hiking trails within a bounding box."""
-    south = request.args.get('south', type=float)
-    west = request.args.get('west', type=float)
-    north = request.args.get('north', type=float)
-    east = request.args.get('east', type=float)
-    if None in [south, west, north, east]:
-        return jsonify({'error': 'All bounding box parameters (south, west, north, east) are required'}), 400
-    trail_data = trail_service.get_trails_in_area(south, west, north, east)
+    bbox, error = _bbox_args()
+    if error:
+        return error
+    try:
+        trail_data = trail_service().get_trails_in_area(*bbox)
+    except ValueError as exc:
+        return jsonify({'error': str(exc)}), 400
     if trail_data:
         return jsonify(trail_data), 200
     return jsonify({'error': 'Failed to fetch trail data'}), 500
 
 
 @external_bp.route('/trails/<osm_type>/<int:osm_id>', methods=['GET'])
+@rate_limit_class(EXPENSIVE_CLASS)
 def get_trail_by_id(osm_type: str, osm_id: int) -> tuple:
     """Get a specific trail by its OSM ID."""
     if osm_type not in ['way', 'relation']:
         return jsonify({'error': 'OSM type must be either "way" or "relation"'}), 400
-    trail_data = trail_service.get_trail_by_id(osm_id, osm_type)
+    trail_data = trail_service().get_trail_by_id(osm_id, osm_type)
     if trail_data:
         return jsonify(trail_data), 200
     return jsonify({'error': 'Failed to fetch trail data'}), 500
 
 
 @external_bp.route('/refuges', methods=['GET'])
+@rate_limit_class(EXPENSIVE_CLASS)
 def get_refuges() -> tuple:
     """Get mountain refuges within a bounding box."""
-    south = request.args.get('south', type=float)
-    west = request.args.get('west', type=float)
-    north = request.args.get('north', type=float)
-    east = request.args.get('east', type=float)
-    if None in [south, west, north, east]:
-        return jsonify({'error': 'All bounding box parameters (south, west, north, east) are required'}), 400
-    refuge_data = refuge_service.get_refuges_in_area(south, west, north, east)
+    bbox, error = _bbox_args()
+    if error:
+        return error
+    try:
+        refuge_data = refuge_service().get_refuges_in_area(*bbox)
+    except ValueError as exc:
+        return jsonify({'error': str(exc)}), 400
     if refuge_data:
         return jsonify(refuge_data), 200
     return jsonify({'error': 'Failed to fetch refuge data'}), 500
\ No newline at end of file
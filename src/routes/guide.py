@@ -8,29 +8,46 @@ authentication layer.
 """
 
 from flask import Blueprint, request, jsonify
+from sqlalchemy import select
+from sqlalchemy.orm import joinedload
 
 import datetime
 
+from ..conditional import collection_version, conditional, current_version, row_version
 from ..models import db, Guide, UserGuideProgress
+from ..serialization_cache import cached_fragment, cached_list, json_list_response, json_response
 
 
 guide_bp = Blueprint('guide', __name__)
 
 
+def _guide_version(guide_id: int):
+    return row_version(select(Guide.updated_at).where(Guide.id == guide_id))
+
+
+def _guide_dict(guide_id: int):
+    guide = Guide.query.get(guide_id)
+    return guide.to_dict() if guide else None
+
+
 @guide_bp.route('/guides', methods=['GET'])
+@conditional(lambda: collection_version(Guide.query, Guide.updated_at), last_modified=False)
 def list_guides() -> tuple:
     """Return a list of all guides."""
-    guides = Guide.query.all()
-    return jsonify([guide.to_dict() for guide in guides]), 200
+    versions = db.session.execute(select(Guide.id, Guide.updated_at)).all()
+    fragments = cached_list('guide', versions, lambda ids: Guide.query.filter(Guide.id.in_(ids)), Guide.to_dict)
+    return json_list_response(fragments), 200
 
 
 @guide_bp.route('/guides/<int:guide_id>', methods=['GET'])
+@conditional(_guide_version)
 def get_guide(guide_id: int) -> tuple:
     """Return details of a specific guide."""
-    guide = Guide.query.get(guide_id)
-    if not guide:
+    version = current_version(_guide_version, guide_id=guide_id)
+    body = version and cached_fragment(('guide', guide_id) + tuple(version), lambda: _guide_dict(guide_id))
+    if not body:
         return jsonify({'error': 'Guide not found'}), 404
-    return jsonify(guide.to_dict()), 200
+    return json_response(body), 200
 
 
 @guide_bp.route('/guides/progress', methods=['GET'])
@@ -39,7 +56,12 @@ def get_progress() -> tuple:
     user_id = request.args.get('user_id')
     if not user_id:
         return jsonify({'error': 'user_id query parameter is required'}), 400
-    progress_records = UserGuideProgress.query.filter_by(user_id=user_id).all()
+    progress_records = (
+        UserGuideProgress.query
+        .options(joinedload(UserGuideProgress.guide))
+        .filter_by(user_id=user_id)
+        .all()
+    )
     return jsonify([record.to_dict() for record in progress_records]), 200
 
 
@@ -0,0 +1,85 @@
+"""
+Blueprint for the hiking route planner.
+
+``GET /api/routes?from=&to=`` finds the quickest walk between two places
+over the trail graph built by ``src/route_planner.py``. Each end is a
+refuge id or a ``lat,lon`` pair, and is snapped to the nearest trail
+within ``MAX_SNAP_METERS``. ``max_sac`` (a grade 1-6 or an OSM
+``sac_scale`` value) keeps the route off harder trails. Routing is in the
+``expensive`` rate limit class (see ``src/admission.py``).
+"""
+
+from typing import Any, Optional, Tuple
+
+from flask import Blueprint, jsonify, request
+
+from ..admission import EXPENSIVE_CLASS, rate_limit_class
+from ..models import Refuge
+from ..route_planner import route_graph
+from ..services.route_graph import MAX_SAC_GRADE, sac_grade
+
+
+planner_bp = Blueprint('planner', __name__)
+
+# How far an end of the route may be from the nearest trail
+MAX_SNAP_METERS = 500.0
+
+
+def _place(value: Optional[str], name: str) -> Tuple[Optional[dict], Optional[tuple]]:
+    """The ``{lat, lon}`` of a ``lat,lon`` pair or a refuge id, or an error response."""
+    if not value:
+        return None, (jsonify({'error': f'{name} is required (a refuge id or "lat,lon")'}), 400)
+    parts = value.split(',')
+    if len(parts) == 2:
+        try:
+            lat, lon = float(parts[0]), float(parts[1])
+        except ValueError:
+            return None, (jsonify({'error': f'{name} must be a refuge id or "lat,lon"'}), 400)
+        if not (-90 <= lat <= 90 and -180 <= lon <= 180):
+            return None, (jsonify({'error': f'{name} is not a valid coordinate'}), 400)
+        return {'lat': lat, 'lon': lon}, None
+    refuge = Refuge.query.get(value)
+    if not refuge:
+        return None, (jsonify({'error': f'Refuge {value} not found'}), 404)
+    if refuge.latitude is None or refuge.longitude is None:
+        return None, (jsonify({'error': f'Refuge {value} has no coordinates'}), 404)
+    return {'lat': float(refuge.latitude), 'lon': float(refuge.longitude), 'refuge_id': refuge.id,
+            'name': refuge.name}, None
+
+
+def _max_grade(value: Any) -> Optional[int]:
+    if value in (None, ''):
+        return None
+    grade = int(value) if str(value).isdigit() else sac_grade(value)
+    if not 1 <= grade <= MAX_SAC_GRADE:
+        raise ValueError(f'max_sac must be 1-{MAX_SAC_GRADE} or an OSM sac_scale value')
+    return grade
+
+
+@planner_bp.route('/routes', methods=['GET'])
+@rate_limit_class(EXPENSIVE_CLASS)
+def plan_route() -> tuple:
+    """Quickest hiking route between two refuges or points."""
+    start, error = _place(request.args.get('from'), 'from')
+    if error:
+        return error
+    end, error = _place(request.args.get('to'), 'to')
+    if error:
+        return error
+    try:
+        max_grade = _max_grade(request.args.get('max_sac'))
+    except ValueError as exc:
+        return jsonify({'error': str(exc)}), 400
+
+    graph = route_graph()
+    ends = []
+    for name, place in (('from', start), ('to', end)):
+        snapped = graph.nearest(place['lat'], place['lon'], MAX_SNAP_METERS)
+        if snapped is None:
+            return jsonify({'error': f'No known trail within {MAX_SNAP_METERS:g} m of {name}'}), 404
+        ends.append(snapped)
+        place['snapped_distance_m'] = round(snapped[1], 1)
+    route = graph.find_route(ends[0][0], ends[1][0], max_grade)
+    if route is None:
+        return jsonify({'error': 'No route found between these places'}), 404
+    return jsonify({'from': start, 'to': end, **graph.describe(route)}), 200
@@ -3,35 +3,130 @@ Blueprint for trail management endpoints.
 
 Exposes CRUD operations for the ``Trail`` model. Users can create new
 trails, list all trails, retrieve a specific trail by ID, update and
-delete existing trails. For simplicity, this implementation does not
-include authentication; the ``created_by`` field should be supplied by the
+delete existing trails, attach a GPX track and fetch its elevation
+profile. For simplicity, this implementation does not include
+authentication; the ``created_by`` field should be supplied by the
 client with a valid user ID.
 """
 
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, current_app, request, jsonify
+from sqlalchemy import select
 
-from ..models import db, Trail
+from ..conditional import collection_version, conditional, current_version, row_version
+from ..models import db, Trail, User
+from ..models.track import attach_track
+from ..models.types import json_array_contains
+from ..serialization_cache import cached_fragment, cached_list, json_list_response, json_response
+from ..services.bulk_import import (
+    BulkImporter, RowError, as_float, as_int, as_json, as_text, iter_records, is_scalar, require,
+)
+from ..services.elevation_profile import DEFAULT_PROFILE_POINTS, NoElevationData, get_cached_profile
+from ..services.gpx import GPXParseError, parse_gpx_upload
 
 
 trail_bp = Blueprint('trail', __name__)
 
+_DIFFICULTIES = set(Trail.__table__.c.difficulty.type.enums)
+_TRACK_METRICS = {'distance_km': 'distance_km', 'elevation_gain': 'elevation_gain_m'}
+
+
+def _validate_trail_row(record: dict) -> dict:
+    """Turn an imported record into ``Trail`` column values."""
+    require(record, 'name', 'difficulty', 'created_by')
+    if not is_scalar(record['difficulty']) or record['difficulty'] not in _DIFFICULTIES:
+        raise RowError(f"difficulty must be one of {', '.join(sorted(_DIFFICULTIES))}")
+    return {
+        'name': as_text(record, 'name', 200),
+        'description': as_text(record, 'description'),
+        'difficulty': record['difficulty'],
+        'distance_km': as_float(record, 'distance_km'),
+        'elevation_gain_m': as_int(record, 'elevation_gain_m'),
+        'estimated_duration_hours': as_float(record, 'estimated_duration_hours'),
+        'gpx_file_url': as_text(record, 'gpx_file_url'),
+        'start_point': as_text(record, 'start_point'),
+        'end_point': as_text(record, 'end_point'),
+        'region': as_text(record, 'region'),
+        'country': as_text(record, 'country'),
+        'season_availability': as_json(record, 'season_availability'),
+        'coordinates': as_json(record, 'coordinates'),
+        'created_by': record['created_by'],
+    }
+
+
+def _trail_version(trail_id: str):
+    return row_version(select(Trail.updated_at).where(Trail.id == trail_id))
+
+
+def _trail_dict(trail_id: str):
+    trail = Trail.query.get(trail_id)
+    return trail.to_dict() if trail else None
+
+
+def _trail_query():
+    """Trail listing query with the filters given in the query string."""
+    query = Trail.query
+    season = request.args.get('season')
+    if season:
+        query = query.filter(json_array_contains(Trail.season_availability, season))
+    return query
+
 
 @trail_bp.route('/trails', methods=['GET'])
+@conditional(lambda: collection_version(_trail_query(), Trail.updated_at), last_modified=False)
 def list_trails() -> tuple:
-    """Return a list of all trails."""
-    trails = Trail.query.all()
-    return jsonify([trail.to_dict() for trail in trails]), 200
+    """Return trails (optionally ``?season=``), assembled from cached per-row JSON."""
+    versions = _trail_query().with_entities(Trail.id, Trail.updated_at).all()
+    fragments = cached_list(
+        'trail', versions, lambda ids: Trail.query.filter(Trail.id.in_(ids)), Trail.to_dict
+    )
+    return json_list_response(fragments), 200
 
 
 @trail_bp.route('/trails/<trail_id>', methods=['GET'])
+@conditional(_trail_version)
 def get_trail(trail_id: str) -> tuple:
     """Return details for a specific trail."""
+    version = current_version(_trail_version, trail_id=trail_id)
+    body = version and cached_fragment(('trail', trail_id) + tuple(version), lambda: _trail_dict(trail_id))
+    if not body:
+        return jsonify({'error': 'Trail not found'}), 404
+    return json_response(body), 200
+
+
+@trail_bp.route('/trails/<trail_id>/gpx', methods=['POST', 'PUT'])
+def upload_trail_gpx(trail_id: str) -> tuple:
+    """Attach a GPX track to a trail and update its distance and elevation gain.
+
+    Accepts multipart form data (field ``file``) or a raw GPX request body.
+    """
     trail = Trail.query.get(trail_id)
     if not trail:
         return jsonify({'error': 'Trail not found'}), 404
+    try:
+        attach_track(trail, parse_gpx_upload(request), _TRACK_METRICS, overwrite_metrics=True)
+    except GPXParseError as exc:
+        return jsonify({'error': str(exc)}), 400
+    db.session.commit()
     return jsonify(trail.to_dict()), 200
 
 
+@trail_bp.route('/trails/<trail_id>/profile', methods=['GET'])
+@conditional(_trail_version)
+def get_trail_profile(trail_id: str) -> tuple:
+    """Return a downsampled elevation profile and climb segments for a trail."""
+    trail = Trail.query.get(trail_id)
+    if not trail:
+        return jsonify({'error': 'Trail not found'}), 404
+    if trail.track is None:
+        return jsonify({'error': 'Trail has no track'}), 404
+    points = request.args.get('points', DEFAULT_PROFILE_POINTS, type=int)
+    try:
+        profile = get_cached_profile('trail', trail.id, trail.updated_at, lambda: trail.track.points, points)
+    except NoElevationData as exc:
+        return jsonify({'error': str(exc)}), 422
+    return jsonify(profile), 200
+
+
 @trail_bp.route('/trails', methods=['POST'])
 def create_trail() -> tuple:
     """Create a new trail."""
@@ -58,6 +153,28 @@ def create_trail() -> tuple:
     return jsonify(trail.to_dict()), 201
 
 
+@trail_bp.route('/trails/bulk', methods=['POST'])
+def bulk_create_trails() -> tuple:
+    """Import many trails from an NDJSON or CSV request body.
+
+    Rows are inserted in batches of ``BULK_IMPORT_BATCH_SIZE`` and committed
+    every ``BULK_IMPORT_TRANSACTION_SIZE`` rows. Invalid rows are skipped and
+    reported in ``errors`` with their row number.
+    """
+    try:
+        records = iter_records(request.stream, request.mimetype)
+    except ValueError as exc:
+        return jsonify({'error': str(exc)}), 415
+    importer = BulkImporter(
+        Trail,
+        _validate_trail_row,
+        batch_size=current_app.config.get('BULK_IMPORT_BATCH_SIZE', 1000),
+        transaction_size=current_app.config.get('BULK_IMPORT_TRANSACTION_SIZE', 10000),
+        foreign_keys={'created_by': User.id},
+    )
+    return jsonify(importer.run(records)), 200
+
+
 @trail_bp.route('/trails/<trail_id>', methods=['PUT', 'PATCH'])
 def update_trail(trail_id: str) -> tuple:
     """Update an existing trail."""
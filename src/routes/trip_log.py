@@ -1,39 +1,207 @@
 """
 Blueprint for trip log (diary) endpoints.
 
-Supports CRUD operations on trip logs. For brevity, authentication and
-authorization checks are omitted; the ``user_id`` field should be
-provided in the request body when creating a new trip log.
+Supports CRUD operations on trip logs and GPX track uploads. For brevity,
+authentication and authorization checks are omitted; the ``user_id`` field
+should be provided in the request body when creating a new trip log.
 """
 
-from flask import Blueprint, request, jsonify
+import datetime
 
-from ..models import db, TripLog
+from flask import Blueprint, Response, current_app, request, jsonify
+from sqlalchemy import select
+from sqlalchemy.orm import joinedload
+
+from ..conditional import collection_version, conditional, current_version, row_version
+from ..models import db, Trail, TripLog, User
+from ..models.track import attach_track
+from ..models.types import json_array_contains
+from ..serialization_cache import cached_fragment, cached_list, json_list_response, json_response
+from ..services.bulk_import import (
+    BulkImporter, RowError, as_bool, as_date, as_float, as_int, as_json, as_text, iter_records, require,
+)
+from ..services.elevation_profile import DEFAULT_PROFILE_POINTS, NoElevationData, get_cached_profile
+from ..services.gpx import GPXParseError, parse_gpx_upload
+from ..services.track_codec import TrackData
 
 
 trip_log_bp = Blueprint('trip_log', __name__)
 
+# TripLog fields filled from the metrics computed for an attached track
+_TRACK_METRICS = {field: field for field in ('distance_km', 'elevation_gain', 'duration_hours')}
 
-@trip_log_bp.route('/trip-logs', methods=['GET'])
-def list_trip_logs() -> tuple:
-    """Return a list of all trip logs in summary form."""
+
+def _validate_trip_log_row(record: dict) -> dict:
+    """Turn an imported record into ``TripLog`` column values."""
+    require(record, 'user_id', 'title', 'date')
+    return {
+        'user_id': record['user_id'],
+        'title': as_text(record, 'title', 100),
+        'description': as_text(record, 'description'),
+        'date': as_date(record, 'date'),
+        'duration_hours': as_float(record, 'duration_hours'),
+        'distance_km': as_float(record, 'distance_km'),
+        'elevation_gain': as_int(record, 'elevation_gain'),
+        'difficulty': as_text(record, 'difficulty'),
+        'trail_id': record.get('trail_id'),
+        'location_name': as_text(record, 'location_name'),
+        'location_coords': as_json(record, 'location_coords'),
+        'weather_conditions': as_text(record, 'weather_conditions'),
+        'temperature': as_float(record, 'temperature'),
+        'is_public': as_bool(record, 'is_public', True),
+        'photos': as_json(record, 'photos', []),
+        'waypoints': as_json(record, 'waypoints', []),
+        'notes': as_json(record, 'notes', []),
+        'equipment_used': as_json(record, 'equipment_used', []),
+        'companions': as_json(record, 'companions', []),
+    }
+
+
+def _apply_gpx_data(log: TripLog, gpx_data) -> None:
+    """Store (or clear) the trip's GPS track from a ``gpx_data`` payload.
+
+    Raises ``ValueError`` if the payload cannot be interpreted as a track.
+    """
+    if gpx_data is None:
+        if log.track is not None:
+            log.track = None
+            # As in ``attach_track``: the log's version must change with its track
+            log.updated_at = datetime.datetime.utcnow()
+        return
+    attach_track(log, TrackData.from_gpx_data(gpx_data), _TRACK_METRICS, overwrite_metrics=False)
+
+
+def _trip_log_query():
+    """Trip log listing query with the filters given in the query string."""
     user_id = request.args.get('user_id')
+    equipment_id = request.args.get('equipment')
+    companion_id = request.args.get('companion')
     query = TripLog.query
     if user_id:
         query = query.filter_by(user_id=user_id)
-    logs = query.all()
-    return jsonify([log.to_summary_dict() for log in logs]), 200
+    if equipment_id:
+        query = query.filter(json_array_contains(TripLog.equipment_used, equipment_id))
+    if companion_id:
+        query = query.filter(json_array_contains(TripLog.companions, {'user_id': companion_id}))
+    return query
+
+
+def _trip_log_list_version():
+    # Summaries embed the author's username, so user edits change the version too
+    query = _trip_log_query().outerjoin(User, TripLog.user_id == User.id)
+    return collection_version(query, TripLog.updated_at, User.updated_at)
+
+
+def _trip_log_version(log_id: int):
+    """Versions of the log and of the user and trail embedded in its detail view."""
+    return row_version(
+        select(TripLog.updated_at, User.updated_at, Trail.updated_at)
+        .select_from(TripLog)
+        .outerjoin(User, TripLog.user_id == User.id)
+        .outerjoin(Trail, TripLog.trail_id == Trail.id)
+        .where(TripLog.id == log_id)
+    )
+
+
+def _trip_log_own_version(log_id: int):
+    return row_version(select(TripLog.updated_at).where(TripLog.id == log_id))
+
+
+@trip_log_bp.route('/trip-logs', methods=['GET'])
+@conditional(_trip_log_list_version, last_modified=False)
+def list_trip_logs() -> tuple:
+    """Return trip logs in summary form (filters: ``user_id``, ``equipment``, ``companion``)."""
+    versions = (
+        _trip_log_query()
+        .outerjoin(User, TripLog.user_id == User.id)
+        .with_entities(TripLog.id, TripLog.updated_at, User.updated_at)
+        .all()
+    )
+
+    def load(ids):
+        return TripLog.query.options(joinedload(TripLog.user)).filter(TripLog.id.in_(ids))
+
+    fragments = cached_list('trip_log_summary', versions, load, TripLog.to_summary_dict)
+    return json_list_response(fragments), 200
 
 
 @trip_log_bp.route('/trip-logs/<int:log_id>', methods=['GET'])
+@conditional(_trip_log_version)
 def get_trip_log(log_id: int) -> tuple:
-    """Return a specific trip log."""
+    """Return a specific trip log.
+
+    The GPS track is only summarised unless ``?include=track`` is given.
+    """
+    include_track = 'track' in request.args.get('include', '').split(',')
+    version = current_version(_trip_log_version, log_id=log_id)
+
+    def build():
+        log = (
+            TripLog.query
+            .options(joinedload(TripLog.user), joinedload(TripLog.trail), joinedload(TripLog.track))
+            .get(log_id)
+        )
+        return log.to_dict(include_track=include_track) if log else None
+
+    body = version and cached_fragment(('trip_log', log_id, include_track) + tuple(version), build)
+    if not body:
+        return jsonify({'error': 'Trip log not found'}), 404
+    return json_response(body), 200
+
+
+@trip_log_bp.route('/trip-logs/<int:log_id>/track', methods=['GET'])
+@conditional(_trip_log_own_version)
+def get_trip_log_track(log_id: int) -> tuple:
+    """Return the GPS track of a trip log as GeoJSON (default) or GPX."""
+    log = TripLog.query.get(log_id)
+    if not log:
+        return jsonify({'error': 'Trip log not found'}), 404
+    if not log.track:
+        return jsonify({'error': 'Trip log has no track'}), 404
+    fmt = request.args.get('format', 'geojson')
+    if fmt == 'gpx':
+        return Response(log.track.points.to_gpx(name=log.title), mimetype='application/gpx+xml'), 200
+    if fmt != 'geojson':
+        return jsonify({'error': 'format must be "geojson" or "gpx"'}), 400
+    return jsonify(log.track.points.to_geojson({'trip_log_id': log.id})), 200
+
+
+@trip_log_bp.route('/trip-logs/<int:log_id>/gpx', methods=['POST', 'PUT'])
+def upload_trip_log_gpx(log_id: int) -> tuple:
+    """Upload a GPX file for a trip log and derive its distance, climb and duration.
+
+    The file may be sent as multipart form data (field ``file``) or as the raw
+    request body. It is parsed incrementally, so large tracks do not need to
+    fit in memory as an XML tree.
+    """
     log = TripLog.query.get(log_id)
     if not log:
         return jsonify({'error': 'Trip log not found'}), 404
+    try:
+        attach_track(log, parse_gpx_upload(request), _TRACK_METRICS, overwrite_metrics=True)
+    except GPXParseError as exc:
+        return jsonify({'error': str(exc)}), 400
+    db.session.commit()
     return jsonify(log.to_dict()), 200
 
 
+@trip_log_bp.route('/trip-logs/<int:log_id>/profile', methods=['GET'])
+@conditional(_trip_log_own_version)
+def get_trip_log_profile(log_id: int) -> tuple:
+    """Return a downsampled elevation profile and climb segments for a trip log."""
+    log = TripLog.query.get(log_id)
+    if not log:
+        return jsonify({'error': 'Trip log not found'}), 404
+    if not log.has_gpx:
+        return jsonify({'error': 'Trip log has no track'}), 404
+    points = request.args.get('points', DEFAULT_PROFILE_POINTS, type=int)
+    try:
+        profile = get_cached_profile('trip_log', log.id, log.updated_at, lambda: log.track.points, points)
+    except NoElevationData as exc:
+        return jsonify({'error': str(exc)}), 422
+    return jsonify(profile), 200
+
+
 @trip_log_bp.route('/trip-logs', methods=['POST'])
 def create_trip_log() -> tuple:
     """Create a new trip log."""
@@ -42,11 +210,15 @@ def create_trip_log() -> tuple:
     for field in required_fields:
         if field not in data:
             return jsonify({'error': f'{field} is required'}), 400
+    try:
+        date = as_date(data, 'date')
+    except RowError as exc:
+        return jsonify({'error': str(exc)}), 400
     log = TripLog(
         user_id=data['user_id'],
         title=data['title'],
         description=data.get('description'),
-        date=data['date'],
+        date=date,
         duration_hours=data.get('duration_hours'),
         distance_km=data.get('distance_km'),
         elevation_gain=data.get('elevation_gain'),
@@ -58,17 +230,42 @@ def create_trip_log() -> tuple:
         temperature=data.get('temperature'),
         is_public=data.get('is_public', True),
         photos=data.get('photos', []),
-        gpx_data=data.get('gpx_data'),
         waypoints=data.get('waypoints', []),
         notes=data.get('notes', []),
         equipment_used=data.get('equipment_used', []),
         companions=data.get('companions', []),
     )
+    if data.get('gpx_data') is not None:
+        try:
+            _apply_gpx_data(log, data['gpx_data'])
+        except (ValueError, KeyError, TypeError) as exc:
+            return jsonify({'error': f'Invalid gpx_data: {exc}'}), 400
     db.session.add(log)
     db.session.commit()
     return jsonify(log.to_dict()), 201
 
 
+@trip_log_bp.route('/trip-logs/bulk', methods=['POST'])
+def bulk_create_trip_logs() -> tuple:
+    """Import many trip logs from an NDJSON or CSV request body.
+
+    Works like ``POST /trails/bulk``; GPS tracks are not part of bulk rows and
+    can be attached afterwards through ``/trip-logs/<id>/gpx``.
+    """
+    try:
+        records = iter_records(request.stream, request.mimetype)
+    except ValueError as exc:
+        return jsonify({'error': str(exc)}), 415
+    importer = BulkImporter(
+        TripLog,
+        _validate_trip_log_row,
+        batch_size=current_app.config.get('BULK_IMPORT_BATCH_SIZE', 1000),
+        transaction_size=current_app.config.get('BULK_IMPORT_TRANSACTION_SIZE', 10000),
+        foreign_keys={'user_id': User.id, 'trail_id': Trail.id},
+    )
+    return jsonify(importer.run(records)), 200
+
+
 @trip_log_bp.route('/trip-logs/<int:log_id>', methods=['PUT', 'PATCH'])
 def update_trip_log(log_id: int) -> tuple:
     """Update an existing trip log."""
@@ -76,15 +273,25 @@ def update_trip_log(log_id: int) -> tuple:
     if not log:
         return jsonify({'error': 'Trip log not found'}), 404
     data = request.get_json() or {}
+    if 'date' in data:
+        try:
+            data['date'] = as_date(data, 'date')
+        except RowError as exc:
+            return jsonify({'error': str(exc)}), 400
     # Update fields if provided
     for attr in [
         'title', 'description', 'date', 'duration_hours', 'distance_km', 'elevation_gain',
         'difficulty', 'trail_id', 'location_name', 'location_coords', 'weather_conditions',
-        'temperature', 'is_public', 'photos', 'gpx_data', 'waypoints', 'notes',
+        'temperature', 'is_public', 'photos', 'waypoints', 'notes',
         'equipment_used', 'companions'
     ]:
         if attr in data:
             setattr(log, attr, data[attr])
+    if 'gpx_data' in data:
+        try:
+            _apply_gpx_data(log, data['gpx_data'])
+        except (ValueError, KeyError, TypeError) as exc:
+            return jsonify({'error': f'Invalid gpx_data: {exc}'}), 400
     db.session.commit()
     return jsonify(log.to_dict()), 200
 
@@ -8,28 +8,44 @@ intended as a starting point for further development.
 """
 
 from flask import Blueprint, request, jsonify
+from sqlalchemy import select
 from werkzeug.security import generate_password_hash, check_password_hash
 
+from ..conditional import collection_version, conditional, current_version, row_version
 from ..models import db, User
+from ..serialization_cache import cached_fragment, cached_list, json_list_response, json_response
 
 
 user_bp = Blueprint('user', __name__)
 
 
+def _user_version(user_id: str):
+    return row_version(select(User.updated_at).where(User.id == user_id))
+
+
+def _user_dict(user_id: str):
+    user = User.query.get(user_id)
+    return user.to_dict() if user else None
+
+
 @user_bp.route('/users', methods=['GET'])
+@conditional(lambda: collection_version(User.query, User.updated_at), last_modified=False)
 def list_users() -> tuple:
     """Return a list of all users (summary representation)."""
-    users = User.query.all()
-    return jsonify([user.to_dict() for user in users]), 200
+    versions = db.session.execute(select(User.id, User.updated_at)).all()
+    fragments = cached_list('user', versions, lambda ids: User.query.filter(User.id.in_(ids)), User.to_dict)
+    return json_list_response(fragments), 200
 
 
 @user_bp.route('/users/<user_id>', methods=['GET'])
+@conditional(lambda user_id: _user_version(user_id))
 def get_user(user_id: str) -> tuple:
     """Return details for a specific user."""
-    user = User.query.get(user_id)
-    if not user:
+    version = current_version(_user_version, user_id=user_id)
+    body = version and cached_fragment(('user', user_id) + tuple(version), lambda: _user_dict(user_id))
+    if not body:
         return jsonify({'error': 'User not found'}), 404
-    return jsonify(user.to_dict()), 200
+    return json_response(body), 200
 
 
 @user_bp.route('/users', methods=['POST'])
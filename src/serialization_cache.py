@@ -0,0 +1,145 @@
+"""
+Cache of serialised JSON fragments per model row version.
+
+Detail and list endpoints spend most of their time in ``to_dict`` and JSON
+encoding even though rows rarely change. Fragments are stored as encoded
+bytes keyed by ``(kind, id, version)`` where *version* is the row's
+``updated_at`` (plus the ``updated_at`` of any embedded rows), so an edit
+simply produces a new key and the old fragment ages out of the byte-bounded
+LRU. List responses are assembled by concatenating cached fragments; only
+rows whose fragment is missing are loaded from the database.
+"""
+
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Iterable, List, Optional, Sequence
+
+from flask import current_app
+
+from .metrics import record_cache
+
+DEFAULT_MAX_BYTES = 32 * 1024 * 1024
+# Rows loaded per ``IN (...)`` query when filling list misses
+_LOAD_CHUNK = 500
+
+
+class SerializationCache:
+    """Thread-safe LRU of ``bytes`` values bounded by their total size."""
+
+    def __init__(self, max_bytes: int = DEFAULT_MAX_BYTES) -> None:
+        self.max_bytes = max_bytes
+        self._entries: 'OrderedDict[Hashable, bytes]' = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable) -> Optional[bytes]:
+        with self._lock:
+            value = self._entries.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key: Hashable, value: bytes) -> None:
+        if len(value) > self.max_bytes:
+            return
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._size -= len(previous)
+            self._entries[key] = value
+            self._size += len(value)
+            while self._size > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._size -= len(evicted)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {'entries': len(self._entries), 'bytes': self._size, 'hits': self.hits, 'misses': self.misses}
+
+
+def get_cache() -> SerializationCache:
+    """Return the application's fragment cache, creating it on first use."""
+    cache = current_app.extensions.get('serialization_cache')
+    if cache is None:
+        max_bytes = current_app.config.get('SERIALIZATION_CACHE_MAX_BYTES', DEFAULT_MAX_BYTES)
+        cache = current_app.extensions['serialization_cache'] = SerializationCache(max_bytes)
+    return cache
+
+
+def encode(data: Any) -> bytes:
+    """Encode ``data`` with the application's JSON provider."""
+    dumps_bytes = getattr(current_app.json, 'dumps_bytes', None)
+    if dumps_bytes is not None:
+        return dumps_bytes(data)
+    return current_app.json.dumps(data).encode('utf-8')
+
+
+def cached_fragment(key: Hashable, build: Callable[[], Any]) -> Optional[bytes]:
+    """Return the encoded fragment for ``key``, building it on a miss.
+
+    ``build`` may return ``None`` (e.g. the row was deleted meanwhile), in
+    which case nothing is cached and ``None`` is returned.
+    """
+    cache = get_cache()
+    fragment = cache.get(key)
+    record_cache('serialization', int(fragment is not None), int(fragment is None))
+    if fragment is None:
+        data = build()
+        if data is None:
+            return None
+        fragment = encode(data)
+        cache.put(key, fragment)
+    return fragment
+
+
+def cached_list(
+    kind: str,
+    versions: Sequence[Sequence[Any]],
+    load: Callable[[List[Any]], Iterable[Any]],
+    serialize: Callable[[Any], Any],
+) -> List[bytes]:
+    """Return encoded fragments for ``versions`` rows in their original order.
+
+    ``versions`` holds ``(id, updated_at, ...)`` tuples, typically selected
+    without loading full rows. ``load`` receives the ids missing from the
+    cache and returns their model instances.
+    """
+    cache = get_cache()
+    fragments: List[Optional[bytes]] = []
+    missing: Dict[Any, List[int]] = {}
+    for index, row in enumerate(versions):
+        key = (kind,) + tuple(row)
+        fragment = cache.get(key)
+        fragments.append(fragment)
+        if fragment is None:
+            missing.setdefault(row[0], []).append(index)
+    record_cache('serialization', len(versions) - len(missing), len(missing))
+    ids = list(missing)
+    for start in range(0, len(ids), _LOAD_CHUNK):
+        for instance in load(ids[start:start + _LOAD_CHUNK]):
+            fragment = encode(serialize(instance))
+            for index in missing.get(instance.id, ()):
+                cache.put((kind,) + tuple(versions[index]), fragment)
+                fragments[index] = fragment
+    # Rows deleted between the two queries are simply left out
+    return [f for f in fragments if f is not None]
+
+
+def json_response(body: bytes, status: int = 200) -> Any:
+    """Wrap an already encoded JSON body in a response."""
+    return current_app.response_class(body, status=status, mimetype='application/json')
+
+
+def json_list_response(fragments: List[bytes], status: int = 200) -> Any:
+    """Build a JSON array response from encoded element fragments."""
+    return json_response(b'[' + b','.join(fragments) + b']', status)
@@ -0,0 +1,271 @@
+"""
+Streaming bulk import of model rows.
+
+Records are read one at a time from an NDJSON or CSV request body, validated
+into plain dictionaries and inserted with Core ``INSERT`` statements executed
+in ``executemany`` batches. A transaction is committed every
+``transaction_size`` rows, so a large import neither holds one huge
+transaction open nor pays a commit per row. Invalid rows are skipped and
+reported with their 1-based row number.
+"""
+
+import csv
+import datetime
+import io
+import json
+import math
+from typing import IO, Any, Callable, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+from sqlalchemy import insert, select
+from sqlalchemy.exc import SQLAlchemyError
+
+from ..models import db
+
+# Cap on the number of per-row errors echoed back to the client
+MAX_REPORTED_ERRORS = 1000
+
+Record = Tuple[int, Optional[Dict[str, Any]], Optional[str]]
+
+
+class RowError(ValueError):
+    """Raised by validators for a row that cannot be imported."""
+
+
+def iter_records(stream: IO[bytes], mimetype: str) -> Iterator[Record]:
+    """Yield ``(row_number, record, error)`` tuples from an NDJSON or CSV stream."""
+    # Raw WSGI input streams read byte by byte when iterated; buffer them
+    stream = io.BufferedReader(stream, buffer_size=1 << 16)
+    if mimetype in ('text/csv', 'application/csv'):
+        return _iter_csv(stream)
+    if mimetype in ('application/x-ndjson', 'application/ndjson', 'application/jsonl', 'application/json'):
+        return _iter_ndjson(stream)
+    raise ValueError('Content-Type must be application/x-ndjson or text/csv')
+
+
+def _iter_ndjson(stream: io.BufferedReader) -> Iterator[Record]:
+    row = 0
+    for line in stream:
+        if not line.strip():
+            continue
+        row += 1
+        try:
+            record = json.loads(line)
+        except ValueError as exc:
+            yield row, None, f'Invalid JSON: {exc}'
+            continue
+        if not isinstance(record, dict):
+            yield row, None, 'Each line must be a JSON object'
+            continue
+        yield row, record, None
+
+
+def _iter_csv(stream: io.BufferedReader) -> Iterator[Record]:
+    # Lines are decoded one at a time so a bad byte fails its own row, not the whole import
+    bad_lines: Set[int] = set()
+
+    def lines() -> Iterator[str]:
+        for number, line in enumerate(stream, start=1):
+            try:
+                yield line.decode('utf-8')
+            except UnicodeDecodeError:
+                bad_lines.add(number)
+                yield line.decode('utf-8', 'replace')
+
+    reader = csv.DictReader(lines())
+    last_line = 0
+    for row, record in enumerate(reader, start=1):
+        first_line, last_line = last_line + 1, reader.line_num
+        if row == 1:
+            first_line = 2  # line 1 is the header
+        if any(first_line <= number <= last_line for number in bad_lines):
+            yield row, None, 'Row is not valid UTF-8'
+            continue
+        # Empty CSV cells mean "not provided"
+        yield row, {k: v for k, v in record.items() if k and v not in (None, '')}, None
+
+
+# --- Field coercion helpers shared by the validators -------------------------
+
+def as_float(record: Dict[str, Any], field: str) -> Optional[float]:
+    value = record.get(field)
+    if value is None:
+        return None
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        raise RowError(f'{field} must be a number')
+    if not math.isfinite(number):
+        raise RowError(f'{field} must be a finite number')
+    return number
+
+
+def as_int(record: Dict[str, Any], field: str) -> Optional[int]:
+    value = as_float(record, field)
+    if value is None:
+        return None
+    if abs(value) >= 2 ** 63:
+        raise RowError(f'{field} is out of range')
+    return int(value)
+
+
+def as_text(record: Dict[str, Any], field: str, max_length: Optional[int] = None) -> Optional[str]:
+    """A string field; numbers are accepted and converted, lists and objects are not."""
+    value = record.get(field)
+    if value is None:
+        return None
+    if not is_scalar(value):
+        raise RowError(f'{field} must be a string')
+    return str(value)[:max_length]
+
+
+def is_scalar(value: Any) -> bool:
+    """Whether ``value`` is a string or a number, i.e. usable as a text value or an id."""
+    return isinstance(value, (str, int, float)) and not isinstance(value, bool)
+
+
+def as_bool(record: Dict[str, Any], field: str, default: bool) -> bool:
+    value = record.get(field)
+    if value is None:
+        return default
+    if isinstance(value, str):
+        return value.strip().lower() in ('1', 'true', 'yes', 'y')
+    return bool(value)
+
+
+def as_json(record: Dict[str, Any], field: str, default: Any = None) -> Any:
+    """Return a JSON field; CSV cells carry it as a JSON string."""
+    value = record.get(field, default)
+    if isinstance(value, str):
+        try:
+            return json.loads(value)
+        except ValueError:
+            raise RowError(f'{field} must be valid JSON')
+    return value
+
+
+def as_date(record: Dict[str, Any], field: str) -> Optional[datetime.date]:
+    value = record.get(field)
+    if value is None:
+        return None
+    try:
+        return datetime.date.fromisoformat(str(value)[:10])
+    except ValueError:
+        raise RowError(f'{field} must be an ISO date (YYYY-MM-DD)')
+
+
+def require(record: Dict[str, Any], *fields: str) -> None:
+    missing = [f for f in fields if record.get(f) in (None, '')]
+    if missing:
+        raise RowError(f"{', '.join(missing)} {'is' if len(missing) == 1 else 'are'} required")
+
+
+class BulkImporter:
+    """Validate and insert records for one model in batched transactions.
+
+    ``validate`` turns a raw record into column values or raises
+    ``RowError``. ``foreign_keys`` maps a column name to the primary key
+    column it must reference; a reference must be a string or a number, and
+    referenced ids are checked with one ``IN`` query per batch instead of
+    letting a single bad row abort the batch.
+    """
+
+    def __init__(
+        self,
+        model: Any,
+        validate: Callable[[Dict[str, Any]], Dict[str, Any]],
+        batch_size: int = 1000,
+        transaction_size: int = 10000,
+        foreign_keys: Optional[Dict[str, Any]] = None,
+    ) -> None:
+        self.model = model
+        self.validate = validate
+        self.batch_size = max(1, batch_size)
+        self.transaction_size = max(self.batch_size, transaction_size)
+        self.foreign_keys = foreign_keys or {}
+        self.inserted = 0
+        self.failed = 0
+        self.errors: List[Dict[str, Any]] = []
+
+    def run(self, records: Iterable[Record]) -> Dict[str, Any]:
+        """Import ``records`` and return a summary with per-row errors."""
+        batch: List[Tuple[int, Dict[str, Any]]] = []
+        pending: List[int] = []  # row numbers inserted but not yet committed
+        for row, record, error in records:
+            if error is None:
+                try:
+                    batch.append((row, self._validate(record)))
+                except RowError as exc:
+                    error = str(exc)
+            if error is not None:
+                self._error(row, error)
+            if len(batch) >= self.batch_size:
+                self._flush(batch, pending)
+                batch = []
+                if len(pending) >= self.transaction_size:
+                    self._commit(pending)
+        if batch:
+            self._flush(batch, pending)
+        if pending:
+            self._commit(pending)
+        return {
+            'inserted': self.inserted,
+            'failed': self.failed,
+            'errors': self.errors,
+            'errors_truncated': self.failed > len(self.errors),
+        }
+
+    def _validate(self, record: Dict[str, Any]) -> Dict[str, Any]:
+        values = self.validate(record)
+        for field in self.foreign_keys:
+            if values.get(field) is not None and not is_scalar(values[field]):
+                raise RowError(f'{field} must be an id, not {type(values[field]).__name__}')
+        return values
+
+    def _error(self, row: int, message: str) -> None:
+        self.failed += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({'row': row, 'error': message})
+
+    def _missing_references(self, batch: List[Tuple[int, Dict[str, Any]]]) -> Dict[str, Set[Any]]:
+        missing = {}
+        for field, target in self.foreign_keys.items():
+            wanted = {values[field] for _, values in batch if values.get(field) is not None}
+            if wanted:
+                found = set(db.session.execute(select(target).where(target.in_(wanted))).scalars())
+                missing[field] = wanted - found
+        return missing
+
+    def _flush(self, batch: List[Tuple[int, Dict[str, Any]]], pending: List[int]) -> None:
+        """Insert one validated batch with a single executemany call."""
+        missing = self._missing_references(batch)
+        rows, values = [], []
+        for row, item in batch:
+            bad = next((f for f, ids in missing.items() if item.get(f) in ids), None)
+            if bad:
+                self._error(row, f'{bad} {item[bad]!r} does not exist')
+                continue
+            rows.append(row)
+            values.append(item)
+        if not values:
+            return
+        try:
+            db.session.execute(insert(self.model.__table__), values)
+        except SQLAlchemyError as exc:
+            # The whole open transaction is lost, including earlier batches
+            self._abort(pending + rows, exc)
+            pending.clear()
+            return
+        pending.extend(rows)
+
+    def _commit(self, pending: List[int]) -> None:
+        try:
+            db.session.commit()
+            self.inserted += len(pending)
+        except SQLAlchemyError as exc:
+            self._abort(pending, exc)
+        pending.clear()
+
+    def _abort(self, rows: List[int], exc: Exception) -> None:
+        db.session.rollback()
+        for row in rows:
+            self._error(row, f'Database error: {exc.__class__.__name__}')
@@ -0,0 +1,168 @@
+"""
+Elevation profiles for trails and trip logs.
+
+``build_profile`` turns a decoded track into a chart-ready series of
+``[distance_km, elevation_m]`` pairs downsampled to a fixed number of points
+with the Largest-Triangle-Three-Buckets (LTTB) algorithm, which keeps the
+visually significant peaks and saddles that plain decimation would drop. It
+also detects sustained climbs on the smoothed elevation series.
+
+Profiles are cached in-process by ``(kind, id, updated_at, points)``; the
+owning row's ``updated_at`` changes whenever its track is replaced, so stale
+entries are simply never looked up again and age out of the LRU.
+"""
+
+import threading
+from collections import OrderedDict
+from itertools import accumulate
+from typing import Any, Callable, Dict, Hashable, List, Sequence
+
+from ..metrics import record_cache
+from .track_codec import TrackData
+from .track_metrics import segment_distances, smoothed_elevation
+
+DEFAULT_PROFILE_POINTS = 200
+MAX_PROFILE_POINTS = 2000
+# A climb must gain at least this much, and ends once we drop this far below its top
+CLIMB_MIN_GAIN_M = 30.0
+
+
+class NoElevationData(ValueError):
+    """Raised for a track whose points carry no elevations."""
+
+
+def build_profile(track: TrackData, points: int = DEFAULT_PROFILE_POINTS) -> Dict[str, Any]:
+    """Return the downsampled profile and climb segments for ``track``."""
+    if track.ele is None:
+        raise NoElevationData('Track has no elevation data')
+    distances = [0.0]
+    distances.extend(accumulate(float(d) for d in segment_distances(track)))
+    elevations = list(track.ele)
+    series = lttb(list(zip(distances, elevations)), points)
+    return {
+        'points': [[round(d / 1000.0, 3), round(e, 1)] for d, e in series],
+        'source_points': len(track),
+        'distance_km': round(distances[-1] / 1000.0, 3),
+        'min_elevation': min(elevations),
+        'max_elevation': max(elevations),
+        'climbs': detect_climbs(distances, smoothed_elevation(track.ele)),
+    }
+
+
+def lttb(data: Sequence[Sequence[float]], threshold: int) -> List[Sequence[float]]:
+    """Downsample ``(x, y)`` pairs to ``threshold`` points using LTTB."""
+    count = len(data)
+    if threshold >= count or threshold < 3:
+        return list(data)
+    sampled = [data[0]]
+    bucket_size = (count - 2) / (threshold - 2)
+    a = 0
+    for i in range(threshold - 2):
+        # Average of the next bucket is the third vertex of the triangle
+        next_start = int((i + 1) * bucket_size) + 1
+        next_end = min(int((i + 2) * bucket_size) + 1, count)
+        span = next_end - next_start
+        avg_x = sum(data[j][0] for j in range(next_start, next_end)) / span
+        avg_y = sum(data[j][1] for j in range(next_start, next_end)) / span
+
+        start = int(i * bucket_size) + 1
+        end = int((i + 1) * bucket_size) + 1
+        ax, ay = data[a]
+        best_area = -1.0
+        best = start
+        for j in range(start, end):
+            area = abs((ax - avg_x) * (data[j][1] - ay) - (ax - data[j][0]) * (avg_y - ay))
+            if area > best_area:
+                best_area = area
+                best = j
+        sampled.append(data[best])
+        a = best
+    sampled.append(data[-1])
+    return sampled
+
+
+def detect_climbs(
+    distances: Sequence[float], elevations: Sequence[float], min_gain: float = CLIMB_MIN_GAIN_M
+) -> List[Dict[str, Any]]:
+    """Find sustained climbs in a (smoothed) elevation series.
+
+    A climb runs from a local low to the following high and is reported when
+    it gains at least ``min_gain`` metres. A descent of ``min_gain`` below the
+    running high closes the climb, so small dips inside a long ascent do not
+    split it.
+    """
+    climbs = []
+    low = high = 0
+    for i in range(1, len(elevations)):
+        elevation = elevations[i]
+        if elevation > elevations[high]:
+            high = i
+        elif elevations[high] - elevation >= min_gain:
+            if elevations[high] - elevations[low] >= min_gain:
+                climbs.append(_climb(distances, elevations, low, high))
+            low = high = i
+        elif elevation < elevations[low]:
+            low = high = i
+    if elevations and elevations[high] - elevations[low] >= min_gain:
+        climbs.append(_climb(distances, elevations, low, high))
+    return climbs
+
+
+def _climb(distances: Sequence[float], elevations: Sequence[float], start: int, end: int) -> Dict[str, Any]:
+    length = distances[end] - distances[start]
+    gain = elevations[end] - elevations[start]
+    return {
+        'start_km': round(distances[start] / 1000.0, 3),
+        'end_km': round(distances[end] / 1000.0, 3),
+        'length_km': round(length / 1000.0, 3),
+        'elevation_gain': round(gain),
+        'start_elevation': round(elevations[start], 1),
+        'end_elevation': round(elevations[end], 1),
+        'avg_grade_pct': round(100.0 * gain / length, 1) if length > 0 else None,
+    }
+
+
+class ProfileCache:
+    """Small thread-safe LRU cache for computed profiles."""
+
+    def __init__(self, max_entries: int = 256) -> None:
+        self.max_entries = max_entries
+        self._entries: 'OrderedDict[Hashable, Dict[str, Any]]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_or_compute(self, key: Hashable, compute: Callable[[], Dict[str, Any]]) -> Dict[str, Any]:
+        """Return the cached value for ``key`` or compute and store it."""
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                record_cache('elevation_profile', 1, 0)
+                return self._entries[key]
+        record_cache('elevation_profile', 0, 1)
+        value = compute()
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return value
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+profile_cache = ProfileCache()
+
+
+def get_cached_profile(
+    kind: str, owner_id: Hashable, version: Any, load_track: Callable[[], TrackData],
+    points: int = DEFAULT_PROFILE_POINTS,
+) -> Dict[str, Any]:
+    """Return the profile for a track owner, computing it at most once per version.
+
+    ``load_track`` is only called on a cache miss, so cache hits never decode
+    (or even load) the stored track.
+    """
+    points = max(3, min(points, MAX_PROFILE_POINTS))
+    key = (kind, owner_id, version, points)
+    return profile_cache.get_or_compute(key, lambda: build_profile(load_track(), points))
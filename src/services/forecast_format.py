@@ -0,0 +1,137 @@
+"""
+Compact encodings of Open-Meteo forecasts for the mobile app.
+
+Open-Meteo already sends hourly and daily data as one array per variable,
+but repeats every timestamp as an ISO string and spreads units over
+``*_units`` objects. :func:`to_columnar` keeps the arrays and replaces the
+``time`` arrays with a shared axis (``start``, ``step`` in seconds and
+``count``) whenever the steps are regular, with the units of all sections
+in a single ``units`` object.
+
+:func:`to_binary` goes further and packs the numeric columns as typed
+arrays after a small JSON header::
+
+    b"MHF1" | uint32 header length | header | columns
+
+The header is UTF-8 JSON, padded with spaces so the columns start at a
+multiple of 4 bytes. It holds the columnar forecast with each section's
+``columns`` replaced by ``{"name", "type", "scale"}`` descriptors in
+storage order. A column of ``type`` ``"i2"`` holds little-endian int16
+values to divide by ``scale`` (``-32768`` is a missing value); ``"f4"``
+holds little-endian float32 values (NaN is a missing value). Every column
+holds ``count`` values and is zero-padded to a multiple of 4 bytes.
+Columns that are not numeric (``sunrise``, ``sunset``) stay in the header
+under ``values``.
+"""
+
+import json
+import math
+import struct
+import sys
+from array import array
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Sequence
+
+MAGIC = b'MHF1'
+MIMETYPE = 'application/vnd.mountainhub.forecast'
+SECTIONS = ('hourly', 'daily')
+# Top-level fields of an Open-Meteo forecast kept as they are
+METADATA = ('latitude', 'longitude', 'elevation', 'timezone', 'timezone_abbreviation', 'utc_offset_seconds')
+
+INT16_MISSING = -32768
+INT16_MAX = 32767
+# Largest number of decimals stored as scaled int16
+MAX_SCALED_DECIMALS = 2
+
+
+def _time_axis(times: Sequence[str]) -> Dict[str, Any]:
+    """``start``/``step``/``count`` for regularly spaced times, the times themselves otherwise."""
+    try:
+        parsed = [datetime.fromisoformat(value) for value in times]
+    except (TypeError, ValueError):
+        return {'time': list(times), 'count': len(times)}
+    if len(parsed) < 2:
+        return {'start': times[0] if times else None, 'step': None, 'count': len(times)}
+    step = (parsed[1] - parsed[0]).total_seconds()
+    if step <= 0 or any((b - a).total_seconds() != step for a, b in zip(parsed, parsed[1:])):
+        return {'time': list(times), 'count': len(times)}
+    return {'start': times[0], 'step': int(step), 'count': len(times)}
+
+
+def to_columnar(forecast: Dict[str, Any]) -> Dict[str, Any]:
+    """``forecast`` (an Open-Meteo response) with shared time axes and merged units."""
+    result: Dict[str, Any] = {'format': 'columnar'}
+    result.update((name, forecast[name]) for name in METADATA if name in forecast)
+    units: Dict[str, str] = {}
+    for section in ('current', *SECTIONS):
+        units.update(
+            (name, unit) for name, unit in (forecast.get(f'{section}_units') or {}).items()
+            if name not in ('time', 'interval')
+        )
+    result['units'] = units
+    if 'current' in forecast:
+        result['current'] = forecast['current']
+    for section in SECTIONS:
+        data = forecast.get(section)
+        if not data:
+            continue
+        block = _time_axis(data.get('time') or [])
+        block['columns'] = {name: values for name, values in data.items() if name != 'time'}
+        result[section] = block
+    return result
+
+
+def _is_number(value: Any) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def _int16_scale(values: Sequence[Optional[float]]) -> Optional[int]:
+    """The smallest power of ten that turns ``values`` into int16 integers, if any."""
+    present = [value for value in values if value is not None]
+    for decimals in range(MAX_SCALED_DECIMALS + 1):
+        scale = 10 ** decimals
+        scaled = [value * scale for value in present]
+        if any(abs(v) > INT16_MAX for v in scaled):
+            return None
+        if all(abs(v - round(v)) < 1e-6 * max(1.0, abs(v)) for v in scaled):
+            return scale
+    return None
+
+
+def _pack_column(values: Sequence[Optional[float]]) -> tuple:
+    """``(descriptor fields, bytes)`` for a numeric column."""
+    scale = _int16_scale(values)
+    if scale is not None:
+        column = array('h', (INT16_MISSING if v is None else round(v * scale) for v in values))
+        fields = {'type': 'i2', 'scale': scale}
+    else:
+        column = array('f', (math.nan if v is None else v for v in values))
+        fields = {'type': 'f4', 'scale': 1}
+    if sys.byteorder == 'big':  # pragma: no cover - the format is little-endian
+        column.byteswap()
+    data = column.tobytes()
+    return fields, data + b'\0' * (-len(data) % 4)
+
+
+def to_binary(forecast: Dict[str, Any]) -> bytes:
+    """``forecast`` in the binary format described in the module docstring."""
+    header = to_columnar(forecast)
+    chunks: List[bytes] = []
+    for section in SECTIONS:
+        block = header.get(section)
+        if block is None:
+            continue
+        descriptors, values = [], {}
+        for name, column in block.pop('columns').items():
+            if all(v is None or _is_number(v) for v in column):
+                fields, data = _pack_column(column)
+                descriptors.append({'name': name, **fields})
+                chunks.append(data)
+            else:
+                values[name] = column
+        block['columns'] = descriptors
+        if values:
+            block['values'] = values
+    encoded = json.dumps(header, separators=(',', ':'), ensure_ascii=False).encode()
+    encoded += b' ' * (-(len(MAGIC) + 4 + len(encoded)) % 4)
+    return b''.join([MAGIC, struct.pack('<I', len(encoded)), encoded, *chunks])
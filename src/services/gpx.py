@@ -0,0 +1,110 @@
+"""
+Incremental GPX parsing.
+
+``parse_gpx`` reads a GPX document with ``xml.etree.ElementTree.iterparse``
+and discards every ``<trkpt>`` element as soon as its values have been copied
+into the output arrays, so memory stays proportional to the number of points
+(a few bytes each) rather than to the size of the XML tree. Route points
+(``<rtept>``) are accepted when a file carries no track points.
+``parse_gpx_upload`` does the same for an upload request.
+"""
+
+from array import array
+from typing import IO, Any, Dict, Optional
+from xml.etree import ElementTree
+
+from .track_codec import TrackData, parse_timestamp
+
+
+class GPXParseError(ValueError):
+    """Raised when an uploaded file is not a usable GPX document."""
+
+
+def _local_name(tag: str) -> str:
+    """Strip the XML namespace from an element tag."""
+    return tag.rsplit('}', 1)[-1]
+
+
+def parse_gpx(source: IO[bytes]) -> TrackData:
+    """Parse track points from a GPX file object into a ``TrackData``.
+
+    All ``<trkseg>`` segments are concatenated in document order. Elevation
+    and time streams are dropped if any point is missing them.
+    """
+    lat, lon, ele, times = array('d'), array('d'), array('d'), array('q')
+    route = (array('d'), array('d'), array('d'), array('q'))
+    has_ele = has_time = True
+    route_has_ele = route_has_time = True
+    parent: Optional[ElementTree.Element] = None
+    names: Dict[str, str] = {}
+    try:
+        for event, elem in ElementTree.iterparse(source, events=('start', 'end')):
+            name = names.get(elem.tag)
+            if name is None:
+                name = names[elem.tag] = _local_name(elem.tag)
+            if event == 'start':
+                if name in ('trkseg', 'rte'):
+                    parent = elem
+                continue
+            if name not in ('trkpt', 'rtept'):
+                continue
+            is_track = name == 'trkpt'
+            out_lat, out_lon, out_ele, out_time = (lat, lon, ele, times) if is_track else route
+            out_lat.append(float(elem.attrib['lat']))
+            out_lon.append(float(elem.attrib['lon']))
+            point_ele = point_time = None
+            for child in elem:
+                child_name = names.get(child.tag) or _local_name(child.tag)
+                if child_name == 'ele' and child.text:
+                    point_ele = float(child.text)
+                elif child_name == 'time' and child.text:
+                    point_time = parse_timestamp(child.text)
+            if point_ele is None:
+                if is_track:
+                    has_ele = False
+                else:
+                    route_has_ele = False
+            else:
+                out_ele.append(point_ele)
+            if point_time is None:
+                if is_track:
+                    has_time = False
+                else:
+                    route_has_time = False
+            else:
+                out_time.append(point_time)
+            # Drop the processed point so the tree never grows
+            elem.clear()
+            if parent is not None and len(parent) and parent[-1] is elem:
+                del parent[-1]
+    except (ElementTree.ParseError, KeyError, ValueError) as exc:
+        raise GPXParseError(f'Invalid GPX file: {exc}') from exc
+    if not lat and route[0]:
+        lat, lon, ele, times = route
+        has_ele, has_time = route_has_ele, route_has_time
+    if not lat:
+        raise GPXParseError('GPX file contains no track points')
+    track = TrackData(
+        lat,
+        lon,
+        ele if has_ele and len(ele) == len(lat) else None,
+        times if has_time and len(times) == len(lat) else None,
+    )
+    try:
+        return track.validate()
+    except ValueError as exc:  # NaN, infinite or out-of-range coordinates
+        raise GPXParseError(f'Invalid GPX file: {exc}') from exc
+
+
+def parse_gpx_upload(request: Any) -> TrackData:
+    """Parse the GPX file of an upload ``request``.
+
+    The file is read from the ``file`` field of multipart form data, or from
+    the raw request body otherwise.
+    """
+    if request.mimetype == 'multipart/form-data':
+        upload = request.files.get('file')
+        if upload is None:
+            raise GPXParseError('A GPX file must be sent in the "file" field')
+        return parse_gpx(upload.stream)
+    return parse_gpx(request.stream)
@@ -0,0 +1,250 @@
+"""
+Compact binary encoding for GPS tracks.
+
+Track points are stored as four parallel streams (latitude, longitude,
+elevation and timestamp). Each stream is quantised to integers, delta encoded
+against the previous point and written as zigzag varints, which typically
+shrinks a recorded track to 5–8 bytes per point compared with 60–100 bytes in
+JSON. Decoding yields ``array`` buffers that can be wrapped zero‑copy by NumPy
+when it is installed. GeoJSON and GPX are only produced on demand.
+"""
+
+import datetime
+import struct
+from array import array
+from typing import Any, Dict, Iterable, List, Optional
+from xml.sax.saxutils import escape
+
+# Binary layout identifier stored in ``Track.encoding``
+ENCODING = 'mht1'
+
+_MAGIC = b'MHT1'
+_HEADER = struct.Struct('<4sBI')  # magic, flags, point count
+_FLAG_ELEVATION = 0x01
+_FLAG_TIME = 0x02
+
+# Quantisation: 1e-6 degrees (~0.1 m) and decimetres for elevation
+_COORD_SCALE = 1_000_000
+_ELEVATION_SCALE = 10
+# Elevations accepted, in metres (Dead Sea shore to above Everest)
+MIN_ELEVATION, MAX_ELEVATION = -500.0, 9000.0
+
+
+class TrackData:
+    """Decoded track with coordinate streams held in ``array`` buffers.
+
+    ``time`` holds Unix timestamps in seconds. ``ele`` and ``time`` are
+    ``None`` when the source track did not carry them for every point.
+    """
+
+    __slots__ = ('lat', 'lon', 'ele', 'time')
+
+    def __init__(
+        self,
+        lat: array,
+        lon: array,
+        ele: Optional[array] = None,
+        time: Optional[array] = None,
+    ) -> None:
+        self.lat = lat
+        self.lon = lon
+        self.ele = ele
+        self.time = time
+
+    def __len__(self) -> int:
+        return len(self.lat)
+
+    def validate(self) -> 'TrackData':
+        """Return the track, or raise ``ValueError`` for a missing or out-of-range value.
+
+        NaN fails every comparison, so it is rejected along with infinities.
+        """
+        if len(self.lon) != len(self.lat):
+            raise ValueError('lat and lon must have the same number of points')
+        checks = [('lat', self.lat, -90.0, 90.0), ('lon', self.lon, -180.0, 180.0)]
+        if self.ele is not None:
+            checks.append(('ele', self.ele, MIN_ELEVATION, MAX_ELEVATION))
+        for name, values, low, high in checks:
+            if not all(low <= value <= high for value in values):
+                raise ValueError(f'Every {name} must be a number between {low:g} and {high:g}')
+        return self
+
+    @classmethod
+    def from_points(cls, points: Iterable[Dict[str, Any]]) -> 'TrackData':
+        """Build a track from an iterable of ``{lat, lon, ele?, time?}`` dicts."""
+        lat, lon, ele, times = array('d'), array('d'), array('d'), array('q')
+        has_ele = has_time = True
+        for point in points:
+            lat.append(float(point['lat']))
+            lon.append(float(point['lon'] if 'lon' in point else point['lng']))
+            elevation = point.get('ele', point.get('elevation'))
+            if elevation is None:
+                has_ele = False
+            elif has_ele:
+                ele.append(float(elevation))
+            timestamp = parse_timestamp(point.get('time'))
+            if timestamp is None:
+                has_time = False
+            elif has_time:
+                times.append(timestamp)
+        return cls(lat, lon, ele if has_ele and ele else None, times if has_time and times else None).validate()
+
+    @classmethod
+    def from_gpx_data(cls, gpx_data: Any) -> 'TrackData':
+        """Build a track from the JSON payload clients send as ``gpx_data``.
+
+        Accepted shapes are ``{"points": [...]}``, a bare list of point dicts
+        and GeoJSON ``LineString`` geometries or features whose coordinates
+        are ``[lon, lat, ele?]``.
+        """
+        if isinstance(gpx_data, list):
+            return cls.from_points(gpx_data)
+        if not isinstance(gpx_data, dict):
+            raise ValueError('gpx_data must be an object or a list of points')
+        if 'points' in gpx_data:
+            return cls.from_points(gpx_data['points'] or [])
+        geometry = gpx_data.get('geometry', gpx_data)
+        if not isinstance(geometry, dict):
+            raise ValueError('gpx_data geometry must be an object')
+        if geometry.get('type') == 'LineString':
+            return cls.from_points(
+                {'lon': c[0], 'lat': c[1], 'ele': c[2] if len(c) > 2 else None}
+                for c in geometry.get('coordinates', [])
+            )
+        raise ValueError('gpx_data must contain "points" or a GeoJSON LineString')
+
+    def bbox(self) -> Optional[List[float]]:
+        """Return ``[min_lon, min_lat, max_lon, max_lat]`` or ``None`` if empty."""
+        if not self.lat:
+            return None
+        return [min(self.lon), min(self.lat), max(self.lon), max(self.lat)]
+
+    def to_geojson(self, properties: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """Render the track as a GeoJSON ``LineString`` feature."""
+        if self.ele is not None:
+            coordinates = [list(c) for c in zip(self.lon, self.lat, self.ele)]
+        else:
+            coordinates = [list(c) for c in zip(self.lon, self.lat)]
+        props = dict(properties or {})
+        if self.time is not None:
+            props['coordTimes'] = [format_timestamp(t) for t in self.time]
+        return {
+            'type': 'Feature',
+            'geometry': {'type': 'LineString', 'coordinates': coordinates},
+            'properties': props,
+        }
+
+    def to_gpx(self, name: Optional[str] = None) -> str:
+        """Render the track as a GPX 1.1 document."""
+        parts = [
+            '<?xml version="1.0" encoding="UTF-8"?>\n',
+            '<gpx version="1.1" creator="MountainHub" xmlns="http://www.topografix.com/GPX/1/1">\n',
+            '<trk>',
+        ]
+        if name:
+            parts.append(f'<name>{escape(name)}</name>')
+        parts.append('<trkseg>\n')
+        for i in range(len(self.lat)):
+            parts.append(f'<trkpt lat="{self.lat[i]:.6f}" lon="{self.lon[i]:.6f}">')
+            if self.ele is not None:
+                parts.append(f'<ele>{self.ele[i]:.1f}</ele>')
+            if self.time is not None:
+                parts.append(f'<time>{format_timestamp(self.time[i])}</time>')
+            parts.append('</trkpt>\n')
+        parts.append('</trkseg></trk>\n</gpx>\n')
+        return ''.join(parts)
+
+
+def encode_track(track: TrackData) -> bytes:
+    """Serialise a track to the compact ``mht1`` binary format.
+
+    Raises ``ValueError`` for a track that fails :meth:`TrackData.validate`.
+    """
+    track.validate()
+    flags = 0
+    if track.ele is not None:
+        flags |= _FLAG_ELEVATION
+    if track.time is not None:
+        flags |= _FLAG_TIME
+    out = bytearray(_HEADER.pack(_MAGIC, flags, len(track)))
+    _write_stream(out, (round(v * _COORD_SCALE) for v in track.lat))
+    _write_stream(out, (round(v * _COORD_SCALE) for v in track.lon))
+    if track.ele is not None:
+        _write_stream(out, (round(v * _ELEVATION_SCALE) for v in track.ele))
+    if track.time is not None:
+        _write_stream(out, track.time)
+    return bytes(out)
+
+
+def decode_track(data: bytes) -> TrackData:
+    """Decode a track previously produced by :func:`encode_track`."""
+    magic, flags, count = _HEADER.unpack_from(data, 0)
+    if magic != _MAGIC:
+        raise ValueError('Unsupported track encoding')
+    pos = _HEADER.size
+    lat_i, pos = _read_stream(data, pos, count)
+    lon_i, pos = _read_stream(data, pos, count)
+    lat = array('d', (v / _COORD_SCALE for v in lat_i))
+    lon = array('d', (v / _COORD_SCALE for v in lon_i))
+    ele = time = None
+    if flags & _FLAG_ELEVATION:
+        ele_i, pos = _read_stream(data, pos, count)
+        ele = array('d', (v / _ELEVATION_SCALE for v in ele_i))
+    if flags & _FLAG_TIME:
+        time, pos = _read_stream(data, pos, count)
+    return TrackData(lat, lon, ele, time)
+
+
+def _write_stream(out: bytearray, values: Iterable[int]) -> None:
+    """Append ``values`` as zigzag varint deltas."""
+    previous = 0
+    append = out.append
+    for value in values:
+        delta = value - previous
+        previous = value
+        zz = (delta << 1) ^ (delta >> 63)
+        while zz > 0x7F:
+            append((zz & 0x7F) | 0x80)
+            zz >>= 7
+        append(zz)
+
+
+def _read_stream(data: bytes, pos: int, count: int) -> tuple:
+    """Read ``count`` zigzag varint deltas starting at ``pos``."""
+    values = array('q', bytes(8 * count))
+    previous = 0
+    for i in range(count):
+        shift = zz = 0
+        while True:
+            byte = data[pos]
+            pos += 1
+            zz |= (byte & 0x7F) << shift
+            if byte < 0x80:
+                break
+            shift += 7
+        previous += (zz >> 1) ^ -(zz & 1)
+        values[i] = previous
+    return values, pos
+
+
+def parse_timestamp(value: Any) -> Optional[int]:
+    """Convert an ISO 8601 string or epoch number to Unix seconds."""
+    if value is None or value == '':
+        return None
+    if isinstance(value, (int, float)):
+        return int(value)
+    text = str(value).strip()
+    if text.endswith('Z'):
+        text = text[:-1] + '+00:00'
+    try:
+        parsed = datetime.datetime.fromisoformat(text)
+    except ValueError:
+        return None
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=datetime.timezone.utc)
+    return int(parsed.timestamp())
+
+
+def format_timestamp(timestamp: int) -> str:
+    """Format Unix seconds as an ISO 8601 UTC string."""
+    return datetime.datetime.fromtimestamp(timestamp, datetime.timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ')
@@ -0,0 +1,182 @@
+"""
+Summary metrics for GPS tracks.
+
+``compute_track_metrics`` derives the figures clients used to compute
+themselves: haversine distance, smoothed elevation gain and loss, elapsed
+and moving time, and the bounding box. When NumPy is installed the whole
+track is processed with vectorised array operations (the ``array`` buffers of
+``TrackData`` are wrapped without copying); otherwise an equivalent
+pure‑Python path is used.
+"""
+
+import functools
+import math
+from typing import Any, Dict, List, Optional
+
+from .track_codec import TrackData
+
+EARTH_RADIUS_M = 6_371_008.8
+# Moving-average window (points) applied to elevation before summing climbs
+ELEVATION_SMOOTHING_WINDOW = 5
+# Segments slower than this are counted as stopped time (about 1 km/h)
+MOVING_SPEED_THRESHOLD_MS = 0.3
+
+
+@functools.lru_cache(maxsize=None)
+def _numpy() -> Any:
+    """Return the NumPy module, or ``None``; imported on first use to keep startup light."""
+    try:  # pragma: no cover - exercised depending on the environment
+        import numpy
+    except ImportError:  # pragma: no cover
+        return None
+    return numpy
+
+
+def compute_track_metrics(track: TrackData) -> Dict[str, Any]:
+    """Return distance, climb, timing and bounding box figures for ``track``."""
+    if len(track) == 0:
+        return _empty_metrics()
+    if _numpy() is not None:
+        segments = _segment_distances_numpy(track)
+        gain, loss = _elevation_change_numpy(track.ele)
+        distance = float(segments.sum())
+        moving = _moving_seconds_numpy(track.time, segments)
+    else:
+        segments = _segment_distances_python(track)
+        gain, loss = _elevation_change_python(track.ele)
+        distance = math.fsum(segments)
+        moving = _moving_seconds_python(track.time, segments)
+    elapsed = float(track.time[-1] - track.time[0]) if track.time is not None else None
+    return {
+        'point_count': len(track),
+        'distance_km': round(distance / 1000.0, 3),
+        'elevation_gain': round(gain) if gain is not None else None,
+        'elevation_loss': round(loss) if loss is not None else None,
+        'min_elevation': min(track.ele) if track.ele is not None else None,
+        'max_elevation': max(track.ele) if track.ele is not None else None,
+        'duration_hours': round(elapsed / 3600.0, 3) if elapsed is not None else None,
+        'moving_time_hours': round(moving / 3600.0, 3) if moving is not None else None,
+        'bbox': track.bbox(),
+    }
+
+
+def _empty_metrics() -> Dict[str, Any]:
+    return {
+        'point_count': 0,
+        'distance_km': 0.0,
+        'elevation_gain': None,
+        'elevation_loss': None,
+        'min_elevation': None,
+        'max_elevation': None,
+        'duration_hours': None,
+        'moving_time_hours': None,
+        'bbox': None,
+    }
+
+
+def haversine_m(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    """Great-circle distance in metres between two points given in degrees."""
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    dphi = phi2 - phi1
+    dlmb = math.radians(lon2 - lon1)
+    a = math.sin(dphi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(dlmb / 2) ** 2
+    return 2 * EARTH_RADIUS_M * math.asin(min(1.0, math.sqrt(a)))
+
+
+def segment_distances(track: TrackData):
+    """Return the length in metres of each segment between consecutive points.
+
+    The result is a NumPy array when NumPy is available, otherwise a list.
+    """
+    if _numpy() is not None:
+        return _segment_distances_numpy(track)
+    return _segment_distances_python(track)
+
+
+def smoothed_elevation(ele) -> List[float]:
+    """Return ``ele`` passed through the moving average used for climb totals."""
+    np = _numpy()
+    if np is not None:
+        return _smooth_numpy(np.frombuffer(ele, dtype=np.float64)).tolist()
+    return _smooth_python(ele)
+
+
+def _segment_distances_numpy(track: TrackData):
+    np = _numpy()
+    lat = np.radians(np.frombuffer(track.lat, dtype=np.float64))
+    lon = np.radians(np.frombuffer(track.lon, dtype=np.float64))
+    dphi = np.diff(lat)
+    dlmb = np.diff(lon)
+    a = np.sin(dphi / 2) ** 2 + np.cos(lat[:-1]) * np.cos(lat[1:]) * np.sin(dlmb / 2) ** 2
+    return 2 * EARTH_RADIUS_M * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+
+def _segment_distances_python(track: TrackData) -> List[float]:
+    lat, lon = track.lat, track.lon
+    return [haversine_m(lat[i], lon[i], lat[i + 1], lon[i + 1]) for i in range(len(lat) - 1)]
+
+
+def _smoothing_window(count: int) -> int:
+    return max(1, min(ELEVATION_SMOOTHING_WINDOW, count))
+
+
+def _smooth_numpy(values):
+    np = _numpy()
+    window = _smoothing_window(len(values))
+    # Edge-padded moving average keeps the series length unchanged
+    padded = np.pad(values, (window // 2, window - 1 - window // 2), mode='edge')
+    return np.convolve(padded, np.ones(window) / window, mode='valid')
+
+
+def _smooth_python(ele) -> List[float]:
+    window = _smoothing_window(len(ele))
+    left = window // 2
+    padded = [ele[0]] * left + list(ele) + [ele[-1]] * (window - 1 - left)
+    running = math.fsum(padded[:window])
+    smoothed = [running / window]
+    for i in range(window, len(padded)):
+        running += padded[i] - padded[i - window]
+        smoothed.append(running / window)
+    return smoothed
+
+
+def _elevation_change_numpy(ele) -> tuple:
+    np = _numpy()
+    if ele is None:
+        return None, None
+    diffs = np.diff(_smooth_numpy(np.frombuffer(ele, dtype=np.float64)))
+    return float(diffs[diffs > 0].sum()), float(-diffs[diffs < 0].sum())
+
+
+def _elevation_change_python(ele) -> tuple:
+    if ele is None:
+        return None, None
+    smoothed = _smooth_python(ele)
+    gain = loss = 0.0
+    for previous, current in zip(smoothed, smoothed[1:]):
+        delta = current - previous
+        if delta > 0:
+            gain += delta
+        else:
+            loss -= delta
+    return gain, loss
+
+
+def _moving_seconds_numpy(time, segments) -> Optional[float]:
+    np = _numpy()
+    if time is None:
+        return None
+    dt = np.diff(np.frombuffer(time, dtype=np.int64)).astype(np.float64)
+    moving = (dt > 0) & (segments >= MOVING_SPEED_THRESHOLD_MS * dt)
+    return float(dt[moving].sum())
+
+
+def _moving_seconds_python(time, segments) -> Optional[float]:
+    if time is None:
+        return None
+    total = 0.0
+    for i, distance in enumerate(segments):
+        dt = time[i + 1] - time[i]
+        if dt > 0 and distance >= MOVING_SPEED_THRESHOLD_MS * dt:
+            total += dt
+    return total
@@ -0,0 +1,68 @@
+"""
+Points sampled along a route, for per-waypoint data such as forecasts.
+
+``sample_along`` picks points at regular distances along a decoded track
+(always keeping both ends) and ``waypoint_points`` reads the ``waypoints``
+stored on a trip log. Both return ``(lat, lon, distance_km)`` tuples, with
+the distance along the route, or ``None`` for free-standing waypoints.
+"""
+
+import math
+from itertools import accumulate
+from typing import Any, Iterable, List, Optional, Tuple
+
+from .track_codec import TrackData
+from .track_metrics import segment_distances
+
+RoutePoint = Tuple[float, float, Optional[float]]
+
+
+def sample_along(track: TrackData, spacing_km: float, max_points: int) -> List[RoutePoint]:
+    """Points every ``spacing_km`` along ``track``, at most ``max_points`` of them.
+
+    The spacing is widened when the track is too long for ``max_points``.
+    Each sample is the first track point at or past its target distance; the
+    last one is always the end of the track.
+    """
+    if len(track) == 0:
+        return []
+    if not math.isfinite(spacing_km) or spacing_km <= 0:
+        raise ValueError('spacing_km must be a positive number')
+    cumulative = [0.0, *accumulate(float(d) for d in segment_distances(track))]
+    total = cumulative[-1]
+    if max_points < 2 or total == 0:
+        return [(track.lat[0], track.lon[0], 0.0)]
+    spacing = max(spacing_km * 1000, total / (max_points - 1))
+    samples: List[RoutePoint] = []
+    target = 0.0
+    for index, distance in enumerate(cumulative):
+        if distance >= target:
+            samples.append((track.lat[index], track.lon[index], round(distance / 1000, 3)))
+            target = (int(distance / spacing) + 1) * spacing
+    end = (track.lat[-1], track.lon[-1], round(total / 1000, 3))
+    if samples[-1] != end:
+        # Move a sample lying close to the end onto it rather than crowd the two
+        if len(samples) == max_points or (len(samples) > 1 and total - samples[-1][2] * 1000 < spacing / 2):
+            samples.pop()
+        samples.append(end)
+    return samples
+
+
+def waypoint_points(waypoints: Iterable[Any], max_points: int) -> List[RoutePoint]:
+    """The first ``max_points`` waypoints that carry a valid ``lat`` and ``lon``/``lng``."""
+    points: List[RoutePoint] = []
+    for waypoint in waypoints or ():
+        if not isinstance(waypoint, dict):
+            continue
+        try:
+            lat = float(waypoint['lat'])
+            lon = float(waypoint['lon'] if 'lon' in waypoint else waypoint['lng'])
+        except (KeyError, TypeError, ValueError):
+            continue
+        # NaN fails both comparisons, so it is skipped with out-of-range values
+        if not (-90 <= lat <= 90 and -180 <= lon <= 180):
+            continue
+        points.append((lat, lon, None))
+        if len(points) == max_points:
+            break
+    return points
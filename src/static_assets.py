@@ -0,0 +1,95 @@
+"""
+Serving of the frontend build (single page application).
+
+The static folder is scanned once at startup into a manifest, so the
+catch‑all route no longer calls ``os.path.exists`` on every request. When the
+build step produced precompressed siblings (``app.3f2a1c9e.js.br`` /
+``.gz``) they are served directly with the matching ``Content-Encoding``,
+and fingerprinted assets get long-lived ``immutable`` cache headers while
+``index.html`` is always revalidated.
+"""
+
+import mimetypes
+import os
+import re
+from typing import Dict, Optional, Set
+
+from flask import Flask, request, send_from_directory
+
+from .compression import negotiate_encoding
+
+# Precompressed variants looked for next to each file, most preferred first
+PRECOMPRESSED_SUFFIXES = {'br': '.br', 'gzip': '.gz'}
+# Content-hashed build output, e.g. ``main.3f2a1c9e.js`` or ``index-0b7d94e1.css``: at least
+# 8 hex digits, one of them a decimal digit, so names like ``logo-mountains.svg`` never match
+_FINGERPRINT = re.compile(r'[.-](?=[0-9a-f]*[0-9])[0-9a-f]{8,}\.[a-z0-9]+$')
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+
+
+class StaticManifest:
+    """Snapshot of the files in a static folder and their precompressed variants."""
+
+    def __init__(self, root: Optional[str]) -> None:
+        self.root = root
+        self.files: Dict[str, Set[str]] = {}
+        if root and os.path.isdir(root):
+            self._scan(root)
+
+    def _scan(self, root: str) -> None:
+        paths = set()
+        for directory, _, filenames in os.walk(root):
+            for filename in filenames:
+                relative = os.path.relpath(os.path.join(directory, filename), root)
+                paths.add(relative.replace(os.sep, '/'))
+        suffixes = tuple(PRECOMPRESSED_SUFFIXES.values())
+        for path in paths:
+            if path.endswith(suffixes) and path.rsplit('.', 1)[0] in paths:
+                continue  # a variant, registered with its original below
+            self.files[path] = {
+                encoding for encoding, suffix in PRECOMPRESSED_SUFFIXES.items() if path + suffix in paths
+            }
+
+    def __contains__(self, path: str) -> bool:
+        return path in self.files
+
+    def encodings(self, path: str) -> Set[str]:
+        return self.files.get(path, set())
+
+
+def register_static_routes(app: Flask) -> StaticManifest:
+    """Register the catch-all SPA route backed by a startup manifest."""
+    manifest = StaticManifest(app.static_folder)
+    app.extensions['static_manifest'] = manifest
+
+    @app.route('/', defaults={'path': ''})
+    @app.route('/<path:path>')
+    def serve(path: str):
+        if path and path in manifest:
+            return _send(manifest, path)
+        if 'index.html' in manifest:
+            return _send(manifest, 'index.html')
+        return "Static content not found", 404
+
+    return manifest
+
+
+def _send(manifest: StaticManifest, path: str):
+    encoding = negotiate_encoding(request.accept_encodings, [
+        e for e in PRECOMPRESSED_SUFFIXES if e in manifest.encodings(path)
+    ])
+    mimetype = mimetypes.guess_type(path)[0] or 'application/octet-stream'
+    if encoding:
+        response = send_from_directory(manifest.root, path + PRECOMPRESSED_SUFFIXES[encoding], mimetype=mimetype)
+        response.headers['Content-Encoding'] = encoding
+    else:
+        response = send_from_directory(manifest.root, path, mimetype=mimetype)
+    if manifest.encodings(path):
+        response.vary.add('Accept-Encoding')
+    if _FINGERPRINT.search(path):
+        response.cache_control.no_cache = None
+        response.cache_control.public = True
+        response.cache_control.max_age = IMMUTABLE_MAX_AGE
+        response.cache_control.immutable = True
+    else:
+        response.cache_control.no_cache = True
+    return response
@@ -0,0 +1,477 @@
+"""
+Persistent cache for third-party API responses, shared by all workers.
+
+Entries live in a SQLite database in ``UPSTREAM_CACHE_DIR`` (WAL mode, so
+every gunicorn worker reads and writes the same file concurrently) and
+survive restarts and deploys, so a fresh set of workers does not stampede
+Overpass. Values are stored as compressed JSON (zstd when ``zstandard`` is
+installed, zlib otherwise) and the file is kept under
+``UPSTREAM_CACHE_MAX_MB`` by evicting the least recently used entries
+(access times are tracked to the minute, so cache hits rarely write).
+
+Each entry has a freshness TTL and a further stale window.
+:meth:`UpstreamCache.fetch` returns fresh entries directly; a stale entry is
+returned at once while one worker refreshes it in a background thread
+(stale-while-revalidate). On a miss only one worker calls the upstream: the
+others wait briefly for its result, using a lease row as a cross-process
+lock. Expired entries are kept for a while longer as last known good data,
+served when the upstream fails.
+
+:meth:`UpstreamCache.fetch_many` does the same for a set of keys that the
+upstream can serve in one request (e.g. forecasts for several points): the
+keys that are not fresh are loaded together.
+
+The same file keeps a decaying request count per key (the ``demand``
+table), which the prefetch scheduler in ``src/prefetch.py`` uses to keep
+popular entries fresh.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+import zlib
+from typing import Any, Callable, Dict, Iterator, List, NamedTuple, Optional, Sequence, Tuple
+
+from flask import Response, g, has_request_context
+
+from .json_provider import dumps_bytes, loads_bytes
+from .metrics import cache_requests, record_cache
+
+logger = logging.getLogger('mountainhub.upstream')
+
+try:  # pragma: no cover - optional dependency
+    import zstandard
+except ImportError:  # pragma: no cover
+    zstandard = None
+
+DEFAULT_MAX_MB = 512
+SCHEMA_VERSION = 4
+# Entries past their stale window are kept this long as a fallback for upstream outages
+LAST_GOOD_SECONDS = 7 * 24 * 60 * 60
+# How long a worker may hold the refresh lease for a key before others take over
+LEASE_SECONDS = 60
+# Request counts in the demand table halve every DEMAND_HALF_LIFE seconds
+DEMAND_HALF_LIFE = 6 * 60 * 60
+# How long a worker waits on a miss for another worker's fetch of the same key
+MISS_WAIT_SECONDS = 10
+# Hits only rewrite an entry's LRU access time once it is this old, so most reads take no write lock
+ACCESS_RESOLUTION_SECONDS = 60
+_POLL_SECONDS = 0.1
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    key TEXT PRIMARY KEY,
+    codec TEXT NOT NULL,
+    value BLOB NOT NULL,
+    size INTEGER NOT NULL,
+    digest TEXT NOT NULL,
+    stored_at REAL NOT NULL,
+    fresh_until REAL NOT NULL,
+    stale_until REAL NOT NULL,
+    accessed_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS entries_accessed ON entries (accessed_at);
+CREATE TABLE IF NOT EXISTS leases (
+    key TEXT PRIMARY KEY,
+    expires_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS demand (
+    key TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    args TEXT NOT NULL,
+    score REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+"""
+
+
+def _decay(score: float, age: float) -> float:
+    return score * 0.5 ** (age / DEMAND_HALF_LIFE)
+
+
+def _compress(data: bytes) -> Tuple[str, bytes]:
+    if zstandard is not None:
+        return 'zstd', zstandard.ZstdCompressor(level=6).compress(data)
+    return 'zlib', zlib.compress(data, 6)
+
+
+def _decompress(codec: str, data: bytes) -> bytes:
+    if codec == 'zstd':
+        return zstandard.ZstdDecompressor().decompress(data)
+    return zlib.decompress(data)
+
+
+class Lookup(NamedTuple):
+    value: Any
+    state: Optional[str]  # FRESH, STALE, EXPIRED or None for a miss
+    age: float  # seconds since the value was stored
+
+
+FRESH, STALE, EXPIRED = 'fresh', 'stale', 'expired'
+_MISS = Lookup(None, None, 0.0)
+
+
+class UpstreamCache:
+    """SQLite-backed cache of JSON-serialisable upstream results."""
+
+    def __init__(self, path: str, max_bytes: int = DEFAULT_MAX_MB * 1024 * 1024) -> None:
+        self.path = path
+        self.max_bytes = max_bytes
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        conn = self._connection()
+        if conn.execute('PRAGMA user_version').fetchone()[0] != SCHEMA_VERSION:
+            # It is only a cache: start over rather than migrate
+            conn.executescript(
+                'DROP TABLE IF EXISTS entries; DROP TABLE IF EXISTS leases; DROP TABLE IF EXISTS demand;'
+            )
+            conn.executescript(_SCHEMA)
+            conn.execute(f'PRAGMA user_version = {SCHEMA_VERSION}')
+
+    def _connection(self) -> sqlite3.Connection:
+        # One connection per thread and process: sqlite3 objects must not cross a fork
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None, check_same_thread=False)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            conn.create_function('decay', 2, _decay, deterministic=True)
+            self._local.conn, self._local.pid = conn, os.getpid()
+        return conn
+
+    def get(self, key: str) -> Lookup:
+        """Look ``key`` up; expired entries are returned as last known good data."""
+        conn = self._connection()
+        row = conn.execute(
+            'SELECT codec, value, stored_at, fresh_until, stale_until, accessed_at FROM entries WHERE key = ?',
+            (key,),
+        ).fetchone()
+        if row is None:
+            return _MISS
+        now = time.time()
+        codec, blob, stored_at, fresh_until, stale_until, accessed_at = row
+        if now - accessed_at >= ACCESS_RESOLUTION_SECONDS:
+            conn.execute('UPDATE entries SET accessed_at = ? WHERE key = ?', (now, key))
+        state = FRESH if fresh_until > now else STALE if stale_until > now else EXPIRED
+        return Lookup(loads_bytes(_decompress(codec, blob)), state, now - stored_at)
+
+    def set(self, key: str, value: Any, ttl: float, stale_ttl: float = 0) -> None:
+        """Store ``value`` as fresh for ``ttl`` seconds, then stale for ``stale_ttl``."""
+        data = dumps_bytes(value)
+        codec, blob = _compress(data)
+        now = time.time()
+        conn = self._connection()
+        conn.execute(
+            'INSERT OR REPLACE INTO entries '
+            '(key, codec, value, size, digest, stored_at, fresh_until, stale_until, accessed_at) '
+            'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+            (key, codec, blob, len(blob), hashlib.sha1(data).hexdigest(), now, now + ttl, now + ttl + stale_ttl, now),
+        )
+        self._evict(conn, now)
+
+    def delete(self, key: str) -> None:
+        self._connection().execute('DELETE FROM entries WHERE key = ?', (key,))
+
+    def _evict(self, conn: sqlite3.Connection, now: float) -> None:
+        conn.execute('DELETE FROM entries WHERE stale_until <= ?', (now - LAST_GOOD_SECONDS,))
+        total = conn.execute('SELECT COALESCE(SUM(size), 0) FROM entries').fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        # Drop least recently used entries down to 90% of the limit
+        excess = total - int(self.max_bytes * 0.9)
+        freed = 0
+        victims = []
+        for key, size in conn.execute('SELECT key, size FROM entries ORDER BY accessed_at'):
+            victims.append((key,))
+            freed += size
+            if freed >= excess:
+                break
+        conn.executemany('DELETE FROM entries WHERE key = ?', victims)
+
+    def acquire_lease(self, key: str, seconds: float = LEASE_SECONDS) -> bool:
+        """Take the cross-process lease on ``key`` unless another holder's is still valid."""
+        now = time.time()
+        conn = self._connection()
+        conn.execute('DELETE FROM leases WHERE key = ? AND expires_at <= ?', (key, now))
+        cursor = conn.execute(
+            'INSERT OR IGNORE INTO leases (key, expires_at) VALUES (?, ?)', (key, now + seconds)
+        )
+        return cursor.rowcount == 1
+
+    def _lease_held(self, key: str) -> bool:
+        row = self._connection().execute(
+            'SELECT 1 FROM leases WHERE key = ? AND expires_at > ?', (key, time.time())
+        ).fetchone()
+        return row is not None
+
+    def release_lease(self, key: str) -> None:
+        self._connection().execute('DELETE FROM leases WHERE key = ?', (key,))
+
+    def fresh_until(self, key: str) -> Optional[float]:
+        """When the entry for ``key`` stops being fresh (epoch seconds), if cached."""
+        row = self._connection().execute('SELECT fresh_until FROM entries WHERE key = ?', (key,)).fetchone()
+        return row[0] if row else None
+
+    def prefix_digest(self, prefix: str) -> str:
+        """Hash of the keys and contents of the entries whose key starts with ``prefix``.
+
+        Refreshing an entry with an identical value leaves it unchanged, and
+        no value is read or decompressed to compute it.
+        """
+        digest = hashlib.sha1()
+        rows = self._connection().execute(
+            'SELECT key, digest FROM entries WHERE key >= ? AND key < ? ORDER BY key', (prefix, prefix + '\uffff')
+        )
+        for key, value_digest in rows:
+            digest.update(f'{key}\0{value_digest}\n'.encode())
+        return digest.hexdigest()
+
+    def scan(self, prefix: str) -> Iterator[Tuple[str, Any]]:
+        """``(key, value)`` of every entry whose key starts with ``prefix``, expired ones included.
+
+        Scanning does not count as an access, so it keeps nothing from eviction.
+        """
+        rows = self._connection().execute(
+            'SELECT key, codec, value FROM entries WHERE key >= ? AND key < ? ORDER BY key',
+            (prefix, prefix + '\uffff'),
+        )
+        for key, codec, blob in rows:
+            yield key, loads_bytes(_decompress(codec, blob))
+
+    def record_demand(self, key: str, kind: str, args: List[Any]) -> None:
+        """Count a request for ``key``; ``kind`` and ``args`` say how to refetch it."""
+        self.record_demand_many({key: (kind, args)})
+
+    def record_demand_many(self, demand: Dict[str, Tuple[str, List[Any]]]) -> None:
+        """:meth:`record_demand` for each ``key: (kind, args)``, in one transaction."""
+        now = time.time()
+        conn = self._connection()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            conn.executemany(
+                'INSERT INTO demand (key, kind, args, score, updated_at) VALUES (?, ?, ?, 1, ?) '
+                'ON CONFLICT (key) DO UPDATE SET score = decay(score, excluded.updated_at - updated_at) + 1, '
+                'updated_at = excluded.updated_at',
+                [(key, kind, json.dumps(args), now) for key, (kind, args) in demand.items()],
+            )
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+        conn.execute('COMMIT')
+
+    def popular(self, limit: int, min_score: float = 0.0) -> List[Tuple[str, str, List[Any], float]]:
+        """The most requested keys as ``(key, kind, args, score)``, by decayed request count."""
+        now = time.time()
+        rows = self._connection().execute(
+            'SELECT key, kind, args, decay(score, ? - updated_at) AS current FROM demand '
+            'WHERE current >= ? ORDER BY current DESC LIMIT ?',
+            (now, min_score, limit),
+        ).fetchall()
+        return [(key, kind, json.loads(args), score) for key, kind, args, score in rows]
+
+    def prune_demand(self, min_score: float) -> None:
+        self._connection().execute(
+            'DELETE FROM demand WHERE decay(score, ? - updated_at) < ?', (time.time(), min_score)
+        )
+
+    def _load_and_store(self, key: str, loader: Callable[[], Any], ttl: float, stale_ttl: float) -> Any:
+        try:
+            value = loader()
+            if value is not None:
+                self.set(key, value, ttl, stale_ttl)
+            return value
+        finally:
+            self.release_lease(key)
+
+    def _refresh(self, key: str, loader: Callable[[], Any], ttl: float, stale_ttl: float) -> None:
+        try:
+            self._load_and_store(key, loader, ttl, stale_ttl)
+        except Exception as exc:
+            logger.warning('Background refresh of %s failed: %s', key, exc)
+
+    def _load(self, key: str, loader: Callable[[], Any], ttl: float, stale_ttl: float) -> Any:
+        if self.acquire_lease(key):
+            return self._load_and_store(key, loader, ttl, stale_ttl)
+        # Another worker is fetching this key: wait for its result rather than pile on
+        deadline = time.monotonic() + MISS_WAIT_SECONDS
+        while time.monotonic() < deadline:
+            time.sleep(_POLL_SECONDS)
+            entry = self.get(key)
+            if entry.state in (FRESH, STALE):
+                return entry.value
+            if not self._lease_held(key):
+                break  # the other worker's fetch failed
+        return loader()
+
+    def fetch(self, key: str, loader: Callable[[], Any], ttl: float, stale_ttl: float = 0) -> Any:
+        """Return the cached value for ``key``, calling ``loader`` when needed.
+
+        ``loader`` returns ``None`` when there is no data (never cached) and
+        raises when the upstream fails; an expired entry is then served as
+        last known good data instead of the error. Responses built from
+        stale data get ``Warning``/``Age`` headers (see
+        :func:`add_staleness_headers`).
+        """
+        entry = self.get(key)
+        if entry.state == FRESH:
+            record_cache('upstream', 1, 0)
+            return entry.value
+        if entry.state == STALE:
+            cache_requests.inc(cache='upstream', result='stale')
+            _mark_stale(entry.age)
+            if self.acquire_lease(key):
+                threading.Thread(target=self._refresh, args=(key, loader, ttl, stale_ttl), daemon=True).start()
+            return entry.value
+
+        record_cache('upstream', 0, 1)
+        try:
+            return self._load(key, loader, ttl, stale_ttl)
+        except Exception as exc:
+            if entry.state != EXPIRED:
+                raise
+            logger.warning('Serving last known good %s (%.0f s old): %s', key, entry.age, exc)
+            cache_requests.inc(cache='upstream', result='fallback')
+            _mark_stale(entry.age)
+            return entry.value
+
+    def _refresh_many(self, keys: List[str], load_many: Callable[[List[str]], Dict[str, Any]],
+                      ttl: float, stale_ttl: float) -> None:
+        try:
+            for key, value in load_many(keys).items():
+                if value is not None:
+                    self.set(key, value, ttl, stale_ttl)
+        except Exception as exc:
+            logger.warning('Background refresh of %d keys failed: %s', len(keys), exc)
+        finally:
+            for key in keys:
+                self.release_lease(key)
+
+    def fetch_many(self, keys: Sequence[str], load_many: Callable[[List[str]], Dict[str, Any]],
+                   ttl: float, stale_ttl: float = 0) -> Dict[str, Any]:
+        """:meth:`fetch` for several keys, loading all misses with one ``load_many`` call.
+
+        ``load_many`` takes the keys to load and returns their values by
+        key. Stale entries are served and refreshed together in the
+        background. If ``load_many`` raises, expired entries are served as
+        last known good data; the error propagates only for keys with
+        nothing cached at all.
+        """
+        results: Dict[str, Any] = {}
+        expired: Dict[str, Lookup] = {}
+        misses: List[str] = []
+        refresh: List[str] = []
+        stale = 0
+        for key in dict.fromkeys(keys):
+            entry = self.get(key)
+            if entry.state in (FRESH, STALE):
+                results[key] = entry.value
+                if entry.state == STALE:
+                    stale += 1
+                    _mark_stale(entry.age)
+                    if self.acquire_lease(key):
+                        refresh.append(key)
+            else:
+                if entry.state == EXPIRED:
+                    expired[key] = entry
+                misses.append(key)
+        record_cache('upstream', len(results) - stale, len(misses))
+        if stale:
+            cache_requests.inc(stale, cache='upstream', result='stale')
+        if refresh:
+            threading.Thread(
+                target=self._refresh_many, args=(refresh, load_many, ttl, stale_ttl), daemon=True
+            ).start()
+        if not misses:
+            return results
+        try:
+            loaded = load_many(misses)
+        except Exception as exc:
+            if len(expired) < len(misses):
+                raise
+            logger.warning('Serving last known good data for %d keys: %s', len(expired), exc)
+            cache_requests.inc(len(expired), cache='upstream', result='fallback')
+            for key, entry in expired.items():
+                _mark_stale(entry.age)
+                results[key] = entry.value
+            return results
+        for key in misses:
+            value = loaded.get(key)
+            if value is not None:
+                self.set(key, value, ttl, stale_ttl)
+            results[key] = value
+        return results
+
+
+def _mark_stale(age: float) -> None:
+    if has_request_context():
+        g.upstream_stale_age = max(age, g.get('upstream_stale_age', 0.0))
+
+
+def add_staleness_headers(response: Response) -> Response:
+    """Flag a response built from stale upstream data (``after_request`` hook)."""
+    age = g.get('upstream_stale_age')
+    if age is not None:
+        response.headers['Warning'] = '110 - "Response is Stale"'
+        response.headers['Age'] = str(int(age))
+    return response
+
+
+_cache: Optional[UpstreamCache] = None
+_cache_lock = threading.Lock()
+
+
+def upstream_cache() -> Optional[UpstreamCache]:
+    """The process-wide cache, or ``None`` when ``UPSTREAM_CACHE_ENABLED=0``."""
+    global _cache
+    if os.getenv('UPSTREAM_CACHE_ENABLED', '1') != '1':
+        return None
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                directory = os.getenv(
+                    'UPSTREAM_CACHE_DIR', os.path.join(tempfile.gettempdir(), 'mountainhub-upstream-cache')
+                )
+                max_mb = int(os.getenv('UPSTREAM_CACHE_MAX_MB', str(DEFAULT_MAX_MB)))
+                _cache = UpstreamCache(os.path.join(directory, 'upstream.db'), max_mb * 1024 * 1024)
+    return _cache
+
+
+def cached_upstream(key: str, loader: Callable[[], Any], ttl: float, stale_ttl: float = 0,
+                    demand: Optional[Tuple[str, List[Any]]] = None) -> Any:
+    """:meth:`UpstreamCache.fetch` on the process-wide cache, or ``loader()`` if disabled.
+
+    ``demand`` is ``(kind, args)`` for :mod:`src.prefetch`: the request is
+    counted so popular keys are refreshed in the background.
+    """
+    cache = upstream_cache()
+    if cache is None:
+        return loader()
+    if demand is not None:
+        try:
+            cache.record_demand(key, *demand)
+        except sqlite3.OperationalError as exc:  # pragma: no cover - database busy
+            logger.debug('Could not record demand for %s: %s', key, exc)
+    return cache.fetch(key, loader, ttl, stale_ttl)
+
+
+def cached_upstream_many(keys: Sequence[str], load_many: Callable[[List[str]], Dict[str, Any]],
+                         ttl: float, stale_ttl: float = 0,
+                         demand: Optional[Dict[str, Tuple[str, List[Any]]]] = None) -> Dict[str, Any]:
+    """:meth:`UpstreamCache.fetch_many` on the process-wide cache, or ``load_many(keys)`` if disabled.
+
+    ``demand`` maps keys to ``(kind, args)`` as in :func:`cached_upstream`.
+    """
+    cache = upstream_cache()
+    if cache is None:
+        return load_many(list(dict.fromkeys(keys)))
+    if demand:
+        try:
+            cache.record_demand_many(demand)
+        except sqlite3.OperationalError as exc:  # pragma: no cover - database busy
+            logger.debug('Could not record demand for %d keys: %s', len(demand), exc)
+    return cache.fetch_many(keys, load_many, ttl, stale_ttl)
@@ -0,0 +1,115 @@
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import unittest
+
+from flask import Flask, jsonify
+
+sys.path.insert(0, os.path.abspath(os.path.dirname(__file__)))
+
+from src.admission import EXPENSIVE_CLASS, QUEUED, RUNNING, AdmissionState, init_admission, rate_limit_class
+
+
+class AdmissionStateTest(unittest.TestCase):
+    """Test per i token bucket e gli slot di concorrenza condivisi tra i worker"""
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmpdir, 'admission.bin')
+        self.state = AdmissionState(self.path, buckets=64, running=2, queued=1)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_token_bucket(self):
+        now = 1000.0
+        for _ in range(3):
+            self.assertEqual(self.state.take('a', rate=1, burst=3, now=now), (True, 0.0))
+        allowed, retry_after = self.state.take('a', rate=1, burst=3, now=now)
+        self.assertFalse(allowed)
+        self.assertAlmostEqual(retry_after, 1.0)
+        # Other clients have their own bucket
+        self.assertTrue(self.state.take('b', rate=1, burst=3, now=now)[0])
+        # Another process opening the same file sees the same buckets
+        other = AdmissionState(self.path, buckets=64, running=2, queued=1)
+        self.assertFalse(other.take('a', rate=1, burst=3, now=now + 0.5)[0])
+        self.assertTrue(other.take('a', rate=1, burst=3, now=now + 1.5)[0])
+
+    def test_full_table_reuses_idle_buckets(self):
+        state = AdmissionState(os.path.join(self.tmpdir, 'small.bin'), buckets=4, running=1, queued=1)
+        for index in range(20):
+            self.assertTrue(state.take(f'client-{index}', rate=1, burst=1, now=1000.0 + index)[0])
+
+    def test_queue_is_bounded(self):
+        self.assertIsNotNone(self.state.claim(RUNNING))
+        self.assertIsNotNone(self.state.claim(RUNNING))
+        self.assertEqual(self.state.admit(timeout=0.05), (None, 'queue_timeout'))
+        waiting = threading.Thread(target=self.state.admit, args=(0.5,))
+        waiting.start()
+        time.sleep(0.1)
+        self.assertEqual(self.state.in_use(QUEUED), 1)
+        self.assertEqual(self.state.admit(timeout=0.05), (None, 'queue_full'))
+        waiting.join()
+
+    def test_queued_request_gets_a_freed_slot(self):
+        first = self.state.claim(RUNNING)
+        self.state.claim(RUNNING)
+        threading.Timer(0.1, self.state.release, (RUNNING, first)).start()
+        self.assertEqual(self.state.admit(timeout=2), (first, ''))
+
+    def test_slots_of_dead_workers_are_reclaimed(self):
+        worker = subprocess.Popen([sys.executable, '-c', 'pass'])
+        worker.wait()
+        self.state.claim(RUNNING, pid=worker.pid)
+        self.state.claim(RUNNING, pid=worker.pid)
+        self.assertIsNotNone(self.state.claim(RUNNING))
+        self.state.release_process(worker.pid)
+        self.assertEqual(self.state.in_use(RUNNING), 1)
+
+
+class AdmissionMiddlewareTest(unittest.TestCase):
+    """Test per le risposte 429 sugli endpoint costosi"""
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        app = Flask(__name__)
+        app.config.update(
+            RATE_LIMIT_PATH=os.path.join(self.tmpdir, 'admission.bin'),
+            RATE_LIMIT_TRUSTED_PROXIES=1,
+            RATE_LIMITS={'default': (600, 100), EXPENSIVE_CLASS: (6, 2)},
+        )
+        init_admission(app)
+
+        @app.route('/cheap')
+        def cheap():
+            return jsonify({}), 200
+
+        @app.route('/expensive')
+        @rate_limit_class(EXPENSIVE_CLASS)
+        def expensive():
+            return jsonify({}), 200
+
+        self.client = app.test_client()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def _get(self, path, client='203.0.113.1'):
+        return self.client.get(path, headers={'X-Forwarded-For': client})
+
+    def test_expensive_endpoints_are_limited_per_client(self):
+        self.assertEqual(self._get('/expensive').status_code, 200)
+        self.assertEqual(self._get('/expensive').status_code, 200)
+        response = self._get('/expensive')
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response.headers['Retry-After'], '10')
+        self.assertEqual(self._get('/cheap').status_code, 200)
+        self.assertEqual(self._get('/expensive', client='203.0.113.2').status_code, 200)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -9,6 +9,7 @@ from flask_testing import TestCase
 # Aggiungi la directory principale al path per importare i moduli
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
+from src.json_provider import FastJSONProvider
 from src.models.user import db, User
 from src.models.trail import Trail
 from src.models.equipment import Equipment
@@ -22,6 +23,8 @@ def create_test_app():
     app.config['TESTING'] = True
     app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///:memory:'
     app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    # Come in produzione: i to_dict restituiscono datetime e Decimal così come sono
+    app.json = FastJSONProvider(app)
     
     db.init_app(app)
     
@@ -107,6 +110,15 @@ class MountainHubAPITest(unittest.TestCase):
             self.assertEqual(len(equipment), 1)
             self.assertEqual(equipment[0].name, 'Scarponi da trekking')
 
+    def test_to_dict_json_encoding(self):
+        """Test per la serializzazione JSON di datetime e Decimal nei to_dict"""
+        with self.app.app_context():
+            trail = Trail.query.one()
+            equipment = Equipment.query.one()
+            data = json.loads(self.app.json.dumps({'trail': trail.to_dict(), 'equipment': equipment.to_dict()}))
+            self.assertEqual(data['trail']['created_at'], trail.created_at.isoformat())
+            self.assertEqual(data['equipment']['rating'], 4.5)
+
 if __name__ == '__main__':
     unittest.main()
 
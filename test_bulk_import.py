@@ -0,0 +1,194 @@
+import io
+import json
+import os
+import sys
+import unittest
+
+from flask import Flask
+
+sys.path.insert(0, os.path.abspath(os.path.dirname(__file__)))
+
+from src.models import db, Trail, TripLog, User
+from src.routes.trail import trail_bp
+from src.routes.trip_log import trip_log_bp
+from src.services.bulk_import import RowError, as_date, as_json, iter_records, require
+
+
+def create_test_app():
+    app = Flask(__name__)
+    app.config['TESTING'] = True
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///:memory:'
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    # Smaller than the test inputs, so batching and intermediate commits are exercised
+    app.config['BULK_IMPORT_BATCH_SIZE'] = 2
+    app.config['BULK_IMPORT_TRANSACTION_SIZE'] = 2
+    db.init_app(app)
+    app.register_blueprint(trail_bp, url_prefix='/api')
+    app.register_blueprint(trip_log_bp, url_prefix='/api')
+    return app
+
+
+class BulkImportParsingTest(unittest.TestCase):
+    """Test per la lettura di flussi NDJSON/CSV nell'import massivo"""
+
+    def test_ndjson_rows_and_errors(self):
+        body = b'{"name": "a"}\n\n{bad\n[1, 2]\n{"name": "b"}\n'
+        records = list(iter_records(io.BytesIO(body), 'application/x-ndjson'))
+        self.assertEqual([r[0] for r in records], [1, 2, 3, 4])
+        self.assertEqual(records[0][1], {'name': 'a'})
+        self.assertIsNotNone(records[1][2])
+        self.assertEqual(records[2][2], 'Each line must be a JSON object')
+        self.assertEqual(records[3][1], {'name': 'b'})
+
+    def test_csv_drops_empty_cells(self):
+        body = 'name,region,season_availability\nMonte Test,,"[""summer""]"\n'.encode()
+        (row, record, error), = iter_records(io.BytesIO(body), 'text/csv')
+        self.assertEqual(row, 1)
+        self.assertIsNone(error)
+        self.assertEqual(record, {'name': 'Monte Test', 'season_availability': '["summer"]'})
+        self.assertEqual(as_json(record, 'season_availability'), ['summer'])
+
+    def test_unsupported_content_type(self):
+        with self.assertRaises(ValueError):
+            iter_records(io.BytesIO(b''), 'text/plain')
+
+    def test_field_helpers(self):
+        with self.assertRaises(RowError):
+            require({'name': ''}, 'name')
+        with self.assertRaises(RowError):
+            as_date({'date': '01/02/2024'}, 'date')
+        self.assertEqual(as_date({'date': '2024-02-01T10:00:00'}, 'date').isoformat(), '2024-02-01')
+
+
+class BulkImportEndpointTest(unittest.TestCase):
+    """Test per gli endpoint di import massivo di sentieri e diari"""
+
+    def setUp(self):
+        self.app = create_test_app()
+        self.client = self.app.test_client()
+        with self.app.app_context():
+            db.create_all(bind_key=None)
+            user = User(username='u', email='u@example.com', password_hash='x')
+            db.session.add(user)
+            db.session.commit()
+            self.user_id = user.id
+
+    def tearDown(self):
+        with self.app.app_context():
+            db.session.remove()
+            db.drop_all(bind_key=None)
+
+    def _names(self, model, field):
+        with self.app.app_context():
+            return sorted(getattr(row, field) for row in model.query.all())
+
+    def test_trails_ndjson_with_bad_rows_and_rollback(self):
+        with self.app.app_context():
+            # A database-side failure for one row, to exercise the rollback path
+            db.session.execute(db.text(
+                "CREATE TRIGGER reject_boom BEFORE INSERT ON trail WHEN NEW.name = 'Boom' "
+                "BEGIN SELECT RAISE(ABORT, 'boom'); END"
+            ))
+            db.session.commit()
+        rows = [
+            {'name': 'A', 'difficulty': 'easy', 'created_by': self.user_id},
+            {'name': 'B', 'difficulty': 'hard', 'created_by': self.user_id, 'distance_km': '7.5'},
+            '{bad',
+            {'name': 'C', 'difficulty': 'easy', 'created_by': 'nobody'},
+            {'name': 'D', 'difficulty': 'easy', 'created_by': self.user_id},
+            {'name': 'E', 'difficulty': 'easy', 'created_by': self.user_id},
+            {'name': 'Boom', 'difficulty': 'easy', 'created_by': self.user_id},
+            {'name': 'F', 'difficulty': 'vertical', 'created_by': self.user_id},
+            {'name': 'G', 'difficulty': 'easy', 'created_by': self.user_id},
+            {'name': 'H', 'difficulty': 'moderate', 'created_by': self.user_id},
+        ]
+        body = '\n'.join(row if isinstance(row, str) else json.dumps(row) for row in rows)
+        response = self.client.post('/api/trails/bulk', data=body, content_type='application/x-ndjson')
+        self.assertEqual(response.status_code, 200)
+        result = response.get_json()
+        # Batches: [1, 2] committed; [4 (unknown user), 5] leaves 5 pending;
+        # [6, 7] fails on 7 and rolls back 5 and 6; [9, 10] committed
+        self.assertEqual(result['inserted'], 4)
+        self.assertEqual(result['failed'], 6)
+        errors = {error['row']: error['error'] for error in result['errors']}
+        self.assertEqual(sorted(errors), [3, 4, 5, 6, 7, 8])
+        self.assertIn('Invalid JSON', errors[3])
+        self.assertEqual(errors[4], "created_by 'nobody' does not exist")
+        self.assertTrue(all(errors[row].startswith('Database error') for row in (5, 6, 7)))
+        self.assertIn('difficulty must be one of', errors[8])
+        self.assertEqual(self._names(Trail, 'name'), ['A', 'B', 'G', 'H'])
+
+    def test_trip_logs_csv_with_bad_rows(self):
+        with self.app.app_context():
+            trail = Trail(name='Monte Test', difficulty='moderate', created_by=self.user_id)
+            db.session.add(trail)
+            db.session.commit()
+            trail_id = trail.id
+        body = '\n'.join([
+            'user_id,title,date,distance_km,trail_id,companions',
+            f'{self.user_id},Primo,2024-07-01,12.5,{trail_id},"[""u2""]"',
+            f'{self.user_id},,2024-07-02,,,',
+            f'{self.user_id},Data sbagliata,01/07/2024,,,',
+            f'{self.user_id},Sentiero ignoto,2024-07-03,,missing,',
+            'nobody,Utente ignoto,2024-07-04,,,',
+            f'{self.user_id},Ultimo,2024-07-05,abc,,',
+            f'{self.user_id},Secondo,2024-07-06,,,',
+        ]) + '\n'
+        response = self.client.post('/api/trip-logs/bulk', data=body, content_type='text/csv')
+        self.assertEqual(response.status_code, 200)
+        result = response.get_json()
+        self.assertEqual(result['inserted'], 2)
+        errors = {error['row']: error['error'] for error in result['errors']}
+        self.assertEqual(errors, {
+            2: 'title is required',
+            3: 'date must be an ISO date (YYYY-MM-DD)',
+            4: "trail_id 'missing' does not exist",
+            5: "user_id 'nobody' does not exist",
+            6: 'distance_km must be a number',
+        })
+        self.assertEqual(self._names(TripLog, 'title'), ['Primo', 'Secondo'])
+        with self.app.app_context():
+            first = TripLog.query.filter_by(title='Primo').one()
+            self.assertEqual((first.distance_km, first.trail_id, first.companions), (12.5, trail_id, ['u2']))
+
+    def test_malformed_values_are_row_errors(self):
+        body = '\n'.join([
+            'name,difficulty,created_by,elevation_gain_m,distance_km',
+            f'Nan,easy,{self.user_id},nan,',
+            f'Inf,easy,{self.user_id},,inf',
+            f'Enorme,easy,{self.user_id},1e30,',
+            f'Buono,easy,{self.user_id},800,12.5',
+        ]).encode() + f'\nRifugio \xe0,easy,{self.user_id},,\nUltimo,hard,{self.user_id},,\n'.encode('latin-1')
+        response = self.client.post('/api/trails/bulk', data=body, content_type='text/csv')
+        self.assertEqual(response.status_code, 200)
+        result = response.get_json()
+        errors = {error['row']: error['error'] for error in result['errors']}
+        self.assertEqual(errors, {
+            1: 'elevation_gain_m must be a finite number',
+            2: 'distance_km must be a finite number',
+            3: 'elevation_gain_m is out of range',
+            5: 'Row is not valid UTF-8',
+        })
+        self.assertEqual(self._names(Trail, 'name'), ['Buono', 'Ultimo'])
+
+        rows = [
+            {'name': 'Lista', 'difficulty': ['easy'], 'created_by': self.user_id},
+            {'name': 'Oggetto', 'difficulty': 'easy', 'created_by': {'id': self.user_id}},
+            {'name': 'Descrizione', 'difficulty': 'easy', 'created_by': self.user_id, 'description': {'a': 1}},
+            {'name': 'Ok', 'difficulty': 'easy', 'created_by': self.user_id},
+        ]
+        body = '\n'.join(json.dumps(row) for row in rows)
+        result = self.client.post('/api/trails/bulk', data=body, content_type='application/x-ndjson').get_json()
+        self.assertEqual(result['inserted'], 1)
+        errors = {error['row']: error['error'] for error in result['errors']}
+        self.assertIn('difficulty must be one of', errors[1])
+        self.assertEqual(errors[2], 'created_by must be an id, not dict')
+        self.assertEqual(errors[3], 'description must be a string')
+
+    def test_unsupported_content_type(self):
+        response = self.client.post('/api/trails/bulk', data='name\n', content_type='text/plain')
+        self.assertEqual(response.status_code, 415)
+
+
+if __name__ == '__main__':
+    unittest.main()
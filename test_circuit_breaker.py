@@ -0,0 +1,114 @@
+import os
+import shutil
+import sys
+import tempfile
+import time
+import unittest
+from unittest import mock
+
+import requests
+from flask import Flask
+
+sys.path.insert(0, os.path.abspath(os.path.dirname(__file__)))
+
+from src import circuit_breaker
+from src.circuit_breaker import CircuitBreaker, CircuitOpenError
+from src.routes.external import external_bp
+from src.upstream_cache import upstream_cache
+
+
+class CircuitBreakerTest(unittest.TestCase):
+    """Test per il circuit breaker delle API esterne"""
+
+    def setUp(self):
+        self.breaker = CircuitBreaker('test', failure_threshold=2, reset_timeout=0.05,
+                                      is_failure=lambda exc: not isinstance(exc, KeyError))
+
+    def _fail(self, exc=RuntimeError):
+        with self.assertRaises(exc):
+            with self.breaker.guard():
+                raise exc('boom')
+
+    def test_opens_after_repeated_failures_and_fails_fast(self):
+        self._fail()
+        self.assertEqual(self.breaker.state, 'closed')
+        self._fail()
+        self.assertEqual(self.breaker.state, 'open')
+        with self.assertRaises(CircuitOpenError) as raised:
+            with self.breaker.guard():
+                self.fail('the upstream must not be called')
+        self.assertGreater(raised.exception.retry_after, 0)
+
+    def test_half_open_trial(self):
+        self._fail()
+        self._fail()
+        time.sleep(0.06)
+        self._fail()  # the trial fails: open again
+        self.assertEqual(self.breaker.state, 'open')
+        time.sleep(0.06)
+        with self.breaker.guard():
+            self.assertEqual(self.breaker.state, 'half_open')
+        self.assertEqual(self.breaker.state, 'closed')
+
+    def test_non_failures_do_not_count(self):
+        self._fail(KeyError)
+        self._fail(KeyError)
+        self.assertEqual(self.breaker.state, 'closed')
+
+
+class ExternalRoutesTest(unittest.TestCase):
+    """Test per la risposta degli endpoint esterni quando Overpass non risponde"""
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.env = mock.patch.dict(os.environ, {'UPSTREAM_CACHE_DIR': self.tmpdir, 'CIRCUIT_FAILURE_THRESHOLD': '2'})
+        self.env.start()
+        # Fresh process-wide cache and breakers for each test
+        self.state = mock.patch.multiple('src.upstream_cache', _cache=None)
+        self.state.start()
+        circuit_breaker._breakers.clear()
+        app = Flask(__name__)
+        app.register_blueprint(external_bp, url_prefix='/api/external')
+        self.client = app.test_client()
+        self.url = '/api/external/refuges?south=46.3&west=11.6&north=46.5&east=11.9'
+
+    def tearDown(self):
+        circuit_breaker._breakers.clear()
+        self.state.stop()
+        self.env.stop()
+        shutil.rmtree(self.tmpdir)
+
+    def test_outage_returns_503_then_fails_fast(self):
+        with mock.patch('requests.Session.post', side_effect=requests.exceptions.ConnectTimeout('timed out')) as post:
+            for _ in range(3):
+                response = self.client.get(self.url)
+                self.assertEqual(response.status_code, 503)
+                self.assertIn('Retry-After', response.headers)
+        self.assertEqual(post.call_count, 2)
+
+    def test_invalid_json_counts_as_a_failure(self):
+        garbage = mock.Mock(status_code=200)
+        garbage.json.side_effect = ValueError('Expecting value')
+        with mock.patch('requests.Session.post', return_value=garbage) as post:
+            for _ in range(3):
+                self.assertEqual(self.client.get(self.url).status_code, 503)
+        self.assertEqual(post.call_count, 2)
+
+    def test_outage_serves_last_known_good_data(self):
+        ok = mock.Mock(status_code=200)
+        ok.json.return_value = {'elements': [{'type': 'node', 'id': 1, 'lat': 46.4, 'lon': 11.7, 'tags': {}}]}
+        with mock.patch('requests.Session.post', return_value=ok):
+            self.assertEqual(self.client.get(self.url).status_code, 200)
+        # Expire the entry by rewriting it with no freshness left
+        cache = upstream_cache()
+        key = cache._connection().execute('SELECT key FROM entries').fetchone()[0]
+        cache.set(key, cache.get(key).value, ttl=0)
+        with mock.patch('requests.Session.post', side_effect=requests.exceptions.ConnectionError('refused')):
+            response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.get_json()['features']), 1)
+        self.assertEqual(response.headers['Warning'], '110 - "Response is Stale"')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,109 @@
+import gzip
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+from flask import Flask, Response, jsonify
+
+sys.path.insert(0, os.path.abspath(os.path.dirname(__file__)))
+
+from src.compression import init_compression
+from src.static_assets import register_static_routes
+
+
+def create_test_app(static_folder=None):
+    app = Flask(__name__, static_folder=static_folder)
+    app.config['TESTING'] = True
+
+    @app.route('/api/big')
+    def big():
+        return jsonify([{'name': 'Sentiero %d' % i, 'difficulty': 'moderate'} for i in range(200)])
+
+    @app.route('/api/small')
+    def small():
+        return jsonify({'ok': True})
+
+    @app.route('/api/stream')
+    def stream():
+        return Response(('{"i": %d}\n' % i for i in range(5000)), mimetype='application/x-ndjson')
+
+    init_compression(app)
+    register_static_routes(app)
+    return app
+
+
+class CompressionTest(unittest.TestCase):
+    """Test per la compressione delle risposte e gli asset statici precompressi"""
+
+    def setUp(self):
+        self.static_dir = tempfile.mkdtemp()
+        os.makedirs(os.path.join(self.static_dir, 'assets'))
+        with open(os.path.join(self.static_dir, 'index.html'), 'w') as handle:
+            handle.write('<html></html>')
+        asset = os.path.join(self.static_dir, 'assets', 'app.3f2a1c9e.js')
+        with open(asset, 'w') as handle:
+            handle.write('console.log(1);' * 100)
+        with open(asset, 'rb') as src, gzip.open(asset + '.gz', 'wb') as dst:
+            shutil.copyfileobj(src, dst)
+        self.client = create_test_app(self.static_dir).test_client()
+
+    def tearDown(self):
+        shutil.rmtree(self.static_dir)
+
+    def test_gzip_json(self):
+        response = self.client.get('/api/big', headers={'Accept-Encoding': 'gzip'})
+        self.assertEqual(response.headers['Content-Encoding'], 'gzip')
+        self.assertIn('Accept-Encoding', response.headers['Vary'])
+        self.assertIn(b'Sentiero 199', gzip.decompress(response.data))
+
+    def test_thresholds_and_negotiation(self):
+        self.assertNotIn('Content-Encoding', self.client.get('/api/small', headers={'Accept-Encoding': 'gzip'}).headers)
+        self.assertNotIn('Content-Encoding', self.client.get('/api/big').headers)
+        self.assertNotIn('Content-Encoding', self.client.get('/api/big', headers={'Accept-Encoding': 'gzip;q=0'}).headers)
+
+    def test_streamed_response(self):
+        response = self.client.get('/api/stream', headers={'Accept-Encoding': 'gzip'})
+        self.assertEqual(response.headers['Content-Encoding'], 'gzip')
+        self.assertEqual(gzip.decompress(response.data).count(b'\n'), 5000)
+
+    def test_precompressed_static_asset(self):
+        response = self.client.get('/assets/app.3f2a1c9e.js', headers={'Accept-Encoding': 'gzip'})
+        self.assertEqual(response.headers['Content-Encoding'], 'gzip')
+        self.assertEqual(response.mimetype, 'text/javascript')
+        self.assertIn('immutable', response.headers['Cache-Control'])
+        self.assertEqual(gzip.decompress(response.data), b'console.log(1);' * 100)
+        response.close()
+
+    def test_long_names_are_not_fingerprints(self):
+        for name in ('logo-mountains.svg', 'app.bundle-settings.js', 'icons.deadbeefcafe.png'):
+            with open(os.path.join(self.static_dir, 'assets', name), 'w') as handle:
+                handle.write('x')
+        client = create_test_app(self.static_dir).test_client()
+        for name in ('logo-mountains.svg', 'app.bundle-settings.js', 'icons.deadbeefcafe.png'):
+            response = client.get('/assets/' + name)
+            self.assertNotIn('immutable', response.headers['Cache-Control'], name)
+            self.assertIn('no-cache', response.headers['Cache-Control'], name)
+            response.close()
+
+    def test_head_negotiates_like_get(self):
+        get = self.client.get('/api/big', headers={'Accept-Encoding': 'gzip'})
+        head = self.client.head('/api/big', headers={'Accept-Encoding': 'gzip'})
+        self.assertEqual(head.headers['Content-Encoding'], 'gzip')
+        self.assertEqual(head.headers['Vary'], get.headers['Vary'])
+        self.assertEqual(head.headers['Content-Length'], get.headers['Content-Length'])
+        self.assertEqual(head.data, b'')
+        head = self.client.head('/assets/app.3f2a1c9e.js', headers={'Accept-Encoding': 'gzip'})
+        self.assertEqual(head.headers['Content-Encoding'], 'gzip')
+        head.close()
+
+    def test_spa_fallback(self):
+        response = self.client.get('/trails/123')
+        self.assertEqual(response.data, b'<html></html>')
+        self.assertIn('no-cache', response.headers['Cache-Control'])
+        response.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,139 @@
+import datetime
+import os
+import sys
+import unittest
+
+from flask import Flask
+
+sys.path.insert(0, os.path.abspath(os.path.dirname(__file__)))
+
+from src.compression import init_compression
+from src.models import db, Trail, TripLog, User
+from src.query_inspector import capture_queries, init_query_inspector
+from src.routes.trail import trail_bp
+from src.routes.trip_log import trip_log_bp
+
+
+def create_test_app():
+    app = Flask(__name__)
+    app.config['TESTING'] = True
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///:memory:'
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    # Installs the statement hooks used by ``capture_queries``
+    app.config['QUERY_INSPECTOR_ENABLED'] = True
+    db.init_app(app)
+    init_query_inspector(app)
+    app.register_blueprint(trail_bp, url_prefix='/api')
+    app.register_blueprint(trip_log_bp, url_prefix='/api')
+    return app
+
+
+class ConditionalGetTest(unittest.TestCase):
+    """Test per le GET condizionali con ETag e Last-Modified"""
+
+    def setUp(self):
+        self.app = create_test_app()
+        self.client = self.app.test_client()
+        with self.app.app_context():
+            db.create_all(bind_key=None)
+            trail = Trail(name='Monte Test', difficulty='moderate')
+            db.session.add(trail)
+            db.session.commit()
+            self.trail_id = trail.id
+
+    def tearDown(self):
+        with self.app.app_context():
+            db.session.remove()
+            db.drop_all(bind_key=None)
+
+    def test_matching_etag_returns_304_without_body(self):
+        first = self.client.get(f'/api/trails/{self.trail_id}')
+        self.assertEqual(first.status_code, 200)
+        self.assertIsNotNone(first.headers.get('ETag'))
+        again = self.client.get(f'/api/trails/{self.trail_id}', headers={'If-None-Match': first.headers['ETag']})
+        self.assertEqual(again.status_code, 304)
+        self.assertEqual(again.data, b'')
+        self.assertEqual(again.headers['ETag'], first.headers['ETag'])
+
+    def test_304_repeats_the_etag_of_a_compressed_response(self):
+        self.app.config['COMPRESS_MIN_SIZE'] = 0
+        init_compression(self.app)
+        url = f'/api/trails/{self.trail_id}'
+        first = self.client.get(url, headers={'Accept-Encoding': 'gzip'})
+        self.assertEqual(first.headers['Content-Encoding'], 'gzip')
+        self.assertTrue(first.headers['ETag'].startswith('W/'))
+        again = self.client.get(url, headers={'Accept-Encoding': 'gzip', 'If-None-Match': first.headers['ETag']})
+        self.assertEqual(again.status_code, 304)
+        self.assertEqual(again.headers['ETag'], first.headers['ETag'])
+        self.assertEqual(self.client.get(url).headers['ETag'], first.headers['ETag'])
+
+    def test_etag_changes_after_put_and_delete(self):
+        url = f'/api/trails/{self.trail_id}'
+        before = self.client.get(url).headers['ETag']
+        self.assertEqual(self.client.put(url, json={'name': 'Monte Nuovo'}).status_code, 200)
+        after_put = self.client.get(url, headers={'If-None-Match': before})
+        self.assertEqual(after_put.status_code, 200)
+        self.assertNotEqual(after_put.headers['ETag'], before)
+        self.assertEqual(after_put.get_json()['name'], 'Monte Nuovo')
+
+        listing = self.client.get('/api/trails').headers['ETag']
+        self.assertIn(self.client.delete(url).status_code, (200, 204))
+        gone = self.client.get(url, headers={'If-None-Match': after_put.headers['ETag']})
+        self.assertEqual(gone.status_code, 404)
+        self.assertNotEqual(self.client.get('/api/trails').headers['ETag'], listing)
+
+    def test_list_etag_changes_with_row_count(self):
+        first = self.client.get('/api/trails')
+        etag = first.headers['ETag']
+        self.assertEqual(self.client.get('/api/trails', headers={'If-None-Match': etag}).status_code, 304)
+        with self.app.app_context():
+            db.session.add(Trail(name='Secondo', difficulty='easy'))
+            db.session.commit()
+        response = self.client.get('/api/trails', headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.get_json()), 2)
+        # Collections are validated by ETag only
+        self.assertIsNone(response.headers.get('Last-Modified'))
+
+    def test_if_modified_since(self):
+        url = f'/api/trails/{self.trail_id}'
+        modified = self.client.get(url).headers['Last-Modified']
+        self.assertEqual(self.client.get(url, headers={'If-Modified-Since': modified}).status_code, 304)
+        earlier = 'Mon, 01 Jan 2001 00:00:00 GMT'
+        self.assertEqual(self.client.get(url, headers={'If-Modified-Since': earlier}).status_code, 200)
+
+    def test_not_modified_does_not_load_rows(self):
+        url = f'/api/trails/{self.trail_id}'
+        etag = self.client.get(url).headers['ETag']
+        listing = self.client.get('/api/trails').headers['ETag']
+        with capture_queries() as detail_log:
+            self.assertEqual(self.client.get(url, headers={'If-None-Match': etag}).status_code, 304)
+        with capture_queries() as list_log:
+            self.assertEqual(self.client.get('/api/trails', headers={'If-None-Match': listing}).status_code, 304)
+        # Only the version query runs, selecting no row columns
+        for log in (detail_log, list_log):
+            self.assertEqual(len(log), 1, log.statements)
+            self.assertNotIn('trail.name', log.statements[0])
+
+
+    def test_clearing_a_track_changes_the_etag(self):
+        with self.app.app_context():
+            user = User(username='u', email='u@example.com', password_hash='x')
+            db.session.add(user)
+            db.session.flush()
+            log = TripLog(user_id=user.id, title='Giro', date=datetime.date(2024, 7, 1))
+            db.session.add(log)
+            db.session.commit()
+            url = f'/api/trip-logs/{log.id}?include=track'
+        points = {'points': [{'lat': 46.0, 'lon': 11.0}, {'lat': 46.01, 'lon': 11.0}]}
+        self.assertEqual(self.client.put(url.split('?')[0], json={'gpx_data': points}).status_code, 200)
+        with_track = self.client.get(url)
+        self.assertIsNotNone(with_track.get_json()['gpx_data'])
+        self.assertEqual(self.client.put(url.split('?')[0], json={'gpx_data': None}).status_code, 200)
+        response = self.client.get(url, headers={'If-None-Match': with_track.headers['ETag']})
+        self.assertEqual(response.status_code, 200)
+        self.assertIsNone(response.get_json()['gpx_data'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,148 @@
+import datetime
+import json
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+from flask import Flask
+
+sys.path.insert(0, os.path.abspath(os.path.dirname(__file__)))
+
+from src.db_config import database_url, engine_options, init_database
+from sqlalchemy.dialects import postgresql
+
+from src.models import db, Guide, Trail, TripLog, User
+from src.models.track import migrate_legacy_gpx_data
+from src.models.types import json_array_contains, upgrade_json_columns
+
+
+class DatabaseConfigTest(unittest.TestCase):
+    """Test per la configurazione del database e il tipo JSON portabile"""
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.app = Flask(__name__)
+        self.app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///' + os.path.join(self.tmpdir, 'test.db')
+        init_database(self.app)
+
+    def tearDown(self):
+        with self.app.app_context():
+            db.session.remove()
+            db.engine.dispose()
+        shutil.rmtree(self.tmpdir)
+
+    def test_sqlite_connections_use_wal(self):
+        with self.app.app_context():
+            with db.engine.connect() as conn:
+                self.assertEqual(conn.exec_driver_sql('PRAGMA journal_mode').scalar(), 'wal')
+                self.assertEqual(conn.exec_driver_sql('PRAGMA synchronous').scalar(), 1)
+                self.assertGreater(conn.exec_driver_sql('PRAGMA busy_timeout').scalar(), 0)
+
+    def test_json_columns_round_trip_on_sqlite(self):
+        with self.app.app_context():
+            db.create_all()
+            guide = Guide(title='Primi passi', description='Guida', difficulty='beginner', steps=[{'title': 'Zaino'}])
+            user = User(username='u', email='u@example.com', password_hash='x')
+            db.session.add_all([guide, user])
+            db.session.flush()
+            log = TripLog(user_id=user.id, title='Giro', date=datetime.date(2024, 7, 1),
+                          location_coords={'lat': 46.1, 'lng': 11.2})
+            db.session.add(log)
+            db.session.commit()
+            guide.steps.append({'title': 'Mappa'})
+            log.location_coords['lat'] = 46.2
+            db.session.commit()
+            db.session.expire_all()
+            self.assertEqual([s['title'] for s in Guide.query.one().steps], ['Zaino', 'Mappa'])
+            self.assertEqual(TripLog.query.one().location_coords['lat'], 46.2)
+
+    def test_json_array_contains_filters_in_sql(self):
+        with self.app.app_context():
+            db.create_all()
+            user = User(username='u', email='u@example.com', password_hash='x')
+            db.session.add(user)
+            db.session.flush()
+            db.session.add_all([
+                Trail(name='Invernale', difficulty='easy', season_availability=['winter', 'spring']),
+                Trail(name='Estiva', difficulty='easy', season_availability=['summer']),
+                TripLog(user_id=user.id, title='Con Ugo', date=datetime.date(2024, 1, 5),
+                        companions=[{'name': 'Ugo', 'user_id': 'u1'}]),
+                TripLog(user_id=user.id, title='Da solo', date=datetime.date(2024, 1, 6), companions=['u1']),
+            ])
+            db.session.commit()
+            winter = Trail.query.filter(json_array_contains(Trail.season_availability, 'winter')).all()
+            self.assertEqual([t.name for t in winter], ['Invernale'])
+            with_ugo = TripLog.query.filter(json_array_contains(TripLog.companions, {'user_id': 'u1'})).all()
+            self.assertEqual([t.title for t in with_ugo], ['Con Ugo'])
+
+        sql = str(json_array_contains(Trail.season_availability, 'winter').compile(dialect=postgresql.dialect()))
+        self.assertIn('@>', sql)
+
+    def test_legacy_gpx_data_moves_to_tracks(self):
+        with self.app.app_context():
+            db.create_all()
+            self.assertEqual(migrate_legacy_gpx_data(), 0)
+            with db.engine.begin() as conn:
+                conn.exec_driver_sql('ALTER TABLE trip_logs ADD COLUMN gpx_data JSON')
+            user = User(username='u', email='u@example.com', password_hash='x')
+            db.session.add(user)
+            db.session.flush()
+            logs = [TripLog(user_id=user.id, title=title, date=datetime.date(2024, 7, 1), distance_km=distance)
+                    for title, distance in (('Vecchio', None), ('Rotto', None), ('Manuale', 9.0))]
+            db.session.add_all(logs)
+            db.session.commit()
+            line = {'type': 'LineString', 'coordinates': [[11.0, 46.0, 1000.0], [11.01, 46.01, 1100.0]]}
+            points = [{'lat': 46.0, 'lon': 11.0}, {'lat': 46.1, 'lon': 11.0}]
+            for log, payload in zip(logs, ({'geometry': line}, {'geometry': 'bad'}, {'points': points})):
+                db.session.execute(db.text('UPDATE trip_logs SET gpx_data = :data WHERE id = :id'),
+                                   {'data': json.dumps(payload), 'id': log.id})
+            db.session.commit()
+
+            self.assertEqual(migrate_legacy_gpx_data(), 2)
+            self.assertEqual(migrate_legacy_gpx_data(), 0)
+            db.session.expire_all()
+            old, broken, manual = (db.session.get(TripLog, log.id) for log in logs)
+            self.assertEqual(old.track.point_count, 2)
+            self.assertTrue(old.track.has_elevation)
+            self.assertGreater(old.distance_km, 1)
+            self.assertIsNone(broken.track)
+            self.assertEqual(manual.track.point_count, 2)
+            self.assertEqual(manual.distance_km, 9.0)
+
+    def test_existing_postgresql_schema_is_upgraded(self):
+        """JSON columns of an older database become JSONB and the GIN indexes are added."""
+        dialect = postgresql.dialect()
+        connection = mock.Mock(dialect=dialect)
+        inspector = mock.Mock()
+        inspector.get_table_names.return_value = ['trail', 'trip_logs']
+        inspector.get_columns.side_effect = lambda table: [
+            {'name': 'season_availability', 'type': postgresql.JSONB()},
+            {'name': 'companions', 'type': postgresql.JSON()},
+            {'name': 'title', 'type': db.String()},
+        ]
+        with mock.patch('src.models.types.inspect', return_value=inspector):
+            self.assertEqual(upgrade_json_columns(connection, db.metadata), 1)
+        sql = [str(call.args[0].compile(dialect=dialect)).strip() for call in connection.execute.call_args_list]
+        self.assertIn('ALTER TABLE trip_logs ALTER COLUMN companions TYPE jsonb USING companions::jsonb', sql)
+        self.assertIn('CREATE INDEX IF NOT EXISTS ix_trail_season_availability ON trail '
+                      'USING gin (season_availability jsonb_path_ops)', sql)
+        self.assertTrue(any(statement.startswith('CREATE INDEX IF NOT EXISTS ix_trip_logs_companions') for statement in sql))
+        self.assertFalse(any(' ON equipment ' in statement for statement in sql))
+        # Other backends are left alone
+        self.assertEqual(upgrade_json_columns(mock.Mock(dialect=mock.Mock(name='sqlite')), db.metadata), 0)
+
+    def test_server_database_gets_pool_options(self):
+        with mock.patch.dict(os.environ, {'DATABASE_URL': 'postgres://u:p@db/mountainhub', 'DB_POOL_SIZE': '20'}):
+            url = database_url()
+            options = engine_options(url)
+        self.assertTrue(url.startswith('postgresql://'))
+        self.assertEqual(options['pool_size'], 20)
+        self.assertTrue(options['pool_pre_ping'])
+        self.assertEqual(engine_options('sqlite:///x.db'), {})
+
+
+if __name__ == '__main__':
+    unittest.main()
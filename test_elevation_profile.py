@@ -0,0 +1,154 @@
+import datetime
+import io
+import os
+import sys
+import unittest
+from array import array
+
+from flask import Flask
+
+sys.path.insert(0, os.path.abspath(os.path.dirname(__file__)))
+
+from src.models import db, Trail, TripLog, User
+from src.routes.trail import trail_bp
+from src.routes.trip_log import trip_log_bp
+from src.services.elevation_profile import (
+    NoElevationData, ProfileCache, build_profile, detect_climbs, lttb, profile_cache,
+)
+from src.services.track_codec import TrackData
+
+GPX = '''<?xml version="1.0"?>
+<gpx version="1.1" xmlns="http://www.topografix.com/GPX/1/1"><trk><trkseg>
+<trkpt lat="46.000" lon="11.0">{0}</trkpt>
+<trkpt lat="46.005" lon="11.0">{1}</trkpt>
+<trkpt lat="46.010" lon="11.0">{2}</trkpt>
+</trkseg></trk></gpx>'''
+GPX_WITH_ELEVATION = GPX.format('<ele>1500</ele>', '<ele>1550</ele>', '<ele>1600</ele>')
+GPX_WITHOUT_ELEVATION = GPX.format('', '', '')
+
+
+def create_test_app():
+    app = Flask(__name__)
+    app.config['TESTING'] = True
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///:memory:'
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    db.init_app(app)
+    app.register_blueprint(trail_bp, url_prefix='/api')
+    app.register_blueprint(trip_log_bp, url_prefix='/api')
+    return app
+
+
+class ElevationProfileTest(unittest.TestCase):
+    """Test per profili altimetrici, LTTB e rilevamento salite"""
+
+    def test_lttb_keeps_endpoints_and_peak(self):
+        data = [(float(i), 0.0) for i in range(1000)]
+        data[500] = (500.0, 100.0)
+        sampled = lttb(data, 20)
+        self.assertEqual(len(sampled), 20)
+        self.assertEqual(sampled[0], data[0])
+        self.assertEqual(sampled[-1], data[-1])
+        self.assertIn((500.0, 100.0), sampled)
+        self.assertEqual(lttb(data[:10], 20), data[:10])
+
+    def test_detect_climbs(self):
+        # Up 100 m, small 10 m dip, up 50 m, down 200 m, up 20 m (too small)
+        elevations = [0, 50, 100, 90, 140, 40, -60, -40]
+        distances = [i * 100.0 for i in range(len(elevations))]
+        climbs = detect_climbs(distances, elevations)
+        self.assertEqual(len(climbs), 1)
+        self.assertEqual(climbs[0]['elevation_gain'], 140)
+        self.assertEqual(climbs[0]['end_km'], 0.4)
+
+    def test_build_profile_requires_elevation(self):
+        track = TrackData(array('d', [46.0, 46.1]), array('d', [11.0, 11.0]))
+        with self.assertRaises(NoElevationData):
+            build_profile(track)
+
+    def test_cache_computes_once_per_key(self):
+        cache = ProfileCache(max_entries=2)
+        calls = []
+        compute = lambda: calls.append(1) or {'ok': True}
+        cache.get_or_compute(('trail', 1, 'v1'), compute)
+        cache.get_or_compute(('trail', 1, 'v1'), compute)
+        self.assertEqual(len(calls), 1)
+        cache.get_or_compute(('trail', 1, 'v2'), compute)
+        cache.get_or_compute(('trail', 2, 'v1'), compute)
+        cache.get_or_compute(('trail', 1, 'v1'), compute)
+        self.assertEqual(len(calls), 4)
+
+
+class ProfileEndpointTest(unittest.TestCase):
+    """Test per gli endpoint dei profili altimetrici di sentieri e diari"""
+
+    def setUp(self):
+        profile_cache.clear()
+        self.app = create_test_app()
+        self.client = self.app.test_client()
+        with self.app.app_context():
+            db.create_all(bind_key=None)
+            user = User(username='u', email='u@example.com', password_hash='x')
+            db.session.add(user)
+            db.session.flush()
+            trail = Trail(name='Monte Test', difficulty='moderate')
+            log = TripLog(user_id=user.id, title='Giro', date=datetime.date(2024, 7, 1))
+            db.session.add_all([trail, log])
+            db.session.commit()
+            self.trail_url, self.log_url = f'/api/trails/{trail.id}', f'/api/trip-logs/{log.id}'
+            self.user_id = user.id
+
+    def tearDown(self):
+        with self.app.app_context():
+            db.session.remove()
+            db.drop_all(bind_key=None)
+
+    def test_profile_status_codes(self):
+        for url, missing in ((self.trail_url, '/api/trails/missing'), (self.log_url, '/api/trip-logs/999')):
+            self.assertEqual(self.client.get(missing + '/profile').status_code, 404)
+            # No track yet
+            self.assertEqual(self.client.get(url + '/profile').status_code, 404)
+            # A track without elevations cannot be profiled
+            upload = self.client.post(url + '/gpx', data=GPX_WITHOUT_ELEVATION, content_type='application/gpx+xml')
+            self.assertEqual(upload.status_code, 200)
+            response = self.client.get(url + '/profile')
+            self.assertEqual(response.status_code, 422)
+            self.assertEqual(response.get_json()['error'], 'Track has no elevation data')
+
+    def test_profile_after_multipart_upload(self):
+        for url, climb in ((self.trail_url, 'elevation_gain_m'), (self.log_url, 'elevation_gain')):
+            missing_file = self.client.post(url + '/gpx', data={}, content_type='multipart/form-data')
+            self.assertEqual(missing_file.status_code, 400)
+            upload = self.client.post(url + '/gpx', data={
+                'file': (io.BytesIO(GPX_WITH_ELEVATION.encode()), 'track.gpx'),
+            }, content_type='multipart/form-data')
+            self.assertEqual(upload.status_code, 200)
+            # The track's metrics are copied onto the trail or log
+            self.assertAlmostEqual(upload.get_json()['distance_km'], 1.11, places=2)
+            self.assertGreater(upload.get_json()[climb], 0)
+            response = self.client.get(url + '/profile?points=2')
+            self.assertEqual(response.status_code, 200)
+            profile = response.get_json()
+            self.assertEqual(profile['source_points'], 3)
+            self.assertEqual(len(profile['points']), 3)  # at least 3 points are kept
+            self.assertEqual((profile['min_elevation'], profile['max_elevation']), (1500.0, 1600.0))
+            self.assertAlmostEqual(profile['distance_km'], 1.11, places=2)
+
+    def test_out_of_range_gpx_data_is_rejected(self):
+        for coordinate in ('Infinity', 'NaN', '1e30'):
+            body = ('{"user_id": "%s", "title": "Giro", "date": "2024-07-01", "gpx_data": '
+                    '{"points": [{"lat": 46.0, "lon": 11.0}, {"lat": %s, "lon": 11.0}]}}') % (self.user_id, coordinate)
+            response = self.client.post('/api/trip-logs', data=body, content_type='application/json')
+            self.assertEqual(response.status_code, 400, coordinate)
+            self.assertIn('Invalid gpx_data', response.get_json()['error'])
+
+    def test_out_of_range_gpx_upload_is_rejected(self):
+        for url in (self.trail_url, self.log_url):
+            for bad in ('lat="nan"', 'lat="inf"', 'lat="1e30"'):
+                body = GPX_WITH_ELEVATION.replace('lat="46.005"', bad)
+                response = self.client.post(url + '/gpx', data=body, content_type='application/gpx+xml')
+                self.assertEqual(response.status_code, 400, (url, bad))
+            self.assertEqual(self.client.get(url + '/profile').status_code, 404)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,65 @@
+import io
+import os
+import sys
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.abspath(os.path.dirname(__file__)))
+
+from src.services import track_metrics
+from src.services.gpx import GPXParseError, parse_gpx
+from src.services.track_metrics import compute_track_metrics
+
+GPX_SAMPLE = b"""<?xml version="1.0" encoding="UTF-8"?>
+<gpx version="1.1" xmlns="http://www.topografix.com/GPX/1/1">
+  <trk><name>Test</name>
+    <trkseg>
+      <trkpt lat="46.0000" lon="11.0000"><ele>1000</ele><time>2024-07-01T08:00:00Z</time></trkpt>
+      <trkpt lat="46.0010" lon="11.0000"><ele>1010</ele><time>2024-07-01T08:01:00Z</time></trkpt>
+    </trkseg>
+    <trkseg>
+      <trkpt lat="46.0020" lon="11.0000"><ele>1020</ele><time>2024-07-01T08:02:00Z</time></trkpt>
+      <trkpt lat="46.0020" lon="11.0000"><ele>1020</ele><time>2024-07-01T08:12:00Z</time></trkpt>
+    </trkseg>
+  </trk>
+</gpx>"""
+
+
+class GPXTest(unittest.TestCase):
+    """Test per il parsing GPX e il calcolo delle metriche di traccia"""
+
+    def test_parse_segments(self):
+        track = parse_gpx(io.BytesIO(GPX_SAMPLE))
+        self.assertEqual(len(track), 4)
+        self.assertEqual(list(track.ele), [1000.0, 1010.0, 1020.0, 1020.0])
+        self.assertEqual(track.time[-1] - track.time[0], 720)
+
+    def test_invalid_files(self):
+        with self.assertRaises(GPXParseError):
+            parse_gpx(io.BytesIO(b'<gpx><trk>'))
+        with self.assertRaises(GPXParseError):
+            parse_gpx(io.BytesIO(b'<gpx version="1.1"></gpx>'))
+        for point in (b'<trkpt lat="nan" lon="11"/>', b'<trkpt lat="46" lon="inf"/>',
+                      b'<trkpt lat="1e30" lon="11"/>', b'<trkpt lat="46" lon="11"><ele>1e30</ele></trkpt>'):
+            with self.assertRaises(GPXParseError, msg=point):
+                parse_gpx(io.BytesIO(b'<gpx><trk><trkseg>' + point + b'</trkseg></trk></gpx>'))
+
+    def test_metrics(self):
+        metrics = compute_track_metrics(parse_gpx(io.BytesIO(GPX_SAMPLE)))
+        self.assertAlmostEqual(metrics['distance_km'], 0.222, places=3)
+        self.assertEqual(metrics['elevation_loss'], 0)
+        self.assertGreater(metrics['elevation_gain'], 0)
+        self.assertEqual(metrics['duration_hours'], 0.2)
+        # The final ten minutes without movement are not moving time
+        self.assertAlmostEqual(metrics['moving_time_hours'], 120 / 3600, places=3)
+        self.assertEqual(metrics['bbox'], [11.0, 46.0, 11.0, 46.002])
+
+    def test_pure_python_fallback_matches(self):
+        track = parse_gpx(io.BytesIO(GPX_SAMPLE))
+        expected = compute_track_metrics(track)
+        with mock.patch.object(track_metrics, '_numpy', lambda: None):
+            self.assertEqual(compute_track_metrics(track), expected)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,49 @@
+import datetime
+import decimal
+import json
+import os
+import sys
+import unittest
+
+from flask import Flask, jsonify
+
+sys.path.insert(0, os.path.abspath(os.path.dirname(__file__)))
+
+from src.json_provider import FastJSONProvider, stdlib_dumps_bytes
+
+
+class JSONProviderTest(unittest.TestCase):
+    """Test per il provider JSON compatto"""
+
+    def setUp(self):
+        self.app = Flask(__name__)
+        self.app.json = FastJSONProvider(self.app)
+        self.payload = {
+            'date': datetime.date(2024, 7, 14),
+            'created_at': datetime.datetime(2024, 7, 14, 6, 30, 15, 250000),
+            'rating': decimal.Decimal('4.25'),
+            'name': 'Rifugio Città di Fiume',
+        }
+
+    def test_native_types_are_encoded_as_iso_and_numbers(self):
+        @self.app.route('/x')
+        def view():
+            return jsonify(self.payload)
+
+        response = self.app.test_client().get('/x')
+        self.assertEqual(response.mimetype, 'application/json')
+        body = json.loads(response.data)
+        self.assertEqual(body['date'], '2024-07-14')
+        self.assertEqual(body['created_at'], '2024-07-14T06:30:15.250000')
+        self.assertEqual(body['rating'], 4.25)
+        self.assertNotIn(b': ', response.data)
+
+    def test_fallback_matches_fast_encoder(self):
+        with self.app.app_context():
+            self.assertEqual(json.loads(stdlib_dumps_bytes(self.payload)),
+                             json.loads(self.app.json.dumps_bytes(self.payload)))
+            self.assertEqual(self.app.json.loads(b'{"a": [1, 2]}'), {'a': [1, 2]})
+
+
+if __name__ == '__main__':
+    unittest.main()
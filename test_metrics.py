@@ -0,0 +1,80 @@
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+from flask import Flask
+
+sys.path.insert(0, os.path.abspath(os.path.dirname(__file__)))
+
+from src import metrics
+
+
+class MetricsTest(unittest.TestCase):
+    """Test per il registro di metriche condiviso tra processi"""
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        patches = [
+            mock.patch.dict(os.environ, {'METRICS_DIR': self.tmpdir}),
+            mock.patch.object(metrics, '_process_files', metrics._ProcessFiles()),
+        ]
+        for patch in patches:
+            patch.start()
+            self.addCleanup(patch.stop)
+        self.addCleanup(shutil.rmtree, self.tmpdir)
+        self.registry = metrics.MetricsRegistry()
+        self.requests = self.registry.counter('demo_requests', 'Demo counter.', ('route',))
+        self.latency = self.registry.histogram('demo_latency_seconds', 'Demo histogram.', buckets=(0.1, 1.0))
+
+    def test_counters_are_summed_across_processes(self):
+        self.requests.inc(route='/trails')
+        pid = os.fork()
+        if pid == 0:  # child: behaves like another gunicorn worker
+            try:
+                self.requests.inc(2, route='/trails')
+            finally:
+                os._exit(0)
+        os.waitpid(pid, 0)
+        self.assertIn('demo_requests_total{route="/trails"} 3', self.registry.exposition())
+        self.assertEqual(len(os.listdir(self.tmpdir)), 2)
+
+    def test_histogram_buckets_are_cumulative(self):
+        for value in (0.05, 0.5, 0.7, 3.0):
+            self.latency.observe(value)
+        text = self.registry.exposition()
+        self.assertIn('# TYPE demo_latency_seconds histogram', text)
+        self.assertIn('demo_latency_seconds_bucket{le="0.1"} 1', text)
+        self.assertIn('demo_latency_seconds_bucket{le="1.0"} 3', text)
+        self.assertIn('demo_latency_seconds_bucket{le="+Inf"} 4', text)
+        self.assertIn('demo_latency_seconds_count 4', text)
+
+    def test_gauges_of_dead_workers_are_dropped(self):
+        gauge = self.registry.gauge('demo_in_use', 'Demo gauge.')
+        gauge.inc(3)
+        self.assertIn('demo_in_use 3', self.registry.exposition())
+        metrics.mark_process_dead(os.getpid())
+        self.assertNotIn('demo_in_use 3', self.registry.exposition())
+
+    def test_metrics_endpoint(self):
+        app = Flask(__name__)
+        app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+        metrics.db.init_app(app)
+        metrics.init_metrics(app)
+
+        @app.route('/ping')
+        def ping():
+            return 'pong'
+
+        client = app.test_client()
+        client.get('/ping')
+        response = client.get('/metrics')
+        self.assertTrue(response.content_type.startswith('text/plain'))
+        self.assertIn(b'http_request_duration_seconds_count{endpoint="ping",method="GET",status="200"} 1',
+                      response.data)
+
+
+if __name__ == '__main__':
+    unittest.main()
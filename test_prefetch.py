@@ -0,0 +1,143 @@
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.abspath(os.path.dirname(__file__)))
+
+from flask import Flask
+
+from src.external_apis import TrailService, _tile_blocks
+from src.routes.external import external_bp
+from src.prefetch import PrefetchScheduler, register_prefetch
+from src.upstream_cache import UpstreamCache, upstream_cache
+
+
+def _way(osm_id, *coordinates):
+    return {'type': 'Feature', 'geometry': {'type': 'LineString', 'coordinates': [list(c) for c in coordinates]},
+            'properties': {'id': osm_id, 'type': 'way'}}
+
+
+class PrefetchSchedulerTest(unittest.TestCase):
+    """Test per il prefetch in background delle aree più richieste"""
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.cache = UpstreamCache(os.path.join(self.tmpdir, 'upstream.db'))
+        self.fetched = []
+        register_prefetch('tile', lambda args: lambda: self.fetched.append(args) or {'tile': args}, 600, 60)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def _request(self, key, times):
+        for _ in range(times):
+            self.cache.record_demand(key, 'tile', [key])
+
+    def test_refreshes_popular_keys_within_budget(self):
+        self._request('dolomiti', 5)
+        self._request('monte-bianco', 3)
+        self._request('gran-sasso', 2)
+        self._request('rarely', 1)
+        scheduler = PrefetchScheduler(self.cache, interval=60, budget_per_minute=2)
+        self.assertEqual(scheduler.run_once(), 2)
+        self.assertEqual(self.fetched, [['dolomiti'], ['monte-bianco']])
+        self.assertEqual(self.cache.get('dolomiti')[:2], ({'tile': ['dolomiti']}, 'fresh'))
+        # Next pass: the two fresh tiles are skipped and the budget goes to the next one
+        self.assertEqual(scheduler.run_once(), 1)
+        self.assertEqual(self.fetched[-1], ['gran-sasso'])
+
+    def test_entries_close_to_expiry_are_refreshed(self):
+        self._request('dolomiti', 3)
+        self.cache.set('dolomiti', 'old', ttl=30)
+        PrefetchScheduler(self.cache, interval=60).run_once()
+        self.assertEqual(self.fetched, [['dolomiti']])
+        self.cache.set('dolomiti', 'new', ttl=3600)
+        PrefetchScheduler(self.cache, interval=60).run_once()
+        self.assertEqual(len(self.fetched), 1)
+
+    def test_only_one_process_runs_each_tick(self):
+        self._request('dolomiti', 3)
+        PrefetchScheduler(self.cache, interval=60).tick()
+        self.cache.delete('dolomiti')
+        PrefetchScheduler(UpstreamCache(self.cache.path), interval=60).tick()
+        self.assertEqual(len(self.fetched), 1)
+
+
+class OverpassTileTest(unittest.TestCase):
+    """Test per la cache e il prefetch delle aree Overpass a tasselli fissi"""
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.env = mock.patch.dict(os.environ, {'UPSTREAM_CACHE_DIR': self.tmpdir})
+        self.env.start()
+        self.state = mock.patch.multiple('src.upstream_cache', _cache=None)
+        self.state.start()
+        self.boxes = []
+        # One way inside the 46.00-46.05 x 11.00-11.05 tile, one crossing into the tile to the east
+        self.ways = [_way(1, (11.01, 46.01), (11.02, 46.02)), _way(2, (11.04, 46.01), (11.06, 46.01))]
+        self.fetch = mock.patch.object(TrailService, '_fetch_trails_in_area', autospec=True, side_effect=(
+            lambda service, *box: self.boxes.append(box) or {'type': 'FeatureCollection', 'features': self.ways}
+        ))
+        self.fetch.start()
+
+    def tearDown(self):
+        self.fetch.stop()
+        self.state.stop()
+        self.env.stop()
+        shutil.rmtree(self.tmpdir)
+
+    def _ids(self, *bbox):
+        return sorted(f['properties']['id'] for f in TrailService().get_trails_in_area(*bbox)['features'])
+
+    def test_areas_share_tiles(self):
+        self.assertEqual(self._ids(46.01, 11.01, 46.03, 11.03), [1])
+        self.assertEqual(self.boxes, [(46.0, 11.0, 46.05, 11.05)])
+        # A different box inside the same tile is served from the cache
+        self.assertEqual(self._ids(46.005, 11.015, 46.04, 11.049), [1, 2])
+        self.assertEqual(len(self.boxes), 1)
+        # Only the uncached tile is fetched, and the crossing way is returned once
+        self.assertEqual(self._ids(46.01, 11.01, 46.02, 11.07), [1, 2])
+        self.assertEqual(self.boxes[1:], [(46.0, 11.05, 46.05, 11.1)])
+
+    def test_only_missing_tiles_are_fetched(self):
+        self._ids(46.01, 11.06, 46.02, 11.07)
+        self.boxes.clear()
+        # The middle tile is cached: its neighbours are fetched separately, not as one box over all three
+        self._ids(46.01, 11.01, 46.02, 11.14)
+        self.assertEqual(sorted(self.boxes), [(46.0, 11.0, 46.05, 11.05), (46.0, 11.1, 46.05, 11.15)])
+        # An L-shaped set of tiles is covered by two rectangles and nothing else
+        blocks = _tile_blocks([(0, 0), (0, 1), (1, 0), (1, 1), (2, 0)])
+        self.assertEqual(sorted((r.start, r.stop, c.start, c.stop) for r, c in blocks), [(0, 2, 0, 2), (2, 3, 0, 1)])
+
+    def test_large_areas_are_rejected(self):
+        app = Flask(__name__)
+        app.register_blueprint(external_bp, url_prefix='/api/external')
+        client = app.test_client()
+        for query in ('south=44&west=6&north=46&east=12', 'south=-90&west=-180&north=90&east=180',
+                      'south=46.1&west=11&north=46&east=11.1', 'south=nan&west=11&north=46&east=11.1'):
+            response = client.get('/api/external/trails?' + query)
+            self.assertEqual(response.status_code, 400, query)
+        self.assertEqual(self.boxes, [])
+        self.assertEqual(upstream_cache().popular(1), [])
+        self.assertEqual(client.get('/api/external/refuges?south=46&west=11&north=46.6&east=11.6').status_code, 400)
+
+    def test_demand_is_counted_per_tile(self):
+        for bbox in ((46.01, 11.01, 46.02, 11.02), (46.03, 11.03, 46.04, 11.04), (46.01, 11.04, 46.02, 11.06)):
+            TrailService().get_trails_in_area(*bbox)
+        popular = {key: (args, score) for key, _, args, score in upstream_cache().popular(10)}
+        self.assertEqual(sorted(popular), ['overpass:trails:46.0,11.0,46.05,11.05', 'overpass:trails:46.0,11.05,46.05,11.1'])
+        args, score = popular['overpass:trails:46.0,11.0,46.05,11.05']
+        self.assertEqual(args, [46.0, 11.0, 46.05, 11.05])
+        self.assertAlmostEqual(score, 3, places=3)
+        # The scheduler refetches a popular tile with the recorded tile box
+        upstream_cache().delete('overpass:trails:46.0,11.0,46.05,11.05')
+        PrefetchScheduler(upstream_cache(), min_score=2).run_once()
+        self.assertEqual(self.boxes[-1], (46.0, 11.0, 46.05, 11.05))
+        self.assertEqual(upstream_cache().get('overpass:trails:46.0,11.0,46.05,11.05').state, 'fresh')
+
+
+if __name__ == '__main__':
+    unittest.main()
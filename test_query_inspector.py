@@ -0,0 +1,105 @@
+import logging
+import os
+import sys
+import unittest
+
+from flask import Flask, jsonify
+
+sys.path.insert(0, os.path.abspath(os.path.dirname(__file__)))
+
+from src.db_config import init_database
+from src.models import db, Guide, User, UserGuideProgress
+from src.query_inspector import QueryProblem, capture_queries, init_query_inspector, logger, query_budget
+from src.routes.guide import guide_bp
+
+
+class QueryInspectorTest(unittest.TestCase):
+    """Test per il rilevamento di N+1, budget di query e query lente"""
+
+    def setUp(self):
+        self.app = Flask(__name__)
+        self.app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+        self.app.config['TESTING'] = True
+        self.app.config['QUERY_INSPECTOR_ENABLED'] = True
+        self.app.config['QUERY_INSPECTOR_RAISE'] = True
+        self.app.config['SLOW_QUERY_MS'] = 10_000
+        init_database(self.app)
+        init_query_inspector(self.app)
+        self.app.register_blueprint(guide_bp, url_prefix='/api')
+
+        @self.app.route('/naive-progress')
+        def naive_progress():
+            records = UserGuideProgress.query.all()
+            return jsonify([record.to_dict() for record in records])
+
+        @self.app.route('/no-queries')
+        @query_budget(0)
+        def no_queries():
+            Guide.query.count()
+            return jsonify({})
+
+        @self.app.route('/budgeted')
+        @query_budget(1)
+        def budgeted():
+            Guide.query.count()
+            User.query.count()
+            return jsonify({})
+
+        with self.app.app_context():
+            db.create_all()
+            db.session.add(User(id='u1', username='anna', email='anna@example.com', password_hash='x'))
+            for i in range(4):
+                guide = Guide(title=f'Guida {i}', description='-', difficulty='beginner', steps=['a', 'b'])
+                db.session.add(guide)
+                db.session.flush()
+                db.session.add(UserGuideProgress(user_id='u1', guide_id=guide.id))
+            db.session.commit()
+
+    def tearDown(self):
+        with self.app.app_context():
+            db.session.remove()
+            db.drop_all()
+
+    def test_progress_route_loads_guides_eagerly(self):
+        response = self.app.test_client().get('/api/guides/progress?user_id=u1')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.get_json()), 4)
+
+    def test_lazy_loads_in_a_loop_are_reported(self):
+        with self.assertRaises(QueryProblem) as raised:
+            self.app.test_client().get('/naive-progress')
+        self.assertIn('Possible N+1: statement executed 4 times', str(raised.exception))
+
+    def test_query_budget(self):
+        with self.assertRaises(QueryProblem) as raised:
+            self.app.test_client().get('/budgeted')
+        self.assertIn('2 queries (budget 1)', str(raised.exception))
+
+    def test_slow_query_logs_plan(self):
+        self.app.config['SLOW_QUERY_MS'] = 0
+        init_query_inspector(self.app)
+        with self.app.app_context(), capture_queries() as log:
+            with self.assertLogs(logger, logging.WARNING) as captured:
+                Guide.query.filter_by(id=1).all()
+        self.assertEqual(len(log), 1)
+        self.assertIn('plan:', captured.output[0])
+        self.assertIn('SEARCH', captured.output[0])
+
+    def test_zero_query_budget_is_enforced(self):
+        with self.assertRaises(QueryProblem) as raised:
+            self.app.test_client().get('/no-queries')
+        self.assertIn('1 queries (budget 0)', str(raised.exception))
+
+    def test_slow_query_threshold_is_per_app(self):
+        other = Flask(__name__)
+        other.config.update(SQLALCHEMY_DATABASE_URI='sqlite://', QUERY_INSPECTOR_ENABLED=True, SLOW_QUERY_MS=0)
+        init_database(other)
+        init_query_inspector(other)
+        # Initialising another app does not change this app's threshold
+        with self.app.app_context(), capture_queries():
+            with self.assertNoLogs(logger, logging.WARNING):
+                Guide.query.filter_by(id=1).all()
+
+
+if __name__ == '__main__':
+    unittest.main()
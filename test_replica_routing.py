@@ -0,0 +1,62 @@
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+from flask import Flask
+
+sys.path.insert(0, os.path.abspath(os.path.dirname(__file__)))
+
+from src.db_config import init_database
+from src.models import db
+from src.models.routing import REPLICA_BIND_KEY
+from src.routes.trail import trail_bp
+
+
+class ReplicaRoutingTest(unittest.TestCase):
+    """Test per l'instradamento delle letture sulla replica (due file SQLite)"""
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.app = Flask(__name__)
+        self.app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///' + os.path.join(self.tmpdir, 'primary.db')
+        self.app.config['DATABASE_REPLICA_URL'] = 'sqlite:///' + os.path.join(self.tmpdir, 'replica.db')
+        init_database(self.app)
+        self.trail = {'name': 'Alta Via 1', 'difficulty': 'moderate', 'created_by': 'u1'}
+        self.app.register_blueprint(trail_bp, url_prefix='/api')
+        with self.app.app_context():
+            db.create_all()
+            # Same schema on the "replica"; replication itself is not simulated
+            db.metadatas[None].create_all(bind=db.engines[REPLICA_BIND_KEY])
+
+    def tearDown(self):
+        with self.app.app_context():
+            db.session.remove()
+            for engine in db.engines.values():
+                engine.dispose()
+        shutil.rmtree(self.tmpdir)
+
+    def test_reads_go_to_replica_and_writes_to_primary(self):
+        writer = self.app.test_client()
+        response = writer.post('/api/trails', json=self.trail)
+        self.assertEqual(response.status_code, 201)
+
+        reader = self.app.test_client()
+        self.assertEqual(reader.get('/api/trails').get_json(), [])
+
+    def test_writer_reads_its_own_writes(self):
+        writer = self.app.test_client()
+        writer.post('/api/trails', json=self.trail)
+        names = [t['name'] for t in writer.get('/api/trails').get_json()]
+        self.assertEqual(names, ['Alta Via 1'])
+
+    def test_stickiness_expires(self):
+        writer = self.app.test_client()
+        writer.post('/api/trails', json=self.trail)
+        writer.set_cookie('mh_db_primary', '0')
+        self.assertEqual(writer.get('/api/trails').get_json(), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,60 @@
+import json
+import logging
+import os
+import sys
+import time
+import unittest
+
+from flask import Flask, jsonify
+from sqlalchemy import text
+
+sys.path.insert(0, os.path.abspath(os.path.dirname(__file__)))
+
+from src.db_config import init_database
+from src.models import db
+from src.request_timing import init_request_timing, logger, track_upstream
+
+
+class RequestTimingTest(unittest.TestCase):
+    """Test per il middleware di misura dei tempi delle richieste"""
+
+    def setUp(self):
+        self.app = Flask(__name__)
+        self.app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+        init_database(self.app)
+        init_request_timing(self.app)
+
+        @self.app.route('/work')
+        def work():
+            db.session.execute(text('select 1'))
+            db.session.execute(text('select 2'))
+            with track_upstream('open-meteo'):
+                time.sleep(0.01)
+            return jsonify({'ok': True})
+
+    def test_server_timing_header(self):
+        response = self.app.test_client().get('/work')
+        header = response.headers['Server-Timing']
+        self.assertTrue(header.startswith('total;dur='))
+        self.assertIn('db;dur=', header)
+        self.assertIn('desc="2 queries"', header)
+        upstream = [p for p in header.split(', ') if p.startswith('ext-open-meteo')]
+        self.assertEqual(len(upstream), 1)
+        self.assertGreaterEqual(float(upstream[0].split('dur=')[1]), 10)
+
+    def test_structured_log_line(self):
+        with self.assertLogs(logger, logging.INFO) as captured:
+            self.app.test_client().get('/work')
+        record = json.loads(captured.records[-1].getMessage())
+        self.assertEqual(record['endpoint'], 'work')
+        self.assertEqual(record['status'], 200)
+        self.assertEqual(record['db_queries'], 2)
+        self.assertIn('open-meteo', record['upstream_ms'])
+
+    def test_track_upstream_outside_request_is_a_no_op(self):
+        with track_upstream('overpass'):
+            pass
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,125 @@
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+from array import array
+from unittest import mock
+
+from flask import Flask
+
+sys.path.insert(0, os.path.abspath(os.path.dirname(__file__)))
+
+from src import route_planner
+from src.models import Refuge, Track, Trail, db
+from src.routes.planner import planner_bp
+from src.services.route_graph import GraphBuilder, RouteGraph
+from src.services.track_codec import TrackData
+from src.upstream_cache import upstream_cache
+
+START, END = (46.0, 11.0), (46.01, 11.0)
+# Slightly off START and END, within the snapping distance
+DETOUR = [(46.00002, 11.0, None), (46.005, 11.006, None), (46.01002, 11.0, None)]
+
+
+def _graph(direct_grade):
+    builder = GraphBuilder()
+    builder.add_way([(*START, None), (*END, None)], direct_grade, name='diretto')
+    builder.add_way(DETOUR, 1, name='giro')
+    return builder.build('test')
+
+
+class RoutePlannerTest(unittest.TestCase):
+    """Test per il calcolo dei percorsi sul grafo dei sentieri"""
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.env = mock.patch.dict(os.environ, {
+            'UPSTREAM_CACHE_DIR': self.tmpdir,
+            'ROUTE_GRAPH_PATH': os.path.join(self.tmpdir, 'graph', 'graph.bin'),
+        })
+        self.env.start()
+        self.state = mock.patch.multiple('src.upstream_cache', _cache=None)
+        self.state.start()
+        route_planner.reset_route_graph()
+
+    def tearDown(self):
+        route_planner.reset_route_graph()
+        self.state.stop()
+        self.env.stop()
+        shutil.rmtree(self.tmpdir)
+
+    def test_snapping_difficulty_and_persistence(self):
+        graph = _graph(direct_grade=2)
+        self.assertEqual(graph.node_count, 3)  # the detour's ends are snapped onto the direct way's
+        self.assertEqual(list(graph.offsets), [0, 2, 4, 6])
+        source, target = graph.nearest(*START, 100)[0], graph.nearest(*END, 100)[0]
+        self.assertEqual(len(graph.find_route(source, target).edges), 1)
+        # Capped at T1 the route takes the longer, easier way
+        self.assertEqual(len(graph.find_route(source, target, max_grade=1).edges), 2)
+        # A T6 direct way costs more time than the detour
+        route = _graph(direct_grade=6).find_route(source, target)
+        self.assertEqual([s['name'] for s in _graph(6).describe(route)['segments']], ['giro'])
+
+        path = os.path.join(self.tmpdir, 'graph.bin')
+        graph.save(path)
+        loaded = RouteGraph.load(path)
+        self.assertEqual(loaded.fingerprint, 'test')
+        self.assertEqual(list(loaded.targets), list(graph.targets))
+        self.assertEqual(loaded.describe(loaded.find_route(source, target)), graph.describe(graph.find_route(source, target)))
+
+    def test_route_endpoint_joins_local_and_cached_trails(self):
+        app = Flask(__name__)
+        app.config.update(SQLALCHEMY_DATABASE_URI='sqlite:///:memory:', TESTING=True)
+        db.init_app(app)
+        app.register_blueprint(planner_bp, url_prefix='/api')
+        # A local track climbing 100 m north from START to END, then an OSM way on to the east
+        upstream_cache().set('overpass:trails:46,11,46.1,11.1', {'type': 'FeatureCollection', 'features': [{
+            'type': 'Feature',
+            'geometry': {'type': 'LineString', 'coordinates': [[11.0, 46.01], [11.01, 46.01]]},
+            'properties': {'id': 42, 'type': 'way', 'name': 'Sentiero 42', 'sac_scale': 'mountain_hiking'},
+        }]}, ttl=60)
+        with app.app_context():
+            db.create_all(bind_key=None)
+            trail = Trail(name='Salita', difficulty='easy')
+            trail.track = Track.from_track_data(TrackData(
+                array('d', [46.0, 46.005, 46.01]), array('d', [11.0] * 3), array('d', [1500.0, 1550.0, 1600.0])
+            ))
+            refuge = Refuge(name='Rifugio', latitude=46.0001, longitude=11.0)
+            db.session.add_all([trail, refuge])
+            db.session.commit()
+            refuge_id = refuge.id
+        client = app.test_client()
+
+        response = client.get(f'/api/routes?from={refuge_id}&to=46.01,11.01&max_sac=mountain_hiking')
+        self.assertEqual(response.status_code, 200, response.get_json())
+        body = response.get_json()
+        self.assertEqual([s['source'] for s in body['segments']], ['trail', 'osm'])
+        self.assertEqual(body['elevation_gain_m'], 100)
+        self.assertAlmostEqual(body['distance_km'], 1.11 + 0.77, places=1)
+        self.assertEqual(body['from']['name'], 'Rifugio')
+        self.assertEqual(body['geometry']['coordinates'][0], [11.0, 46.0, 1500.0])
+        self.assertTrue(os.path.exists(os.environ['ROUTE_GRAPH_PATH']))
+
+        self.assertEqual(client.get('/api/routes?from=46.01,11.01&to=46.0,11.0&max_sac=1').status_code, 404)
+        self.assertEqual(client.get('/api/routes?from=45,10&to=46.0,11.0').status_code, 404)
+        self.assertEqual(client.get('/api/routes?to=46.0,11.0').status_code, 400)
+        self.assertEqual(client.get('/api/routes?from=46,11&to=46,11&max_sac=9').status_code, 400)
+        # Another worker loads the saved graph instead of building it again
+        route_planner.reset_route_graph()
+        with mock.patch.object(route_planner, 'build_graph') as build:
+            self.assertEqual(client.get(f'/api/routes?from={refuge_id}&to=46.01,11.01').status_code, 200)
+        build.assert_not_called()
+
+        # Refreshing a cached way with the same content keeps the graph; new content rebuilds it
+        with app.app_context():
+            fingerprint = route_planner.source_fingerprint()
+            upstream_cache().set('overpass:trails:46,11,46.1,11.1', upstream_cache().get(
+                'overpass:trails:46,11,46.1,11.1').value, ttl=60)
+            self.assertEqual(route_planner.source_fingerprint(), fingerprint)
+            upstream_cache().set('overpass:way:43', {'type': 'FeatureCollection', 'features': []}, ttl=60)
+            self.assertNotEqual(route_planner.source_fingerprint(), fingerprint)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,119 @@
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+from array import array
+from unittest import mock
+
+from flask import Flask
+
+sys.path.insert(0, os.path.abspath(os.path.dirname(__file__)))
+
+from src import circuit_breaker
+from src.external_apis import WeatherService
+from src.models import Track, Trail, db
+from src.routes.external import external_bp
+from src.services.track_codec import TrackData
+from src.services.track_sampling import sample_along
+
+# About 1.11 km between consecutive points
+STRAIGHT_TRACK = TrackData(array('d', [46.0 + i * 0.01 for i in range(11)]), array('d', [11.0] * 11))
+
+
+def _open_meteo(url, params, timeout):
+    """Fake Open-Meteo: one forecast per requested location, a list for several."""
+    forecasts = [
+        {'latitude': float(lat), 'longitude': float(lon), 'current': {'temperature_2m': 10}}
+        for lat, lon in zip(params['latitude'].split(','), params['longitude'].split(','))
+    ]
+    response = mock.Mock(status_code=200)
+    response.json.return_value = forecasts if len(forecasts) > 1 else forecasts[0]
+    return response
+
+
+class RouteWeatherTest(unittest.TestCase):
+    """Test per il meteo lungo un percorso con una sola richiesta a Open-Meteo"""
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.env = mock.patch.dict(os.environ, {'UPSTREAM_CACHE_DIR': self.tmpdir})
+        self.env.start()
+        self.state = mock.patch.multiple('src.upstream_cache', _cache=None)
+        self.state.start()
+        circuit_breaker._breakers.clear()
+        self.get = mock.patch('requests.Session.get', side_effect=_open_meteo)
+        self.upstream = self.get.start()
+
+    def tearDown(self):
+        self.get.stop()
+        circuit_breaker._breakers.clear()
+        self.state.stop()
+        self.env.stop()
+        shutil.rmtree(self.tmpdir)
+
+    def test_sample_along_keeps_both_ends(self):
+        samples = sample_along(STRAIGHT_TRACK, spacing_km=2, max_points=50)
+        self.assertEqual([lat for lat, _, _ in samples], [46.0, 46.02, 46.04, 46.06, 46.08, 46.09, 46.1])
+        # A sample close to the end is moved onto it
+        samples = sample_along(STRAIGHT_TRACK, spacing_km=3, max_points=50)
+        self.assertEqual([lat for lat, _, _ in samples], [46.0, 46.03, 46.06, 46.1])
+        self.assertAlmostEqual(samples[-1][2], 11.12, places=1)
+        self.assertEqual(len(sample_along(STRAIGHT_TRACK, spacing_km=0.1, max_points=3)), 3)
+
+    def test_batch_fetches_uncached_cells_in_one_request(self):
+        service = WeatherService('http://open-meteo.test/v1/forecast')
+        forecasts = service.get_weather_batch([(46.001, 11.0), (46.002, 11.0), (46.05, 11.0)])
+        self.assertEqual(self.upstream.call_count, 1)
+        self.assertEqual(self.upstream.call_args.kwargs['params']['latitude'], '46.0,46.05')
+        self.assertIs(forecasts[0], forecasts[1])
+        self.assertEqual(forecasts[2]['latitude'], 46.05)
+        # Cached cells are not requested again
+        service.get_weather_batch([(46.05, 11.0), (46.2, 11.0)])
+        self.assertEqual(self.upstream.call_args.kwargs['params']['latitude'], '46.2')
+        self.assertEqual(service.get_weather(46.0, 11.0)['latitude'], 46.0)
+        self.assertEqual(self.upstream.call_count, 2)
+
+    def test_route_endpoint(self):
+        app = Flask(__name__)
+        app.config.update(SQLALCHEMY_DATABASE_URI='sqlite:///:memory:', TESTING=True)
+        db.init_app(app)
+        app.register_blueprint(external_bp, url_prefix='/api/external')
+        with app.app_context():
+            db.create_all(bind_key=None)
+            trail = Trail(name='Traversata', difficulty='moderate')
+            trail.track = Track.from_track_data(STRAIGHT_TRACK)
+            db.session.add(trail)
+            db.session.commit()
+            trail_id = trail.id
+        client = app.test_client()
+
+        response = client.get(f'/api/external/weather/route?trail_id={trail_id}&spacing_km=5')
+        self.assertEqual(response.status_code, 200)
+        body = response.get_json()
+        self.assertEqual([p['distance_km'] for p in body['points']][0], 0.0)
+        self.assertEqual(len(body['points']), 3)
+        self.assertEqual(len(body['forecasts']), 3)
+        self.assertEqual(self.upstream.call_count, 1)
+
+        response = client.post('/api/external/weather/route', json={'points': [
+            {'lat': 46.0, 'lon': 11.0}, {'lat': 46.001, 'lng': 11.001},
+        ]})
+        body = response.get_json()
+        self.assertEqual([p['forecast'] for p in body['points']], [0, 0])
+        self.assertEqual(len(body['forecasts']), 1)
+        self.assertEqual(self.upstream.call_count, 1)  # served from the cache
+        self.assertEqual(client.post('/api/external/weather/route', json={'points': [{'lat': 1}]}).status_code, 400)
+        self.assertEqual(client.get('/api/external/weather/route').status_code, 400)
+        # Non-finite or out-of-range input is a client error, not a crash
+        for query in ('weather/route?trail_id=%s&spacing_km=nan' % trail_id, 'weather?latitude=nan&longitude=11',
+                      'weather?latitude=46&longitude=inf', 'weather?latitude=91&longitude=11'):
+            self.assertEqual(client.get(f'/api/external/{query}').status_code, 400, query)
+        for point in ({'lat': 'nan', 'lon': 11.0}, {'lat': 46.0, 'lon': 'inf'}, {'lat': 46.0, 'lon': 200}):
+            response = client.post('/api/external/weather/route', json={'points': [point]})
+            self.assertEqual(response.status_code, 400, point)
+        self.assertEqual(self.upstream.call_count, 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
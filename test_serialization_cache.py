@@ -0,0 +1,68 @@
+import json
+import os
+import sys
+import unittest
+
+from flask import Flask
+
+sys.path.insert(0, os.path.abspath(os.path.dirname(__file__)))
+
+from src.serialization_cache import SerializationCache, cached_list, json_list_response
+
+
+class Row:
+    def __init__(self, id, name):
+        self.id = id
+        self.name = name
+
+    def to_dict(self):
+        return {'id': self.id, 'name': self.name}
+
+
+class SerializationCacheTest(unittest.TestCase):
+    """Test per la cache dei frammenti JSON serializzati"""
+
+    def setUp(self):
+        self.app = Flask(__name__)
+        self.rows = {i: Row(i, 'Rifugio %d' % i) for i in range(1, 6)}
+        self.loaded = []
+
+    def load(self, ids):
+        self.loaded.append(sorted(ids))
+        return [self.rows[i] for i in ids if i in self.rows]
+
+    def test_lru_is_bounded_by_bytes(self):
+        cache = SerializationCache(max_bytes=10)
+        cache.put('a', b'12345')
+        cache.put('b', b'12345')
+        cache.get('a')
+        cache.put('c', b'123')
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(cache.get('a'), b'12345')
+        self.assertLessEqual(cache.stats()['bytes'], 10)
+
+    def test_list_only_loads_missing_or_changed_rows(self):
+        versions = [(i, 'v1') for i in range(1, 6)]
+        with self.app.app_context():
+            first = cached_list('row', versions, self.load, Row.to_dict)
+            self.assertEqual(self.loaded, [[1, 2, 3, 4, 5]])
+
+            self.rows[3].name = 'Bivacco'
+            versions[2] = (3, 'v2')
+            second = cached_list('row', versions, self.load, Row.to_dict)
+            self.assertEqual(self.loaded[1:], [[3]])
+
+            body = json.loads(json_list_response(second).get_data())
+        self.assertEqual(len(first), 5)
+        self.assertEqual([r['id'] for r in body], [1, 2, 3, 4, 5])
+        self.assertEqual(body[2]['name'], 'Bivacco')
+
+    def test_deleted_rows_are_skipped(self):
+        versions = [(1, 'v1'), (99, 'v1')]
+        with self.app.app_context():
+            fragments = cached_list('row', versions, self.load, Row.to_dict)
+        self.assertEqual(len(fragments), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
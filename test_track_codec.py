@@ -0,0 +1,64 @@
+import os
+import sys
+import unittest
+from array import array
+
+sys.path.insert(0, os.path.abspath(os.path.dirname(__file__)))
+
+from src.services.track_codec import TrackData, decode_track, encode_track
+
+
+class TrackCodecTest(unittest.TestCase):
+    """Test per la codifica binaria delle tracce GPS"""
+
+    def setUp(self):
+        self.points = [
+            {'lat': 46.123456, 'lon': 11.654321, 'ele': 1500.2, 'time': '2024-07-01T08:00:00Z'},
+            {'lat': 46.123500, 'lon': 11.654300, 'ele': 1501.0, 'time': '2024-07-01T08:00:05Z'},
+            {'lat': 46.122000, 'lon': 11.655000, 'ele': 1498.7, 'time': '2024-07-01T08:00:10Z'},
+        ]
+
+    def test_round_trip(self):
+        track = decode_track(encode_track(TrackData.from_points(self.points)))
+        self.assertEqual(len(track), 3)
+        for point, lat, lon, ele in zip(self.points, track.lat, track.lon, track.ele):
+            self.assertAlmostEqual(point['lat'], lat, places=6)
+            self.assertAlmostEqual(point['lon'], lon, places=6)
+            self.assertAlmostEqual(point['ele'], ele, places=1)
+        self.assertEqual(list(track.time), [1719820800, 1719820805, 1719820810])
+
+    def test_optional_streams(self):
+        track = TrackData.from_points([{'lat': 1.0, 'lng': 2.0}, {'lat': 1.5, 'lng': 2.5}])
+        decoded = decode_track(encode_track(track))
+        self.assertIsNone(decoded.ele)
+        self.assertIsNone(decoded.time)
+        self.assertEqual(decoded.to_geojson()['geometry']['coordinates'], [[2.0, 1.0], [2.5, 1.5]])
+
+    def test_geojson_input_and_gpx_output(self):
+        track = TrackData.from_gpx_data(
+            {'type': 'LineString', 'coordinates': [[11.0, 46.0, 1000.0], [11.1, 46.1, 1100.0]]}
+        )
+        self.assertEqual(track.bbox(), [11.0, 46.0, 11.1, 46.1])
+        gpx = track.to_gpx(name='Giro <test>')
+        self.assertIn('<trkpt lat="46.100000" lon="11.100000"><ele>1100.0</ele></trkpt>', gpx)
+        self.assertIn('Giro &lt;test&gt;', gpx)
+
+    def test_invalid_payload(self):
+        with self.assertRaises(ValueError):
+            TrackData.from_gpx_data('not a track')
+        with self.assertRaises(ValueError):
+            TrackData.from_gpx_data({'geometry': 'bad'})
+
+    def test_out_of_range_values(self):
+        for point in ({'lat': float('nan'), 'lon': 11.0}, {'lat': 46.0, 'lon': float('inf')},
+                      {'lat': 1e30, 'lon': 11.0}, {'lat': 46.0, 'lon': 181.0},
+                      {'lat': 46.0, 'lon': 11.0, 'ele': 1e30}):
+            with self.assertRaises(ValueError, msg=point):
+                TrackData.from_points([self.points[0], point])
+        track = TrackData(array('d', [46.0, float('nan')]), array('d', [11.0, 11.0]))
+        with self.assertRaises(ValueError):
+            encode_track(track)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,113 @@
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.abspath(os.path.dirname(__file__)))
+
+from src import upstream_cache
+from src.upstream_cache import UpstreamCache
+
+
+class UpstreamCacheTest(unittest.TestCase):
+    """Test per la cache persistente delle risposte delle API esterne"""
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmpdir, 'upstream.db')
+        self.cache = UpstreamCache(self.path)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_fresh_entries_skip_the_loader(self):
+        loader = mock.Mock(return_value={'features': [1, 2]})
+        self.assertEqual(self.cache.fetch('k', loader, ttl=60), {'features': [1, 2]})
+        self.assertEqual(self.cache.fetch('k', loader, ttl=60), {'features': [1, 2]})
+        self.assertEqual(loader.call_count, 1)
+        # Another instance on the same file (e.g. another worker) sees the entry
+        self.assertEqual(UpstreamCache(self.path).get('k')[:2], ({'features': [1, 2]}, 'fresh'))
+
+    def test_failures_are_not_cached(self):
+        loader = mock.Mock(side_effect=[None, {'ok': True}])
+        self.assertIsNone(self.cache.fetch('k', loader, ttl=60))
+        self.assertEqual(self.cache.fetch('k', loader, ttl=60), {'ok': True})
+
+    def test_stale_while_revalidate(self):
+        self.cache.set('k', 'old', ttl=0, stale_ttl=60)
+        refreshed = threading.Event()
+
+        def loader():
+            refreshed.set()
+            return 'new'
+
+        self.assertEqual(self.cache.fetch('k', loader, ttl=60), 'old')
+        self.assertTrue(refreshed.wait(5))
+        for _ in range(50):
+            if self.cache.get('k')[:2] == ('new', 'fresh'):
+                break
+            time.sleep(0.02)
+        self.assertEqual(self.cache.get('k')[:2], ('new', 'fresh'))
+
+    def test_expired_entries_are_reloaded(self):
+        self.cache.set('k', 'old', ttl=0, stale_ttl=0)
+        self.assertEqual(self.cache.get('k').state, 'expired')
+        self.assertEqual(self.cache.fetch('k', lambda: 'new', ttl=60), 'new')
+
+    def test_expired_entries_are_served_when_the_upstream_fails(self):
+        self.cache.set('k', 'old', ttl=0, stale_ttl=0)
+        self.assertEqual(self.cache.fetch('k', mock.Mock(side_effect=RuntimeError('down')), ttl=60), 'old')
+        with self.assertRaises(RuntimeError):
+            self.cache.fetch('other', mock.Mock(side_effect=RuntimeError('down')), ttl=60)
+
+    def test_least_recently_used_entries_are_evicted(self):
+        cache = UpstreamCache(os.path.join(self.tmpdir, 'small.db'), max_bytes=2500)
+        payload = os.urandom(900).hex()  # about 1 kB compressed
+        cache.set('a', payload, ttl=60)
+        cache.set('b', payload, ttl=60)
+        accessed = "SELECT accessed_at FROM entries WHERE key = 'a'"
+        stored = cache._connection().execute(accessed).fetchone()[0]
+        # Access times are only rewritten once they are older than the resolution
+        cache.get('a')
+        self.assertEqual(cache._connection().execute(accessed).fetchone()[0], stored)
+        later = time.time() + upstream_cache.ACCESS_RESOLUTION_SECONDS
+        with mock.patch('src.upstream_cache.time.time', return_value=later):
+            cache.get('a')
+        self.assertEqual(cache._connection().execute(accessed).fetchone()[0], later)
+        cache.set('c', payload, ttl=60)
+        self.assertIsNotNone(cache.get('a').state)
+        self.assertIsNone(cache.get('b').state)
+        self.assertIsNotNone(cache.get('c').state)
+
+    def test_concurrent_misses_call_the_upstream_once(self):
+        calls = []
+
+        def loader():
+            calls.append(1)
+            time.sleep(0.3)
+            return 'value'
+
+        results = []
+        threads = [
+            threading.Thread(target=lambda: results.append(UpstreamCache(self.path).fetch('k', loader, ttl=60)))
+            for _ in range(4)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(results, ['value'] * 4)
+        self.assertEqual(len(calls), 1)
+
+    def test_disabled_cache_calls_loader(self):
+        with mock.patch.dict(os.environ, {'UPSTREAM_CACHE_ENABLED': '0'}):
+            self.assertEqual(upstream_cache.cached_upstream('k', lambda: 1, ttl=60), 1)
+            self.assertIsNone(upstream_cache.upstream_cache())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,128 @@
+import json
+import math
+import os
+import shutil
+import struct
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+from flask import Flask
+
+sys.path.insert(0, os.path.abspath(os.path.dirname(__file__)))
+
+from src import circuit_breaker
+from src.external_apis import WeatherQuery, WeatherService
+from src.routes.external import external_bp
+from src.services.forecast_format import MIMETYPE, to_binary, to_columnar
+
+FORECAST = {
+    'latitude': 46.4, 'longitude': 11.7, 'elevation': 2100.0, 'timezone': 'Europe/Rome', 'utc_offset_seconds': 7200,
+    'hourly_units': {'time': 'iso8601', 'temperature_2m': '°C', 'visibility': 'm'},
+    'hourly': {
+        'time': ['2024-06-01T00:00', '2024-06-01T01:00', '2024-06-01T02:00'],
+        'temperature_2m': [3.5, None, -1.25],
+        'visibility': [24140.0, 12000.5, 800.0],
+    },
+    'daily_units': {'time': 'iso8601', 'sunrise': 'iso8601'},
+    'daily': {'time': ['2024-06-01'], 'sunrise': ['2024-06-01T05:36']},
+}
+
+
+def _open_meteo(url, params, timeout):
+    response = mock.Mock(status_code=200)
+    response.json.return_value = {'latitude': float(params['latitude']), 'params': params}
+    return response
+
+
+def _decode(payload):
+    """Reference decoder for the binary forecast format."""
+    length, = struct.unpack_from('<I', payload, 4)
+    header = json.loads(payload[8:8 + length])
+    offset, columns = 8 + length, {}
+    for section in ('hourly', 'daily'):
+        block = header.get(section) or {'columns': []}
+        for column in block['columns']:
+            code, size = ('h', 2) if column['type'] == 'i2' else ('f', 4)
+            values = struct.unpack_from(f"<{block['count']}{code}", payload, offset)
+            offset += -(-block['count'] * size // 4) * 4
+            columns[column['name']] = [
+                None if v == -32768 or (code == 'f' and math.isnan(v)) else v / column['scale'] for v in values
+            ]
+    return header, columns
+
+
+class WeatherSelectionTest(unittest.TestCase):
+    """Test per la selezione delle variabili meteo e i formati compatti"""
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.env = mock.patch.dict(os.environ, {'UPSTREAM_CACHE_DIR': self.tmpdir})
+        self.env.start()
+        self.state = mock.patch.multiple('src.upstream_cache', _cache=None)
+        self.state.start()
+        circuit_breaker._breakers.clear()
+        self.get = mock.patch('requests.Session.get', side_effect=_open_meteo)
+        self.upstream = self.get.start()
+
+    def tearDown(self):
+        self.get.stop()
+        circuit_breaker._breakers.clear()
+        self.state.stop()
+        self.env.stop()
+        shutil.rmtree(self.tmpdir)
+
+    def test_select_narrows_upstream_params(self):
+        query = WeatherQuery.select(['temperature_2m', 'sunrise'], ['hourly', 'daily'], days=3)
+        self.assertEqual(query.params(), {'hourly': 'temperature_2m', 'daily': 'sunrise', 'forecast_days': 3})
+        self.assertEqual(WeatherQuery.select(resolutions=['current']).params()['forecast_days'], 7)
+        self.assertEqual(WeatherQuery.from_args(query.as_args()), query)
+        self.assertEqual(WeatherQuery().cache_suffix(), '')
+        for args in ((['nope'], None, None), (None, ['weekly'], None), (None, None, 17), (['sunrise'], ['hourly'], None)):
+            with self.assertRaises(ValueError):
+                WeatherQuery.select(*args)
+
+    def test_each_query_is_cached_separately(self):
+        service = WeatherService('http://open-meteo.test/v1/forecast')
+        query = WeatherQuery.select(['temperature_2m'], ['hourly'], days=2)
+        narrow = service.get_weather(46.0, 11.0, query=query)
+        self.assertNotIn('daily', narrow['params'])
+        self.assertIn('daily', service.get_weather(46.0, 11.0)['params'])
+        self.assertEqual(service.get_weather(46.0, 11.0, query=query), narrow)
+        self.assertEqual(self.upstream.call_count, 2)
+
+    def test_columnar_and_binary_encodings(self):
+        columnar = to_columnar(FORECAST)
+        self.assertEqual(columnar['hourly']['start'], '2024-06-01T00:00')
+        self.assertEqual((columnar['hourly']['step'], columnar['hourly']['count']), (3600, 3))
+        self.assertEqual(columnar['hourly']['columns']['temperature_2m'], [3.5, None, -1.25])
+        self.assertEqual(columnar['units'], {'temperature_2m': '°C', 'visibility': 'm', 'sunrise': 'iso8601'})
+
+        payload = to_binary(FORECAST)
+        self.assertEqual(payload[:4], b'MHF1')
+        header, columns = _decode(payload)
+        types = {c['name']: (c['type'], c['scale']) for c in header['hourly']['columns']}
+        self.assertEqual(types, {'temperature_2m': ('i2', 100), 'visibility': ('f4', 1)})
+        self.assertEqual(columns['temperature_2m'], [3.5, None, -1.25])
+        self.assertEqual(columns['visibility'], [24140.0, 12000.5, 800.0])
+        self.assertEqual(header['daily']['values'], {'sunrise': ['2024-06-01T05:36']})
+
+    def test_weather_endpoint_options(self):
+        app = Flask(__name__)
+        app.register_blueprint(external_bp, url_prefix='/api/external')
+        client = app.test_client()
+        base = '/api/external/weather?latitude=46&longitude=11'
+        response = client.get(base + '&variables=temperature_2m,precipitation&resolution=hourly&days=2')
+        self.assertEqual(response.status_code, 200)
+        params = self.upstream.call_args.kwargs['params']
+        self.assertEqual((params['hourly'], params['forecast_days']), ('temperature_2m,precipitation', 2))
+        self.assertNotIn('current', params)
+        response = client.get(base + '&format=binary')
+        self.assertEqual(response.mimetype, MIMETYPE)
+        for query in ('&variables=nope', '&days=x', '&days=0', '&format=xml'):
+            self.assertEqual(client.get(base + query).status_code, 400, query)
+
+
+if __name__ == '__main__':
+    unittest.main()
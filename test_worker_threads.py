@@ -0,0 +1,79 @@
+import gc
+import json
+import os
+import sys
+import threading
+import time
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.abspath(os.path.dirname(__file__)))
+
+from benchmarks.stub_server import StubServer
+from src import circuit_breaker, external_apis
+from src.external_apis import RefugeService
+from src.lazy_services import lazy_service
+
+OVERPASS_PATH = '/api/interpreter'
+
+
+def _run_in_threads(target, count):
+    threads = [threading.Thread(target=target, args=(i,)) for i in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+
+class WorkerThreadsTest(unittest.TestCase):
+    """Test per l'uso dei servizi esterni da più thread dello stesso worker"""
+
+    def setUp(self):
+        self.env = mock.patch.dict(os.environ, {'UPSTREAM_CACHE_ENABLED': '0'})
+        self.env.start()
+        circuit_breaker._breakers.clear()
+
+    def tearDown(self):
+        circuit_breaker._breakers.clear()
+        self.env.stop()
+
+    def test_slow_upstream_calls_overlap(self):
+        elements = [{'type': 'node', 'id': 1, 'lat': 46.4, 'lon': 11.7, 'tags': {'name': 'Rifugio'}}]
+        results, sessions, spans = {}, {}, {}
+        with StubServer(delay=0.3) as stub:
+            stub.serve(OVERPASS_PATH, json.dumps({'elements': elements}).encode())
+            service = RefugeService(stub.url + OVERPASS_PATH)
+
+            def call(index):
+                start = time.perf_counter()
+                results[index] = service.get_refuges_in_area(46.3 + index * 0.01, 11.6, 46.5, 11.9)
+                spans[index] = (start, time.perf_counter())
+                sessions[index] = external_apis._session()
+
+            gc.collect()  # keep a collection of earlier tests' garbage out of the timing
+            _run_in_threads(call, 8)
+        self.assertEqual(stub.requests, 8)
+        elapsed = max(end for _, end in spans.values()) - min(start for start, _ in spans.values())
+        self.assertLess(elapsed, 8 * 0.3 / 2)
+        for result in results.values():
+            self.assertEqual(result['features'][0]['properties'], {'name': 'Rifugio', 'id': 1, 'type': 'node'})
+        # Every thread keeps its own keep-alive session
+        self.assertEqual(len({id(session) for session in sessions.values()}), 8)
+
+    def test_lazy_service_is_built_once_under_contention(self):
+        built = []
+
+        @lazy_service
+        def service():
+            built.append(1)
+            time.sleep(0.05)
+            return object()
+
+        instances = {}
+        _run_in_threads(lambda index: instances.__setitem__(index, service()), 8)
+        self.assertEqual(len(built), 1)
+        self.assertEqual(len({id(instance) for instance in instances.values()}), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()